@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+End-to-end throughput benchmark for the driver packet pipeline
+
+Runs the sample images in input/ (plus synthetic scale-up copies) through
+DriverPacketProcessor against local stand-in services and writes a JSON
+artifact with throughput, per-stage latency percentiles, peak RSS and
+external call counts.
+
+Usage:
+    python benchmarks/benchmark_pipeline.py
+    python benchmarks/benchmark_pipeline.py --scale 4 --gemini-latency 0.5
+    python benchmarks/benchmark_pipeline.py --services replay
+    python benchmarks/benchmark_pipeline.py --compare /tmp/driver_packet_benchmarks/previous.json
+"""
+
+import argparse
+import glob
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Add project root to path for imports
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from src.main_processor import DriverPacketProcessor
+from src.logging_utils import get_logger
+
+from stand_ins import StandInGeminiModel, StandInHttpClient
+
+IMAGE_PATTERNS = ["*.jpg", "*.jpeg", "*.png"]
+PERCENTILES = [50, 90, 95, 99]
+
+
+def prepare_workload(input_dir: str, work_dir: str, scale: int) -> int:
+    """
+    Copy sample images into the work directory and add synthetic scale-ups
+
+    Each scale-up copy is slightly re-toned and re-encoded so it is a distinct
+    page rather than a byte-identical duplicate.
+
+    Returns:
+        Number of images in the workload
+    """
+    images = sorted(
+        path
+        for pattern in IMAGE_PATTERNS
+        for path in glob.glob(os.path.join(input_dir, pattern))
+    )
+    if not images:
+        raise FileNotFoundError(f"No sample images found in {input_dir}")
+
+    count = 0
+    for path in images:
+        shutil.copy(path, work_dir)
+        count += 1
+
+        # Keep the extension in the name: samples like "Media 7.jpg" and
+        # "Media 7.jpeg" share a stem
+        name = Path(path).name
+        for copy_index in range(1, scale):
+            with Image.open(path) as img:
+                variant = ImageEnhance.Brightness(img.convert("RGB")).enhance(
+                    1 + 0.02 * copy_index
+                )
+                variant.save(
+                    os.path.join(work_dir, f"{name}_scale{copy_index:02d}.jpg"),
+                    quality=90,
+                )
+            count += 1
+
+    return count
+
+
+def build_processor(
+    services: str, gemini_latency: float, here_latency: float
+) -> DriverPacketProcessor:
+    """Create a processor wired to local stand-in services"""
+    processor = DriverPacketProcessor(setup_logging_config=False, replay_mode="replay")
+
+    if services == "synthetic":
+        http_client = StandInHttpClient(latency_seconds=here_latency)
+        processor.http_client = http_client
+        processor.geocoding_service.http = http_client
+        processor.route_analyzer.http = http_client
+        processor.data_extractor.model = StandInGeminiModel(
+            latency_seconds=gemini_latency
+        )
+    else:
+        processor.http_client.latency_seconds = here_latency
+        processor.data_extractor.model.latency_seconds = gemini_latency
+
+    return processor
+
+
+def summarize_stage_timings(results: List[Dict]) -> Dict:
+    """Compute latency percentiles (milliseconds) for each pipeline stage"""
+    samples: Dict[str, List[float]] = {}
+    for result in results:
+        if result.get("is_duplicate"):
+            continue
+        for stage, seconds in result.get("stage_timings", {}).items():
+            samples.setdefault(stage, []).append(seconds * 1000)
+
+    summary = {}
+    for stage, values in samples.items():
+        values = np.asarray(values)
+        summary[stage] = {
+            "count": int(values.size),
+            "mean_ms": round(float(values.mean()), 2),
+            **{
+                f"p{p}_ms": round(float(np.percentile(values, p)), 2)
+                for p in PERCENTILES
+            },
+            "max_ms": round(float(values.max()), 2),
+        }
+    return summary
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident set size of this process in MB (None if unavailable)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS reports bytes
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=PROJECT_ROOT,
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except Exception:
+        return None
+
+
+def run_benchmark(
+    input_dir: str,
+    scale: int = 1,
+    services: str = "synthetic",
+    gemini_latency: float = 0.0,
+    here_latency: float = 0.0,
+    detect_duplicates: bool = False,
+) -> Dict:
+    """
+    Run the pipeline benchmark
+
+    Args:
+        input_dir: Folder with sample images
+        scale: Total copies per sample image (1 = originals only)
+        services: "synthetic" stand-ins or "replay" of recorded fixtures
+        gemini_latency: Injected latency per Gemini call (seconds)
+        here_latency: Injected latency per HERE call (seconds)
+        detect_duplicates: Enable perceptual-hash duplicate detection
+
+    Returns:
+        Benchmark report dictionary
+    """
+    processor = build_processor(services, gemini_latency, here_latency)
+
+    with tempfile.TemporaryDirectory(prefix="packet_bench_") as work_dir:
+        image_count = prepare_workload(input_dir, work_dir, scale)
+
+        started = time.perf_counter()
+        results = processor.file_processor.process_folder(
+            work_dir, detect_duplicates=detect_duplicates
+        )
+        elapsed = time.perf_counter() - started
+
+    if isinstance(processor.data_extractor.model, StandInGeminiModel):
+        call_counts = processor.http_client.get_call_stats()
+        call_counts.update(processor.data_extractor.model.get_call_stats())
+    else:
+        call_counts = processor.get_service_call_stats()
+
+    successful = sum(1 for r in results if r.get("processing_success"))
+
+    return {
+        "benchmark": "pipeline_throughput",
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "git_revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "parameters": {
+            "input_dir": input_dir,
+            "scale": scale,
+            "services": services,
+            "gemini_latency_seconds": gemini_latency,
+            "here_latency_seconds": here_latency,
+            "detect_duplicates": detect_duplicates,
+        },
+        "images": image_count,
+        "successful": successful,
+        "failed": len(results) - successful,
+        "elapsed_seconds": round(elapsed, 3),
+        "images_per_minute": round(image_count / elapsed * 60, 2) if elapsed else 0,
+        "stage_latency": summarize_stage_timings(results),
+        "peak_rss_mb": peak_rss_mb(),
+        "external_calls": call_counts,
+    }
+
+
+def compare_reports(current: Dict, previous: Dict) -> List[str]:
+    """Describe throughput and p95 stage latency changes against a previous run"""
+
+    def change(new, old):
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    lines = [
+        f"images/min: {previous['images_per_minute']} -> {current['images_per_minute']} "
+        f"({change(current['images_per_minute'], previous['images_per_minute'])})"
+    ]
+    for stage, stats in current["stage_latency"].items():
+        old = previous.get("stage_latency", {}).get(stage)
+        if old:
+            lines.append(
+                f"{stage} p95: {old['p95_ms']}ms -> {stats['p95_ms']}ms "
+                f"({change(stats['p95_ms'], old['p95_ms'])})"
+            )
+    return lines
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Driver packet pipeline benchmark")
+    parser.add_argument("--input", default=str(PROJECT_ROOT / "input"))
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument(
+        "--services", choices=["synthetic", "replay"], default="synthetic"
+    )
+    parser.add_argument("--gemini-latency", type=float, default=0.0)
+    parser.add_argument("--here-latency", type=float, default=0.0)
+    parser.add_argument("--dedup", action="store_true")
+    parser.add_argument(
+        "--output",
+        default=str(Path(tempfile.gettempdir()) / "driver_packet_benchmarks"),
+        help="Directory for the JSON artifact (defaults to the system temp dir)",
+    )
+    parser.add_argument("--compare", help="Previous benchmark JSON to compare against")
+    args = parser.parse_args()
+
+    # Keep per-stage logging from dominating the measurement
+    get_logger().setLevel(logging.ERROR)
+
+    report = run_benchmark(
+        args.input,
+        scale=max(1, args.scale),
+        services=args.services,
+        gemini_latency=args.gemini_latency,
+        here_latency=args.here_latency,
+        detect_duplicates=args.dedup,
+    )
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"benchmark_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(
+        f"📊 {report['images']} images in {report['elapsed_seconds']}s "
+        f"({report['images_per_minute']} images/min), peak RSS {report['peak_rss_mb']} MB"
+    )
+    for stage, stats in report["stage_latency"].items():
+        print(
+            f"  {stage:<22} p50 {stats['p50_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms"
+        )
+    print(
+        f"  external calls: { {s: c['calls'] for s, c in report['external_calls'].items()} }"
+    )
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            for line in compare_reports(report, json.load(f)):
+                print(f"  Δ {line}")
+
+    print(f"✅ Benchmark written to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+State mileage engine benchmark
+
+Compares the polygon-intersection and vertex-classification engines of
+StateAnalyzer.calculate_state_miles_from_polyline for speed and accuracy on
+long synthetic routes, measures the per-state error of Douglas-Peucker
+route simplification at several tolerances against unsimplified results, and
+times calculate_state_miles_batch against a per-route loop.
+
+Uses the configured state shapefile when present; otherwise builds synthetic
+"states" (Voronoi cells over the contiguous US, densified to thousands of
+vertices each) so the comparison still exercises complex polygons.
+
+Usage:
+    python benchmarks/benchmark_state_mileage.py
+    python benchmarks/benchmark_state_mileage.py --routes 20 --vertices 50000
+    python benchmarks/benchmark_state_mileage.py --tolerances 5,25,100
+    python benchmarks/benchmark_state_mileage.py --batch-routes 500 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# Add project root to path for imports
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import flexpolyline
+import geopandas as gpd
+import shapely
+from shapely.geometry import MultiPoint, box
+
+from src.config import config
+from src.polyline_utils import decode_polyline_array, project_coordinates
+from src.state_analyzer import StateAnalyzer
+
+ENGINES = ["intersection", "vertex"]
+
+# Contiguous US bounds in EPSG:5070 (meters)
+CONUS_BOUNDS = (-2350000, 280000, 2250000, 3170000)
+
+
+def synthetic_state_boundaries(seed: int = 7, densify_meters: float = 250.0):
+    """Voronoi 'states' over the contiguous US with densified borders"""
+    rng = np.random.default_rng(seed)
+    minx, miny, maxx, maxy = CONUS_BOUNDS
+    seeds = np.column_stack((rng.uniform(minx, maxx, 48), rng.uniform(miny, maxy, 48)))
+    extent = box(*CONUS_BOUNDS)
+    cells = shapely.voronoi_polygons(MultiPoint(seeds), extend_to=extent)
+    polygons = [
+        shapely.segmentize(cell.intersection(extent), densify_meters)
+        for cell in cells.geoms
+    ]
+    return gpd.GeoDataFrame(
+        {"STUSPS": sorted(StateAnalyzer.CONTIGUOUS_STATES)[: len(polygons)]},
+        geometry=polygons,
+        crs="EPSG:5070",
+    )
+
+
+def load_boundaries(analyzer: StateAnalyzer):
+    if Path(config.STATE_SHAPEFILE_PATH).exists():
+        return analyzer.load_state_boundaries(), "shapefile"
+    analyzer._state_boundaries = synthetic_state_boundaries()
+    return analyzer._state_boundaries, "synthetic"
+
+
+def synthetic_routes(count: int, vertices: int, seed: int = 11) -> List[str]:
+    """Meandering cross-country routes encoded as HERE flexible polylines"""
+    rng = np.random.default_rng(seed)
+    routes = []
+    for _ in range(count):
+        start = np.array([rng.uniform(30, 46), rng.uniform(-120, -110)])
+        heading = rng.uniform(-0.4, 0.4) + np.cumsum(rng.normal(0, 0.02, vertices))
+        step = 25 / vertices  # ~25 degrees of longitude in total
+        lat = start[0] + np.cumsum(np.sin(heading) * step)
+        # Reflect into 26-48N rather than clipping, which would leave
+        # unnaturally straight stretches along the bounds
+        lat = 26 + 22 - np.abs((lat - 26) % 44 - 22)
+        lng = start[1] + np.cumsum(np.cos(heading) * step)
+        routes.append(flexpolyline.encode(list(zip(lat, lng))))
+    return routes
+
+
+def route_meters(polyline: str, crs: str) -> float:
+    x, y = project_coordinates(decode_polyline_array(polyline), crs)
+    return float(np.hypot(np.diff(x), np.diff(y)).sum())
+
+
+def compare_state_miles(reference: List, candidate: List) -> Dict:
+    """Per-state mileage differences between two lists of (miles, total) results"""
+    abs_errors, relative_errors, state_set_mismatches = [], [], 0
+    for (expected, total), (actual, _) in zip(reference, candidate):
+        if set(expected) != set(actual):
+            state_set_mismatches += 1
+        for state in set(expected) | set(actual):
+            error = abs(expected.get(state, 0.0) - actual.get(state, 0.0))
+            abs_errors.append(error)
+            relative_errors.append(error / total)
+
+    return {
+        "max_state_error_miles": round(max(abs_errors, default=0.0), 3),
+        "mean_state_error_miles": round(
+            float(np.mean(abs_errors)) if abs_errors else 0.0, 3
+        ),
+        "max_error_fraction_of_route": round(max(relative_errors, default=0.0), 6),
+        "routes_with_different_states": state_set_mismatches,
+    }
+
+
+def measure_simplification(
+    analyzer: StateAnalyzer,
+    polylines: List[str],
+    reference: List,
+    tolerances: List[float],
+    crs: str,
+) -> Dict:
+    """Error and speed of route simplification against unsimplified results"""
+    report = {}
+    for tolerance in tolerances:
+        results, timings, kept = [], [], []
+        for polyline, (_, total_miles) in zip(polylines, reference):
+            started = time.perf_counter()
+            miles = analyzer.calculate_state_miles_from_polyline(
+                polyline,
+                total_miles,
+                engine="intersection",
+                simplify_tolerance=tolerance,
+            )
+            timings.append(time.perf_counter() - started)
+            results.append((miles, total_miles))
+
+            x, y = project_coordinates(decode_polyline_array(polyline), crs)
+            simplified = analyzer._simplify_segment(np.column_stack((x, y)), tolerance)
+            kept.append(len(simplified) / len(x))
+
+        report[f"{tolerance:g}m"] = {
+            "mean_ms": round(float(np.mean(timings)) * 1000, 2),
+            "vertices_kept_fraction": round(float(np.mean(kept)), 4),
+            **compare_state_miles(reference, results),
+        }
+    return report
+
+
+def measure_batch(
+    analyzer: StateAnalyzer, routes: int, vertices: int, crs: str, workers: int = 1
+) -> Dict:
+    """
+    Per-route loop vs calculate_state_miles_batch on a Format 4 sized load,
+    optionally also with the batch spread over GIS worker processes
+    """
+    polylines = synthetic_routes(routes, vertices, seed=23)
+    totals = [route_meters(polyline, crs) / 1609.34 for polyline in polylines]
+
+    started = time.perf_counter()
+    looped = [
+        analyzer.calculate_state_miles_from_polyline(polyline, total)
+        for polyline, total in zip(polylines, totals)
+    ]
+    loop_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batched = analyzer.calculate_state_miles_batch(polylines, totals)
+    batch_seconds = time.perf_counter() - started
+
+    report = {
+        "routes": routes,
+        "vertices_per_route": vertices,
+        "loop_ms": round(loop_seconds * 1000, 2),
+        "batch_ms": round(batch_seconds * 1000, 2),
+        "speedup": round(loop_seconds / batch_seconds, 2),
+        "identical_results": looped == batched,
+    }
+
+    if workers > 1:
+        config.STATE_ANALYSIS_WORKERS = workers
+        try:
+            analyzer.calculate_state_miles_batch(polylines[:workers], totals[:workers])
+            started = time.perf_counter()
+            pooled = analyzer.calculate_state_miles_batch(polylines, totals)
+            pooled_seconds = time.perf_counter() - started
+        finally:
+            analyzer.close_worker_pool()
+            config.STATE_ANALYSIS_WORKERS = 1
+
+        report.update(
+            {
+                "workers": workers,
+                "cpu_count": os.cpu_count(),
+                "pooled_batch_ms": round(pooled_seconds * 1000, 2),
+                "pooled_speedup": round(batch_seconds / pooled_seconds, 2),
+                "pooled_identical_results": pooled == batched,
+            }
+        )
+    return report
+
+
+def run(
+    routes: int,
+    vertices: int,
+    repeats: int,
+    tolerances: List[float] = (),
+    batch_routes: int = 0,
+    batch_vertices: int = 2000,
+    workers: int = 1,
+) -> Dict:
+    analyzer = StateAnalyzer()
+    states, boundary_source = load_boundaries(analyzer)
+    polylines = synthetic_routes(routes, vertices)
+
+    timings = {engine: [] for engine in ENGINES}
+    results = {engine: [] for engine in ENGINES}
+
+    for polyline in polylines:
+        total_miles = route_meters(polyline, states.crs.srs) / 1609.34
+        for engine in ENGINES:
+            for _ in range(repeats):
+                started = time.perf_counter()
+                miles = analyzer.calculate_state_miles_from_polyline(
+                    polyline, total_miles, engine=engine
+                )
+                timings[engine].append(time.perf_counter() - started)
+            results[engine].append((miles, total_miles))
+
+    return {
+        "benchmark": "state_mileage_engines",
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "boundary_source": boundary_source,
+        "state_polygon_vertices": int(
+            shapely.get_num_coordinates(states.geometry.values).sum()
+        ),
+        "routes": routes,
+        "vertices_per_route": vertices,
+        "repeats": repeats,
+        "bisection_iterations": config.STATE_BORDER_BISECTION_ITERATIONS,
+        "engines": {
+            engine: {
+                "mean_ms": round(float(np.mean(values)) * 1000, 2),
+                "p95_ms": round(float(np.percentile(values, 95)) * 1000, 2),
+            }
+            for engine, values in timings.items()
+        },
+        "speedup": round(
+            float(np.mean(timings["intersection"]) / np.mean(timings["vertex"])), 2
+        ),
+        "accuracy": compare_state_miles(results["intersection"], results["vertex"]),
+        "simplification": measure_simplification(
+            analyzer, polylines, results["intersection"], tolerances, states.crs.srs
+        ),
+        "batch": (
+            measure_batch(
+                analyzer, batch_routes, batch_vertices, states.crs.srs, workers
+            )
+            if batch_routes
+            else None
+        ),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="State mileage engine benchmark")
+    parser.add_argument("--routes", type=int, default=10)
+    parser.add_argument("--vertices", type=int, default=20000)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument(
+        "--tolerances",
+        default="10,25,50,100,250",
+        help="Comma-separated simplification tolerances in meters",
+    )
+    parser.add_argument(
+        "--batch-routes",
+        type=int,
+        default=200,
+        help="Routes in the batch test (0 = skip)",
+    )
+    parser.add_argument("--batch-vertices", type=int, default=2000)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Also time the batch on this many GIS worker processes",
+    )
+    parser.add_argument(
+        "--output",
+        default=str(Path(tempfile.gettempdir()) / "driver_packet_benchmarks"),
+        help="Directory for the JSON artifact (defaults to the system temp dir)",
+    )
+    args = parser.parse_args()
+
+    tolerances = [float(t) for t in args.tolerances.split(",") if t.strip()]
+    report = run(
+        args.routes,
+        args.vertices,
+        args.repeats,
+        tolerances,
+        batch_routes=args.batch_routes,
+        batch_vertices=args.batch_vertices,
+        workers=args.workers,
+    )
+
+    output_dir = Path(args.output)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"state_mileage_{time.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(
+        f"🗺️ {report['routes']} routes x {report['vertices_per_route']} vertices "
+        f"({report['boundary_source']} boundaries, {report['state_polygon_vertices']} polygon vertices)"
+    )
+    for engine, stats in report["engines"].items():
+        print(
+            f"  {engine:<13} mean {stats['mean_ms']:>9.2f}ms  p95 {stats['p95_ms']:>9.2f}ms"
+        )
+    print(f"  speedup: {report['speedup']}x")
+    print(f"  accuracy: {report['accuracy']}")
+    for tolerance, stats in report["simplification"].items():
+        print(
+            f"  simplify {tolerance:>5}: {stats['mean_ms']:>8.2f}ms, "
+            f"{stats['vertices_kept_fraction']:.1%} vertices kept, "
+            f"max state error {stats['max_state_error_miles']} mi "
+            f"(mean {stats['mean_state_error_miles']})"
+        )
+    if report["batch"]:
+        batch = report["batch"]
+        print(
+            f"  batch of {batch['routes']} routes: loop {batch['loop_ms']}ms, "
+            f"batch {batch['batch_ms']}ms ({batch['speedup']}x, "
+            f"identical: {batch['identical_results']})"
+        )
+        if "workers" in batch:
+            print(
+                f"  batch on {batch['workers']} workers ({batch['cpu_count']} CPUs): "
+                f"{batch['pooled_batch_ms']}ms ({batch['pooled_speedup']}x, "
+                f"identical: {batch['pooled_identical_results']})"
+            )
+    print(f"✅ Benchmark written to {output_path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Local stand-in services for benchmarking
+Deterministic, network-free replacements for Gemini and the HERE APIs
+"""
+
+import hashlib
+import json
+import math
+import time
+from types import SimpleNamespace
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+from src.replay import ReplayResponse
+
+try:
+    import flexpolyline
+except ImportError:
+    flexpolyline = None
+
+
+# City -> (latitude, longitude, state name)
+CITY_COORDINATES = {
+    "Bloomington, CA": (34.0703, -117.3959, "California"),
+    "Phoenix, AZ": (33.4484, -112.0740, "Arizona"),
+    "Albuquerque, NM": (35.0844, -106.6504, "New Mexico"),
+    "Amarillo, TX": (35.2220, -101.8313, "Texas"),
+    "Dallas, TX": (32.7767, -96.7970, "Texas"),
+    "Oklahoma City, OK": (35.4676, -97.5164, "Oklahoma"),
+    "Little Rock, AR": (34.7465, -92.2896, "Arkansas"),
+    "Memphis, TN": (35.1495, -90.0490, "Tennessee"),
+    "Nashville, TN": (36.1627, -86.7816, "Tennessee"),
+    "Atlanta, GA": (33.7490, -84.3880, "Georgia"),
+    "Denver, CO": (39.7392, -104.9903, "Colorado"),
+    "Salt Lake City, UT": (40.7608, -111.8910, "Utah"),
+    "Las Vegas, NV": (36.1699, -115.1398, "Nevada"),
+    "Kansas City, MO": (39.0997, -94.5786, "Missouri"),
+}
+
+# Representative multi-stop trips (origin, drops..., final drop off)
+TRIP_TEMPLATES = [
+    ["Bloomington, CA", "Phoenix, AZ", "Dallas, TX", "Bloomington, CA"],
+    ["Bloomington, CA", "Las Vegas, NV", "Salt Lake City, UT", "Denver, CO"],
+    ["Dallas, TX", "Oklahoma City, OK", "Kansas City, MO", "Dallas, TX"],
+    ["Bloomington, CA", "Albuquerque, NM", "Amarillo, TX", "Oklahoma City, OK"],
+    ["Memphis, TN", "Nashville, TN", "Atlanta, GA", "Little Rock, AR"],
+]
+
+DROP_FIELDS = ["first_drop", "second_drop", "third_drop", "forth_drop"]
+
+
+def _haversine_meters(a, b) -> float:
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * 6371000 * math.asin(math.sqrt(h))
+
+
+class _CallCounter:
+    """Per-service call counters in the same shape as the replay stand-ins"""
+
+    def __init__(self, latency_seconds: float = 0.0):
+        self.latency_seconds = latency_seconds
+        self.call_counts: Dict[str, Dict[str, int]] = {}
+
+    def _call(self, service: str) -> None:
+        counts = self.call_counts.setdefault(service, {"calls": 0})
+        counts["calls"] += 1
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+    def get_call_stats(self) -> Dict[str, Dict[str, int]]:
+        return {service: dict(counts) for service, counts in self.call_counts.items()}
+
+
+class StandInHttpClient(_CallCounter):
+    """
+    Stand-in for HERE geocode, revgeocode and routes
+
+    Routes are straight lines between the endpoints, densified to
+    route_points vertices so polyline processing does realistic work.
+    """
+
+    def __init__(self, latency_seconds: float = 0.0, route_points: int = 400):
+        super().__init__(latency_seconds)
+        self.route_points = route_points
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs):
+        host = urlparse(url).netloc
+        params = params or {}
+
+        if host.startswith("revgeocode"):
+            self._call("here_revgeocode")
+            return ReplayResponse(200, self._revgeocode(params["at"]), url)
+        if host.startswith("geocode"):
+            self._call("here_geocode")
+            return ReplayResponse(200, self._geocode(params["q"]), url)
+        if host.startswith("router"):
+            self._call("here_routes")
+            return ReplayResponse(200, self._route(params), url)
+
+        self._call(host or "http")
+        return ReplayResponse(200, [], url)
+
+    def _geocode(self, query: str) -> Dict:
+        city = CITY_COORDINATES.get(query)
+        if not city:
+            return {"items": []}
+        return {"items": [{"position": {"lat": city[0], "lng": city[1]}}]}
+
+    def _revgeocode(self, at: str) -> Dict:
+        point = tuple(float(v) for v in at.split(","))
+        nearest = min(
+            CITY_COORDINATES.values(), key=lambda c: _haversine_meters(point, c)
+        )
+        return {"items": [{"address": {"state": nearest[2]}}]}
+
+    def _route(self, params: Dict) -> Dict:
+        origin = tuple(float(v) for v in params["origin"].split(","))
+        destination = tuple(float(v) for v in params["destination"].split(","))
+
+        n = self.route_points
+        points = [
+            (
+                origin[0] + (destination[0] - origin[0]) * i / (n - 1),
+                origin[1] + (destination[1] - origin[1]) * i / (n - 1),
+            )
+            for i in range(n)
+        ]
+        section = {
+            "summary": {"length": int(_haversine_meters(origin, destination) * 1.15)}
+        }
+        if flexpolyline:
+            section["polyline"] = flexpolyline.encode(points)
+
+        return {"routes": [{"sections": [section]}]}
+
+
+class StandInGeminiModel(_CallCounter):
+    """
+    Stand-in for the Gemini model
+
+    Returns a canned trip chosen from the image content so repeated runs
+    produce identical results.
+    """
+
+    model_name = "stand-in"
+
+    def generate_content(self, contents):
+        self._call("gemini")
+
+        image = contents[1]
+        digest = hashlib.sha256(image.resize((32, 32)).tobytes()).digest()
+        stops = TRIP_TEMPLATES[digest[0] % len(TRIP_TEMPLATES)]
+
+        data = {
+            "drivers_name": "BENCHMARK DRIVER",
+            "unit": "101",
+            "trailer": "245",
+            "date_trip_started": "06/01/2025",
+            "date_trip_ended": "06/05/2025",
+            "trip": str(1 + digest[1] % 50),
+            "trip_started_from": stops[0],
+            "drop_off": stops[-1],
+            "total_miles": "",
+            "fuel_purchases": [],
+        }
+        for field, stop in zip(DROP_FIELDS, stops[1:-1]):
+            data[field] = stop
+
+        text = json.dumps(data)
+        return SimpleNamespace(
+            text=text,
+            usage_metadata=SimpleNamespace(
+                prompt_token_count=1800,
+                candidates_token_count=len(text) // 4,
+                total_token_count=1800 + len(text) // 4,
+            ),
+        )
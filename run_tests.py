@@ -69,6 +69,13 @@ def run_tests_with_coverage():
     return subprocess.run(cmd).returncode
 
 
+def run_benchmark(extra_args=None):
+    """Run the end-to-end pipeline benchmark against local stand-in services"""
+    print("⏱️ Running Pipeline Benchmark...")
+    cmd = [sys.executable, "benchmarks/benchmark_pipeline.py"] + (extra_args or [])
+    return subprocess.run(cmd).returncode
+
+
 def setup_test_environment():
     """Setup test environment"""
     print("🔧 Setting up test environment...")
@@ -99,12 +106,14 @@ def main():
         print("  unit      - Run unit tests")
         print("  all       - Run all tests")
         print("  coverage  - Run tests with coverage")
+        print("  bench     - Run pipeline throughput benchmark (extra args passed through)")
         print("\nExamples:")
         print("  python run_tests.py setup")
         print("  python run_tests.py config")
         print("  python run_tests.py api")
         print("  python run_tests.py diagnose")
         print("  python run_tests.py coverage")
+        print("  python run_tests.py bench --scale 4")
         return 1
     
     command = sys.argv[1].lower()
@@ -129,6 +138,8 @@ def main():
         return run_all_tests()  
     elif command == "coverage":
         return run_tests_with_coverage()
+    elif command == "bench":
+        return run_benchmark(sys.argv[2:])
     else:
         print(f"❌ Unknown command: {command}")
         return 1
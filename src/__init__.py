@@ -9,6 +9,7 @@ from .main_processor import (
     process_driver_packet,
     process_driver_packet_folder,
 )
+from .processor_registry import get_shared_processor
 from .data_extractor import GeminiDataExtractor
 from .geocoding_service import GeocodingService
 from .route_analyzer import RouteAnalyzer
@@ -29,6 +30,7 @@ __all__ = [
     # Convenience functions
     "process_driver_packet",
     "process_driver_packet_folder",
+    "get_shared_processor",
     # Individual modules (for advanced use)
     "GeminiDataExtractor",
     "GeocodingService",
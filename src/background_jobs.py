@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Background jobs module
+Thread-pool runner that processes uploaded images outside the UI script run
+and publishes per-image progress into job records
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from .logging_utils import get_logger
+from .config import config
+
+# Job states
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_CANCELLED = "cancelled"
+
+
+class BackgroundJobRunner:
+    """
+    Process image uploads concurrently on a shared thread pool
+
+    Extraction, geocoding and routing spend most of their time waiting on
+    Gemini and HERE, so threads overlap that latency. Each job keeps its results
+    in upload order; finished images appear in the job record as soon as they
+    complete, so callers can show partial results while work continues.
+    """
+
+    def __init__(self, max_workers: Optional[int] = None, max_jobs: int = 20):
+        """
+        Initialize the runner
+
+        Args:
+            max_workers: Images processed at once
+                         (defaults to config.BACKGROUND_JOB_WORKERS)
+            max_jobs: Finished jobs kept for lookup before the oldest are dropped
+        """
+        self.logger = get_logger()
+        self.max_workers = max_workers or config.BACKGROUND_JOB_WORKERS
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="packet-job"
+        )
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict] = {}
+        self._futures: Dict[str, List] = {}
+
+    def submit_images(
+        self,
+        processor,
+        uploads: List[Tuple[str, bytes]],
+        use_here_api: bool = True,
+    ) -> str:
+        """
+        Queue a batch of images for processing
+
+        Args:
+            processor: DriverPacketProcessor used for every image in the job
+            uploads: (file name, image bytes) for each image, in display order
+            use_here_api: Whether to use HERE API for geocoding and routing
+
+        Returns:
+            Job ID for get_job() and cancel_job()
+        """
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            "job_id": job_id,
+            "status": JOB_RUNNING,
+            "total": len(uploads),
+            "completed": 0,
+            "successful": 0,
+            "failed": 0,
+            "in_progress": [],
+            "results": [None] * len(uploads),
+            "submitted_at": time.time(),
+            "finished_at": None,
+        }
+
+        with self._lock:
+            self._prune_finished_jobs()
+            self._jobs[job_id] = job
+            self._futures[job_id] = [
+                self._executor.submit(
+                    self._run_image, job_id, index, name, data, processor, use_here_api
+                )
+                for index, (name, data) in enumerate(uploads)
+            ]
+
+        if not uploads:
+            self._finish_job(job_id)
+
+        self.logger.info(f"Queued background job {job_id} with {len(uploads)} images")
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict]:
+        """
+        Get a snapshot of a job record
+
+        Args:
+            job_id: Job ID returned by submit_images()
+
+        Returns:
+            Copy of the job record (results list holds None for images that are
+            not finished yet), or None if the job is unknown
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            snapshot = dict(job)
+            snapshot["results"] = list(job["results"])
+            snapshot["in_progress"] = list(job["in_progress"])
+            return snapshot
+
+    def cancel_job(self, job_id: str) -> bool:
+        """
+        Cancel the images of a job that have not started yet
+
+        Images already being processed run to completion.
+
+        Args:
+            job_id: Job ID returned by submit_images()
+
+        Returns:
+            True if the job was running and is now cancelled
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] != JOB_RUNNING:
+                return False
+            job["status"] = JOB_CANCELLED
+            job["finished_at"] = time.time()
+            futures = self._futures.pop(job_id, [])
+
+        for future in futures:
+            future.cancel()
+        self.logger.info(f"Cancelled background job {job_id}")
+        return True
+
+    def shutdown(self, wait: bool = False) -> None:
+        """Stop accepting jobs and cancel queued images"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run_image(
+        self,
+        job_id: str,
+        index: int,
+        name: str,
+        data: bytes,
+        processor,
+        use_here_api: bool,
+    ) -> None:
+        """Process one image of a job and publish its result"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job["status"] == JOB_CANCELLED:
+                return
+            job["in_progress"].append(name)
+
+        result = process_image_bytes(processor, name, data, use_here_api)
+
+        with self._lock:
+            job["in_progress"].remove(name)
+            job["results"][index] = result
+            job["completed"] += 1
+            if result.get("processing_success"):
+                job["successful"] += 1
+            else:
+                job["failed"] += 1
+            done = job["completed"] == job["total"]
+
+        if done:
+            self._finish_job(job_id)
+
+    def _finish_job(self, job_id: str) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            if job["status"] == JOB_RUNNING:
+                job["status"] = JOB_COMPLETED
+                job["finished_at"] = time.time()
+            self._futures.pop(job_id, None)
+        self.logger.info(
+            f"Background job {job_id} finished: {job['successful']}/{job['total']} successful"
+        )
+
+    def _prune_finished_jobs(self) -> None:
+        """Drop the oldest finished jobs beyond max_jobs (caller holds the lock)"""
+        finished = [
+            job_id for job_id, job in self._jobs.items() if job["status"] != JOB_RUNNING
+        ]
+        for job_id in finished[: max(0, len(self._jobs) - self.max_jobs + 1)]:
+            del self._jobs[job_id]
+
+
+def process_image_bytes(
+    processor, name: str, data: bytes, use_here_api: bool = True
+) -> Dict:
+    """
+    Process an uploaded image held in memory
+
+    Args:
+        processor: DriverPacketProcessor
+        name: Original file name (used as the result's source_image)
+        data: Image file content
+        use_here_api: Whether to use HERE API for geocoding and routing
+
+    Returns:
+        Processing result dictionary (a failed result on error)
+    """
+    try:
+        return processor.process_image_with_distances(
+            data, use_here_api, source_name=name
+        )
+
+    except Exception as e:
+        get_logger().error(f"Background processing of {name} failed: {e}")
+        return {
+            "source_image": name,
+            "processing_success": False,
+            "error": str(e),
+        }
@@ -40,6 +40,14 @@ class Config:
     GEMINI_API_KEY: str = os.getenv("GEMINI_API_KEY", "")
     GEMINI_MODEL: str = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
 
+    # Gemini pricing (USD per million tokens) for cost accounting
+    GEMINI_INPUT_COST_PER_MILLION_TOKENS: float = float(
+        os.getenv("GEMINI_INPUT_COST_PER_MILLION_TOKENS", "0.30")
+    )
+    GEMINI_OUTPUT_COST_PER_MILLION_TOKENS: float = float(
+        os.getenv("GEMINI_OUTPUT_COST_PER_MILLION_TOKENS", "2.50")
+    )
+
     # HERE API Configuration
     HERE_API_KEY: str = os.getenv("HERE_API_KEY", "")
 
@@ -65,6 +73,17 @@ class Config:
         os.getenv("HERE_RATE_LIMIT", "0.1")
     )  # seconds between requests
 
+    # Service Record/Replay (offline benchmarking without API quota)
+    SERVICE_REPLAY_MODE: str = os.getenv("SERVICE_REPLAY_MODE", "off").lower()
+    SERVICE_REPLAY_DIR: str = os.getenv("SERVICE_REPLAY_DIR", "test/fixtures/replay")
+    SERVICE_REPLAY_LATENCY_SECONDS: float = float(
+        os.getenv("SERVICE_REPLAY_LATENCY_SECONDS", "0.0")
+    )
+    SERVICE_REPLAY_ERROR_RATE: float = float(
+        os.getenv("SERVICE_REPLAY_ERROR_RATE", "0.0")
+    )
+    SERVICE_REPLAY_SEED: int = int(os.getenv("SERVICE_REPLAY_SEED", "42"))
+
     # =============================================================================
     # LOGGING CONFIGURATION
     # =============================================================================
@@ -109,6 +128,29 @@ class Config:
     SUPPORTED_IMAGE_EXTENSIONS: List[str] = [".jpg", ".jpeg", ".png"]
     MAX_IMAGE_SIZE_MB: int = int(os.getenv("MAX_IMAGE_SIZE_MB", "50"))
 
+    # Images processed concurrently by the web app's background job runner
+    BACKGROUND_JOB_WORKERS: int = int(os.getenv("BACKGROUND_JOB_WORKERS", "4"))
+
+    # Fuel CSV Ingestion (rows parsed per chunk; individual purchases kept per
+    # file - per-state totals always include every row)
+    CSV_CHUNK_ROWS: int = int(os.getenv("CSV_CHUNK_ROWS", "50000"))
+    CSV_MAX_FUEL_PURCHASES: int = int(os.getenv("CSV_MAX_FUEL_PURCHASES", "1000"))
+
+    # Upload previews (longest thumbnail side in pixels; thumbnails kept)
+    THUMBNAIL_SIZE: int = int(os.getenv("THUMBNAIL_SIZE", "320"))
+    THUMBNAIL_CACHE_SIZE: int = int(os.getenv("THUMBNAIL_CACHE_SIZE", "256"))
+
+    # PDF Ingestion
+    PDF_RENDER_DPI: int = int(os.getenv("PDF_RENDER_DPI", "200"))
+
+    # Duplicate Page Detection
+    DUPLICATE_DETECTION_ENABLED: bool = (
+        os.getenv("DUPLICATE_DETECTION_ENABLED", "true").lower() == "true"
+    )
+    DUPLICATE_HASH_MAX_DISTANCE: int = int(
+        os.getenv("DUPLICATE_HASH_MAX_DISTANCE", "4")
+    )
+
     # Geocoding Configuration
     GEOCODING_CACHE_SIZE: int = int(os.getenv("GEOCODING_CACHE_SIZE", "1000"))
     USE_HERE_API_PREFERRED: bool = (
@@ -121,6 +163,46 @@ class Config:
     )
     ROUTE_SAMPLE_POINTS_MAX: int = int(os.getenv("ROUTE_SAMPLE_POINTS_MAX", "20"))
 
+    # State Mileage Engine ("intersection" or "vertex")
+    STATE_MILEAGE_ENGINE: str = os.getenv(
+        "STATE_MILEAGE_ENGINE", "intersection"
+    ).lower()
+    STATE_BORDER_BISECTION_ITERATIONS: int = int(
+        os.getenv("STATE_BORDER_BISECTION_ITERATIONS", "20")
+    )
+
+    # Douglas-Peucker tolerance (meters, projected CRS) applied to route
+    # polylines before state mileage is measured; 0 disables simplification
+    ROUTE_SIMPLIFY_TOLERANCE_METERS: float = float(
+        os.getenv("ROUTE_SIMPLIFY_TOLERANCE_METERS", "0")
+    )
+
+    # Polyline-free state analysis from the local state boundaries (no
+    # reverse-geocoding calls); falls back to sampling over HERE if disabled
+    STATE_ANALYSIS_LOCAL: bool = (
+        os.getenv("STATE_ANALYSIS_LOCAL", "true").lower() == "true"
+    )
+    LOCAL_SAMPLE_SPACING_MILES: float = float(
+        os.getenv("LOCAL_SAMPLE_SPACING_MILES", "5.0")
+    )
+    STATE_BORDER_PRECISION_METERS: float = float(
+        os.getenv("STATE_BORDER_PRECISION_METERS", "100")
+    )
+
+    # Worker processes for batch state mileage (1 = in-process, 0 = one per CPU)
+    STATE_ANALYSIS_WORKERS: int = int(os.getenv("STATE_ANALYSIS_WORKERS", "1"))
+
+    # Per-leg state mileage results kept for recalculation (number of legs)
+    STATE_MILEAGE_CACHE_SIZE: int = int(os.getenv("STATE_MILEAGE_CACHE_SIZE", "1000"))
+
+    # Routing backend: "auto" (HERE if a key is set, else the local road graph
+    # if present, else great circle), "here" or "local"
+    ROUTING_BACKEND: str = os.getenv("ROUTING_BACKEND", "auto").lower()
+    LOCAL_ROUTE_CACHE_SIZE: int = int(os.getenv("LOCAL_ROUTE_CACHE_SIZE", "10000"))
+
+    # Concurrent geocoding/routing requests for Format 4 load sheets
+    FORMAT4_ROUTING_WORKERS: int = int(os.getenv("FORMAT4_ROUTING_WORKERS", "8"))
+
     # Distance Calculation
     GREAT_CIRCLE_EARTH_RADIUS_MILES: float = 3956.0
     METERS_TO_MILES_CONVERSION: float = 1609.34
@@ -141,6 +223,11 @@ class Config:
         "STATE_SHAPEFILE_PATH", "src/cb_2024_us_state_500k.shp"
     )
 
+    # Road graph for offline routing (see local_router.save_road_graph)
+    LOCAL_ROAD_GRAPH_PATH: str = os.getenv(
+        "LOCAL_ROAD_GRAPH_PATH", "src/us_road_graph.npz"
+    )
+
     # =============================================================================
     # VALIDATION AND QUALITY CONTROL
     # =============================================================================
@@ -233,6 +320,81 @@ class Config:
             )
             validation_result["is_valid"] = False
 
+        # Validate state mileage engine
+        if cls.STATE_MILEAGE_ENGINE not in ("intersection", "vertex"):
+            validation_result["warnings"].append(
+                f'STATE_MILEAGE_ENGINE "{cls.STATE_MILEAGE_ENGINE}" not recognized, using intersection'
+            )
+            cls.STATE_MILEAGE_ENGINE = "intersection"
+
+        if (
+            cls.LOCAL_SAMPLE_SPACING_MILES <= 0
+            or cls.STATE_BORDER_PRECISION_METERS <= 0
+        ):
+            validation_result["warnings"].append(
+                "LOCAL_SAMPLE_SPACING_MILES and STATE_BORDER_PRECISION_METERS must be positive, using defaults"
+            )
+            cls.LOCAL_SAMPLE_SPACING_MILES = 5.0
+            cls.STATE_BORDER_PRECISION_METERS = 100.0
+
+        if cls.STATE_ANALYSIS_WORKERS < 0:
+            validation_result["warnings"].append(
+                "STATE_ANALYSIS_WORKERS is negative, analyzing state mileage in-process"
+            )
+            cls.STATE_ANALYSIS_WORKERS = 1
+
+        if cls.ROUTE_SIMPLIFY_TOLERANCE_METERS < 0:
+            validation_result["warnings"].append(
+                "ROUTE_SIMPLIFY_TOLERANCE_METERS is negative, disabling route simplification"
+            )
+            cls.ROUTE_SIMPLIFY_TOLERANCE_METERS = 0.0
+
+        if cls.BACKGROUND_JOB_WORKERS < 1:
+            validation_result["warnings"].append(
+                "BACKGROUND_JOB_WORKERS must be at least 1, processing one image at a time"
+            )
+            cls.BACKGROUND_JOB_WORKERS = 1
+
+        if cls.CSV_CHUNK_ROWS < 1:
+            validation_result["warnings"].append(
+                "CSV_CHUNK_ROWS must be at least 1, using 50000"
+            )
+            cls.CSV_CHUNK_ROWS = 50000
+
+        if cls.THUMBNAIL_SIZE < 16:
+            validation_result["warnings"].append(
+                "THUMBNAIL_SIZE must be at least 16 pixels, using 320"
+            )
+            cls.THUMBNAIL_SIZE = 320
+
+        if cls.FORMAT4_ROUTING_WORKERS < 1:
+            validation_result["warnings"].append(
+                "FORMAT4_ROUTING_WORKERS must be at least 1, routing one lane at a time"
+            )
+            cls.FORMAT4_ROUTING_WORKERS = 1
+
+        # Validate routing backend
+        if cls.ROUTING_BACKEND not in ("auto", "here", "local"):
+            validation_result["warnings"].append(
+                f'ROUTING_BACKEND "{cls.ROUTING_BACKEND}" not recognized, using auto'
+            )
+            cls.ROUTING_BACKEND = "auto"
+
+        if (
+            cls.ROUTING_BACKEND == "local"
+            and not Path(cls.LOCAL_ROAD_GRAPH_PATH).exists()
+        ):
+            validation_result["warnings"].append(
+                f"ROUTING_BACKEND is local but LOCAL_ROAD_GRAPH_PATH does not exist: {cls.LOCAL_ROAD_GRAPH_PATH}"
+            )
+
+        # Validate replay mode
+        if cls.SERVICE_REPLAY_MODE not in ("off", "record", "replay"):
+            validation_result["warnings"].append(
+                f'SERVICE_REPLAY_MODE "{cls.SERVICE_REPLAY_MODE}" not recognized, using off'
+            )
+            cls.SERVICE_REPLAY_MODE = "off"
+
         # Validate log level
         valid_log_levels = ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"]
         if cls.LOG_LEVEL not in valid_log_levels:
@@ -311,10 +473,27 @@ class Config:
         return {
             "supported_extensions": cls.SUPPORTED_IMAGE_EXTENSIONS,
             "max_image_size_mb": cls.MAX_IMAGE_SIZE_MB,
+            "csv_chunk_rows": cls.CSV_CHUNK_ROWS,
+            "csv_max_fuel_purchases": cls.CSV_MAX_FUEL_PURCHASES,
+            "thumbnail_size": cls.THUMBNAIL_SIZE,
+            "thumbnail_cache_size": cls.THUMBNAIL_CACHE_SIZE,
+            "pdf_render_dpi": cls.PDF_RENDER_DPI,
+            "duplicate_detection_enabled": cls.DUPLICATE_DETECTION_ENABLED,
+            "duplicate_hash_max_distance": cls.DUPLICATE_HASH_MAX_DISTANCE,
             "geocoding_cache_size": cls.GEOCODING_CACHE_SIZE,
+            "state_mileage_cache_size": cls.STATE_MILEAGE_CACHE_SIZE,
             "use_here_api_preferred": cls.USE_HERE_API_PREFERRED,
             "min_state_miles_threshold": cls.MIN_STATE_MILES_THRESHOLD,
             "route_sample_points_max": cls.ROUTE_SAMPLE_POINTS_MAX,
+            "state_mileage_engine": cls.STATE_MILEAGE_ENGINE,
+            "route_simplify_tolerance_meters": cls.ROUTE_SIMPLIFY_TOLERANCE_METERS,
+            "state_analysis_local": cls.STATE_ANALYSIS_LOCAL,
+            "state_analysis_workers": cls.STATE_ANALYSIS_WORKERS,
+            "background_job_workers": cls.BACKGROUND_JOB_WORKERS,
+            "routing_backend": cls.ROUTING_BACKEND,
+            "local_road_graph_path": cls.LOCAL_ROAD_GRAPH_PATH,
+            "local_route_cache_size": cls.LOCAL_ROUTE_CACHE_SIZE,
+            "format4_routing_workers": cls.FORMAT4_ROUTING_WORKERS,
         }
 
     @classmethod
@@ -4,31 +4,83 @@ Core data extraction module using Gemini API
 Handles OCR and intelligent data extraction from driver packet images
 """
 
+import io
 import os
 import json
 import time
-from typing import Dict, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple, Union
 from PIL import Image
 import google.generativeai as genai
 
 from .logging_utils import get_logger
 from .config import config
 
+# Anything extract_data() accepts: a file path, encoded image bytes, a binary
+# file-like object (e.g. a Streamlit upload) or an already decoded PIL image
+ImageSource = Union[
+    str, os.PathLike, bytes, bytearray, memoryview, BinaryIO, Image.Image
+]
+
+
+def image_source_name(image: ImageSource, default: str = "uploaded_image") -> str:
+    """
+    Derive the source_image name for an image source
+
+    Args:
+        image: Path, bytes, file-like object or PIL image
+        default: Name used when the source carries none (e.g. raw bytes)
+
+    Returns:
+        File name of the source
+    """
+    if isinstance(image, (str, os.PathLike)):
+        return os.path.basename(image)
+    name = getattr(image, "filename", None) or getattr(image, "name", None)
+    return os.path.basename(name) if isinstance(name, str) and name else default
+
 
 class GeminiDataExtractor:
     """
     Extract data from driver packet images using Google's Gemini multimodal AI
     """
 
-    def __init__(self, api_key: Optional[str] = None):
+    # Compact per-field instructions used for targeted re-extraction
+    FIELD_PROMPTS = {
+        "drivers_name": "driver's full name (Row 1) - EXACTLY as written",
+        "unit": "unit number (Row 1)",
+        "trailer": "trailer number (Row 1) - MUST be 2XX format (200-299)",
+        "date_trip_started": "trip start date (Row 2) - MM/DD/YY format",
+        "date_trip_ended": "trip end date (Row 2) - MM/DD/YY format",
+        "trip": "trip number (Row 2) - ONLY if explicitly written",
+        "trip_started_from": "Trip Started From (Row 3) - 'City, ST'",
+        "first_drop": "1st. Drop (Row 3) - 'City, ST'",
+        "second_drop": "2nd. Drop (Row 3) - 'City, ST', empty if blank",
+        "third_drop": "3rd. Drop (Row 4) - 'City, ST', empty if blank",
+        "forth_drop": "4th. Drop (Row 4) - 'City, ST', empty if blank",
+        "inbound_pu": "Inbound PU (Row 5) - 'City, ST'",
+        "drop_off": "Drop Off (Row 5) - 'City, ST', array if separated by 'to'",
+        "total_miles": "total miles from the OFFICE USE ONLY section at the bottom",
+        "fuel_purchases": "FUEL DETAILS rows as an array of {state, gallons} objects",
+    }
+
+    def __init__(self, api_key: Optional[str] = None, model=None):
         """
         Initialize the Gemini data extractor
 
         Args:
             api_key: Gemini API key (if not provided, will use config.GEMINI_API_KEY)
+            model: Pre-built model with a generate_content() method (e.g. a
+                   replay.ReplayGeminiModel); skips API configuration and probing
         """
         self.logger = get_logger()
 
+        # Define the extraction prompt
+        self.extraction_prompt = self._build_extraction_prompt()
+
+        if model is not None:
+            self.model = model
+            return
+
         # Configure Gemini API
         if api_key:
             genai.configure(api_key=api_key)
@@ -43,9 +95,6 @@ class GeminiDataExtractor:
         # Initialize the model using configuration with fallback
         self.model = self._initialize_model_with_fallback()
 
-        # Define the extraction prompt
-        self.extraction_prompt = self._build_extraction_prompt()
-
     def _initialize_model_with_fallback(self):
         """Initialize Gemini model with automatic fallback to working alternatives"""
         # Try models in order of preference
@@ -268,85 +317,115 @@ Return ONLY the JSON object, no additional text or explanation.
 Analyze the image carefully and extract all CLEARLY VISIBLE information with intelligent validation:
 """
 
-    def extract_data(self, image_path: str) -> Dict:
+    def extract_data(
+        self, image: ImageSource, source_name: Optional[str] = None
+    ) -> Dict:
         """
         Extract data from a driver packet image
 
+        In-memory sources are decoded directly, without writing a temp file.
+
         Args:
-            image_path: Path to the image file
+            image: Path to the image file, encoded image bytes, a binary
+                   file-like object or a PIL image
+            source_name: Name recorded as source_image in the result
+                         (defaults to the file name of the source)
 
         Returns:
             Dictionary with extracted data or error information
         """
+        source_name = source_name or image_source_name(image)
         try:
-            self.logger.info(
-                f"Starting data extraction from: {os.path.basename(image_path)}"
-            )
+            self.logger.info(f"Starting data extraction from: {source_name}")
+
+            if isinstance(image, Image.Image):
+                return self.extract_data_from_image(image, source_name)
+
+            if isinstance(image, (str, os.PathLike)):
+                # Check if file exists
+                if not os.path.isfile(image):
+                    return {
+                        "extraction_success": False,
+                        "error": f"File not found: {image}",
+                        "source_image": source_name,
+                    }
+            elif isinstance(image, (bytes, bytearray, memoryview)):
+                image = io.BytesIO(image)
+
+            # Load image with proper resource management
+            try:
+                with Image.open(image) as img:
+                    self.logger.info(f"Image loaded: {img.size}")
+
+                    # Image is automatically closed when exiting the 'with' block
+                    return self.extract_data_from_image(img, source_name)
 
-            # Check if file exists
-            if not os.path.isfile(image_path):
+            except Exception as e:
                 return {
                     "extraction_success": False,
-                    "error": f"File not found: {image_path}",
-                    "source_image": os.path.basename(image_path),
+                    "error": f"Error loading image: {e}",
+                    "source_image": source_name,
                 }
 
-            # Load image with proper resource management
-            try:
-                with Image.open(image_path) as img:
-                    self.logger.info(f"Image loaded: {img.size}")
+        except Exception as e:
+            self.logger.error(f"Unexpected error in data extraction: {e}")
+            return {
+                "extraction_success": False,
+                "error": f"Unexpected error: {e}",
+                "source_image": source_name,
+            }
 
-                    # # Convert to RGB if necessary (some formats need this)
-                    # if img.mode != 'RGB':
-                    #     img = img.convert('RGB')
+    def extract_data_from_image(self, image: Image.Image, source_name: str) -> Dict:
+        """
+        Extract data from an already loaded page image
 
-                    # Generate content using Gemini
-                    try:
-                        self.logger.info("Sending image to Gemini API...")
-                        response = self.model.generate_content(
-                            [self.extraction_prompt, img]
-                        )
-                        extracted_text = response.text
-                        self.logger.info("✅ Received response from Gemini API")
+        Used for pages that never touch disk, such as rasterized PDF pages
+        and uploads decoded by extract_data().
 
-                        # Image is automatically closed when exiting the 'with' block
+        Args:
+            image: PIL image of the driver packet page
+            source_name: Name recorded as source_image in the result
 
-                    except Exception as e:
-                        self.logger.error(f"Gemini API error: {e}")
-                        return {
-                            "extraction_success": False,
-                            "error": f"Gemini API error: {e}",
-                            "source_image": os.path.basename(image_path),
-                        }
+        Returns:
+            Dictionary with extracted data or error information
+        """
+        try:
+            # Generate content using Gemini
+            try:
+                self.logger.info("Sending image to Gemini API...")
+                started = time.perf_counter()
+                response = self.model.generate_content([self.extraction_prompt, image])
+                extracted_text = response.text
+                usage = self._build_usage_record(
+                    response, time.perf_counter() - started
+                )
+                self.logger.info(
+                    f"✅ Received response from Gemini API "
+                    f"({usage['total_tokens']} tokens, {usage['latency_seconds']:.2f}s)"
+                )
 
             except Exception as e:
+                self.logger.error(f"Gemini API error: {e}")
                 return {
                     "extraction_success": False,
-                    "error": f"Error loading image: {e}",
-                    "source_image": os.path.basename(image_path),
+                    "error": f"Gemini API error: {e}",
+                    "source_image": source_name,
                 }
 
             # Parse JSON response
             try:
-                # Clean up response text
-                if "```json" in extracted_text:
-                    extracted_text = extracted_text.split("```json")[1]
-                if "```" in extracted_text:
-                    extracted_text = extracted_text.split("```")[0]
-
-                extracted_data = json.loads(extracted_text.strip())
+                extracted_data = self._parse_json_response(extracted_text)
 
                 # Return raw extracted data with basic metadata
                 result = {
                     "extraction_success": True,
                     "extraction_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "source_image": os.path.basename(image_path),
+                    "source_image": source_name,
                     **extracted_data,
+                    "extraction_usage": usage,
                 }
 
-                self.logger.info(
-                    f"Successfully extracted data from {os.path.basename(image_path)}"
-                )
+                self.logger.info(f"Successfully extracted data from {source_name}")
                 return result
 
             except json.JSONDecodeError as e:
@@ -354,8 +433,9 @@ Analyze the image carefully and extract all CLEARLY VISIBLE information with int
                 return {
                     "extraction_success": False,
                     "error": f"JSON parsing error: {e}",
-                    "source_image": os.path.basename(image_path),
+                    "source_image": source_name,
                     "raw_response": extracted_text,
+                    "extraction_usage": usage,
                 }
 
         except Exception as e:
@@ -363,5 +443,193 @@ Analyze the image carefully and extract all CLEARLY VISIBLE information with int
             return {
                 "extraction_success": False,
                 "error": f"Unexpected error: {e}",
-                "source_image": os.path.basename(image_path),
+                "source_image": source_name,
+            }
+
+    def _build_usage_record(self, response, latency_seconds: float) -> Dict:
+        """
+        Build token, latency and cost accounting for a Gemini response
+
+        Args:
+            response: Gemini response object (usage_metadata is read if present)
+            latency_seconds: Wall-clock time of the generate_content call
+
+        Returns:
+            Dictionary with token counts, latency, model name and estimated cost
+        """
+        metadata = getattr(response, "usage_metadata", None)
+
+        def token_count(name: str) -> int:
+            value = getattr(metadata, name, 0)
+            return value if isinstance(value, int) else 0
+
+        prompt_tokens = token_count("prompt_token_count")
+        output_tokens = token_count("candidates_token_count")
+        total_tokens = token_count("total_token_count") or (
+            prompt_tokens + output_tokens
+        )
+
+        model_name = getattr(self.model, "model_name", None)
+        if not isinstance(model_name, str):
+            model_name = config.GEMINI_MODEL
+
+        estimated_cost = (
+            prompt_tokens * config.GEMINI_INPUT_COST_PER_MILLION_TOKENS
+            + output_tokens * config.GEMINI_OUTPUT_COST_PER_MILLION_TOKENS
+        ) / 1_000_000
+
+        return {
+            "model": model_name.replace("models/", ""),
+            "prompt_tokens": prompt_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": total_tokens,
+            "latency_seconds": round(latency_seconds, 3),
+            "estimated_cost_usd": round(estimated_cost, 6),
+        }
+
+    def _parse_json_response(self, response_text: str) -> Dict:
+        """Strip markdown fences from a Gemini response and parse the JSON body"""
+        if "```json" in response_text:
+            response_text = response_text.split("```json")[1]
+        if "```" in response_text:
+            response_text = response_text.split("```")[0]
+
+        return json.loads(response_text.strip())
+
+    def _build_field_prompt(self, fields: List[str]) -> str:
+        """Build a compact prompt that asks only about the named fields"""
+        field_lines = ",\n".join(
+            f'    "{field}": "{self.FIELD_PROMPTS[field]}"' for field in fields
+        )
+        return f"""
+Re-read ONLY the following fields on this ASF Carrier Inc driver trip sheet.
+Read handwriting letter by letter. Use "" for any field that is blank or unreadable.
+Dates are MM/DD/YY, locations are "City, ST", trailer numbers are 200-299.
+
+Return ONLY a JSON object with exactly these keys:
+{{
+{field_lines}
+}}
+"""
+
+    def reextract_fields(
+        self,
+        image_path: str,
+        fields: List[str],
+        existing_data: Optional[Dict] = None,
+        crop_box: Optional[Tuple[float, float, float, float]] = None,
+    ) -> Dict:
+        """
+        Re-extract only the named fields and merge them into an existing record
+
+        Much cheaper than re-running the full extraction prompt when validation
+        flags one or two fields (e.g. a bad trailer number or total_miles).
+
+        Args:
+            image_path: Path to the image file
+            fields: Field names to re-extract (keys of FIELD_PROMPTS)
+            existing_data: Previously extracted record to merge the new values into
+            crop_box: Optional (left, top, right, bottom) region of the form as
+                fractions of the image size, e.g. (0, 0.8, 1, 1) for the bottom strip
+
+        Returns:
+            Copy of existing_data with re-extracted values merged in, or a
+            dictionary with "extraction_success": False on failure
+        """
+        result = dict(existing_data or {})
+        source_image = os.path.basename(image_path)
+
+        unknown_fields = [f for f in fields if f not in self.FIELD_PROMPTS]
+        if unknown_fields or not fields:
+            return {
+                **result,
+                "extraction_success": False,
+                "error": f"Unknown or empty field list for re-extraction: {unknown_fields or fields}",
+                "source_image": result.get("source_image", source_image),
             }
+
+        if not os.path.isfile(image_path):
+            return {
+                **result,
+                "extraction_success": False,
+                "error": f"File not found: {image_path}",
+                "source_image": result.get("source_image", source_image),
+            }
+
+        self.logger.info(f"Re-extracting {fields} from: {source_image}")
+
+        try:
+            with Image.open(image_path) as img:
+                region = img
+                if crop_box:
+                    width, height = img.size
+                    left, top, right, bottom = crop_box
+                    region = img.crop(
+                        (
+                            int(left * width),
+                            int(top * height),
+                            int(right * width),
+                            int(bottom * height),
+                        )
+                    )
+                    self.logger.debug(
+                        f"Cropped region for re-extraction: {region.size}"
+                    )
+
+                started = time.perf_counter()
+                response = self.model.generate_content(
+                    [self._build_field_prompt(fields), region]
+                )
+                response_text = response.text
+                usage = self._build_usage_record(
+                    response, time.perf_counter() - started
+                )
+
+        except Exception as e:
+            self.logger.error(f"Gemini API error during re-extraction: {e}")
+            return {
+                **result,
+                "extraction_success": False,
+                "error": f"Gemini API error: {e}",
+                "source_image": result.get("source_image", source_image),
+            }
+
+        try:
+            reextracted = self._parse_json_response(response_text)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"JSON parsing error during re-extraction: {e}")
+            return {
+                **result,
+                "extraction_success": False,
+                "error": f"JSON parsing error: {e}",
+                "source_image": result.get("source_image", source_image),
+                "raw_response": response_text,
+                "reextraction_usage": usage,
+            }
+
+        # Merge only the requested fields; keep the previous value when the
+        # model could not read the field a second time
+        updated_fields = []
+        for field in fields:
+            value = reextracted.get(field)
+            if value in (None, "", []):
+                continue
+            if result.get(field) != value:
+                updated_fields.append(field)
+            result[field] = value
+
+        result.update(
+            {
+                "extraction_success": True,
+                "source_image": result.get("source_image", source_image),
+                "reextracted_fields": fields,
+                "reextraction_updated_fields": updated_fields,
+                "reextraction_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "reextraction_usage": usage,
+            }
+        )
+
+        self.logger.info(
+            f"Re-extraction complete for {source_image}: {len(updated_fields)} field(s) changed"
+        )
+        return result
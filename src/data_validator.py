@@ -172,6 +172,9 @@ class DataValidator:
         # Validate total miles reasonableness
         warnings.extend(self._check_total_miles(extracted_data))
 
+        # Check trailer number format after corrections
+        warnings.extend(self._check_trailer_number(extracted_data))
+
         if warnings:
             self.logger.warning(f"Found {len(warnings)} validation warnings")
             for warning in warnings:
@@ -181,6 +184,40 @@ class DataValidator:
 
         return warnings
 
+    def get_fields_for_reextraction(self, warnings: List[str]) -> List[str]:
+        """
+        Map validation warnings to the fields worth re-asking the model about
+
+        Args:
+            warnings: Warnings from validate_extracted_data (and miles comparison)
+
+        Returns:
+            Ordered list of field names flagged by the warnings
+        """
+        warning_patterns = [
+            (r"trip number", ["trip"]),
+            (r"driver name", ["drivers_name"]),
+            (r"date format in (date_trip_started|date_trip_ended)", None),
+            (r"field duplication: (\w+) and inbound_pu", None),
+            (r"3rd drop filled but 2nd drop empty", ["second_drop", "third_drop"]),
+            (r"4th drop filled but 3rd drop empty", ["third_drop", "forth_drop"]),
+            (r"total miles", ["total_miles"]),
+            (r"(major|significant) discrepancy: extracted", ["total_miles"]),
+            (r"trailer number", ["trailer"]),
+        ]
+
+        fields = []
+        for warning in warnings:
+            for pattern, pattern_fields in warning_patterns:
+                match = re.search(pattern, warning, re.IGNORECASE)
+                if not match:
+                    continue
+                for field in pattern_fields or [match.group(1)]:
+                    if field not in fields:
+                        fields.append(field)
+
+        return fields
+
     def _correct_trailer_number(self, data: Dict) -> List[str]:
         """Correct trailer numbers to ensure they're in 200-299 range"""
         corrections = []
@@ -680,3 +717,20 @@ class DataValidator:
                 warnings.append(f"Invalid total miles format: {total_miles}")
 
         return warnings
+
+    def _check_trailer_number(self, data: Dict) -> List[str]:
+        """Check trailer numbers that could not be corrected into the 2XX range"""
+        warnings = []
+
+        if data.get("trailer"):
+            trailer = str(data["trailer"]).strip()
+            if not (
+                len(trailer) == config.TRAILER_NUMBER_LENGTH
+                and trailer.isdigit()
+                and trailer.startswith(config.TRAILER_NUMBER_PREFIX)
+            ):
+                warnings.append(
+                    f"Invalid trailer number: '{trailer}' (expected 200-299)"
+                )
+
+        return warnings
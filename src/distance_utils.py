@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Distance utilities module
+Vectorized great-circle (haversine) distances for coordinate pairs and stop matrices
+"""
+
+import numpy as np
+
+# Same value as config.GREAT_CIRCLE_EARTH_RADIUS_MILES; kept here so the module
+# has no package imports and also works from the legacy standalone processor
+EARTH_RADIUS_MILES = 3956.0
+
+
+def _as_lat_lng(coords) -> np.ndarray:
+    """Convert one (lat, lng) pair or a sequence of pairs to an (n, 2) float array"""
+    lat_lng = np.atleast_2d(np.asarray(coords, dtype=np.float64))
+    if lat_lng.shape[-1] != 2:
+        raise ValueError("Coordinates must be (latitude, longitude) pairs")
+    return lat_lng
+
+
+def _haversine(lat1, lng1, lat2, lng2, radius: float) -> np.ndarray:
+    """Haversine formula on arrays of radians (broadcasting)"""
+    a = (
+        np.sin((lat2 - lat1) / 2) ** 2
+        + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    )
+    # Rounding can push a just past 1 for antipodal points
+    return 2 * radius * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def great_circle_distances(
+    origins, destinations, radius: float = EARTH_RADIUS_MILES
+) -> np.ndarray:
+    """
+    Great-circle distance for each origin/destination pair in one call
+
+    Args:
+        origins: (latitude, longitude) pair or sequence of pairs
+        destinations: Pairs matching origins (a single pair is broadcast)
+        radius: Earth radius in the output unit (default miles)
+
+    Returns:
+        Array of distances, one per pair
+    """
+    origins = np.radians(_as_lat_lng(origins))
+    destinations = np.radians(_as_lat_lng(destinations))
+    return _haversine(
+        origins[:, 0],
+        origins[:, 1],
+        destinations[:, 0],
+        destinations[:, 1],
+        radius,
+    )
+
+
+def great_circle_matrix(
+    points, destinations=None, radius: float = EARTH_RADIUS_MILES
+) -> np.ndarray:
+    """
+    Great-circle distances between every pair of stops
+
+    Args:
+        points: Sequence of (latitude, longitude) pairs (matrix rows)
+        destinations: Sequence of pairs for the matrix columns
+                      (defaults to points, giving a symmetric N×N matrix)
+        radius: Earth radius in the output unit (default miles)
+
+    Returns:
+        Array of shape (len(points), len(destinations))
+    """
+    rows = np.radians(_as_lat_lng(points))
+    columns = rows if destinations is None else np.radians(_as_lat_lng(destinations))
+    return _haversine(
+        rows[:, 0, None],
+        rows[:, 1, None],
+        columns[None, :, 0],
+        columns[None, :, 1],
+        radius,
+    )
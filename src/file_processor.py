@@ -8,9 +8,16 @@ import os
 import glob
 import time
 import json
-from typing import List, Dict
+import copy
+from typing import Dict, Iterator, List, Optional, Union
 from pathlib import Path
 
+from PIL import Image
+
+from .config import config
+from .image_dedup import PerceptualHashIndex
+from .pdf_processor import PDF_AVAILABLE, iter_pdf_pages, page_source_name
+from .results_store import ResultsStore
 from .logging_utils import get_logger
 
 
@@ -31,16 +38,26 @@ class FileProcessor:
 
         # Supported image extensions
         self.supported_extensions = ["*.jpg", "*.jpeg", "*.png"]
+        self.pdf_extension = "*.pdf"
 
     def process_folder(
-        self, input_folder: str, use_here_api: bool = True
+        self,
+        input_folder: str,
+        use_here_api: bool = True,
+        detect_duplicates: Optional[bool] = None,
     ) -> List[Dict]:
         """
-        Process all images in a folder
+        Process all images and PDF envelope scans in a folder
+
+        Duplicate and near-duplicate pages (rescans, repeated exports) are
+        detected with a perceptual hash and reuse the extraction of the first
+        matching image instead of being sent to Gemini again. PDF pages are
+        rasterized one at a time and streamed straight into extraction.
 
         Args:
-            input_folder: Folder containing driver packet images
+            input_folder: Folder containing driver packet images and/or PDFs
             use_here_api: Whether to use HERE API for geocoding and routing
+            detect_duplicates: Override config.DUPLICATE_DETECTION_ENABLED
 
         Returns:
             List of dictionaries with processing results
@@ -49,54 +66,63 @@ class FileProcessor:
             results = []
             image_files = []
 
+            hash_index = self._create_hash_index(detect_duplicates)
+            results_by_image = {}
+
             # Find all image files in the input folder
             for ext in self.supported_extensions:
                 image_files.extend(glob.glob(os.path.join(input_folder, ext)))
 
-            if not image_files:
+            # Stable order so the first copy of a duplicate page is deterministic
+            image_files.sort()
+            pdf_files = sorted(
+                glob.glob(os.path.join(input_folder, self.pdf_extension))
+            )
+
+            if not image_files and not pdf_files:
                 self.logger.warning(f"No image files found in {input_folder}")
                 return []
 
-            self.logger.info(f"Found {len(image_files)} images to process")
+            self.logger.info(
+                f"Found {len(image_files)} images and {len(pdf_files)} PDFs to process"
+            )
 
             # Process each image
             for i, image_path in enumerate(image_files, 1):
-                try:
-                    self.logger.info(f"\n{'='*50}")
-                    self.logger.info(
-                        f"Processing {i}/{len(image_files)}: {os.path.basename(image_path)}..."
+                self.logger.info(f"\n{'='*50}")
+                self.logger.info(
+                    f"Processing {i}/{len(image_files)}: {os.path.basename(image_path)}..."
+                )
+                results.append(
+                    self._process_page(
+                        image_path,
+                        os.path.basename(image_path),
+                        use_here_api,
+                        hash_index,
+                        results_by_image,
                     )
+                )
 
-                    if self.main_processor:
-                        result = self.main_processor.process_image_with_distances(
-                            image_path, use_here_api
-                        )
-                    else:
-                        self.logger.error("No main processor available")
-                        result = {
-                            "source_image": os.path.basename(image_path),
-                            "processing_success": False,
-                            "error": "No main processor available",
-                        }
-
-                    results.append(result)
-
-                except Exception as e:
-                    self.logger.error(f"Error processing {image_path}: {e}")
-                    results.append(
-                        {
-                            "source_image": os.path.basename(image_path),
-                            "processing_success": False,
-                            "error": f"Processing error: {str(e)}",
-                        }
+            # Stream each PDF page by page
+            for pdf_path in pdf_files:
+                results.extend(
+                    self._iter_pdf_results(
+                        pdf_path, use_here_api, hash_index, results_by_image
                     )
+                )
 
             # Show summary of processing results
             successful = sum(1 for r in results if r.get("processing_success"))
             self.logger.info(
-                f"\n✅ Successfully processed {successful}/{len(image_files)} images"
+                f"\n✅ Successfully processed {successful}/{len(results)} pages"
             )
 
+            duplicates = sum(1 for r in results if r.get("is_duplicate"))
+            if duplicates:
+                self.logger.info(
+                    f"♻️ Skipped extraction for {duplicates} duplicate page(s)"
+                )
+
             return results
 
         except Exception as e:
@@ -108,6 +134,184 @@ class FileProcessor:
                 }
             ]
 
+    def process_pdf(
+        self,
+        pdf_path: str,
+        use_here_api: bool = True,
+        detect_duplicates: Optional[bool] = None,
+    ) -> List[Dict]:
+        """
+        Process every page of a multi-page PDF envelope scan
+
+        Args:
+            pdf_path: Path to the PDF file
+            use_here_api: Whether to use HERE API for geocoding and routing
+            detect_duplicates: Override config.DUPLICATE_DETECTION_ENABLED
+
+        Returns:
+            List of dictionaries with processing results, one per page
+        """
+        return list(
+            self._iter_pdf_results(
+                pdf_path, use_here_api, self._create_hash_index(detect_duplicates), {}
+            )
+        )
+
+    def _iter_pdf_results(
+        self,
+        pdf_path: str,
+        use_here_api: bool,
+        hash_index: Optional[PerceptualHashIndex],
+        results_by_image: Dict,
+    ) -> Iterator[Dict]:
+        """
+        Rasterize a PDF lazily and yield one processing result per page
+
+        Only the page currently being processed is held in memory.
+        """
+        pdf_name = os.path.basename(pdf_path)
+
+        if not PDF_AVAILABLE:
+            self.logger.error(f"Cannot process {pdf_name}: pymupdf is not installed")
+            yield {
+                "source_image": pdf_name,
+                "processing_success": False,
+                "error": "PDF support requires pymupdf",
+            }
+            return
+
+        try:
+            for page_number, page_image in iter_pdf_pages(pdf_path):
+                source_name = page_source_name(pdf_path, page_number)
+                self.logger.info(f"\n{'='*50}")
+                self.logger.info(f"Processing {pdf_name} page {page_number}...")
+
+                result = self._process_page(
+                    page_image,
+                    source_name,
+                    use_here_api,
+                    hash_index,
+                    results_by_image,
+                )
+                result["source_pdf"] = pdf_name
+                result["page_number"] = page_number
+                page_image.close()
+
+                yield result
+
+        except Exception as e:
+            self.logger.error(f"Error reading PDF {pdf_path}: {e}")
+            yield {
+                "source_image": pdf_name,
+                "processing_success": False,
+                "error": f"PDF processing error: {str(e)}",
+            }
+
+    def _process_page(
+        self,
+        page: Union[str, Image.Image],
+        source_name: str,
+        use_here_api: bool,
+        hash_index: Optional[PerceptualHashIndex],
+        results_by_image: Dict,
+    ) -> Dict:
+        """
+        Process a single page (image path or in-memory image), reusing the
+        result of an earlier duplicate page when one is found
+
+        Args:
+            page: Image file path or PIL image
+            source_name: Name recorded as source_image in the result
+            use_here_api: Whether to use HERE API for geocoding and routing
+            hash_index: Perceptual hash index, or None if detection is disabled
+            results_by_image: Results of already processed pages by source name
+
+        Returns:
+            Processing result dictionary
+        """
+        try:
+            duplicate = self._check_duplicate(hash_index, page, source_name)
+
+            if duplicate and duplicate["duplicate_of"] in results_by_image:
+                return self._build_duplicate_result(
+                    results_by_image[duplicate["duplicate_of"]],
+                    source_name,
+                    duplicate,
+                )
+
+            if not self.main_processor:
+                self.logger.error("No main processor available")
+                return {
+                    "source_image": source_name,
+                    "processing_success": False,
+                    "error": "No main processor available",
+                }
+
+            if isinstance(page, str):
+                result = self.main_processor.process_image_with_distances(
+                    page, use_here_api
+                )
+            else:
+                result = self.main_processor.process_single_image(
+                    page, use_here_api, source_name
+                )
+
+            results_by_image[source_name] = result
+            return result
+
+        except Exception as e:
+            self.logger.error(f"Error processing {source_name}: {e}")
+            return {
+                "source_image": source_name,
+                "processing_success": False,
+                "error": f"Processing error: {str(e)}",
+            }
+
+    def _create_hash_index(
+        self, detect_duplicates: Optional[bool]
+    ) -> Optional[PerceptualHashIndex]:
+        """Create a hash index for a batch, or None if detection is disabled"""
+        if detect_duplicates is None:
+            detect_duplicates = config.DUPLICATE_DETECTION_ENABLED
+        return PerceptualHashIndex() if detect_duplicates else None
+
+    def _check_duplicate(
+        self,
+        hash_index: Optional[PerceptualHashIndex],
+        page: Union[str, Image.Image],
+        image_name: str,
+    ) -> Optional[Dict]:
+        """Look up an image in the hash index, treating hashing errors as unique"""
+        if hash_index is None:
+            return None
+
+        try:
+            return hash_index.check_and_add(page, image_name)
+        except Exception as e:
+            self.logger.warning(f"Could not hash {image_name} for duplicate check: {e}")
+            return None
+
+    def _build_duplicate_result(
+        self, original_result: Dict, image_name: str, duplicate: Dict
+    ) -> Dict:
+        """
+        Build the result for a duplicate page from the original page's result
+
+        Args:
+            original_result: Processing result of the first matching image
+            image_name: File name of the duplicate image
+            duplicate: Match info from the hash index
+
+        Returns:
+            Copy of the original result marked as a duplicate
+        """
+        result = copy.deepcopy(original_result)
+        result["source_image"] = image_name
+        result["is_duplicate"] = True
+        result["duplicate_of"] = duplicate["duplicate_of"]
+        result["duplicate_hash_distance"] = duplicate["hash_distance"]
+        return result
+
     def save_results_to_json(self, results: List[Dict], output_path: str) -> bool:
         """
         Save processing results to JSON file with timestamp
@@ -168,60 +372,34 @@ class FileProcessor:
         Returns:
             Dictionary with summary statistics
         """
-        summary = {
-            "total_images": len(results),
-            "successful_processing": 0,
-            "failed_processing": 0,
-            "geocoding_success": 0,
-            "distance_calculations": 0,
-            "reference_validations": 0,
-            "common_errors": {},
-            "validation_warnings_count": 0,
-        }
-
-        error_counts = {}
-
-        for result in results:
-            if result.get("processing_success"):
-                summary["successful_processing"] += 1
-
-                # Check geocoding success
-                coords = result.get("coordinates", {})
-                if (
-                    coords
-                    and coords.get("geocoding_summary", {}).get(
-                        "successful_geocoding", 0
-                    )
-                    > 0
-                ):
-                    summary["geocoding_success"] += 1
-
-                # Check distance calculations
-                distances = result.get("distance_calculations", {})
-                if distances and distances.get("calculation_success"):
-                    summary["distance_calculations"] += 1
-
-                # Check reference validation
-                ref_validation = result.get("reference_validation", {})
-                if ref_validation and ref_validation.get("reference_found"):
-                    summary["reference_validations"] += 1
-
-                # Count validation warnings
-                warnings = result.get("validation_warnings", [])
-                summary["validation_warnings_count"] += len(warnings)
-
-            else:
-                summary["failed_processing"] += 1
+        # Same flattening and counting rules as the dashboard metrics
+        store = ResultsStore.from_results(results)
+        try:
+            counts = store.get_summary()
 
-                # Track error types
-                error = result.get("error", "Unknown error")
+            error_counts = {}
+            for error, packets in store.error_counts().items():
                 error_type = self._categorize_error(error)
-                error_counts[error_type] = error_counts.get(error_type, 0) + 1
+                error_counts[error_type] = error_counts.get(error_type, 0) + packets
+        finally:
+            store.close()
 
-        # Sort errors by frequency
-        summary["common_errors"] = dict(
-            sorted(error_counts.items(), key=lambda x: x[1], reverse=True)
-        )
+        summary = {
+            "total_images": counts["total"],
+            "successful_processing": counts["successful"],
+            "failed_processing": counts["failed"],
+            "geocoding_success": counts["geocoding_successes"],
+            "distance_calculations": counts["distance_successes"],
+            "reference_validations": counts["reference_validations"],
+            # Sort errors by frequency
+            "common_errors": dict(
+                sorted(error_counts.items(), key=lambda x: x[1], reverse=True)
+            ),
+            "validation_warnings_count": counts["validation_warnings"],
+            "duplicate_pages": counts["duplicates"],
+        }
+
+        summary["token_usage"] = self._aggregate_token_usage(results)
 
         # Calculate success rates
         if summary["total_images"] > 0:
@@ -255,6 +433,14 @@ class FileProcessor:
             f"  Reference validations: {summary['reference_validations']} ({summary.get('reference_validation_rate', 0):.1%})"
         )
 
+        token_usage = summary["token_usage"]
+        if token_usage["pages_with_usage"]:
+            self.logger.info(
+                f"  Gemini tokens: {token_usage['total_tokens']} "
+                f"(avg {token_usage['average_tokens_per_page']:.0f}/page, "
+                f"~${token_usage['estimated_cost_usd']:.4f})"
+            )
+
         if summary["common_errors"]:
             self.logger.warning(f"  Common errors:")
             for error_type, count in list(summary["common_errors"].items())[:5]:
@@ -262,6 +448,111 @@ class FileProcessor:
 
         return summary
 
+    def _aggregate_token_usage(self, results: List[Dict]) -> Dict:
+        """
+        Sum Gemini token, latency and cost accounting over a batch
+
+        Duplicate pages reuse another page's extraction and are not counted.
+
+        Args:
+            results: List of processing results
+
+        Returns:
+            Dictionary with token totals, averages and estimated cost
+        """
+        usage_records = [
+            r["extraction_usage"]
+            for r in results
+            if r.get("extraction_usage") and not r.get("is_duplicate")
+        ]
+
+        totals = {
+            "pages_with_usage": len(usage_records),
+            "prompt_tokens": sum(u.get("prompt_tokens", 0) for u in usage_records),
+            "output_tokens": sum(u.get("output_tokens", 0) for u in usage_records),
+            "total_tokens": sum(u.get("total_tokens", 0) for u in usage_records),
+            "total_latency_seconds": round(
+                sum(u.get("latency_seconds", 0.0) for u in usage_records), 3
+            ),
+            "estimated_cost_usd": round(
+                sum(u.get("estimated_cost_usd", 0.0) for u in usage_records), 6
+            ),
+        }
+
+        pages = totals["pages_with_usage"] or 1
+        totals["average_tokens_per_page"] = totals["total_tokens"] / pages
+        totals["average_latency_seconds"] = totals["total_latency_seconds"] / pages
+
+        return totals
+
+    def get_expensive_pages(self, results: List[Dict], top_n: int = 10) -> List[Dict]:
+        """
+        Rank pages by Gemini token consumption
+
+        Args:
+            results: List of processing results
+            top_n: Number of pages to return
+
+        Returns:
+            List of per-page usage entries, most expensive first
+        """
+        pages = []
+        for result in results:
+            usage = result.get("extraction_usage")
+            if not usage or result.get("is_duplicate"):
+                continue
+
+            pages.append(
+                {
+                    "source_image": result.get("source_image", "Unknown"),
+                    "processing_success": result.get("processing_success", False),
+                    **usage,
+                }
+            )
+
+        pages.sort(
+            key=lambda p: (p.get("total_tokens", 0), p.get("latency_seconds", 0.0)),
+            reverse=True,
+        )
+        return pages[:top_n]
+
+    def create_usage_report(
+        self, results: List[Dict], output_path: str, top_n: int = 10
+    ) -> bool:
+        """
+        Create a token and cost report ranking the most expensive pages
+
+        Args:
+            results: List of processing results
+            output_path: Path to output directory
+            top_n: Number of pages to include in the ranking
+
+        Returns:
+            True if successful, False otherwise
+        """
+        try:
+            output_dir = Path(output_path)
+            output_dir.mkdir(parents=True, exist_ok=True)
+
+            timestamp = time.strftime("%Y%m%d_%H%M%S")
+            filepath = output_dir / f"token_usage_{timestamp}.json"
+
+            usage_report = {
+                "report_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "totals": self._aggregate_token_usage(results),
+                "most_expensive_pages": self.get_expensive_pages(results, top_n),
+            }
+
+            with open(filepath, "w", encoding="utf-8") as f:
+                json.dump(usage_report, f, indent=2, ensure_ascii=False)
+
+            self.logger.info(f"Token usage report saved to: {filepath}")
+            return True
+
+        except Exception as e:
+            self.logger.error(f"Error creating token usage report: {e}")
+            return False
+
     def _categorize_error(self, error_message: str) -> str:
         """Categorize error messages into types"""
         error_lower = error_message.lower()
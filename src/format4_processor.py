@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Format 4 processor module
+Calculates routes and state mileage for load-based route sheets (one load per
+row with shipper and delivery city/state), resolving each unique location and
+lane once and fanning the results back to the rows
+"""
+
+import csv
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .config import config
+from .logging_utils import get_logger
+
+# Header tokens (lowercase, spaces and underscores removed) that identify Format 4
+FORMAT4_REQUIRED_COLUMNS = [
+    "loadno",
+    "shippercity",
+    "shipperstate",
+    "deliverycity",
+    "deliverystate",
+]
+FORMAT4_ALTERNATIVE_COLUMNS = ["load", "shipper", "delivery", "city", "state"]
+
+# Rows scanned for the header line
+FORMAT4_HEADER_SEARCH_ROWS = 3
+
+Lane = Tuple[str, str]
+
+
+def find_format4_header(lines: List[str]) -> Optional[int]:
+    """
+    Find the Format 4 header line among the first rows of a sheet
+
+    Args:
+        lines: CSV lines
+
+    Returns:
+        Index of the header line, or None if no Format 4 header was found
+    """
+    for row_idx in range(min(FORMAT4_HEADER_SEARCH_ROWS, len(lines))):
+        if not lines[row_idx].strip():
+            continue
+
+        header_clean = lines[row_idx].lower().replace(" ", "").replace("_", "")
+        if all(col in header_clean for col in FORMAT4_REQUIRED_COLUMNS):
+            return row_idx
+        if sum(1 for col in FORMAT4_ALTERNATIVE_COLUMNS if col in header_clean) >= 4:
+            return row_idx
+
+    return None
+
+
+class Format4RouteProcessor:
+    """
+    Route every load of a Format 4 sheet
+
+    Load sheets repeat the same shipper/delivery pairs heavily, so rows are
+    reduced to unique locations and unique lanes first. Locations are geocoded
+    and lanes routed concurrently (the calls wait on HERE), going through the
+    processor's shared geocoding cache, and state mileage is measured for all
+    lanes in a single batch. Each row then takes the result of its lane.
+    """
+
+    def __init__(self, processor, max_workers: Optional[int] = None):
+        """
+        Initialize the Format 4 processor
+
+        Args:
+            processor: DriverPacketProcessor whose geocoding, route and state
+                       analyzers are used
+            max_workers: Concurrent geocoding/routing requests
+                         (defaults to config.FORMAT4_ROUTING_WORKERS)
+        """
+        self.logger = get_logger()
+        self.processor = processor
+        self.max_workers = max_workers or config.FORMAT4_ROUTING_WORKERS
+
+    def process_csv(
+        self,
+        csv_content: str,
+        filename: str,
+        use_here_api: bool = True,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+    ) -> Dict:
+        """
+        Process a Format 4 CSV sheet
+
+        Args:
+            csv_content: CSV text
+            filename: Source file name (used as the result's source_image)
+            use_here_api: Whether to use HERE API for geocoding
+            progress_callback: Called with (fraction complete, status message)
+
+        Returns:
+            Processing result dictionary (a failed result on error)
+        """
+        try:
+            lines = csv_content.strip().split("\n")
+            header_row_idx = find_format4_header(lines)
+            if header_row_idx is None:
+                raise ValueError(
+                    f"Could not find Format 4 headers in first "
+                    f"{FORMAT4_HEADER_SEARCH_ROWS} rows"
+                )
+
+            reader = csv.DictReader(io.StringIO("\n".join(lines[header_row_idx:])))
+            rows = list(reader)
+            if not rows:
+                raise ValueError("No data rows found after header")
+
+            summary = self.process_rows(rows, use_here_api, progress_callback)
+
+        except Exception as e:
+            return {
+                "source_image": filename,
+                "processing_success": False,
+                "error": f"Format 4 processing failed: {str(e)}",
+            }
+
+        return {
+            "source_image": filename,
+            "processing_success": True,
+            "processing_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "format_type": "Format 4 - Load-based Route Data",
+            "total_routes_processed": len(rows),
+            "successful_routes": summary["successful_routes"],
+            "total_miles": str(int(summary["total_miles"])),
+            "distance_calculations": {
+                "calculation_success": True,
+                "total_distance_miles": summary["total_miles"],
+                "state_mileage": summary["state_mileage"],
+            },
+            "route_details": summary["route_details"],
+            "error_types": summary["error_types"],
+            "unique_locations": summary["unique_locations"],
+            "unique_lanes": summary["unique_lanes"],
+            "header_found_at_row": header_row_idx + 1,
+        }
+
+    def process_rows(
+        self,
+        rows: List[Dict],
+        use_here_api: bool = True,
+        progress_callback: Optional[Callable[[float, str], None]] = None,
+    ) -> Dict:
+        """
+        Route a list of load rows
+
+        Args:
+            rows: Rows keyed by the sheet's column names
+            use_here_api: Whether to use HERE API for geocoding
+            progress_callback: Called with (fraction complete, status message)
+
+        Returns:
+            Dictionary with route_details (one entry per row, in row order),
+            state_mileage totals, total_miles, successful_routes, error_types,
+            unique_locations and unique_lanes
+        """
+        report = progress_callback or (lambda fraction, message: None)
+
+        row_lanes: List[Optional[Lane]] = []
+        row_errors: Dict[int, str] = {}
+        for i, row in enumerate(rows):
+            lane, error = self._row_lane(row)
+            row_lanes.append(lane)
+            if error:
+                row_errors[i] = error
+
+        lanes = list(dict.fromkeys(lane for lane in row_lanes if lane))
+        locations = list(dict.fromkeys(loc for lane in lanes for loc in lane))
+        self.logger.info(
+            f"Format 4: {len(rows)} rows, {len(locations)} unique locations, "
+            f"{len(lanes)} unique lanes"
+        )
+
+        report(0.0, f"Geocoding {len(locations)} unique locations...")
+        geocoded = self._geocode_locations(locations, use_here_api)
+
+        report(0.3, f"Calculating {len(lanes)} unique routes...")
+        lane_results = self._route_lanes(lanes, geocoded)
+
+        report(0.8, f"Calculating state mileage for {len(lanes)} unique routes...")
+        lane_state_mileage = self._lane_state_mileage(lane_results)
+
+        report(1.0, "Route processing complete")
+        return self._fan_out(
+            rows, row_lanes, row_errors, lane_results, lane_state_mileage, lanes
+        )
+
+    def _row_lane(self, row: Dict) -> Tuple[Optional[Lane], Optional[str]]:
+        """Get a row's (origin, destination) lane, or the reason it has none"""
+        fields = {
+            name: (row.get(name) or "").strip()
+            for name in (
+                "Shipper City",
+                "Shipper State",
+                "Delivery City",
+                "Delivery State",
+            )
+        }
+        missing_fields = [name for name, value in fields.items() if not value]
+        if missing_fields:
+            return None, (
+                f"Missing required location data: {', '.join(missing_fields)}"
+            )
+
+        origin = f"{fields['Shipper City']}, {fields['Shipper State']}"
+        destination = f"{fields['Delivery City']}, {fields['Delivery State']}"
+        return (origin, destination), None
+
+    def _geocode_locations(
+        self, locations: List[str], use_here_api: bool
+    ) -> Dict[str, Tuple[Optional[Tuple[float, float]], Optional[str]]]:
+        """Geocode unique locations concurrently: location -> (coords, error)"""
+
+        def geocode(location):
+            try:
+                return (
+                    self.processor.geocoding_service.geocode_location(
+                        location, use_here_api
+                    ),
+                    None,
+                )
+            except Exception as e:
+                return None, f"Geocoding service error: {str(e)}"
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(locations, executor.map(geocode, locations)))
+
+    def _route_lanes(
+        self,
+        lanes: List[Lane],
+        geocoded: Dict[str, Tuple[Optional[Tuple[float, float]], Optional[str]]],
+    ) -> Dict[Lane, Dict]:
+        """Route unique lanes concurrently: lane -> {route, error}"""
+
+        def route(lane):
+            (origin_coords, origin_error), (destination_coords, destination_error) = (
+                geocoded[lane[0]],
+                geocoded[lane[1]],
+            )
+            if origin_error or destination_error:
+                return {"error": origin_error or destination_error}
+
+            if not origin_coords or not destination_coords:
+                missing_coords = []
+                if not origin_coords:
+                    missing_coords.append(f"origin ({lane[0]})")
+                if not destination_coords:
+                    missing_coords.append(f"destination ({lane[1]})")
+                return {"error": f"Could not geocode: {', '.join(missing_coords)}"}
+
+            try:
+                route_result = self.processor.route_analyzer.calculate_route_distance(
+                    origin_coords, destination_coords
+                )
+            except Exception as e:
+                return {"error": f"Route calculation service error: {str(e)}"}
+
+            if not route_result or not route_result.get("distance_miles", 0) > 0:
+                return {"error": "Distance calculation failed"}
+            return {"route": route_result}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            return dict(zip(lanes, executor.map(route, lanes)))
+
+    def _lane_state_mileage(
+        self, lane_results: Dict[Lane, Dict]
+    ) -> Dict[Lane, Optional[Dict[str, float]]]:
+        """
+        Measure state miles for every routed lane with a polyline in one batch
+
+        Returns:
+            lane -> state miles (None where analysis failed, so the caller
+            falls back to endpoint states); lanes without a polyline are absent
+        """
+        pending = [
+            (lane, result["route"])
+            for lane, result in lane_results.items()
+            if "route" in result and result["route"].get("polyline")
+        ]
+        if not pending:
+            return {}
+
+        try:
+            batch_state_miles = (
+                self.processor.state_analyzer.calculate_state_miles_batch(
+                    [route["polyline"] for _, route in pending],
+                    [route["distance_miles"] for _, route in pending],
+                )
+            )
+        except Exception as e:
+            self.logger.warning(f"Format 4 state analysis failed: {e}")
+            batch_state_miles = [None] * len(pending)
+
+        return {
+            lane: state_miles
+            for (lane, _), state_miles in zip(pending, batch_state_miles)
+        }
+
+    def _fan_out(
+        self,
+        rows: List[Dict],
+        row_lanes: List[Optional[Lane]],
+        row_errors: Dict[int, str],
+        lane_results: Dict[Lane, Dict],
+        lane_state_mileage: Dict[Lane, Optional[Dict[str, float]]],
+        lanes: List[Lane],
+    ) -> Dict:
+        """Build per-row route details and sheet totals from the lane results"""
+        route_details = []
+        state_mileage_totals: Dict[str, int] = {}
+        total_calculated_miles = 0
+        successful_routes = 0
+        error_types: Dict[str, int] = {}
+
+        for i, (row, lane) in enumerate(zip(rows, row_lanes)):
+            load_no = (row.get("Load No") or "").strip()
+            lane_result = lane_results.get(lane, {}) if lane else {}
+            error = row_errors.get(i) or lane_result.get("error")
+
+            if error:
+                entry = {"load_no": load_no}
+                if lane:
+                    entry.update(origin=lane[0], destination=lane[1])
+                entry.update(success=False, error=error)
+                route_details.append(entry)
+                error_type = error.split(":")[0] if ":" in error else error
+                error_types[error_type] = error_types.get(error_type, 0) + 1
+                continue
+
+            distance_miles = lane_result["route"]["distance_miles"]
+            state_mileage = []
+            if lane in lane_state_mileage:
+                state_mileage = self._row_state_mileage(
+                    lane_state_mileage[lane],
+                    distance_miles,
+                    (row.get("Shipper State") or "").strip(),
+                    (row.get("Delivery State") or "").strip(),
+                )
+
+            route_details.append(
+                {
+                    "load_no": load_no,
+                    "origin": lane[0],
+                    "destination": lane[1],
+                    "distance_miles": distance_miles,
+                    "state_mileage": state_mileage,
+                    "original_row_data": dict(row),
+                    "success": True,
+                }
+            )
+
+            for state_data in state_mileage:
+                state_mileage_totals[state_data["state"]] = (
+                    state_mileage_totals.get(state_data["state"], 0)
+                    + state_data["miles"]
+                )
+            total_calculated_miles += distance_miles
+            successful_routes += 1
+
+        state_mileage_list = [
+            {
+                "state": state,
+                "miles": int(round(miles)),
+                "percentage": (
+                    round((miles / total_calculated_miles) * 100, 1)
+                    if total_calculated_miles > 0
+                    else 0
+                ),
+            }
+            for state, miles in state_mileage_totals.items()
+        ]
+        state_mileage_list.sort(key=lambda x: x["miles"], reverse=True)
+
+        self.logger.info(
+            f"Format 4 processing complete: {successful_routes}/{len(rows)} routes "
+            f"successful, {total_calculated_miles:.0f} total miles"
+        )
+        for error_type, count in error_types.items():
+            self.logger.warning(f"  {error_type}: {count} routes")
+
+        return {
+            "route_details": route_details,
+            "state_mileage": state_mileage_list,
+            "total_miles": total_calculated_miles,
+            "successful_routes": successful_routes,
+            "error_types": error_types,
+            "unique_locations": len({loc for lane in lanes for loc in lane}),
+            "unique_lanes": len(lanes),
+        }
+
+    @staticmethod
+    def _row_state_mileage(
+        state_miles: Optional[Dict[str, float]],
+        distance_miles: float,
+        shipper_state: str,
+        delivery_state: str,
+    ) -> List[Dict]:
+        """Convert a lane's state miles to a row's state_mileage list"""
+        if state_miles is not None:
+            return [
+                {
+                    "state": state,
+                    "miles": int(round(miles)),
+                    "percentage": (
+                        round((miles / distance_miles) * 100, 1)
+                        if distance_miles > 0
+                        else 0
+                    ),
+                }
+                for state, miles in state_miles.items()
+            ]
+
+        # Fallback - use origin and destination states
+        if shipper_state and shipper_state != delivery_state:
+            return [
+                {
+                    "state": shipper_state,
+                    "miles": int(distance_miles // 2),
+                    "percentage": 50.0,
+                },
+                {
+                    "state": delivery_state,
+                    "miles": int(distance_miles // 2),
+                    "percentage": 50.0,
+                },
+            ]
+        return [
+            {
+                "state": shipper_state or delivery_state,
+                "miles": int(distance_miles),
+                "percentage": 100.0,
+            }
+        ]
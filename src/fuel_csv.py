@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Fuel CSV module
+Streaming, chunked aggregation of fuel-card transaction exports (per-state
+gallons), with format detection from the first lines of an upload
+"""
+
+import io
+from typing import Dict, List, Optional, Union
+
+import pandas as pd
+
+from .config import config
+from .logging_utils import get_logger
+
+# Lines read from the start of an upload to detect its format
+CSV_DETECTION_LINES = 5
+
+# Column names of the supported fuel exports
+FORMAT2_COLUMNS = {"state": "State/ Prov", "gallons": "Qty", "unit": "Unit"}
+FORMAT3_COLUMNS = {
+    "state": "Truck Stop State",
+    "gallons": "Number of Tractor Gallons",
+    "unit": "Unit Number",
+}
+
+CsvSource = Union[str, bytes, io.IOBase]
+
+
+def _open_csv_source(source: CsvSource):
+    """Get a file object positioned at the start of a CSV source"""
+    if isinstance(source, str):
+        return io.StringIO(source)
+    if isinstance(source, bytes):
+        return io.BytesIO(source)
+    if source.seekable():
+        source.seek(0)
+    return source
+
+
+def read_csv_head(source: CsvSource, max_lines: int = CSV_DETECTION_LINES) -> List[str]:
+    """
+    Read the first lines of a CSV source without loading the rest
+
+    Args:
+        source: CSV text, bytes, or a text/binary file object (rewound afterwards)
+        max_lines: Number of lines to read
+
+    Returns:
+        Lines without line endings (fewer if the source is shorter)
+    """
+    stream = _open_csv_source(source)
+    lines = []
+    for _ in range(max_lines):
+        line = stream.readline()
+        if not line:
+            break
+        if isinstance(line, bytes):
+            line = line.decode("utf-8-sig" if not lines else "utf-8", errors="replace")
+        lines.append(line.rstrip("\r\n"))
+
+    if not isinstance(source, (str, bytes)) and source.seekable():
+        source.seek(0)
+    return lines
+
+
+def read_csv_text(source: CsvSource) -> str:
+    """
+    Read a whole CSV source as text
+
+    Args:
+        source: CSV text, bytes, or a text/binary file object
+
+    Returns:
+        CSV text
+    """
+    if isinstance(source, str):
+        return source
+    content = _open_csv_source(source).read()
+    return content.decode("utf-8") if isinstance(content, bytes) else content
+
+
+def summarize_fuel_csv(
+    source: CsvSource,
+    columns: Dict[str, str],
+    chunk_rows: Optional[int] = None,
+    max_purchases: Optional[int] = None,
+) -> Dict:
+    """
+    Aggregate gallons by state from a fuel transaction CSV, one chunk at a time
+
+    Only the state, gallons and unit columns are parsed (as strings; gallons
+    are converted with a vectorized numeric parse), and each chunk is reduced
+    with a group-by before the next is read, so memory stays bounded by the
+    chunk size regardless of file size. Rows without a state or with
+    non-positive or unparseable gallons are ignored; malformed lines are skipped.
+
+    Args:
+        source: CSV text, bytes, or a text/binary file object
+        columns: Column names for "state", "gallons" and "unit"
+                 (FORMAT2_COLUMNS or FORMAT3_COLUMNS)
+        chunk_rows: Rows parsed per chunk (defaults to config.CSV_CHUNK_ROWS)
+        max_purchases: Individual purchases kept in the result
+                       (defaults to config.CSV_MAX_FUEL_PURCHASES)
+
+    Returns:
+        Dictionary with unit (first non-empty unit value), fuel_by_state,
+        total_gallons, fuel_purchases (the first max_purchases purchases),
+        fuel_purchase_count and rows_read
+    """
+    chunk_rows = chunk_rows or config.CSV_CHUNK_ROWS
+    max_purchases = (
+        config.CSV_MAX_FUEL_PURCHASES if max_purchases is None else max_purchases
+    )
+    wanted = set(columns.values())
+
+    fuel_by_state: Dict[str, float] = {}
+    fuel_purchases: List[Dict] = []
+    purchase_count = 0
+    rows_read = 0
+    unit = None
+
+    reader = pd.read_csv(
+        _open_csv_source(source),
+        usecols=lambda column: column in wanted,
+        dtype=str,
+        keep_default_na=False,
+        encoding="utf-8-sig",
+        index_col=False,
+        on_bad_lines="skip",
+        chunksize=chunk_rows,
+    )
+
+    with reader:
+        for chunk in reader:
+            rows_read += len(chunk)
+            empty = pd.Series("", index=chunk.index, dtype=str)
+
+            if not unit:
+                units = chunk.get(columns["unit"], empty).str.strip()
+                non_empty = units[units != ""]
+                unit = non_empty.iloc[0] if len(non_empty) else ""
+
+            states = chunk.get(columns["state"], empty).str.strip().str.upper()
+            gallons = pd.to_numeric(
+                chunk.get(columns["gallons"], empty).str.strip(), errors="coerce"
+            )
+            valid = (states != "") & (gallons > 0)
+            if not valid.any():
+                continue
+
+            purchases = pd.DataFrame(
+                {"state": states[valid], "gallons": gallons[valid]}
+            )
+            for state, total in (
+                purchases.groupby("state", sort=False)["gallons"].sum().items()
+            ):
+                fuel_by_state[state] = fuel_by_state.get(state, 0) + float(total)
+
+            if len(fuel_purchases) < max_purchases:
+                fuel_purchases.extend(
+                    purchases.head(max_purchases - len(fuel_purchases)).to_dict(
+                        "records"
+                    )
+                )
+            purchase_count += len(purchases)
+
+    if purchase_count > len(fuel_purchases):
+        get_logger().info(
+            f"Kept {len(fuel_purchases)} of {purchase_count} fuel purchases "
+            f"(per-state totals include all)"
+        )
+
+    return {
+        "unit": unit,
+        "fuel_by_state": fuel_by_state,
+        "total_gallons": sum(fuel_by_state.values()),
+        "fuel_purchases": fuel_purchases,
+        "fuel_purchase_count": purchase_count,
+        "rows_read": rows_read,
+    }
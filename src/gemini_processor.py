@@ -20,6 +20,10 @@ import urllib.parse
 import logging
 from logging.handlers import RotatingFileHandler
 import io
+try:
+    from .distance_utils import great_circle_distances
+except ImportError:  # imported as a top-level module (see gemini_example.py)
+    from distance_utils import great_circle_distances
 # Optional GIS dependencies for enhanced route analysis
 try:
     import geopandas as gpd
@@ -1654,32 +1658,11 @@ Analyze the image carefully and extract all CLEARLY VISIBLE information with int
         Returns:
             Distance in miles
         """
-        import math
-        
         if not coords1 or not coords2:
             return 0.0
             
         try:
-            lat1, lon1 = coords1
-            lat2, lon2 = coords2
-            
-            # Convert to radians
-            lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
-            
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            
-            a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-            c = 2 * math.asin(math.sqrt(a))
-            
-            # Earth radius in miles
-            r = 3956
-            
-            # Calculate distance
-            distance = c * r
-            
-            return round(distance, 1)
+            return round(float(great_circle_distances(coords1, coords2)[0]), 1)
             
         except Exception as e:
             print(f"⚠️  Distance estimation failed: {e}")
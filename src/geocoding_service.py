@@ -5,29 +5,73 @@ Provides location-to-coordinate conversion using multiple geocoding APIs
 """
 
 import os
+import threading
 import time
 import requests
+from collections import OrderedDict
 from typing import Dict, Optional, Tuple, List
 
 from .logging_utils import get_logger
 from .config import config
 
+# Location fields of a driver packet, in trip order
+STOP_LOCATION_FIELDS = [
+    "trip_started_from",
+    "first_drop",
+    "second_drop",
+    "third_drop",
+    "forth_drop",
+    "inbound_pu",
+    "drop_off",
+]
+
+
+def stop_location(extracted_data: Dict, field: str) -> str:
+    """
+    Get the location geocoded for a stop field
+
+    Args:
+        extracted_data: Dictionary with extracted trip data
+        field: Location field name
+
+    Returns:
+        Location string (the first entry for a drop_off list), or "" if empty
+    """
+    location = extracted_data.get(field) or ""
+
+    # Handle drop_off as array
+    if isinstance(location, list):
+        # Use the first drop-off location for geocoding
+        location = location[0] if location else ""
+
+    return location if isinstance(location, str) else str(location)
+
 
 class GeocodingService:
     """
     Service for converting locations to coordinates using multiple geocoding providers
     """
 
-    def __init__(self, here_api_key: Optional[str] = None):
+    def __init__(self, here_api_key: Optional[str] = None, http_client=None):
         """
         Initialize the geocoding service
 
         Args:
             here_api_key: HERE API key (if not provided, will use config.HERE_API_KEY)
+            http_client: Object with a requests-compatible get() (defaults to
+                         the requests module; see replay.ReplayHttpClient)
         """
         self.logger = get_logger()
         self.here_api_key = here_api_key or config.HERE_API_KEY
-        self.geocoding_cache = {}
+        self.http = http_client or requests
+        # Location -> coordinates (None for lookups with no results), least recently
+        # used first; the processor may be shared by several sessions/threads
+        self.geocoding_cache: "OrderedDict[str, Optional[Tuple[float, float]]]" = (
+            OrderedDict()
+        )
+        self._cache_lock = threading.Lock()
+        # Serializes Nominatim requests so concurrent callers keep to its rate limit
+        self._nominatim_lock = threading.Lock()
 
         if self.here_api_key:
             self.logger.info("HERE API key configured for geocoding")
@@ -55,8 +99,10 @@ class GeocodingService:
         location = location.strip()
 
         # Check cache first
-        if location in self.geocoding_cache:
-            return self.geocoding_cache[location]
+        with self._cache_lock:
+            if location in self.geocoding_cache:
+                self.geocoding_cache.move_to_end(location)
+                return self.geocoding_cache[location]
 
         # Try HERE API first if available and preferred
         if use_here_api and self.here_api_key:
@@ -82,7 +128,7 @@ class GeocodingService:
             url = "https://geocode.search.hereapi.com/v1/geocode"
             params = {"q": location, "apikey": self.here_api_key, "limit": 1}
 
-            response = requests.get(
+            response = self.http.get(
                 url, params=params, timeout=config.GEOCODING_TIMEOUT
             )
             response.raise_for_status()
@@ -94,13 +140,13 @@ class GeocodingService:
                 coords = (position["lat"], position["lng"])
 
                 # Cache the result
-                self.geocoding_cache[location] = coords
+                self._cache_location(location, coords)
                 self.logger.debug(f"HERE geocoded '{location}' -> {coords}")
 
                 return coords
             else:
                 # Cache negative result
-                self.geocoding_cache[location] = None
+                self._cache_location(location, None)
                 self.logger.debug(
                     f"HERE geocoding failed for '{location}' - no results"
                 )
@@ -108,8 +154,8 @@ class GeocodingService:
 
         except Exception as e:
             self.logger.warning(f"HERE geocoding failed for '{location}': {e}")
-            # Cache failure
-            self.geocoding_cache[location] = None
+            # Not cached: the cache is shared, and a timeout or HTTP error is
+            # no answer about the location, so later calls should retry
             return None
 
     def _geocode_nominatim(self, location: str) -> Optional[Tuple[float, float]]:
@@ -135,9 +181,9 @@ class GeocodingService:
             headers = {"User-Agent": "Driver-Packet-Processor/1.0"}
 
             # Rate limiting - Nominatim requires respectful usage
-            time.sleep(config.NOMINATIM_RATE_LIMIT)
-
-            response = requests.get(url, params=params, headers=headers, timeout=5)
+            with self._nominatim_lock:
+                time.sleep(config.NOMINATIM_RATE_LIMIT)
+                response = self.http.get(url, params=params, headers=headers, timeout=5)
             response.raise_for_status()
 
             data = response.json()
@@ -146,13 +192,13 @@ class GeocodingService:
                 coords = (float(data[0]["lat"]), float(data[0]["lon"]))
 
                 # Cache the result
-                self.geocoding_cache[location] = coords
+                self._cache_location(location, coords)
                 self.logger.debug(f"Nominatim geocoded '{location}' -> {coords}")
 
                 return coords
             else:
                 # Cache negative result
-                self.geocoding_cache[location] = None
+                self._cache_location(location, None)
                 self.logger.debug(
                     f"Nominatim geocoding failed for '{location}' - no results"
                 )
@@ -160,12 +206,15 @@ class GeocodingService:
 
         except Exception as e:
             self.logger.warning(f"Nominatim geocoding failed for '{location}': {e}")
-            # Cache failure
-            self.geocoding_cache[location] = None
+            # Not cached: the cache is shared, and a timeout or HTTP error is
+            # no answer about the location, so later calls should retry
             return None
 
     def get_coordinates_for_stops(
-        self, extracted_data: Dict, use_here_api: bool = True
+        self,
+        extracted_data: Dict,
+        use_here_api: bool = True,
+        previous_coordinates: Optional[Dict] = None,
     ) -> Dict:
         """
         Add coordinates for all stops in the extracted data
@@ -173,37 +222,31 @@ class GeocodingService:
         Args:
             extracted_data: Dictionary with extracted trip data
             use_here_api: If True, use HERE API; if False, use Nominatim
+            previous_coordinates: Coordinates from an earlier call; stops whose
+                                  location is unchanged and was found are
+                                  reused instead of geocoded again
 
         Returns:
             Dictionary with coordinate information for each location field
         """
-        # Location fields to geocode
-        location_fields = [
-            "trip_started_from",
-            "first_drop",
-            "second_drop",
-            "third_drop",
-            "forth_drop",
-            "inbound_pu",
-            "drop_off",
-        ]
-
         coordinates = {}
+        previous_coordinates = previous_coordinates or {}
+        reused = 0
 
         self.logger.info("Getting coordinates for trip stops...")
 
-        for field in location_fields:
-            location = extracted_data.get(field, "")
-
-            # Handle drop_off as array
-            if field == "drop_off" and isinstance(location, list):
-                if location:
-                    # Use the first drop-off location for geocoding
-                    location = location[0]
-                else:
-                    location = ""
-
-            if location and location.strip():
+        for field in STOP_LOCATION_FIELDS:
+            location = stop_location(extracted_data, field)
+            previous = previous_coordinates.get(field)
+
+            if (
+                isinstance(previous, dict)
+                and previous.get("location") == location
+                and previous.get("latitude") is not None
+            ):
+                coordinates[field] = dict(previous)
+                reused += 1
+            elif location and location.strip():
                 self.logger.debug(f"Geocoding {field}: {location}")
                 coords = self.geocode_location(location, use_here_api)
                 if coords:
@@ -250,7 +293,7 @@ class GeocodingService:
 
         self.logger.info(
             f"Geocoding completed: {successful_coords}/{total_locations} successful "
-            f"({geocoding_summary['geocoding_success_rate']:.1%})"
+            f"({geocoding_summary['geocoding_success_rate']:.1%}, {reused} reused)"
         )
 
         # Return coordinates with summary
@@ -280,7 +323,7 @@ class GeocodingService:
                 "limit": 1,
             }
 
-            response = requests.get(
+            response = self.http.get(
                 url, params=params, timeout=config.GEOCODING_TIMEOUT
             )
             response.raise_for_status()
@@ -361,6 +404,16 @@ class GeocodingService:
         state_lower = state_name.lower().strip()
         return state_mapping.get(state_lower, state_name.upper()[:2])
 
+    def _cache_location(
+        self, location: str, coords: Optional[Tuple[float, float]]
+    ) -> None:
+        """Cache a geocoding result, evicting the least recently used beyond the size limit"""
+        with self._cache_lock:
+            self.geocoding_cache[location] = coords
+            self.geocoding_cache.move_to_end(location)
+            while len(self.geocoding_cache) > config.GEOCODING_CACHE_SIZE:
+                self.geocoding_cache.popitem(last=False)
+
     def get_cache_stats(self) -> Dict:
         """
         Get geocoding cache statistics
@@ -368,10 +421,10 @@ class GeocodingService:
         Returns:
             Dictionary with cache statistics
         """
-        total_entries = len(self.geocoding_cache)
-        successful_entries = sum(
-            1 for v in self.geocoding_cache.values() if v is not None
-        )
+        with self._cache_lock:
+            cached = list(self.geocoding_cache.values())
+        total_entries = len(cached)
+        successful_entries = sum(1 for v in cached if v is not None)
         failed_entries = total_entries - successful_entries
 
         return {
@@ -385,5 +438,6 @@ class GeocodingService:
 
     def clear_cache(self) -> None:
         """Clear the geocoding cache"""
-        self.geocoding_cache.clear()
+        with self._cache_lock:
+            self.geocoding_cache.clear()
         self.logger.info("Geocoding cache cleared")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Image deduplication module
+Detects duplicate and near-duplicate packet pages using perceptual hashing
+"""
+
+from typing import Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from .config import config
+from .logging_utils import get_logger
+
+
+def compute_dhash(image: Union[str, Image.Image], hash_size: int = 8) -> int:
+    """
+    Compute a difference hash (dHash) for an image
+
+    The image is reduced to grayscale and resized to (hash_size + 1) x hash_size,
+    then each bit records whether a pixel is brighter than its right neighbour.
+    Rescans, re-exports and recompressed copies of the same page produce hashes
+    that differ in only a few bits.
+
+    Args:
+        image: Path to the image file or an already opened PIL image
+        hash_size: Hash width/height in bits (hash has hash_size**2 bits)
+
+    Returns:
+        Hash as an integer
+    """
+    if isinstance(image, str):
+        with Image.open(image) as img:
+            return compute_dhash(img, hash_size)
+
+    small = image.convert("L").resize((hash_size + 1, hash_size), Image.LANCZOS)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | int(pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming_distance(hash_a: int, hash_b: int) -> int:
+    """Number of differing bits between two hashes"""
+    return bin(hash_a ^ hash_b).count("1")
+
+
+class PerceptualHashIndex:
+    """
+    In-memory index of image hashes for duplicate lookups within a batch
+    """
+
+    def __init__(self, max_distance: Optional[int] = None):
+        """
+        Initialize the hash index
+
+        Args:
+            max_distance: Maximum Hamming distance to treat two images as duplicates
+                          (defaults to config.DUPLICATE_HASH_MAX_DISTANCE)
+        """
+        self.logger = get_logger()
+        self.max_distance = (
+            config.DUPLICATE_HASH_MAX_DISTANCE if max_distance is None else max_distance
+        )
+        self._entries: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def find_duplicate(self, image_hash: int) -> Optional[Tuple[str, int]]:
+        """
+        Find the closest indexed image within the configured distance
+
+        Args:
+            image_hash: Hash of the image to look up
+
+        Returns:
+            Tuple of (key, distance) for the closest match, or None
+        """
+        best = None
+        for indexed_hash, key in self._entries:
+            distance = hamming_distance(image_hash, indexed_hash)
+            if distance <= self.max_distance and (best is None or distance < best[1]):
+                best = (key, distance)
+                if distance == 0:
+                    break
+        return best
+
+    def add(self, image_hash: int, key: str) -> None:
+        """Add an image hash to the index under the given key"""
+        self._entries.append((image_hash, key))
+
+    def check_and_add(self, image: Union[str, Image.Image], key: str) -> Optional[Dict]:
+        """
+        Hash an image and either report it as a duplicate or add it to the index
+
+        Args:
+            image: Image path or PIL image
+            key: Identifier stored for the image (e.g. its file name)
+
+        Returns:
+            Dictionary with duplicate_of and hash_distance if the image duplicates
+            an indexed one, otherwise None (the image is indexed)
+        """
+        image_hash = compute_dhash(image)
+        match = self.find_duplicate(image_hash)
+
+        if match:
+            duplicate_of, distance = match
+            self.logger.info(
+                f"Duplicate page detected: {key} matches {duplicate_of} (distance {distance})"
+            )
+            return {"duplicate_of": duplicate_of, "hash_distance": distance}
+
+        self.add(image_hash, key)
+        return None
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Local router module
+Offline truck routing over a prebuilt road graph as a stand-in for HERE routing
+"""
+
+import heapq
+import math
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    import flexpolyline
+except ImportError:
+    flexpolyline = None
+
+from .logging_utils import get_logger
+from .config import config
+from .distance_utils import great_circle_distances, great_circle_matrix
+
+GRAPH_FORMAT_VERSION = 1
+EARTH_RADIUS_METERS = 6371008.8
+
+
+def save_road_graph(
+    path: str,
+    lat: np.ndarray,
+    lng: np.ndarray,
+    edge_from: np.ndarray,
+    edge_to: np.ndarray,
+    edge_meters: Optional[np.ndarray] = None,
+) -> Path:
+    """
+    Write a road graph in the compact on-disk format used by LocalRouter
+
+    Roads are stored in both directions as a compressed sparse row (CSR)
+    adjacency list: float64 node coordinates, int32 targets and float32
+    lengths in a compressed .npz file.
+
+    Args:
+        path: Output .npz path
+        lat: Node latitudes
+        lng: Node longitudes
+        edge_from: Start node index of each road segment
+        edge_to: End node index of each road segment
+        edge_meters: Road length of each segment (defaults to the
+                     great-circle length between its nodes)
+
+    Returns:
+        Path of the written graph
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lng = np.asarray(lng, dtype=np.float64)
+    edge_from = np.asarray(edge_from, dtype=np.int64)
+    edge_to = np.asarray(edge_to, dtype=np.int64)
+    if edge_meters is None:
+        edge_meters = great_circle_distances(
+            np.column_stack((lat[edge_from], lng[edge_from])),
+            np.column_stack((lat[edge_to], lng[edge_to])),
+            radius=EARTH_RADIUS_METERS,
+        )
+
+    # Both directions, sorted by source node
+    sources = np.concatenate((edge_from, edge_to))
+    targets = np.concatenate((edge_to, edge_from))
+    weights = np.concatenate((edge_meters, edge_meters)).astype(np.float32)
+    order = np.argsort(sources, kind="stable")
+
+    indptr = np.zeros(len(lat) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=len(lat)), out=indptr[1:])
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez_compressed(
+        path,
+        format_version=np.int32(GRAPH_FORMAT_VERSION),
+        lat=lat,
+        lng=lng,
+        indptr=indptr,
+        indices=targets[order].astype(np.int32),
+        weights=weights[order],
+    )
+    return path
+
+
+class LocalRouter:
+    """
+    A* shortest-path routing over a road graph loaded from disk
+
+    Routes are returned in the same shape as RouteAnalyzer.calculate_route_distance
+    (distance plus a HERE flexible polyline), so state analysis works unchanged.
+    """
+
+    def __init__(self, graph_path: str, cache_size: Optional[int] = None):
+        """
+        Load the road graph
+
+        Args:
+            graph_path: Graph written by save_road_graph()
+            cache_size: Routes kept in memory, keyed by snapped node pair
+                        (defaults to config.LOCAL_ROUTE_CACHE_SIZE)
+        """
+        self.logger = get_logger()
+        self.graph_path = Path(graph_path)
+
+        with np.load(self.graph_path) as graph:
+            version = int(graph["format_version"])
+            if version != GRAPH_FORMAT_VERSION:
+                raise ValueError(f"Unsupported road graph format version {version}")
+            self.lat = graph["lat"]
+            self.lng = graph["lng"]
+            indptr, indices, weights = (
+                graph["indptr"],
+                graph["indices"],
+                graph["weights"],
+            )
+
+        # Plain lists are much faster than NumPy scalars in the search loop
+        self._indptr = indptr.tolist()
+        self._indices = indices.tolist()
+        self._weights = weights.tolist()
+        self._node_coords = np.column_stack((self.lat, self.lng))
+
+        self.cache_size = (
+            config.LOCAL_ROUTE_CACHE_SIZE if cache_size is None else cache_size
+        )
+        self.route_cache: (
+            "OrderedDict[Tuple[int, int], Optional[Tuple[float, List[int]]]]"
+        ) = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self.logger.info(
+            f"Loaded road graph {self.graph_path.name}: {len(self.lat)} nodes, "
+            f"{len(self._indices) // 2} road segments"
+        )
+
+    @property
+    def node_count(self) -> int:
+        return len(self.lat)
+
+    def nearest_node(self, coords: Tuple[float, float]) -> Tuple[int, float]:
+        """
+        Snap a coordinate to the nearest graph node
+
+        Args:
+            coords: (latitude, longitude)
+
+        Returns:
+            Tuple of (node index, distance to the node in meters)
+        """
+        distances = great_circle_matrix(
+            [coords], self._node_coords, radius=EARTH_RADIUS_METERS
+        )[0]
+        node = int(np.argmin(distances))
+        return node, float(distances[node])
+
+    def shortest_path(
+        self, source: int, target: int
+    ) -> Optional[Tuple[float, List[int]]]:
+        """
+        A* shortest path between two nodes
+
+        The heuristic is the great-circle distance to the target, which never
+        exceeds the road distance, so the first time the target is settled the
+        path is optimal.
+
+        Args:
+            source: Start node index
+            target: End node index
+
+        Returns:
+            Tuple of (road meters, node indices along the path), or None if the
+            target cannot be reached
+        """
+        key = (source, target)
+        with self._cache_lock:
+            if key in self.route_cache:
+                self.route_cache.move_to_end(key)
+                return self.route_cache[key]
+
+        result = self._astar(source, target)
+
+        with self._cache_lock:
+            self.route_cache[key] = result
+            while len(self.route_cache) > self.cache_size:
+                self.route_cache.popitem(last=False)
+        return result
+
+    def _astar(self, source: int, target: int) -> Optional[Tuple[float, List[int]]]:
+        # Great-circle heuristic to the target for every node, in one call
+        heuristic = great_circle_matrix(
+            self._node_coords[target], self._node_coords, radius=EARTH_RADIUS_METERS
+        )[0].tolist()
+
+        indptr, indices, weights = self._indptr, self._indices, self._weights
+        best = {source: 0.0}
+        previous = {}
+        settled = set()
+        queue = [(heuristic[source], 0.0, source)]
+
+        while queue:
+            _, cost, node = heapq.heappop(queue)
+            if node in settled:
+                continue
+            if node == target:
+                path = [node]
+                while node in previous:
+                    node = previous[node]
+                    path.append(node)
+                return cost, path[::-1]
+            settled.add(node)
+
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbor = indices[edge]
+                new_cost = cost + weights[edge]
+                if new_cost < best.get(neighbor, math.inf):
+                    best[neighbor] = new_cost
+                    previous[neighbor] = node
+                    heapq.heappush(
+                        queue, (new_cost + heuristic[neighbor], new_cost, neighbor)
+                    )
+
+        return None
+
+    def route(
+        self,
+        origin_coords: Tuple[float, float],
+        destination_coords: Tuple[float, float],
+    ) -> Optional[Dict]:
+        """
+        Route between two coordinates over the road graph
+
+        Args:
+            origin_coords: (latitude, longitude) of origin
+            destination_coords: (latitude, longitude) of destination
+
+        Returns:
+            Dictionary with distance_miles, polyline (list with one HERE flexible
+            polyline) and api_used, or None if no route exists
+        """
+        origin_node, origin_snap = self.nearest_node(origin_coords)
+        destination_node, destination_snap = self.nearest_node(destination_coords)
+
+        found = self.shortest_path(origin_node, destination_node)
+        if found is None:
+            self.logger.warning(
+                f"No local route between {origin_coords} and {destination_coords}"
+            )
+            return None
+
+        road_meters, path = found
+        distance_meters = origin_snap + road_meters + destination_snap
+
+        polyline = None
+        if flexpolyline is not None:
+            points = [tuple(origin_coords)]
+            points.extend(zip(self.lat[path].tolist(), self.lng[path].tolist()))
+            points.append(tuple(destination_coords))
+            polyline = [flexpolyline.encode(points)]
+
+        return {
+            "distance_miles": round(distance_meters / 1609.34, 1),
+            "polyline": polyline,
+            "api_used": "local_router",
+            "state_miles": {},
+        }
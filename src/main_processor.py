@@ -9,13 +9,15 @@ import time
 from typing import Dict, List, Optional
 
 from .logging_utils import setup_logging, get_logger
-from .data_extractor import GeminiDataExtractor
-from .geocoding_service import GeocodingService
+from .data_extractor import GeminiDataExtractor, ImageSource, image_source_name
+from .geocoding_service import GeocodingService, STOP_LOCATION_FIELDS, stop_location
 from .route_analyzer import RouteAnalyzer
 from .state_analyzer import StateAnalyzer
 from .data_validator import DataValidator
 from .reference_validator import ReferenceValidator
 from .file_processor import FileProcessor
+from .replay import ReplayStore, ReplayHttpClient, ReplayGeminiModel
+from .config import config
 
 
 class DriverPacketProcessor:
@@ -29,6 +31,7 @@ class DriverPacketProcessor:
         here_api_key: Optional[str] = None,
         reference_csv_path: Optional[str] = None,
         setup_logging_config: bool = True,
+        replay_mode: Optional[str] = None,
     ):
         """
         Initialize the main processor with all sub-modules
@@ -38,6 +41,8 @@ class DriverPacketProcessor:
             here_api_key: HERE API key for geocoding and routing
             reference_csv_path: Path to reference CSV for validation
             setup_logging_config: Whether to setup logging configuration
+            replay_mode: "off", "record" or "replay" for Gemini/HERE calls
+                         (defaults to config.SERVICE_REPLAY_MODE)
         """
         # Setup logging
         if setup_logging_config:
@@ -47,18 +52,37 @@ class DriverPacketProcessor:
 
         self.logger.info("Initializing Driver Packet Processor...")
 
+        self.replay_mode = (replay_mode or config.SERVICE_REPLAY_MODE).lower()
+        self.http_client = None
+
         # Initialize all sub-modules
         try:
+            if self.replay_mode != "off":
+                here_api_key = self._setup_replay(here_api_key)
+
             # Data extraction
-            self.data_extractor = GeminiDataExtractor(api_key=gemini_api_key)
+            if self.replay_mode == "replay":
+                self.data_extractor = GeminiDataExtractor(
+                    model=ReplayGeminiModel("replay", self.replay_store)
+                )
+            else:
+                self.data_extractor = GeminiDataExtractor(api_key=gemini_api_key)
+                if self.replay_mode == "record":
+                    self.data_extractor.model = ReplayGeminiModel(
+                        "record", self.replay_store, model=self.data_extractor.model
+                    )
             self.logger.info("✅ Data extractor initialized")
 
             # Geocoding service
-            self.geocoding_service = GeocodingService(here_api_key=here_api_key)
+            self.geocoding_service = GeocodingService(
+                here_api_key=here_api_key, http_client=self.http_client
+            )
             self.logger.info("✅ Geocoding service initialized")
 
             # Route analyzer
-            self.route_analyzer = RouteAnalyzer(here_api_key=here_api_key)
+            self.route_analyzer = RouteAnalyzer(
+                here_api_key=here_api_key, http_client=self.http_client
+            )
             self.logger.info("✅ Route analyzer initialized")
 
             # State analyzer
@@ -87,143 +111,247 @@ class DriverPacketProcessor:
             self.logger.error(f"❌ Error initializing processor: {e}")
             raise
 
-    def process_single_image(self, image_path: str, use_here_api: bool = True) -> Dict:
+    def _setup_replay(self, here_api_key: Optional[str]) -> Optional[str]:
+        """
+        Create the fixture store and HTTP stand-in for record/replay mode
+
+        Args:
+            here_api_key: HERE API key passed to the processor
+
+        Returns:
+            HERE API key to use (a placeholder in replay mode, since recorded
+            HERE responses are served without contacting the service)
+        """
+        if self.replay_mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported replay mode: {self.replay_mode}")
+
+        self.replay_store = ReplayStore()
+        self.http_client = ReplayHttpClient(self.replay_mode, self.replay_store)
+        self.logger.info(
+            f"🎞️ Service {self.replay_mode} mode using fixtures in {self.replay_store.fixture_dir}"
+        )
+
+        if self.replay_mode == "replay":
+            return here_api_key or config.HERE_API_KEY or "replay"
+        return here_api_key
+
+    def get_service_call_stats(self) -> Dict:
+        """Get per-service call counters when running in record/replay mode"""
+        if self.replay_mode == "off":
+            return {}
+
+        stats = self.http_client.get_call_stats()
+        model = self.data_extractor.model
+        if isinstance(model, ReplayGeminiModel):
+            stats.update(model.get_call_stats())
+        return stats
+
+    def process_single_image(
+        self,
+        image: ImageSource,
+        use_here_api: bool = True,
+        source_name: Optional[str] = None,
+    ) -> Dict:
         """
         Process a single driver packet image through all stages
 
         Args:
-            image_path: Path to the image file
+            image: Path to the image file, encoded image bytes, a binary
+                   file-like object (e.g. an upload) or a PIL image
             use_here_api: Whether to use HERE API for geocoding and routing
+            source_name: Name recorded as source_image in the result
+                         (defaults to the file name of the source)
 
         Returns:
             Dictionary with complete processing results
         """
+        source_name = source_name or image_source_name(image)
         try:
-            self.logger.info(
-                f"🚛 Starting complete processing of: {os.path.basename(image_path)}"
-            )
+            self.logger.info(f"🚛 Starting complete processing of: {source_name}")
 
             # Stage 1: Extract data from image
             self.logger.info("📝 Stage 1: Extracting data from image...")
-            extraction_result = self.data_extractor.extract_data(image_path)
-
-            if not extraction_result.get("extraction_success"):
-                return {
-                    "processing_success": False,
-                    "stage_failed": "data_extraction",
-                    "error": extraction_result.get("error", "Data extraction failed"),
-                    "source_image": os.path.basename(image_path),
-                }
-
-            # Stage 2: Validate and correct extracted data
-            self.logger.info("🔧 Stage 2: Validating and correcting data...")
-            corrected_data, corrections = self.data_validator.validate_and_correct_data(
-                extraction_result
-            )
-            validation_warnings = self.data_validator.validate_extracted_data(
-                corrected_data
-            )
+            started = time.perf_counter()
+            extraction_result = self.data_extractor.extract_data(image, source_name)
+            timings = {}
+            self._record_stage(timings, "extraction", started)
 
-            # Stage 3: Get coordinates for locations
-            self.logger.info("🌍 Stage 3: Getting coordinates for locations...")
-            coordinates_data = self.geocoding_service.get_coordinates_for_stops(
-                corrected_data, use_here_api
+            return self._process_extraction_result(
+                extraction_result, source_name, use_here_api, timings
             )
 
-            # Stage 4: Calculate route distances
-            self.logger.info("📏 Stage 4: Calculating route distances...")
-            distance_data = self.route_analyzer.calculate_trip_distances(
-                coordinates_data
-            )
+        except Exception as e:
+            self.logger.error(f"❌ Error in complete processing: {e}")
+            return {
+                "processing_success": False,
+                "stage_failed": "unknown",
+                "error": f"Processing error: {str(e)}",
+                "source_image": source_name,
+            }
 
-            # Stage 5: Analyze state mileage distribution
-            self.logger.info("🗺️ Stage 5: Analyzing state mileage distribution...")
-            polylines = (
-                distance_data.get("trip_polylines", [])
-                if distance_data.get("calculation_success")
-                else []
-            )
-            enhanced_distance_data = self.state_analyzer.add_state_mileage_to_trip_data(
-                distance_data, polylines
-            )
+    def _record_stage(self, timings: Dict, stage: str, started: float) -> float:
+        """
+        Store the elapsed time of a stage and return the start of the next one
 
-            # Stage 6: Validate against reference data (if available)
-            self.logger.info("🔍 Stage 6: Validating against reference data...")
-            reference_validation = self.reference_validator.validate_against_reference(
-                corrected_data
-            )
+        Args:
+            timings: Dictionary of stage durations to update
+            stage: Stage name
+            started: perf_counter() value when the stage started
 
-            # Stage 7: Compare extracted vs calculated miles
-            if corrected_data.get("total_miles") and enhanced_distance_data.get(
-                "total_distance_miles"
-            ):
-                miles_comparison = self.route_analyzer.validate_distance_vs_extracted(
-                    corrected_data.get("total_miles"),
-                    enhanced_distance_data.get("total_distance_miles"),
-                )
-                if miles_comparison.get("warnings"):
-                    validation_warnings.extend(miles_comparison["warnings"])
-
-            # Compile final result
-            result = {
-                "processing_success": True,
-                "processing_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "source_image": os.path.basename(image_path),
-                # Extracted and corrected data
-                **corrected_data,
-                # Processing metadata
-                "corrections_applied": corrections,
-                "validation_warnings": validation_warnings,
-                # Coordinate information
-                "coordinates": coordinates_data,
-                # Distance calculations
-                "distance_calculations": enhanced_distance_data,
-                # Reference validation
-                "reference_validation": reference_validation,
-            }
+        Returns:
+            Current perf_counter() value
+        """
+        now = time.perf_counter()
+        timings[stage] = round(now - started, 6)
+        return now
 
-            # Add summary statistics
-            result["processing_summary"] = self._generate_processing_summary(result)
+    def _process_extraction_result(
+        self,
+        extraction_result: Dict,
+        source_name: str,
+        use_here_api: bool,
+        timings: Optional[Dict] = None,
+    ) -> Dict:
+        """
+        Run stages 2-7 (validation, geocoding, routing, state analysis,
+        reference validation) on an extraction result
 
-            self.logger.info(
-                f"✅ Complete processing finished for {os.path.basename(image_path)}"
-            )
+        Args:
+            extraction_result: Result from the data extractor
+            source_name: Name recorded as source_image in the result
+            use_here_api: Whether to use HERE API for geocoding and routing
+            timings: Stage durations recorded so far (e.g. extraction)
 
-            return result
+        Returns:
+            Dictionary with complete processing results, including
+            stage_timings in seconds
+        """
+        timings = dict(timings or {})
 
-        except Exception as e:
-            self.logger.error(f"❌ Error in complete processing: {e}")
-            return {
+        if not extraction_result.get("extraction_success"):
+            failure = {
                 "processing_success": False,
-                "stage_failed": "unknown",
-                "error": f"Processing error: {str(e)}",
-                "source_image": os.path.basename(image_path),
+                "stage_failed": "data_extraction",
+                "error": extraction_result.get("error", "Data extraction failed"),
+                "source_image": source_name,
+                "stage_timings": timings,
             }
+            # Failed parses still consumed tokens
+            if extraction_result.get("extraction_usage"):
+                failure["extraction_usage"] = extraction_result["extraction_usage"]
+            return failure
+
+        # Stage 2: Validate and correct extracted data
+        self.logger.info("🔧 Stage 2: Validating and correcting data...")
+        stage_started = time.perf_counter()
+        corrected_data, corrections = self.data_validator.validate_and_correct_data(
+            extraction_result
+        )
+        validation_warnings = self.data_validator.validate_extracted_data(
+            corrected_data
+        )
+
+        stage_started = self._record_stage(timings, "validation", stage_started)
+
+        # Stage 3: Get coordinates for locations
+        self.logger.info("🌍 Stage 3: Getting coordinates for locations...")
+        coordinates_data = self.geocoding_service.get_coordinates_for_stops(
+            corrected_data, use_here_api
+        )
+
+        stage_started = self._record_stage(timings, "geocoding", stage_started)
+
+        # Stage 4: Calculate route distances
+        self.logger.info("📏 Stage 4: Calculating route distances...")
+        distance_data = self.route_analyzer.calculate_trip_distances(coordinates_data)
+
+        stage_started = self._record_stage(timings, "routing", stage_started)
+
+        # Stage 5: Analyze state mileage distribution
+        self.logger.info("🗺️ Stage 5: Analyzing state mileage distribution...")
+        enhanced_distance_data = self.state_analyzer.add_state_mileage_to_trip_data(
+            distance_data
+        )
+
+        stage_started = self._record_stage(timings, "state_analysis", stage_started)
+
+        # Stage 6: Validate against reference data (if available)
+        self.logger.info("🔍 Stage 6: Validating against reference data...")
+        reference_validation = self.reference_validator.validate_against_reference(
+            corrected_data
+        )
+
+        self._record_stage(timings, "reference_validation", stage_started)
+        timings["total"] = round(sum(timings.values()), 6)
+
+        # Stage 7: Compare extracted vs calculated miles
+        if corrected_data.get("total_miles") and enhanced_distance_data.get(
+            "total_distance_miles"
+        ):
+            miles_comparison = self.route_analyzer.validate_distance_vs_extracted(
+                corrected_data.get("total_miles"),
+                enhanced_distance_data.get("total_distance_miles"),
+            )
+            if miles_comparison.get("warnings"):
+                validation_warnings.extend(miles_comparison["warnings"])
+
+        # Compile final result
+        result = {
+            "processing_success": True,
+            "processing_timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "source_image": source_name,
+            # Extracted and corrected data
+            **corrected_data,
+            # Processing metadata
+            "corrections_applied": corrections,
+            "validation_warnings": validation_warnings,
+            # Coordinate information
+            "coordinates": coordinates_data,
+            # Distance calculations
+            "distance_calculations": enhanced_distance_data,
+            # Reference validation
+            "reference_validation": reference_validation,
+            # Per-stage wall-clock durations in seconds
+            "stage_timings": timings,
+        }
+
+        # Add summary statistics
+        result["processing_summary"] = self._generate_processing_summary(result)
+
+        self.logger.info(f"✅ Complete processing finished for {source_name}")
+
+        return result
 
     def process_image_with_distances(
-        self, image_path: str, use_here_api: bool = True
+        self,
+        image: ImageSource,
+        use_here_api: bool = True,
+        source_name: Optional[str] = None,
     ) -> Dict:
         """
         Alias for process_single_image for backward compatibility
         """
-        return self.process_single_image(image_path, use_here_api)
+        return self.process_single_image(image, use_here_api, source_name)
 
     def process_multiple_images(
         self, input_folder: str, use_here_api: bool = True
     ) -> List[Dict]:
         """
-        Process multiple images in a folder
+        Process multiple images in a folder, or every page of a PDF envelope scan
 
         Args:
-            input_folder: Folder containing driver packet images
+            input_folder: Folder containing driver packet images/PDFs, or a PDF file
             use_here_api: Whether to use HERE API for geocoding and routing
 
         Returns:
             List of processing results
         """
-        self.logger.info(f"🚛 Starting batch processing of folder: {input_folder}")
-
-        results = self.file_processor.process_folder(input_folder, use_here_api)
+        if os.path.isfile(input_folder) and input_folder.lower().endswith(".pdf"):
+            self.logger.info(f"🚛 Starting batch processing of PDF: {input_folder}")
+            results = self.file_processor.process_pdf(input_folder, use_here_api)
+        else:
+            self.logger.info(f"🚛 Starting batch processing of folder: {input_folder}")
+            results = self.file_processor.process_folder(input_folder, use_here_api)
 
         # Generate batch summary
         summary = self.file_processor.get_processing_summary(results)
@@ -257,6 +385,19 @@ class DriverPacketProcessor:
         """
         return self.file_processor.create_error_report(results, output_path)
 
+    def create_usage_report(self, results: List[Dict], output_path: str) -> bool:
+        """
+        Create token and cost report ranking the most expensive pages
+
+        Args:
+            results: List of processing results
+            output_path: Output directory path
+
+        Returns:
+            True if successful
+        """
+        return self.file_processor.create_usage_report(results, output_path)
+
     def generate_accuracy_report(self, results: List[Dict]) -> Dict:
         """
         Generate accuracy report from multiple validation results
@@ -346,15 +487,122 @@ class DriverPacketProcessor:
         """
         return self.route_analyzer.calculate_trip_distances(coordinates_data)
 
+    def recalculate_distances(self, result: Dict, use_here_api: bool = True) -> Dict:
+        """
+        Recalculate distances for a result whose location fields were edited
+
+        The stop locations are compared with the locations the result's stored
+        coordinates were computed for. Only changed stops are geocoded, only
+        legs touching them are routed (unchanged legs keep their routes), and
+        state mileage is composed from the per-leg cache, so only rerouted
+        legs are measured.
+
+        Args:
+            result: Processing result with the edited location fields and the
+                    coordinates/distance_calculations from its last calculation
+            use_here_api: Whether to use HERE API for geocoding and routing
+
+        Returns:
+            Dictionary with recalculation_success, patch (coordinates,
+            distance_calculations and validation_warnings to set on the
+            result), changed_stops, reused_legs and rerouted_legs, or error
+        """
+        try:
+            previous_coordinates = result.get("coordinates") or {}
+            changed_stops = [
+                field
+                for field in STOP_LOCATION_FIELDS
+                if stop_location(result, field)
+                != (previous_coordinates.get(field) or {}).get("location", "")
+            ]
+            self.logger.info(
+                f"♻️ Recalculating distances ({len(changed_stops)} changed stops: "
+                f"{', '.join(changed_stops) or 'none'})"
+            )
+
+            coordinates_data = self.geocoding_service.get_coordinates_for_stops(
+                result, use_here_api, previous_coordinates=previous_coordinates
+            )
+
+            previous_legs = (result.get("distance_calculations") or {}).get("legs", [])
+            distance_data = self.route_analyzer.calculate_trip_distances(
+                coordinates_data, previous_legs=previous_legs
+            )
+
+            enhanced_distance_data = self.state_analyzer.add_state_mileage_to_trip_data(
+                distance_data
+            )
+
+            validation_warnings = self._update_miles_warning(
+                result.get("validation_warnings") or [],
+                result.get("total_miles"),
+                enhanced_distance_data.get("total_distance_miles", 0),
+            )
+
+            return {
+                "recalculation_success": True,
+                "patch": {
+                    "coordinates": coordinates_data,
+                    "distance_calculations": enhanced_distance_data,
+                    "validation_warnings": validation_warnings,
+                },
+                "changed_stops": changed_stops,
+                "reused_legs": distance_data.get("reused_legs", 0),
+                "rerouted_legs": distance_data.get("rerouted_legs", 0),
+            }
+
+        except Exception as e:
+            self.logger.error(f"Error recalculating distances: {e}")
+            return {"recalculation_success": False, "error": str(e)}
+
+    @staticmethod
+    def _update_miles_warning(
+        warnings: List[str], extracted_miles, calculated_miles: float
+    ) -> List[str]:
+        """
+        Replace the extracted vs calculated miles warning after a recalculation
+
+        Args:
+            warnings: Current validation warnings
+            extracted_miles: Total miles extracted from the document
+            calculated_miles: Newly calculated total miles
+
+        Returns:
+            Warnings without the old miles warning, plus a new one if the
+            miles differ by more than 5%
+        """
+        if not extracted_miles or calculated_miles <= 0:
+            return list(warnings)
+
+        try:
+            extracted_miles_num = float(str(extracted_miles).replace(",", ""))
+        except ValueError:
+            return list(warnings)
+
+        updated = [w for w in warnings if not w.startswith("Suspicious total miles:")]
+        percentage_diff = abs(
+            (extracted_miles_num - calculated_miles) / calculated_miles * 100
+        )
+        if percentage_diff > 5:
+            updated.append(
+                f"Suspicious total miles: extracted ({extracted_miles_num}) differs "
+                f"from calculated ({calculated_miles:.1f}) by {percentage_diff:.1f}%"
+            )
+        return updated
+
     def get_cache_stats(self) -> Dict:
         """Get statistics about cached data across all services"""
-        stats = {"geocoding_cache": self.geocoding_service.get_cache_stats()}
+        stats = {
+            "geocoding_cache": self.geocoding_service.get_cache_stats(),
+            "state_mileage_cache": self.state_analyzer.get_cache_stats(),
+        }
 
         return stats
 
     def clear_caches(self) -> None:
         """Clear all caches"""
         self.geocoding_service.clear_cache()
+        self.state_analyzer.clear_cache()
         self.logger.info("All caches cleared")
 
 
@@ -396,7 +644,7 @@ def process_driver_packet_folder(
     Convenience function to process a folder of driver packet images
 
     Args:
-        input_folder: Folder containing images
+        input_folder: Folder containing images/PDFs, or a single PDF envelope scan
         output_folder: Folder for output files
         gemini_api_key: Gemini API key
         here_api_key: HERE API key
@@ -420,6 +668,9 @@ def process_driver_packet_folder(
     if failed_results:
         processor.create_error_report(results, output_folder)
 
+    # Token and cost accounting for the batch
+    processor.create_usage_report(results, output_folder)
+
     # Generate accuracy report if reference validation was performed
     accuracy_report = processor.generate_accuracy_report(results)
     if accuracy_report:
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+PDF processor module
+Rasterizes multi-page envelope scans lazily, one page at a time
+"""
+
+import os
+from typing import Iterator, Optional, Tuple
+
+from PIL import Image
+
+# Optional PDF dependency for multi-page envelope scans
+try:
+    import pymupdf
+
+    PDF_AVAILABLE = True
+except ImportError:
+    PDF_AVAILABLE = False
+    pymupdf = None
+
+from .config import config
+from .logging_utils import get_logger
+
+
+def page_source_name(pdf_path: str, page_number: int) -> str:
+    """
+    Build the source_image name for a PDF page
+
+    Matches the naming of hand-exploded pages (e.g. envelope_Page_07), so
+    downstream grouping and reports treat both inputs the same way.
+
+    Args:
+        pdf_path: Path to the PDF file
+        page_number: 1-based page number
+
+    Returns:
+        Source name such as "envelope_Page_07"
+    """
+    stem = os.path.splitext(os.path.basename(pdf_path))[0]
+    return f"{stem}_Page_{page_number:02d}"
+
+
+def get_pdf_page_count(pdf_path: str) -> int:
+    """Return the number of pages in a PDF without rendering any of them"""
+    if not PDF_AVAILABLE:
+        raise ImportError("PDF support requires pymupdf (pip install pymupdf)")
+
+    with pymupdf.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def iter_pdf_pages(
+    pdf_path: str, dpi: Optional[int] = None
+) -> Iterator[Tuple[int, Image.Image]]:
+    """
+    Lazily rasterize the pages of a PDF
+
+    Only one page is rendered and held in memory at a time; nothing is
+    written to disk.
+
+    Args:
+        pdf_path: Path to the PDF file
+        dpi: Render resolution (defaults to config.PDF_RENDER_DPI)
+
+    Yields:
+        Tuples of (1-based page number, RGB PIL image)
+    """
+    if not PDF_AVAILABLE:
+        raise ImportError("PDF support requires pymupdf (pip install pymupdf)")
+
+    logger = get_logger()
+    dpi = dpi or config.PDF_RENDER_DPI
+
+    with pymupdf.open(pdf_path) as doc:
+        logger.info(
+            f"Rasterizing {doc.page_count} page(s) from {os.path.basename(pdf_path)} at {dpi} DPI"
+        )
+
+        for index in range(doc.page_count):
+            pixmap = doc.load_page(index).get_pixmap(dpi=dpi, alpha=False)
+            image = Image.frombytes(
+                "RGB", (pixmap.width, pixmap.height), pixmap.samples
+            )
+            del pixmap
+
+            yield index + 1, image
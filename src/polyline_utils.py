@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Polyline utilities module
+Vectorized HERE flexible polyline decoding and coordinate projection
+"""
+
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+
+try:
+    from pyproj import Transformer
+
+    PYPROJ_AVAILABLE = True
+except ImportError:
+    PYPROJ_AVAILABLE = False
+    Transformer = None
+
+
+# HERE flexible polyline alphabet (URL-safe base64 ordering)
+_ENCODING_TABLE = b"ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789-_"
+_DECODING_TABLE = np.full(256, -1, dtype=np.int16)
+_DECODING_TABLE[np.frombuffer(_ENCODING_TABLE, dtype=np.uint8)] = np.arange(64)
+
+_FORMAT_VERSION = 1
+
+
+def _decode_varints(encoded: str) -> np.ndarray:
+    """
+    Decode all unsigned varints in an encoded polyline string
+
+    Each character carries 5 value bits plus a continuation bit (0x20);
+    chunks are little-endian within a varint.
+
+    Args:
+        encoded: Encoded polyline string
+
+    Returns:
+        Array of unsigned integers (uint64)
+    """
+    chars = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8)
+    values = _DECODING_TABLE[chars]
+    if (values < 0).any():
+        raise ValueError("Invalid character in flexible polyline")
+
+    values = values.astype(np.uint64)
+    is_last = (values & 0x20) == 0
+    if not is_last[-1]:
+        raise ValueError("Truncated flexible polyline")
+
+    # Index of the varint each chunk belongs to, and the chunk's position in it
+    ends = np.flatnonzero(is_last)
+    starts = np.concatenate(([0], ends[:-1] + 1))
+    varint_index = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    chunk_position = np.arange(len(values)) - starts[varint_index]
+
+    shifted = (values & np.uint64(0x1F)) << (
+        np.uint64(5) * chunk_position.astype(np.uint64)
+    )
+    return np.add.reduceat(shifted, starts)
+
+
+def decode_polyline_array(encoded: str) -> np.ndarray:
+    """
+    Decode a HERE flexible polyline into a NumPy coordinate array
+
+    Equivalent to flexpolyline.decode() but without building Python tuples.
+    A third dimension (elevation etc.), if present, is dropped.
+
+    Args:
+        encoded: HERE flexible polyline string
+
+    Returns:
+        Array of shape (n, 2) with [latitude, longitude] rows
+    """
+    varints = _decode_varints(encoded)
+    if len(varints) < 2 or varints[0] != _FORMAT_VERSION:
+        raise ValueError("Unsupported flexible polyline header")
+
+    header = int(varints[1])
+    precision = header & 15
+    third_dim = (header >> 4) & 7
+    dims = 3 if third_dim else 2
+
+    body = varints[2:]
+    if len(body) % dims:
+        raise ValueError("Flexible polyline has an incomplete coordinate")
+
+    # Zigzag decode, then undo delta encoding
+    signed = (body >> np.uint64(1)).astype(np.int64)
+    signed = np.where(body & np.uint64(1), ~signed, signed)
+    coords = np.cumsum(signed.reshape(-1, dims)[:, :2], axis=0)
+
+    return coords / float(10**precision)
+
+
+@lru_cache(maxsize=8)
+def get_transformer(target_crs: str = "EPSG:5070"):
+    """
+    Get a cached WGS84 -> target CRS transformer
+
+    Args:
+        target_crs: Target CRS in any form pyproj accepts (e.g. "EPSG:5070")
+
+    Returns:
+        pyproj Transformer using (x=longitude, y=latitude) axis order
+    """
+    if not PYPROJ_AVAILABLE:
+        raise ImportError("pyproj is required for coordinate projection")
+    return Transformer.from_crs("EPSG:4326", target_crs, always_xy=True)
+
+
+def project_coordinates(
+    lat_lng: np.ndarray, target_crs: str = "EPSG:5070"
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Project [latitude, longitude] rows to the target CRS in one call
+
+    Args:
+        lat_lng: Array of shape (n, 2) with [latitude, longitude] rows
+        target_crs: Target CRS (default NAD83 / Conus Albers, meters)
+
+    Returns:
+        Tuple of (x, y) coordinate arrays
+    """
+    return get_transformer(target_crs).transform(lat_lng[:, 1], lat_lng[:, 0])
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Processor registry module
+Process-wide DriverPacketProcessor instances shared by all sessions that use
+the same API keys, so model setup, geocode/route caches and state boundaries
+are warmed once per server process
+"""
+
+import hashlib
+import threading
+from typing import Dict, Optional
+
+from .logging_utils import get_logger
+from .main_processor import DriverPacketProcessor
+
+_registry_lock = threading.Lock()
+_processors: Dict[str, DriverPacketProcessor] = {}
+_creation_locks: Dict[str, threading.Lock] = {}
+
+
+def api_key_fingerprint(
+    gemini_api_key: Optional[str] = None,
+    here_api_key: Optional[str] = None,
+    reference_csv_path: Optional[str] = None,
+) -> str:
+    """
+    Build the registry key for a processor configuration
+
+    The keys themselves are never stored; only a SHA-256 digest is kept.
+
+    Args:
+        gemini_api_key: Gemini API key
+        here_api_key: HERE API key
+        reference_csv_path: Path to reference CSV for validation
+
+    Returns:
+        Hex fingerprint identifying the configuration
+    """
+    payload = "\0".join(
+        value or "" for value in (gemini_api_key, here_api_key, reference_csv_path)
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def get_shared_processor(
+    gemini_api_key: Optional[str] = None,
+    here_api_key: Optional[str] = None,
+    reference_csv_path: Optional[str] = None,
+) -> DriverPacketProcessor:
+    """
+    Get the shared processor for a set of API keys, creating it on first use
+
+    Processors hold no per-session state (results, edits and options are passed
+    in per call), so one instance can serve every session with the same keys.
+    State boundaries are loaded when the processor is created so the first
+    trip does not pay for the shapefile read.
+
+    Args:
+        gemini_api_key: Gemini API key for data extraction
+        here_api_key: HERE API key for geocoding and routing
+        reference_csv_path: Path to reference CSV for validation
+
+    Returns:
+        Shared DriverPacketProcessor
+
+    Raises:
+        Exception: Whatever DriverPacketProcessor raises on initialization
+                   (nothing is registered in that case)
+    """
+    fingerprint = api_key_fingerprint(gemini_api_key, here_api_key, reference_csv_path)
+
+    with _registry_lock:
+        processor = _processors.get(fingerprint)
+        if processor is not None:
+            return processor
+        creation_lock = _creation_locks.setdefault(fingerprint, threading.Lock())
+
+    # Initialization is slow (model probing), so only callers wanting the same
+    # configuration wait for it
+    with creation_lock:
+        with _registry_lock:
+            processor = _processors.get(fingerprint)
+        if processor is not None:
+            return processor
+
+        processor = DriverPacketProcessor(
+            gemini_api_key=gemini_api_key,
+            here_api_key=here_api_key,
+            reference_csv_path=reference_csv_path,
+        )
+        processor.state_analyzer.load_state_boundaries()
+
+        with _registry_lock:
+            _processors[fingerprint] = processor
+        get_logger().info(f"Registered shared processor {fingerprint}")
+        return processor
+
+
+def get_registry_stats() -> Dict:
+    """
+    Get cache statistics for every shared processor
+
+    Returns:
+        Dictionary mapping processor fingerprints to their cache statistics
+    """
+    with _registry_lock:
+        processors = dict(_processors)
+    return {
+        fingerprint: processor.get_cache_stats()
+        for fingerprint, processor in processors.items()
+    }
+
+
+def clear_shared_processors() -> None:
+    """Drop all shared processors (they are recreated on next use)"""
+    with _registry_lock:
+        _processors.clear()
+        _creation_locks.clear()
+    get_logger().info("Shared processors cleared")
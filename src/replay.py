@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Service replay module
+Records real Gemini and HERE responses to fixture files and serves them back
+offline, with optional injected latency and errors for benchmarking
+"""
+
+import hashlib
+import json
+import random
+import threading
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+import requests
+from PIL import Image
+
+from .config import config
+from .logging_utils import get_logger
+
+REPLAY_MODES = ("off", "record", "replay")
+
+# Request parameters that never affect the response and must not end up in fixtures
+_EXCLUDED_PARAMS = {"apikey", "key"}
+
+
+class ReplayStore:
+    """
+    Fixture storage for recorded service responses
+
+    Each request is keyed by a hash of its service name and parameters (API
+    keys excluded) and stored as <fixture_dir>/<service>/<key>.json.
+    """
+
+    def __init__(self, fixture_dir: Optional[str] = None):
+        """
+        Initialize the fixture store
+
+        Args:
+            fixture_dir: Directory holding recorded responses
+                         (defaults to config.SERVICE_REPLAY_DIR)
+        """
+        self.logger = get_logger()
+        self.fixture_dir = Path(fixture_dir or config.SERVICE_REPLAY_DIR)
+
+    @staticmethod
+    def request_key(service: str, request: Dict) -> str:
+        """Build a stable fixture key for a request"""
+        cleaned = {k: v for k, v in request.items() if k not in _EXCLUDED_PARAMS}
+        payload = json.dumps([service, cleaned], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:24]
+
+    def _path(self, service: str, request: Dict) -> Path:
+        return self.fixture_dir / service / f"{self.request_key(service, request)}.json"
+
+    def load(self, service: str, request: Dict) -> Optional[Dict]:
+        """
+        Load a recorded response
+
+        Args:
+            service: Service name (e.g. "here_geocode", "gemini")
+            request: Request parameters used to build the key
+
+        Returns:
+            Recorded response dictionary, or None if not recorded
+        """
+        path = self._path(service, request)
+        if not path.exists():
+            return None
+
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["response"]
+
+    def save(self, service: str, request: Dict, response: Dict) -> Path:
+        """
+        Save a response as a fixture
+
+        Args:
+            service: Service name
+            request: Request parameters used to build the key
+            response: Response dictionary to store
+
+        Returns:
+            Path of the written fixture file
+        """
+        path = self._path(service, request)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        cleaned = {k: v for k, v in request.items() if k not in _EXCLUDED_PARAMS}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {"service": service, "request": cleaned, "response": response},
+                f,
+                indent=config.JSON_INDENT,
+                ensure_ascii=False,
+            )
+
+        self.logger.debug(f"Recorded {service} response to {path}")
+        return path
+
+
+class _ReplayBase:
+    """Shared mode handling, fault injection and call counting"""
+
+    def __init__(
+        self,
+        mode: str,
+        store: ReplayStore,
+        latency_seconds: Optional[float] = None,
+        error_rate: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unsupported replay mode: {mode}")
+
+        self.logger = get_logger()
+        self.mode = mode
+        self.store = store
+        self.latency_seconds = (
+            config.SERVICE_REPLAY_LATENCY_SECONDS
+            if latency_seconds is None
+            else latency_seconds
+        )
+        self.error_rate = (
+            config.SERVICE_REPLAY_ERROR_RATE if error_rate is None else error_rate
+        )
+        self._random = random.Random(
+            config.SERVICE_REPLAY_SEED if seed is None else seed
+        )
+        self.call_counts: Dict[str, Dict[str, int]] = {}
+        # Clients are shared by the job runner and Format 4 worker threads
+        self._counts_lock = threading.Lock()
+
+    def _count(self, service: str, counter: str) -> None:
+        with self._counts_lock:
+            counts = self.call_counts.setdefault(
+                service,
+                {
+                    "calls": 0,
+                    "replayed": 0,
+                    "recorded": 0,
+                    "missing": 0,
+                    "injected_errors": 0,
+                },
+            )
+            counts[counter] += 1
+
+    def _inject_faults(self, service: str) -> None:
+        """Apply configured latency and randomly raise injected errors"""
+        if self.latency_seconds > 0:
+            time.sleep(self.latency_seconds)
+
+        if self.error_rate > 0 and self._random.random() < self.error_rate:
+            self._count(service, "injected_errors")
+            raise requests.exceptions.Timeout(f"Injected {service} error (replay)")
+
+    def get_call_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get per-service call counters"""
+        with self._counts_lock:
+            return {
+                service: dict(counts) for service, counts in self.call_counts.items()
+            }
+
+
+class ReplayResponse:
+    """Minimal stand-in for requests.Response built from a recorded response"""
+
+    def __init__(self, status_code: int, data, url: str = ""):
+        self.status_code = status_code
+        self._data = data
+        self.url = url
+        self.text = json.dumps(data)
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error (replayed) for url: {self.url}",
+                response=self,
+            )
+
+
+class ReplayHttpClient(_ReplayBase):
+    """
+    Drop-in replacement for the `requests` module used by the geocoding and
+    routing services (only `get` is needed)
+
+    In record mode requests go to the real service and the responses are
+    stored. In replay mode responses are served from the fixture store and a
+    missing fixture raises a ConnectionError, just like being offline.
+    """
+
+    SERVICE_HOSTS = {
+        "geocode.search.hereapi.com": "here_geocode",
+        "revgeocode.search.hereapi.com": "here_revgeocode",
+        "router.hereapi.com": "here_routes",
+        "nominatim.openstreetmap.org": "nominatim",
+    }
+
+    def _service_for(self, url: str) -> str:
+        host = urlparse(url).netloc
+        return self.SERVICE_HOSTS.get(host, host or "http")
+
+    def get(self, url: str, params: Optional[Dict] = None, **kwargs):
+        """
+        Perform (record) or serve (replay) a GET request
+
+        Args:
+            url: Request URL
+            params: Query parameters
+            **kwargs: Passed through to requests.get in record mode
+
+        Returns:
+            requests.Response in record mode, ReplayResponse in replay mode
+        """
+        service = self._service_for(url)
+        request = {"url": url, **(params or {})}
+        self._count(service, "calls")
+
+        if self.mode == "record":
+            response = requests.get(url, params=params, **kwargs)
+            try:
+                data = response.json()
+            except ValueError:
+                data = None
+            self.store.save(
+                service, request, {"status_code": response.status_code, "json": data}
+            )
+            self._count(service, "recorded")
+            return response
+
+        self._inject_faults(service)
+
+        recorded = self.store.load(service, request)
+        if recorded is None:
+            self._count(service, "missing")
+            raise requests.exceptions.ConnectionError(
+                f"No recorded {service} response for {request} (replay mode)"
+            )
+
+        self._count(service, "replayed")
+        return ReplayResponse(recorded["status_code"], recorded["json"], url)
+
+
+class ReplayGeminiModel(_ReplayBase):
+    """
+    Stand-in for a Gemini GenerativeModel
+
+    Requests are keyed by the prompt text and a hash of the image pixels, so
+    the same page replays the same response.
+    """
+
+    service = "gemini"
+
+    def __init__(
+        self,
+        mode: str,
+        store: ReplayStore,
+        model=None,
+        model_name: Optional[str] = None,
+        **kwargs,
+    ):
+        """
+        Initialize the replay model
+
+        Args:
+            mode: "record" or "replay"
+            store: Fixture store
+            model: Real GenerativeModel (required in record mode)
+            model_name: Model name reported in usage accounting
+            **kwargs: latency_seconds, error_rate, seed
+        """
+        super().__init__(mode, store, **kwargs)
+        if mode == "record" and model is None:
+            raise ValueError("Record mode requires a real Gemini model")
+
+        self.model = model
+        self.model_name = (
+            model_name or getattr(model, "model_name", None) or config.GEMINI_MODEL
+        )
+
+    @staticmethod
+    def _request_for(contents) -> Dict:
+        """Describe generate_content arguments in a hashable, JSON-safe form"""
+        parts = contents if isinstance(contents, (list, tuple)) else [contents]
+        described = []
+        for part in parts:
+            if isinstance(part, Image.Image):
+                digest = hashlib.sha256(part.tobytes()).hexdigest()
+                described.append(f"image:{part.mode}:{part.size}:{digest}")
+            else:
+                described.append(
+                    "text:" + hashlib.sha256(str(part).encode("utf-8")).hexdigest()
+                )
+        return {"contents": described}
+
+    def generate_content(self, contents):
+        """Generate (record) or replay a Gemini response"""
+        request = self._request_for(contents)
+        self._count(self.service, "calls")
+
+        if self.mode == "record":
+            response = self.model.generate_content(contents)
+            metadata = getattr(response, "usage_metadata", None)
+            self.store.save(
+                self.service,
+                request,
+                {
+                    "text": response.text,
+                    "usage_metadata": {
+                        name: getattr(metadata, name, 0) or 0
+                        for name in (
+                            "prompt_token_count",
+                            "candidates_token_count",
+                            "total_token_count",
+                        )
+                    },
+                },
+            )
+            self._count(self.service, "recorded")
+            return response
+
+        self._inject_faults(self.service)
+
+        recorded = self.store.load(self.service, request)
+        if recorded is None:
+            self._count(self.service, "missing")
+            raise ConnectionError(
+                "No recorded Gemini response for this page (replay mode)"
+            )
+
+        self._count(self.service, "replayed")
+        return SimpleNamespace(
+            text=recorded["text"],
+            usage_metadata=SimpleNamespace(**recorded.get("usage_metadata", {})),
+        )
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Results index module
+Pagination of large batches, and field-level edit diffs that are applied on
+top of the original results
+"""
+
+import math
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def field_display_value(value: Any) -> str:
+    """
+    Format a result field the way it is shown and edited
+
+    Args:
+        value: Field value (string, number, list of locations or None)
+
+    Returns:
+        Display string ('' for missing values, lists joined with ', ')
+    """
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+    return str(value) if value else ""
+
+
+def apply_result_edits(result: Dict, edits: Optional[Dict] = None) -> Dict:
+    """
+    Get a result with its edited fields applied
+
+    Args:
+        result: Original processing result
+        edits: Fields that differ from the original (see update_result_edits)
+
+    Returns:
+        New dictionary; the original result is not modified
+    """
+    return {**result, **(edits or {})}
+
+
+def update_result_edits(edits: Dict, original: Dict, field: str, value: Any) -> bool:
+    """
+    Record an edited field value, keeping only fields that differ from the original
+
+    Args:
+        edits: Edit diff to update in place
+        original: Original processing result
+        field: Field name
+        value: New value
+
+    Returns:
+        True if the diff changed
+    """
+    if field_display_value(value) == field_display_value(original.get(field)):
+        return edits.pop(field, None) is not None
+
+    if field in edits and field_display_value(edits[field]) == field_display_value(
+        value
+    ):
+        return False
+    edits[field] = value
+    return True
+
+
+def paginate(items: List, page: int, page_size: int) -> Tuple[List, int, int]:
+    """
+    Get one page of items
+
+    Args:
+        items: Items to page through
+        page: 1-based page number (clamped to the available pages)
+        page_size: Items per page
+
+    Returns:
+        Tuple of (items on the page, page number used, page count)
+    """
+    page_size = max(1, page_size)
+    page_count = max(1, math.ceil(len(items) / page_size))
+    page = min(max(1, page), page_count)
+    start = (page - 1) * page_size
+    return items[start : start + page_size], page, page_count
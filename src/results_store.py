@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+"""
+Results store module
+Flattens processing results into typed SQLite tables (packets, legs, state
+mileage, fuel) so summaries, dashboard filters and exports are answered by
+indexed queries
+"""
+
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from .logging_utils import get_logger
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS packets (
+    position INTEGER PRIMARY KEY,
+    source_image TEXT,
+    format_type TEXT,
+    processing_success INTEGER NOT NULL,
+    is_duplicate INTEGER NOT NULL DEFAULT 0,
+    drivers_name TEXT COLLATE NOCASE,
+    unit TEXT COLLATE NOCASE,
+    trailer TEXT COLLATE NOCASE,
+    trip TEXT COLLATE NOCASE,
+    trip_date TEXT,
+    page_number INTEGER,
+    extracted_miles REAL,
+    calculated_miles REAL,
+    distance_success INTEGER NOT NULL DEFAULT 0,
+    geocoded_stops INTEGER NOT NULL DEFAULT 0,
+    reference_found INTEGER NOT NULL DEFAULT 0,
+    warning_count INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    edited INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS legs (
+    position INTEGER NOT NULL REFERENCES packets(position),
+    leg_number INTEGER,
+    origin TEXT,
+    origin_state TEXT,
+    destination TEXT,
+    destination_state TEXT,
+    distance_miles REAL,
+    api_used TEXT,
+    route_analysis_used INTEGER NOT NULL DEFAULT 0,
+    calculation_failed INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS state_mileage (
+    position INTEGER NOT NULL REFERENCES packets(position),
+    seq INTEGER NOT NULL,
+    state TEXT,
+    miles REAL,
+    percentage REAL
+);
+CREATE TABLE IF NOT EXISTS fuel (
+    position INTEGER NOT NULL REFERENCES packets(position),
+    seq INTEGER NOT NULL,
+    state TEXT,
+    gallons REAL
+);
+CREATE INDEX IF NOT EXISTS idx_packets_driver ON packets(drivers_name);
+CREATE INDEX IF NOT EXISTS idx_packets_unit ON packets(unit);
+CREATE INDEX IF NOT EXISTS idx_packets_trailer ON packets(trailer);
+CREATE INDEX IF NOT EXISTS idx_packets_trip ON packets(trip);
+CREATE INDEX IF NOT EXISTS idx_packets_date ON packets(trip_date);
+CREATE INDEX IF NOT EXISTS idx_legs_position ON legs(position);
+CREATE INDEX IF NOT EXISTS idx_state_mileage_position ON state_mileage(position, seq);
+CREATE INDEX IF NOT EXISTS idx_state_mileage_state ON state_mileage(state);
+CREATE INDEX IF NOT EXISTS idx_fuel_position ON fuel(position, seq);
+CREATE INDEX IF NOT EXISTS idx_fuel_state ON fuel(state);
+"""
+
+# Columns matched by the free-text packet search
+SEARCH_COLUMNS = ("source_image", "drivers_name", "unit", "trip", "error")
+
+# Trip dates as written by the data validator (MM/DD/YY), plus 4-digit years
+TRIP_DATE_FORMATS = ["%m/%d/%y", "%m/%d/%Y", "%Y-%m-%d"]
+
+# Packets numbered by position among the exported packets, for page-number fallbacks
+_EXPORTED_PACKETS = """
+WITH exported AS (
+    SELECT *, ROW_NUMBER() OVER (ORDER BY position) AS export_index
+    FROM packets
+    WHERE ? OR processing_success = 1
+)
+"""
+
+
+def parse_miles(value) -> Optional[float]:
+    """
+    Parse a miles value such as 2,435 or "2435B" (leading number only)
+
+    Args:
+        value: Extracted or calculated miles
+
+    Returns:
+        Miles as a float, or None if there is no leading number
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+
+    clean_value = str(value).replace(",", "").replace("$", "").replace(" ", "")
+    numeric_part = re.search(r"^[\d.]+", clean_value.strip())
+    try:
+        return float(numeric_part.group()) if numeric_part else None
+    except ValueError:
+        return None
+
+
+def parse_trip_date(value) -> Optional[str]:
+    """
+    Parse a trip date into ISO format (YYYY-MM-DD) for range queries
+
+    Args:
+        value: Date as extracted (MM/DD/YY after validation)
+
+    Returns:
+        ISO date string, or None if the date cannot be parsed
+    """
+    if not value or not isinstance(value, str):
+        return None
+    for date_format in TRIP_DATE_FORMATS:
+        try:
+            return datetime.strptime(value.strip(), date_format).date().isoformat()
+        except ValueError:
+            continue
+    return None
+
+
+def page_number_from_name(source_image: str) -> Optional[int]:
+    """
+    Get the envelope page number from an image filename
+
+    Args:
+        source_image: File name such as "Page_8.jpg", "Page 8.jpg" or "scan8.jpg"
+
+    Returns:
+        Page number ("Page N" first, else the first number), or None
+    """
+    page_match = re.search(r"[Pp]age[_\s]*(\d+)", source_image or "")
+    if not page_match:
+        # Try to find any number in the filename as fallback
+        page_match = re.search(r"(\d+)", source_image or "")
+    return int(page_match.group(1)) if page_match else None
+
+
+def _text(value) -> Optional[str]:
+    """Store a scalar field as text (None stays NULL)"""
+    if value is None:
+        return None
+    if isinstance(value, list):
+        return ", ".join(str(item) for item in value)
+    return str(value)
+
+
+class ResultsStore:
+    """
+    SQLite store of flattened processing results
+
+    Packets are keyed by their position in the loaded result list, so
+    queries return packets in the same order as the list.
+    """
+
+    def __init__(self, db_path: str = ":memory:"):
+        """
+        Initialize the results store
+
+        Args:
+            db_path: SQLite database file, or ":memory:" for a private
+                     in-memory store
+        """
+        self.logger = get_logger()
+        self.db_path = db_path
+        # Streamlit reruns a session's script on different threads
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript(SCHEMA)
+
+    @classmethod
+    def from_results(
+        cls, results: List[Dict], edited_sources: Optional[Iterable[str]] = None
+    ) -> "ResultsStore":
+        """
+        Create an in-memory store holding the given results
+
+        Args:
+            results: List of processing results
+            edited_sources: Source images of results with user edits
+
+        Returns:
+            Loaded results store
+        """
+        store = cls()
+        store.load_results(results, edited_sources)
+        return store
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    def load_results(
+        self, results: Iterable[Dict], edited_sources: Optional[Iterable[str]] = None
+    ) -> int:
+        """
+        Replace the stored results
+
+        Args:
+            results: Processing results, in display order (with edits applied)
+            edited_sources: Source images of results with user edits
+
+        Returns:
+            Number of packets stored
+        """
+        edited_sources = set(edited_sources or ())
+        packets, legs, state_mileage, fuel = [], [], [], []
+        for position, result in enumerate(results):
+            packet, packet_legs, packet_states, packet_fuel = self._flatten(
+                position, result, result.get("source_image", "") in edited_sources
+            )
+            packets.append(packet)
+            legs.extend(packet_legs)
+            state_mileage.extend(packet_states)
+            fuel.extend(packet_fuel)
+
+        with self._lock, self._conn:
+            for table in ("fuel", "state_mileage", "legs", "packets"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.executemany(
+                "INSERT INTO packets VALUES "
+                "(?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                packets,
+            )
+            self._conn.executemany(
+                "INSERT INTO legs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", legs
+            )
+            self._conn.executemany(
+                "INSERT INTO state_mileage VALUES (?, ?, ?, ?, ?)", state_mileage
+            )
+            self._conn.executemany("INSERT INTO fuel VALUES (?, ?, ?, ?)", fuel)
+
+        self.logger.debug(
+            f"Results store loaded: {len(packets)} packets, {len(legs)} legs, "
+            f"{len(state_mileage)} state rows, {len(fuel)} fuel rows"
+        )
+        return len(packets)
+
+    @staticmethod
+    def _flatten(position: int, result: Dict, edited: bool = False):
+        """Split one result into its packet, leg, state mileage and fuel rows"""
+        distance_data = result.get("distance_calculations")
+        if not isinstance(distance_data, dict):
+            distance_data = {}
+        coordinates = result.get("coordinates")
+        if not isinstance(coordinates, dict):
+            coordinates = {}
+        reference = result.get("reference_validation")
+        if not isinstance(reference, dict):
+            reference = {}
+        success = bool(result.get("processing_success"))
+
+        packet = (
+            position,
+            result.get("source_image", ""),
+            result.get("format_type"),
+            int(success),
+            int(bool(result.get("is_duplicate"))),
+            _text(result.get("drivers_name")),
+            _text(result.get("unit")),
+            _text(result.get("trailer")),
+            _text(result.get("trip")),
+            parse_trip_date(result.get("date_trip_started")),
+            page_number_from_name(result.get("source_image", "")),
+            parse_miles(result.get("total_miles")),
+            parse_miles(distance_data.get("total_distance_miles")),
+            int(bool(distance_data.get("calculation_success"))),
+            (coordinates.get("geocoding_summary") or {}).get("successful_geocoding", 0),
+            int(bool(reference.get("reference_found"))),
+            len(result.get("validation_warnings") or []),
+            None if success else _text(result.get("error", "Unknown error")),
+            int(edited),
+        )
+
+        legs = [
+            (
+                position,
+                leg.get("leg_number"),
+                (leg.get("origin") or {}).get("location"),
+                (leg.get("origin") or {}).get("state"),
+                (leg.get("destination") or {}).get("location"),
+                (leg.get("destination") or {}).get("state"),
+                leg.get("distance_miles"),
+                leg.get("api_used"),
+                int(bool(leg.get("route_analysis_used"))),
+                int(bool(leg.get("calculation_failed"))),
+            )
+            for leg in distance_data.get("legs") or []
+        ]
+
+        # Trip state mileage, or the packet-level list of CSV-based results
+        states = distance_data.get("state_mileage") or result.get("state_mileage") or []
+        state_mileage = [
+            (
+                position,
+                seq,
+                item.get("state", ""),
+                parse_miles(item.get("miles")) or 0,
+                item.get("percentage"),
+            )
+            for seq, item in enumerate(states)
+        ]
+
+        fuel = [
+            (position, seq, state, gallons)
+            for seq, (state, gallons) in enumerate(
+                (result.get("fuel_by_state") or {}).items()
+            )
+        ]
+
+        return packet, legs, state_mileage, fuel
+
+    def _query(self, sql: str, params: Iterable = ()) -> List[Dict]:
+        """Run a query and return its rows as dictionaries"""
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, tuple(params))]
+
+    @staticmethod
+    def _packet_filters(
+        drivers_name: Optional[str] = None,
+        unit: Optional[str] = None,
+        trailer: Optional[str] = None,
+        trip: Optional[str] = None,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None,
+        successful_only: bool = False,
+        format_prefix: Optional[str] = None,
+        search: Optional[str] = None,
+        with_warnings_only: bool = False,
+        edited_only: bool = False,
+    ):
+        """Build the WHERE clause and parameters for packet filters"""
+        clauses, params = [], []
+        for column, value in (
+            ("drivers_name", drivers_name),
+            ("unit", unit),
+            ("trailer", trailer),
+            ("trip", trip),
+        ):
+            if value:
+                clauses.append(f"p.{column} = ?")
+                params.append(value.strip())
+        if date_from:
+            clauses.append("p.trip_date >= ?")
+            params.append(date_from)
+        if date_to:
+            clauses.append("p.trip_date <= ?")
+            params.append(date_to)
+        if successful_only:
+            clauses.append("p.processing_success = 1")
+        if format_prefix:
+            clauses.append("p.format_type LIKE ? || '%'")
+            params.append(format_prefix)
+        if with_warnings_only:
+            clauses.append("p.warning_count > 0")
+        if edited_only:
+            clauses.append("p.edited = 1")
+        search = (search or "").strip()
+        if search:
+            pattern = "%" + re.sub(r"([\\%_])", r"\\\1", search) + "%"
+            clauses.append(
+                "("
+                + " OR ".join(
+                    f"p.{column} LIKE ? ESCAPE '\\'" for column in SEARCH_COLUMNS
+                )
+                + ")"
+            )
+            params.extend([pattern] * len(SEARCH_COLUMNS))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        return where, params
+
+    def query_packets(
+        self, limit: Optional[int] = None, offset: int = 0, **filters
+    ) -> List[Dict]:
+        """
+        Get packets matching exact driver/unit/trailer/trip values, a date
+        range, a text search and status flags
+
+        Args:
+            limit: Maximum packets returned (None for all)
+            offset: Matching packets skipped before the first one returned
+            **filters: drivers_name, unit, trailer, trip (case-insensitive),
+                       date_from, date_to (ISO dates, inclusive),
+                       successful_only, format_prefix, search (case-insensitive
+                       substring of source image, driver, unit, trip or error),
+                       with_warnings_only, edited_only
+
+        Returns:
+            Packet rows in result order
+        """
+        where, params = self._packet_filters(**filters)
+        sql = f"SELECT p.* FROM packets p {where} ORDER BY p.position"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params += [limit, offset]
+        return self._query(sql, params)
+
+    def count_packets(self, **filters) -> int:
+        """
+        Count packets matching the given filters
+
+        Args:
+            **filters: Packet filters, as for query_packets
+
+        Returns:
+            Number of matching packets
+        """
+        where, params = self._packet_filters(**filters)
+        return self._query(
+            f"SELECT COUNT(*) AS packets FROM packets p {where}", params
+        )[0]["packets"]
+
+    def state_mileage_totals(self, **filters) -> List[Dict]:
+        """
+        Total miles per state over the matching successful packets
+
+        Args:
+            **filters: Packet filters, as for query_packets
+
+        Returns:
+            Rows with state, miles and packets, most miles first
+        """
+        filters["successful_only"] = True
+        where, params = self._packet_filters(**filters)
+        return self._query(
+            f"""
+            SELECT s.state, SUM(s.miles) AS miles, COUNT(DISTINCT s.position) AS packets
+            FROM state_mileage s JOIN packets p ON p.position = s.position
+            {where}
+            GROUP BY s.state
+            ORDER BY miles DESC
+            """,
+            params,
+        )
+
+    def get_summary(self) -> Dict:
+        """
+        Get summary counts and totals over all stored packets
+
+        Returns:
+            Dictionary with total, successful, failed, duplicates,
+            extracted_miles and calculated_miles (successful packets),
+            distance_successes, geocoding_successes, reference_validations,
+            validation_warnings, here_api_packets, route_analysis_packets
+            and unique_states
+        """
+        summary = self._query("""
+            SELECT
+                COUNT(*) AS total,
+                COALESCE(SUM(processing_success), 0) AS successful,
+                COALESCE(SUM(is_duplicate), 0) AS duplicates,
+                COALESCE(SUM(CASE WHEN processing_success = 1
+                    THEN extracted_miles END), 0) AS extracted_miles,
+                COALESCE(SUM(CASE WHEN processing_success = 1
+                    THEN calculated_miles END), 0) AS calculated_miles,
+                COALESCE(SUM(processing_success AND distance_success), 0)
+                    AS distance_successes,
+                COALESCE(SUM(processing_success AND geocoded_stops > 0), 0)
+                    AS geocoding_successes,
+                COALESCE(SUM(processing_success AND reference_found), 0)
+                    AS reference_validations,
+                COALESCE(SUM(CASE WHEN processing_success = 1
+                    THEN warning_count END), 0) AS validation_warnings
+            FROM packets
+            """)[0]
+        summary["failed"] = summary["total"] - summary["successful"]
+
+        summary.update(self._query("""
+            SELECT
+                COUNT(DISTINCT CASE WHEN l.api_used = 'HERE'
+                    THEN l.position END) AS here_api_packets,
+                COUNT(DISTINCT CASE WHEN l.route_analysis_used = 1
+                    THEN l.position END) AS route_analysis_packets
+            FROM legs l JOIN packets p ON p.position = l.position
+            WHERE p.processing_success = 1
+            """)[0])
+
+        summary["unique_states"] = self._query("""
+            SELECT COUNT(DISTINCT s.state) AS states
+            FROM state_mileage s JOIN packets p ON p.position = s.position
+            WHERE p.processing_success = 1 AND p.distance_success = 1
+            """)[0]["states"]
+
+        return summary
+
+    def error_counts(self) -> Dict[str, int]:
+        """
+        Count failed packets by error message
+
+        Returns:
+            Dictionary mapping error messages to packet counts
+        """
+        rows = self._query("""
+            SELECT error, COUNT(*) AS packets FROM packets
+            WHERE processing_success = 0
+            GROUP BY error ORDER BY MIN(position)
+            """)
+        return {row["error"]: row["packets"] for row in rows}
+
+    def state_mileage_rows(self, include_failed: bool = True) -> List[Dict]:
+        """
+        Get state mileage per successful packet, for distance exports
+
+        Args:
+            include_failed: Whether failed packets count towards export_index
+                            (they never produce rows)
+
+        Returns:
+            Rows with export_index (1-based position among exported packets),
+            page_number, unit, trailer, state and miles, in packet and state
+            order; packets without state mileage give one row with state None
+        """
+        return self._query(
+            _EXPORTED_PACKETS + """
+            SELECT e.export_index, e.page_number, e.unit, e.trailer, s.state, s.miles
+            FROM exported e LEFT JOIN state_mileage s ON s.position = e.position
+            WHERE e.processing_success = 1
+            ORDER BY e.position, s.seq
+            """,
+            (int(include_failed),),
+        )
+
+    def fuel_rows(self, include_failed: bool = True) -> List[Dict]:
+        """
+        Get gallons per state per successful packet, for fuel exports
+
+        Args:
+            include_failed: Whether failed packets count towards export_index
+
+        Returns:
+            Rows with export_index, page_number, unit, state and gallons,
+            in packet and purchase order
+        """
+        return self._query(
+            _EXPORTED_PACKETS + """
+            SELECT e.export_index, e.page_number, e.unit, f.state, f.gallons
+            FROM exported e JOIN fuel f ON f.position = e.position
+            WHERE e.processing_success = 1
+            ORDER BY e.position, f.seq
+            """,
+            (int(include_failed),),
+        )
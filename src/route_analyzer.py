@@ -5,12 +5,20 @@ Handles route distance calculations and trip analysis using HERE API
 """
 
 import os
-import math
+import threading
 import requests
 from typing import Dict, List, Optional, Tuple
 
+import numpy as np
+
 from .logging_utils import get_logger
 from .config import config
+from .distance_utils import great_circle_distances
+from .local_router import LocalRouter
+
+# Road graphs shared by all analyzers, keyed by graph path
+_SHARED_ROUTERS: Dict[str, LocalRouter] = {}
+_ROUTERS_LOCK = threading.Lock()
 
 
 class RouteAnalyzer:
@@ -18,18 +26,36 @@ class RouteAnalyzer:
     Analyze routes and calculate distances between coordinates using HERE API
     """
 
-    def __init__(self, here_api_key: Optional[str] = None):
+    def __init__(
+        self,
+        here_api_key: Optional[str] = None,
+        http_client=None,
+        local_router: Optional[LocalRouter] = None,
+    ):
         """
         Initialize the route analyzer
 
         Args:
             here_api_key: HERE API key (if not provided, will use config.HERE_API_KEY)
+            http_client: Object with a requests-compatible get() (defaults to
+                         the requests module; see replay.ReplayHttpClient)
+            local_router: Offline router (if not provided, loaded from
+                          config.LOCAL_ROAD_GRAPH_PATH when the file exists)
         """
         self.logger = get_logger()
         self.here_api_key = here_api_key or config.HERE_API_KEY
+        self.http = http_client or requests
+        self.routing_backend = config.ROUTING_BACKEND
+        self.local_router = local_router or self._load_local_router()
 
-        if self.here_api_key:
+        if self.routing_backend == "local" and self.local_router:
+            self.logger.info("Local road graph configured for route analysis")
+        elif self.here_api_key:
             self.logger.info("HERE API key configured for route analysis")
+        elif self.local_router:
+            self.logger.info(
+                "HERE API key not available - distance calculations will use the local road graph"
+            )
         else:
             self.logger.warning(
                 "HERE API key not available - distance calculations will use great circle approximation"
@@ -50,9 +76,20 @@ class RouteAnalyzer:
         Returns:
             Dictionary with distance, polyline, and route information, or None if failed
         """
-        if not self.here_api_key:
+        if self.local_router and (
+            self.routing_backend == "local" or not self.here_api_key
+        ):
+            if not origin_coords or not destination_coords:
+                return None
+            local_result = self._calculate_local_route(
+                origin_coords, destination_coords
+            )
+            if local_result:
+                return local_result
+
+        if not self.here_api_key or self.routing_backend == "local":
             self.logger.warning(
-                "HERE API key not configured - using great circle distance"
+                "No HERE API key or local route available - using great circle distance"
             )
             distance_miles = self.estimate_great_circle_distance(
                 origin_coords, destination_coords
@@ -82,7 +119,7 @@ class RouteAnalyzer:
                 f"HERE API routing: {origin_coords} → {destination_coords}"
             )
 
-            response = requests.get(url, params=params, timeout=config.ROUTING_TIMEOUT)
+            response = self.http.get(url, params=params, timeout=config.ROUTING_TIMEOUT)
             self.logger.debug(f"HERE API response status: {response.status_code}")
 
             response.raise_for_status()
@@ -149,7 +186,14 @@ class RouteAnalyzer:
                 except:
                     self.logger.error(f"Response Text: {e.response.text[:200]}")
 
-            # Fallback to great circle distance
+            # Fallback to the local road graph, then great circle distance
+            if self.local_router:
+                local_result = self._calculate_local_route(
+                    origin_coords, destination_coords
+                )
+                if local_result:
+                    return local_result
+
             distance_miles = self.estimate_great_circle_distance(
                 origin_coords, destination_coords
             )
@@ -161,6 +205,41 @@ class RouteAnalyzer:
                 "error": str(e),
             }
 
+    def _load_local_router(self) -> Optional[LocalRouter]:
+        """Load the offline router if the backend allows it and a graph exists"""
+        if self.routing_backend == "here":
+            return None
+        if not os.path.exists(config.LOCAL_ROAD_GRAPH_PATH):
+            return None
+
+        graph_path = os.path.abspath(config.LOCAL_ROAD_GRAPH_PATH)
+        with _ROUTERS_LOCK:
+            if graph_path not in _SHARED_ROUTERS:
+                try:
+                    _SHARED_ROUTERS[graph_path] = LocalRouter(graph_path)
+                except Exception as e:
+                    self.logger.error(f"Failed to load local road graph: {e}")
+                    return None
+            return _SHARED_ROUTERS[graph_path]
+
+    def _calculate_local_route(
+        self,
+        origin_coords: Tuple[float, float],
+        destination_coords: Tuple[float, float],
+    ) -> Optional[Dict]:
+        """Route over the local road graph, or None if it has no route"""
+        try:
+            result = self.local_router.route(origin_coords, destination_coords)
+        except Exception as e:
+            self.logger.error(f"Local route calculation failed: {e}")
+            return None
+
+        if result:
+            self.logger.info(
+                f"Local route calculated: {result['distance_miles']:.1f} miles"
+            )
+        return result
+
     def estimate_great_circle_distance(
         self, coords1: Tuple[float, float], coords2: Tuple[float, float]
     ) -> float:
@@ -174,47 +253,57 @@ class RouteAnalyzer:
         Returns:
             Distance in miles
         """
-        if not coords1 or not coords2:
-            return 0.0
+        return self.estimate_great_circle_distances([coords1], [coords2])[0]
 
-        try:
-            lat1, lon1 = coords1
-            lat2, lon2 = coords2
+    def estimate_great_circle_distances(
+        self,
+        origins: List[Tuple[float, float]],
+        destinations: List[Tuple[float, float]],
+    ) -> List[float]:
+        """
+        Estimate distances for many coordinate pairs in one vectorized call
 
-            # Convert to radians
-            lat1, lon1, lat2, lon2 = map(math.radians, [lat1, lon1, lat2, lon2])
+        Args:
+            origins: (latitude, longitude) of each origin
+            destinations: (latitude, longitude) of each destination
 
-            # Haversine formula
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
+        Returns:
+            Distance in miles for each pair (0.0 where a coordinate is missing)
+        """
+        distances = [0.0] * len(origins)
+        valid = [i for i, (a, b) in enumerate(zip(origins, destinations)) if a and b]
+        if not valid:
+            return distances
 
-            a = (
-                math.sin(dlat / 2) ** 2
-                + math.cos(lat1) * math.cos(lat2) * math.sin(dlon / 2) ** 2
+        try:
+            miles = great_circle_distances(
+                [origins[i] for i in valid],
+                [destinations[i] for i in valid],
+                radius=config.GREAT_CIRCLE_EARTH_RADIUS_MILES,
             )
-            c = 2 * math.asin(math.sqrt(a))
-
-            # Earth radius in miles (from config)
-            r = config.GREAT_CIRCLE_EARTH_RADIUS_MILES
-
-            # Calculate distance
-            distance = c * r
-
-            return round(distance, 1)
-
         except Exception as e:
             self.logger.error(f"Distance estimation failed: {e}")
-            return 0.0
+            return distances
+
+        for i, value in zip(valid, np.round(miles, 1).tolist()):
+            distances[i] = value
+        return distances
 
-    def calculate_trip_distances(self, coordinates_data: Dict) -> Dict:
+    def calculate_trip_distances(
+        self, coordinates_data: Dict, previous_legs: Optional[List[Dict]] = None
+    ) -> Dict:
         """
         Calculate distances for all legs of a trip using coordinates
 
         Args:
             coordinates_data: Dictionary with coordinate information from geocoding service
+            previous_legs: Legs from an earlier calculation; a leg between the
+                           same origin and destination coordinates is reused
+                           instead of routed again (failed legs are retried)
 
         Returns:
-            Dictionary with distance calculations for each leg
+            Dictionary with distance calculations for each leg (with
+            reused_legs and rerouted_legs counts when previous_legs is given)
         """
         try:
             if not coordinates_data:
@@ -295,10 +384,28 @@ class RouteAnalyzer:
                 f"Found {len(valid_stops)} valid stops for distance calculation"
             )
 
+            # Routes of earlier legs, keyed by their endpoint coordinates
+            known_routes = {}
+            for leg in previous_legs or []:
+                if leg.get("calculation_failed") or "distance_miles" not in leg:
+                    continue
+                try:
+                    endpoints = (
+                        tuple(leg["origin"]["coordinates"]),
+                        tuple(leg["destination"]["coordinates"]),
+                    )
+                except (KeyError, TypeError):
+                    continue
+                known_routes[endpoints] = {
+                    "distance_miles": leg["distance_miles"],
+                    "api_used": leg.get("api_used"),
+                    "polyline": leg.get("polyline"),
+                }
+            reused_legs = 0
+
             # Calculate distances for each leg
             legs = []
             total_distance = 0
-            trip_polylines: List[str] = []  # Collect all polylines across legs
 
             for i in range(len(valid_stops) - 1):
                 origin = valid_stops[i]
@@ -308,10 +415,17 @@ class RouteAnalyzer:
                     f"Calculating leg {i+1}: {origin['location']} → {destination['location']}"
                 )
 
-                # Calculate distance using HERE API or fallback
-                distance_info = self.calculate_route_distance(
-                    origin["coordinates"], destination["coordinates"]
+                # Reuse the route of an unchanged leg, otherwise calculate
+                # distance using HERE API or fallback
+                distance_info = known_routes.get(
+                    (tuple(origin["coordinates"]), tuple(destination["coordinates"]))
                 )
+                if distance_info:
+                    reused_legs += 1
+                else:
+                    distance_info = self.calculate_route_distance(
+                        origin["coordinates"], destination["coordinates"]
+                    )
 
                 leg_data = {
                     "leg_number": i + 1,
@@ -335,12 +449,12 @@ class RouteAnalyzer:
                     distance_miles = distance_info["distance_miles"]
                     total_distance += distance_miles
 
-                    # Collect polylines for trip-level analysis
+                    # Polylines are kept on the leg only (results are held in
+                    # session state and exported), so state mileage is computed
+                    # and cached per leg
                     polyline_value = distance_info.get("polyline")
-                    if isinstance(polyline_value, list):
-                        trip_polylines.extend([pl for pl in polyline_value if pl])
-                    elif isinstance(polyline_value, str) and polyline_value:
-                        trip_polylines.append(polyline_value)
+                    if polyline_value:
+                        leg_data["polyline"] = polyline_value
 
                     self.logger.info(f"Leg {i+1}: {distance_miles} miles")
                 else:
@@ -367,8 +481,10 @@ class RouteAnalyzer:
                 "successful_calculations": successful_legs,
                 "total_distance_miles": round(total_distance, 1),
                 "calculation_success": calculation_success,
-                "trip_polylines": trip_polylines,  # For state analyzer
             }
+            if previous_legs is not None:
+                result["reused_legs"] = reused_legs
+                result["rerouted_legs"] = len(legs) - reused_legs
 
             # Add error information if all calculations failed
             if successful_legs == 0:
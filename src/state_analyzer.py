@@ -4,14 +4,20 @@ State analyzer module
 Handles state-based route analysis and mileage distribution calculations
 """
 
+import hashlib
+import json
 import os
+import threading
 import time
+import numpy as np
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
 
 # Optional GIS dependencies for enhanced route analysis
 try:
     import geopandas as gpd
+    import shapely
     import shapely.geometry as geom
     from shapely.geometry import LineString, Point
     import flexpolyline
@@ -41,6 +47,12 @@ except ImportError:
 from .logging_utils import get_logger
 from .geocoding_service import GeocodingService
 from .config import config
+from .polyline_utils import decode_polyline_array, project_coordinates
+from .state_workers import FORKSERVER_AVAILABLE, StateAnalysisPool
+
+# Projected state boundaries shared by all analyzers, keyed by shapefile path
+_SHARED_BOUNDARIES: Dict[str, object] = {}
+_BOUNDARIES_LOCK = threading.Lock()
 
 
 class StateAnalyzer:
@@ -48,6 +60,58 @@ class StateAnalyzer:
     Analyze routes to determine state-by-state mileage distribution
     """
 
+    # Contiguous US states counted for IFTA mileage
+    CONTIGUOUS_STATES = {
+        "AL",
+        "AZ",
+        "AR",
+        "CA",
+        "CO",
+        "CT",
+        "DE",
+        "FL",
+        "GA",
+        "ID",
+        "IL",
+        "IN",
+        "IA",
+        "KS",
+        "KY",
+        "LA",
+        "ME",
+        "MD",
+        "MA",
+        "MI",
+        "MN",
+        "MS",
+        "MO",
+        "MT",
+        "NE",
+        "NV",
+        "NH",
+        "NJ",
+        "NM",
+        "NY",
+        "NC",
+        "ND",
+        "OH",
+        "OK",
+        "OR",
+        "PA",
+        "RI",
+        "SC",
+        "SD",
+        "TN",
+        "TX",
+        "UT",
+        "VT",
+        "VA",
+        "WA",
+        "WV",
+        "WI",
+        "WY",
+    }
+
     def __init__(self, geocoding_service: Optional[GeocodingService] = None):
         """
         Initialize the state analyzer
@@ -58,6 +122,16 @@ class StateAnalyzer:
         self.logger = get_logger()
         self.geocoding_service = geocoding_service
         self._state_boundaries = None
+        self._worker_pool = None
+        # Trips on several threads may ask for the pool at the same time
+        self._worker_pool_lock = threading.Lock()
+
+        # Route meters per state for each leg, keyed by polyline content (LRU)
+        self.leg_state_cache: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self.leg_cache_hits = 0
+        self.leg_cache_misses = 0
+        # Guards the leg cache when trips are processed on several threads
+        self._cache_lock = threading.Lock()
 
         if GIS_AVAILABLE:
             self.logger.info(
@@ -77,10 +151,31 @@ class StateAnalyzer:
             return None
 
         if self._state_boundaries is None:
-            self.logger.info("Loading state boundary data...")
+            self._state_boundaries = self._load_shared_boundaries(
+                Path(config.STATE_SHAPEFILE_PATH)
+            )
+
+        return self._state_boundaries
 
-            # Path to state shapefile (from config)
-            state_shp = Path(config.STATE_SHAPEFILE_PATH)
+    def _load_shared_boundaries(self, state_shp: Path):
+        """
+        Load projected state boundaries once per process and shapefile
+
+        Every analyzer (and every processor sharing this process) reuses the
+        same GeoDataFrame, which is only read from here.
+
+        Args:
+            state_shp: Path to the state shapefile
+
+        Returns:
+            GeoDataFrame of state boundaries in EPSG:5070, or None on failure
+        """
+        cache_key = str(state_shp.resolve())
+        with _BOUNDARIES_LOCK:
+            if cache_key in _SHARED_BOUNDARIES:
+                return _SHARED_BOUNDARIES[cache_key]
+
+            self.logger.info("Loading state boundary data...")
 
             if not state_shp.exists():
                 self.logger.error(f"State shapefile not found: {state_shp}")
@@ -89,21 +184,22 @@ class StateAnalyzer:
             try:
                 # Load state boundaries and project to appropriate CRS
                 states = gpd.read_file(state_shp)[["STUSPS", "geometry"]]
-                self._state_boundaries = states.to_crs(
-                    epsg=5070
-                )  # NAD83/USA Contiguous
+                boundaries = states.to_crs(epsg=5070)  # NAD83/USA Contiguous
 
-                self.logger.info(
-                    f"Loaded {len(self._state_boundaries)} state boundaries"
-                )
+                self.logger.info(f"Loaded {len(boundaries)} state boundaries")
             except Exception as e:
                 self.logger.error(f"Error loading state boundaries: {e}")
                 return None
 
-        return self._state_boundaries
+            _SHARED_BOUNDARIES[cache_key] = boundaries
+            return boundaries
 
     def calculate_state_miles_from_polyline(
-        self, polyline_str, total_distance_miles: float
+        self,
+        polyline_str,
+        total_distance_miles: float,
+        engine: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
     ) -> Dict[str, float]:
         """
         Calculate miles driven in each state using HERE polyline and state boundary intersection
@@ -111,6 +207,12 @@ class StateAnalyzer:
         Args:
             polyline_str: HERE API polyline string(s)
             total_distance_miles: Total distance of the route
+            engine: "intersection" (polygon intersection) or "vertex" (vertex
+                    classification with border bisection); defaults to
+                    config.STATE_MILEAGE_ENGINE
+            simplify_tolerance: Douglas-Peucker tolerance in meters applied to
+                                the projected route (0 disables); defaults to
+                                config.ROUTE_SIMPLIFY_TOLERANCE_METERS
 
         Returns:
             Dictionary mapping state abbreviations to miles driven
@@ -121,10 +223,6 @@ class StateAnalyzer:
             )
             return {}
 
-        if not flexpolyline:
-            self.logger.warning("flexpolyline not available - cannot decode polyline")
-            return {}
-
         try:
             if not polyline_str:
                 self.logger.warning("No polyline data available")
@@ -144,147 +242,47 @@ class StateAnalyzer:
                 polyline_str if isinstance(polyline_str, list) else [polyline_str]
             )
 
-            combined_line_geoms = []
+            # Decode and project each route section
+            segments = []
             total_points = 0
             for pl in polylines:
                 if not pl:
                     continue
-                # Decode HERE's flexible polyline
+                # Decode HERE's flexible polyline straight into a [lat, lng] array
                 self.logger.debug(f"Decoding HERE polyline segment ({len(pl)} chars)")
-                decoded_coords = flexpolyline.decode(pl)
+                decoded_coords = decode_polyline_array(pl)
                 total_points += len(decoded_coords)
-                if not decoded_coords or len(decoded_coords) < 2:
+                if len(decoded_coords) < 2:
                     continue
-                # HERE flexpolyline returns [lat, lng, elevation] tuples
-                # Convert to [(lng, lat)] for shapely (note: reversed order)
-                line_coords = [(coord[1], coord[0]) for coord in decoded_coords]
-                # Create route line geometry per segment
-                combined_line_geoms.append(LineString(line_coords))
+                # Project to the state boundaries CRS in one vectorized call
+                x, y = project_coordinates(decoded_coords, states_gdf.crs.srs)
+                segments.append(np.column_stack((x, y)))
 
-            if not combined_line_geoms:
+            if not segments:
                 self.logger.warning("No valid decoded polyline segments")
                 return {}
 
-            # Merge segments into a single multilinestring/linestring
-            route_line = (
-                combined_line_geoms[0]
-                if len(combined_line_geoms) == 1
-                else geom.MultiLineString(combined_line_geoms)
-            )
             self.logger.info(
-                f"Created route geometry from {len(combined_line_geoms)} segment(s), {total_points} points total"
+                f"Created route geometry from {len(segments)} segment(s), {total_points} points total"
             )
 
-            # Convert to GeoDataFrame with WGS84 CRS
-            route_gdf = gpd.GeoDataFrame([1], geometry=[route_line], crs="EPSG:4326")
-
-            # Reproject to match state boundaries CRS
-            route_projected = route_gdf.to_crs(states_gdf.crs)
-            self.logger.debug("Route reprojected to match state boundaries")
-
-            # Find intersections with state boundaries
-            state_miles = {}
-            total_route_length_meters = 0
-
-            for idx, state_row in states_gdf.iterrows():
-                try:
-                    intersection = route_projected.iloc[0].geometry.intersection(
-                        state_row.geometry
-                    )
-
-                    if not intersection.is_empty:
-                        # Calculate length of intersection
-                        if hasattr(intersection, "length"):
-                            length_meters = intersection.length
-                        else:
-                            # Handle multipart geometries
-                            length_meters = sum(
-                                geom.length
-                                for geom in intersection.geoms
-                                if hasattr(geom, "length")
-                            )
-
-                        if length_meters > 0:
-                            total_route_length_meters += length_meters
-                            state_abbr = state_row["STUSPS"]
-                            state_miles[state_abbr] = (
-                                length_meters / 1609.34
-                            )  # Convert to miles
-
-                except Exception as state_error:
-                    continue
-
-            # Scale the calculated miles to match the actual route distance
-            if state_miles and total_route_length_meters > 0:
-                calculated_total_miles = sum(state_miles.values())
-                if calculated_total_miles > 0:
-                    scale_factor = total_distance_miles / calculated_total_miles
-                    for state in state_miles:
-                        state_miles[state] = round(state_miles[state] * scale_factor, 1)
+            if simplify_tolerance is None:
+                simplify_tolerance = config.ROUTE_SIMPLIFY_TOLERANCE_METERS
+            if simplify_tolerance > 0:
+                segments = [
+                    self._simplify_segment(xy, simplify_tolerance) for xy in segments
+                ]
+                self.logger.debug(
+                    f"Simplified route to {sum(len(xy) for xy in segments)} points "
+                    f"(tolerance {simplify_tolerance}m)"
+                )
 
-            # Filter out very small segments (using config threshold)
-            state_miles = {
-                state: miles
-                for state, miles in state_miles.items()
-                if miles >= config.MIN_STATE_MILES_THRESHOLD
-            }
+            if (engine or config.STATE_MILEAGE_ENGINE) == "vertex":
+                state_meters = self._state_meters_by_vertices(segments, states_gdf)
+            else:
+                state_meters = self._state_meters_by_intersection(segments, states_gdf)
 
-            # Keep only contiguous US states to reduce noise
-            contiguous_states = {
-                "AL",
-                "AZ",
-                "AR",
-                "CA",
-                "CO",
-                "CT",
-                "DE",
-                "FL",
-                "GA",
-                "ID",
-                "IL",
-                "IN",
-                "IA",
-                "KS",
-                "KY",
-                "LA",
-                "ME",
-                "MD",
-                "MA",
-                "MI",
-                "MN",
-                "MS",
-                "MO",
-                "MT",
-                "NE",
-                "NV",
-                "NH",
-                "NJ",
-                "NM",
-                "NY",
-                "NC",
-                "ND",
-                "OH",
-                "OK",
-                "OR",
-                "PA",
-                "RI",
-                "SC",
-                "SD",
-                "TN",
-                "TX",
-                "UT",
-                "VT",
-                "VA",
-                "WA",
-                "WV",
-                "WI",
-                "WY",
-            }
-            state_miles = {
-                state: miles
-                for state, miles in state_miles.items()
-                if state in contiguous_states
-            }
+            state_miles = self._finalize_state_miles(state_meters, total_distance_miles)
 
             self.logger.info(f"State miles calculated: {len(state_miles)} states")
             for state, miles in state_miles.items():
@@ -296,6 +294,528 @@ class StateAnalyzer:
             self.logger.error(f"Error calculating state miles from polyline: {e}")
             return {}
 
+    def _simplify_segment(self, xy: np.ndarray, tolerance: float) -> np.ndarray:
+        """
+        Simplify a projected route section with Douglas-Peucker
+
+        The simplified line only shortens the measured length slightly; the
+        per-state split is rescaled to the routed distance afterwards.
+
+        Args:
+            xy: Projected (n, 2) coordinate array
+            tolerance: Maximum deviation from the original line in meters
+
+        Returns:
+            Simplified (m, 2) coordinate array (endpoints preserved)
+        """
+        simplified = shapely.simplify(
+            LineString(xy), tolerance, preserve_topology=False
+        )
+        return shapely.get_coordinates(simplified)
+
+    def calculate_state_miles_batch(
+        self,
+        polylines: List,
+        total_distances_miles: List[float],
+        engine: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
+    ) -> List[Dict[str, float]]:
+        """
+        Calculate state miles for many routes at once
+
+        All routes are decoded, projected in a single call and intersected with
+        the state boundaries in one spatial index query, so projection and
+        index costs are shared across the batch.
+
+        Args:
+            polylines: One entry per route, each a HERE polyline string or a
+                       list of section polyline strings (empty for no route)
+            total_distances_miles: Total distance of each route
+            engine: "intersection" or "vertex"; defaults to config.STATE_MILEAGE_ENGINE
+            simplify_tolerance: Douglas-Peucker tolerance in meters; defaults
+                                to config.ROUTE_SIMPLIFY_TOLERANCE_METERS
+
+        Returns:
+            List of dictionaries mapping state abbreviations to miles, in input
+            order (empty for routes that could not be analyzed)
+        """
+        if len(polylines) != len(total_distances_miles):
+            raise ValueError(
+                "polylines and total_distances_miles must be the same length"
+            )
+
+        route_meters = self._state_meters_batch(polylines, engine, simplify_tolerance)
+        results = [
+            (
+                self._finalize_state_miles(state_meters, total_miles)
+                if state_meters
+                else {}
+            )
+            for state_meters, total_miles in zip(route_meters, total_distances_miles)
+        ]
+
+        self.logger.info(
+            f"Batch state miles calculated for "
+            f"{sum(1 for r in results if r)}/{len(polylines)} routes"
+        )
+        return results
+
+    def _state_meters_batch(
+        self,
+        polylines: List,
+        engine: Optional[str] = None,
+        simplify_tolerance: Optional[float] = None,
+    ) -> List[Dict[str, float]]:
+        """
+        Measure route meters per state for many routes (before rescaling)
+
+        Args:
+            polylines: One entry per route, each a polyline string or a list of
+                       section polyline strings
+            engine: "intersection" or "vertex"; defaults to config.STATE_MILEAGE_ENGINE
+            simplify_tolerance: Douglas-Peucker tolerance in meters; defaults
+                                to config.ROUTE_SIMPLIFY_TOLERANCE_METERS
+
+        Returns:
+            List of dictionaries mapping state abbreviations to route meters,
+            in input order (empty for routes that could not be analyzed)
+        """
+        empty = [{} for _ in polylines]
+        if not GIS_AVAILABLE:
+            self.logger.warning(
+                "GIS dependencies not available - cannot perform polyline analysis"
+            )
+            return empty
+
+        try:
+            states_gdf = self.load_state_boundaries()
+            if states_gdf is None:
+                self.logger.warning(
+                    "State boundaries not available - cannot perform intersection"
+                )
+                return empty
+
+            # Decode every section, remembering which route it belongs to
+            decoded, owners = [], []
+            for route_idx, polyline in enumerate(polylines):
+                sections = polyline if isinstance(polyline, list) else [polyline]
+                try:
+                    route_coords = [decode_polyline_array(pl) for pl in sections if pl]
+                except ValueError as e:
+                    self.logger.warning(f"Skipping route {route_idx}: {e}")
+                    continue
+                for coords in route_coords:
+                    if len(coords) >= 2:
+                        decoded.append(coords)
+                        owners.append(route_idx)
+
+            if not decoded:
+                self.logger.warning("No valid decoded polyline segments in batch")
+                return empty
+
+            # Project all routes in one vectorized call
+            x, y = project_coordinates(np.concatenate(decoded), states_gdf.crs.srs)
+            segments = np.split(
+                np.column_stack((x, y)), np.cumsum([len(c) for c in decoded])[:-1]
+            )
+
+            if simplify_tolerance is None:
+                simplify_tolerance = config.ROUTE_SIMPLIFY_TOLERANCE_METERS
+            if simplify_tolerance > 0:
+                segments = [
+                    self._simplify_segment(xy, simplify_tolerance) for xy in segments
+                ]
+
+            owners = np.asarray(owners)
+            engine = engine or config.STATE_MILEAGE_ENGINE
+
+            # Spread larger batches over the GIS worker processes
+            pool = self._get_worker_pool() if len(polylines) > 1 else None
+            if pool is not None:
+                return pool.measure(segments, owners, len(polylines), engine)
+
+            return self._measure_segments(
+                segments, owners, len(polylines), states_gdf, engine
+            )
+
+        except Exception as e:
+            self.logger.error(f"Error calculating batch state miles: {e}")
+            return empty
+
+    def _measure_segments(
+        self,
+        segments: List[np.ndarray],
+        owners: np.ndarray,
+        route_count: int,
+        states_gdf,
+        engine: str,
+    ) -> List[Dict[str, float]]:
+        """
+        Measure route meters per state for projected route sections
+
+        Args:
+            segments: Projected (n, 2) coordinate arrays, one per route section
+            owners: Route index of each section
+            route_count: Number of routes
+            states_gdf: State boundaries in the same projected CRS
+            engine: "intersection" or "vertex"
+
+        Returns:
+            List of dictionaries mapping state abbreviations to route meters
+        """
+        if not segments:
+            return [{} for _ in range(route_count)]
+
+        if engine == "vertex":
+            return [
+                self._state_meters_by_vertices(
+                    [segments[i] for i in np.flatnonzero(owners == route_idx)],
+                    states_gdf,
+                )
+                for route_idx in range(route_count)
+            ]
+        return self._state_meters_by_overlay(segments, owners, route_count, states_gdf)
+
+    def _get_worker_pool(self):
+        """
+        Get the GIS worker pool, starting it on first use
+
+        Returns:
+            StateAnalysisPool, or None when STATE_ANALYSIS_WORKERS <= 1 or
+            forkserver workers are not available on this platform
+        """
+        workers = config.STATE_ANALYSIS_WORKERS
+        if workers == 0:
+            workers = os.cpu_count() or 1
+        if workers <= 1 or not FORKSERVER_AVAILABLE:
+            return None
+
+        with self._worker_pool_lock:
+            if self._worker_pool is None:
+                try:
+                    self._worker_pool = StateAnalysisPool(self, workers)
+                except (RuntimeError, OSError) as e:
+                    self.logger.warning(
+                        f"State analysis workers unavailable, running in-process: {e}"
+                    )
+                    return None
+            return self._worker_pool
+
+    def close_worker_pool(self) -> None:
+        """Stop the GIS worker processes (if started)"""
+        with self._worker_pool_lock:
+            if self._worker_pool is not None:
+                self._worker_pool.close()
+                self._worker_pool = None
+        # Trips on several threads may ask for the pool at the same time
+        self._worker_pool_lock = threading.Lock()
+
+    def calculate_leg_state_meters(self, leg_polylines: List) -> List[Dict[str, float]]:
+        """
+        Measure route meters per state for each trip leg, reusing cached legs
+
+        Legs are keyed by a hash of their polyline content (plus the engine and
+        simplification settings), so recalculating a trip after a one-stop
+        edit only measures the legs whose routes changed.
+
+        Args:
+            leg_polylines: One entry per leg, each a polyline string or a list
+                           of section polyline strings
+
+        Returns:
+            List of dictionaries mapping state abbreviations to route meters,
+            in leg order (empty for legs that could not be analyzed)
+        """
+        engine = config.STATE_MILEAGE_ENGINE
+        tolerance = config.ROUTE_SIMPLIFY_TOLERANCE_METERS
+        keys = [
+            self._leg_cache_key(polyline, engine, tolerance)
+            for polyline in leg_polylines
+        ]
+
+        results: List[Optional[Dict[str, float]]] = [None] * len(leg_polylines)
+        missing = []
+        with self._cache_lock:
+            for leg_idx, key in enumerate(keys):
+                if key in self.leg_state_cache:
+                    self.leg_state_cache.move_to_end(key)
+                    results[leg_idx] = self.leg_state_cache[key]
+                    self.leg_cache_hits += 1
+                else:
+                    missing.append(leg_idx)
+                    self.leg_cache_misses += 1
+
+        if missing:
+            self.logger.debug(
+                f"Measuring state mileage for {len(missing)}/{len(keys)} legs "
+                f"({len(keys) - len(missing)} cached)"
+            )
+            measured = self._state_meters_batch(
+                [leg_polylines[leg_idx] for leg_idx in missing], engine, tolerance
+            )
+            with self._cache_lock:
+                for leg_idx, state_meters in zip(missing, measured):
+                    results[leg_idx] = state_meters
+                    # Failed legs are not cached so they are retried next time
+                    if state_meters:
+                        self.leg_state_cache[keys[leg_idx]] = state_meters
+
+                while len(self.leg_state_cache) > config.STATE_MILEAGE_CACHE_SIZE:
+                    self.leg_state_cache.popitem(last=False)
+
+        # Copies, so callers cannot modify cached entries
+        return [dict(state_meters) for state_meters in results]
+
+    @staticmethod
+    def _leg_cache_key(polyline, engine: str, tolerance: float) -> str:
+        """Build the cache key for a leg from its polyline content and settings"""
+        sections = polyline if isinstance(polyline, list) else [polyline]
+        payload = json.dumps([sections, engine, tolerance])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_cache_stats(self) -> Dict:
+        """
+        Get per-leg state mileage cache statistics
+
+        Returns:
+            Dictionary with cache statistics
+        """
+        lookups = self.leg_cache_hits + self.leg_cache_misses
+        return {
+            "cached_legs": len(self.leg_state_cache),
+            "hits": self.leg_cache_hits,
+            "misses": self.leg_cache_misses,
+            "hit_rate": self.leg_cache_hits / lookups if lookups > 0 else 0,
+        }
+
+    def clear_cache(self) -> None:
+        """Clear the per-leg state mileage cache"""
+        with self._cache_lock:
+            self.leg_state_cache.clear()
+            self.leg_cache_hits = 0
+            self.leg_cache_misses = 0
+        self.logger.info("State mileage cache cleared")
+
+    def _state_meters_by_intersection(
+        self, segments: List[np.ndarray], states_gdf
+    ) -> Dict[str, float]:
+        """
+        Measure route length per state by intersecting the route with each state polygon
+
+        Args:
+            segments: Projected (n, 2) coordinate arrays, one per route section
+            states_gdf: State boundaries in the same projected CRS
+
+        Returns:
+            Dictionary mapping state abbreviations to route meters
+        """
+        owners = np.zeros(len(segments), dtype=np.int64)
+        return self._state_meters_by_overlay(segments, owners, 1, states_gdf)[0]
+
+    def _state_meters_by_overlay(
+        self,
+        segments: List[np.ndarray],
+        owners: np.ndarray,
+        route_count: int,
+        states_gdf,
+    ) -> List[Dict[str, float]]:
+        """
+        Measure route length per state for many routes with one spatial index query
+
+        Only (section, state) pairs whose geometries intersect are clipped, and
+        the clipped lengths are accumulated into a routes x states matrix.
+
+        Args:
+            segments: Projected (n, 2) coordinate arrays, one per route section
+            owners: Route index of each section
+            route_count: Number of routes
+            states_gdf: State boundaries in the same projected CRS
+
+        Returns:
+            List of dictionaries mapping state abbreviations to route meters
+        """
+        lines = shapely.linestrings(
+            np.concatenate(segments),
+            indices=np.repeat(np.arange(len(segments)), [len(xy) for xy in segments]),
+        )
+        state_geoms = np.asarray(states_gdf.geometry.values)
+        line_idx, state_idx = states_gdf.sindex.query(lines, predicate="intersects")
+        lengths = shapely.length(
+            shapely.intersection(lines[line_idx], state_geoms[state_idx])
+        )
+
+        meters = np.zeros((route_count, len(state_geoms)))
+        np.add.at(meters, (owners[line_idx], state_idx), lengths)
+
+        abbreviations = states_gdf["STUSPS"].to_numpy()
+        route_meters = []
+        for row in meters:
+            state_meters = {}
+            for state_idx in np.flatnonzero(row > 0):
+                state = abbreviations[state_idx]
+                state_meters[state] = state_meters.get(state, 0.0) + float(
+                    row[state_idx]
+                )
+            route_meters.append(state_meters)
+        return route_meters
+
+    def _classify_points(self, xy: np.ndarray, states_gdf) -> np.ndarray:
+        """
+        Find the state containing each point with vectorized point-in-polygon tests
+
+        Args:
+            xy: Projected (n, 2) coordinate array
+            states_gdf: State boundaries in the same projected CRS
+
+        Returns:
+            Array of positional state indices (-1 for points outside every state)
+        """
+        labels = np.full(len(xy), -1, dtype=np.int64)
+        if len(xy) == 0:
+            return labels
+
+        # Prepared polygons (prepared once, reused on later calls) tested only
+        # against the points inside each state's bounding box
+        state_geoms = np.asarray(states_gdf.geometry.values)
+        shapely.prepare(state_geoms)
+        x, y = xy[:, 0], xy[:, 1]
+
+        # Reverse order so a point exactly on a border keeps the first state
+        for idx in range(len(state_geoms) - 1, -1, -1):
+            minx, miny, maxx, maxy = state_geoms[idx].bounds
+            candidates = np.flatnonzero(
+                (x >= minx) & (x <= maxx) & (y >= miny) & (y <= maxy)
+            )
+            if candidates.size:
+                hits = shapely.intersects_xy(
+                    state_geoms[idx], x[candidates], y[candidates]
+                )
+                labels[candidates[hits]] = idx
+        return labels
+
+    def _state_meters_by_vertices(
+        self,
+        segments: List[np.ndarray],
+        states_gdf,
+        bisection_iterations: Optional[int] = None,
+    ) -> Dict[str, float]:
+        """
+        Measure route length per state by classifying route vertices
+
+        Every vertex is assigned to a state with a vectorized point-in-polygon
+        query. Route segments whose endpoints share a state count fully toward
+        it; segments that cross a border are bisected to locate the crossing
+        and split between the two states.
+
+        Args:
+            segments: Projected (n, 2) coordinate arrays, one per route section
+            states_gdf: State boundaries in the same projected CRS
+            bisection_iterations: Halvings per border crossing; defaults to
+                                  config.STATE_BORDER_BISECTION_ITERATIONS
+
+        Returns:
+            Dictionary mapping state abbreviations to route meters
+        """
+        if bisection_iterations is None:
+            bisection_iterations = config.STATE_BORDER_BISECTION_ITERATIONS
+
+        abbreviations = states_gdf["STUSPS"].to_numpy()
+        state_geoms = np.asarray(states_gdf.geometry.values)
+        meters = np.zeros(len(abbreviations))
+
+        for xy in segments:
+            labels = self._classify_points(xy, states_gdf)
+            starts, ends = xy[:-1], xy[1:]
+            label_a, label_b = labels[:-1], labels[1:]
+            lengths = np.hypot(*(ends - starts).T)
+
+            # Segments fully inside one state
+            same = (label_a == label_b) & (label_a >= 0)
+            meters += np.bincount(
+                label_a[same], weights=lengths[same], minlength=len(meters)
+            )
+
+            # Segments crossing a border: bisect towards the crossing point
+            crossing = np.flatnonzero(label_a != label_b)
+            if crossing.size == 0:
+                continue
+
+            low, high = starts[crossing].copy(), ends[crossing].copy()
+            low_label = label_a[crossing]
+
+            # Each midpoint only needs testing against one polygon: the start
+            # state, or the end state when the segment starts outside all states
+            has_low_state = low_label >= 0
+            test_geoms = state_geoms[
+                np.where(has_low_state, low_label, label_b[crossing])
+            ]
+            for _ in range(bisection_iterations):
+                mid = (low + high) / 2
+                inside = shapely.intersects_xy(test_geoms, mid[:, 0], mid[:, 1])
+                in_low_state = np.where(has_low_state, inside, ~inside)
+                low[in_low_state] = mid[in_low_state]
+                high[~in_low_state] = mid[~in_low_state]
+
+            border = (low + high) / 2
+            first_part = np.hypot(*(border - starts[crossing]).T)
+            second_part = lengths[crossing] - first_part
+
+            for labels_side, part in (
+                (low_label, first_part),
+                (label_b[crossing], second_part),
+            ):
+                inside = labels_side >= 0
+                meters += np.bincount(
+                    labels_side[inside], weights=part[inside], minlength=len(meters)
+                )
+
+        state_meters = {}
+        for state, value in zip(abbreviations, meters):
+            if value > 0:
+                state_meters[state] = state_meters.get(state, 0.0) + float(value)
+        return state_meters
+
+    def _finalize_state_miles(
+        self, state_meters: Dict[str, float], total_distance_miles: float
+    ) -> Dict[str, float]:
+        """
+        Convert per-state route meters to miles scaled to the routed distance
+
+        Args:
+            state_meters: Dictionary mapping state abbreviations to route meters
+            total_distance_miles: Total distance of the route
+
+        Returns:
+            Dictionary mapping contiguous US state abbreviations to miles,
+            with segments below the configured threshold removed
+        """
+        state_miles = {
+            state: length_meters / 1609.34  # Convert to miles
+            for state, length_meters in state_meters.items()
+        }
+
+        # Scale the calculated miles to match the actual route distance
+        if state_miles:
+            calculated_total_miles = sum(state_miles.values())
+            if calculated_total_miles > 0:
+                scale_factor = total_distance_miles / calculated_total_miles
+                for state in state_miles:
+                    state_miles[state] = round(state_miles[state] * scale_factor, 1)
+
+        # Filter out very small segments (using config threshold)
+        state_miles = {
+            state: miles
+            for state, miles in state_miles.items()
+            if miles >= config.MIN_STATE_MILES_THRESHOLD
+        }
+
+        # Keep only contiguous US states to reduce noise
+        return {
+            state: miles
+            for state, miles in state_miles.items()
+            if state in self.CONTIGUOUS_STATES
+        }
+
     def analyze_route_states_enhanced(
         self,
         polyline: Optional[str],
@@ -371,6 +891,107 @@ class StateAnalyzer:
                 origin_coords, destination_coords, total_distance_miles
             )
 
+    def analyze_route_states_local(
+        self,
+        origin_coords: Tuple[float, float],
+        destination_coords: Tuple[float, float],
+        total_distance_miles: float,
+        via_coords: Optional[List[Tuple[float, float]]] = None,
+    ) -> Optional[Dict]:
+        """
+        Route state analysis from the local state boundaries (no network calls)
+
+        Samples the straight lines between the stops every
+        LOCAL_SAMPLE_SPACING_MILES in the boundaries' projected CRS, classifies
+        all samples in one vectorized call and bisects between consecutive
+        samples in different states until each border crossing is pinned to
+        STATE_BORDER_PRECISION_METERS. Miles are split by the measured length
+        in each state and scaled to the routed distance.
+
+        Args:
+            origin_coords: (latitude, longitude) of the origin
+            destination_coords: (latitude, longitude) of the destination
+            total_distance_miles: Routed distance to distribute
+            via_coords: Optional intermediate stops, in order
+
+        Returns:
+            Analysis dictionary in the same format as analyze_route_states_enhanced,
+            or None if the state boundaries are not available
+        """
+        if not GIS_AVAILABLE:
+            return None
+
+        try:
+            states_gdf = self.load_state_boundaries()
+            if states_gdf is None:
+                return None
+
+            stops = np.array(
+                [origin_coords, *(via_coords or []), destination_coords], dtype=float
+            )
+            x, y = project_coordinates(stops, states_gdf.crs.srs)
+            stops_xy = np.column_stack((x, y))
+
+            # Evenly spaced samples along each stop-to-stop line
+            spacing_meters = config.LOCAL_SAMPLE_SPACING_MILES * 1609.34
+            pieces = [stops_xy[:1]]
+            for start, end in zip(stops_xy[:-1], stops_xy[1:]):
+                steps = max(1, int(np.ceil(np.hypot(*(end - start)) / spacing_meters)))
+                ratios = np.arange(1, steps + 1)[:, None] / steps
+                pieces.append(start + ratios * (end - start))
+            samples = np.concatenate(pieces)
+            sample_count = len(samples)
+
+            # Halvings needed to shrink a sample interval to the border precision
+            ratio = spacing_meters / config.STATE_BORDER_PRECISION_METERS
+            iterations = int(np.ceil(np.log2(ratio))) if ratio > 1 else 0
+
+            state_meters = self._state_meters_by_vertices(
+                [samples], states_gdf, bisection_iterations=iterations
+            )
+            state_miles = self._finalize_state_miles(state_meters, total_distance_miles)
+            if not state_miles:
+                return None
+
+            states_list = [
+                {
+                    "state": state,
+                    "miles": miles,
+                    "percentage": (
+                        round(miles / total_distance_miles * 100, 1)
+                        if total_distance_miles > 0
+                        else 0
+                    ),
+                }
+                for state, miles in state_miles.items()
+            ]
+            states_list.sort(key=lambda x: x["miles"], reverse=True)
+
+            accounted = sum(state["miles"] for state in states_list)
+            coverage_percentage = (
+                accounted / total_distance_miles * 100
+                if total_distance_miles > 0
+                else 0
+            )
+
+            self.logger.info(
+                f"Local boundary analysis: {len(states_list)} states from "
+                f"{sample_count} samples"
+            )
+
+            return {
+                "states": states_list,
+                "analysis_method": "local_boundary_sampling",
+                "total_distance_analyzed": total_distance_miles,
+                "route_coverage_percentage": round(coverage_percentage, 1),
+                "sample_points_used": sample_count,
+                "states_detected": len(states_list),
+            }
+
+        except Exception as e:
+            self.logger.warning(f"Local boundary analysis failed: {e}")
+            return None
+
     def _generate_route_sample_points(
         self,
         origin: Tuple[float, float],
@@ -630,7 +1251,8 @@ class StateAnalyzer:
 
         Args:
             trip_distance_data: Distance calculation results from RouteAnalyzer
-            polylines: Optional polyline data for enhanced analysis
+            polylines: Optional trip polylines, used when the legs carry none
+                       (RouteAnalyzer keeps its polylines on the legs)
 
         Returns:
             Updated trip data with state mileage information
@@ -658,14 +1280,44 @@ class StateAnalyzer:
             if "destination" in last_leg and "coordinates" in last_leg["destination"]:
                 destination_coords = last_leg["destination"]["coordinates"]
 
+        # Prefer per-leg polylines: each leg's state meters are cached, and the
+        # trip total is composed from them before rescaling to the trip distance
+        leg_polylines = [
+            leg["polyline"]
+            for leg in legs
+            if leg.get("polyline") and not leg.get("calculation_failed")
+        ]
+
+        if leg_polylines and GIS_AVAILABLE:
+            state_meters = {}
+            for leg_meters in self.calculate_leg_state_meters(leg_polylines):
+                for state, meters in leg_meters.items():
+                    state_meters[state] = state_meters.get(state, 0.0) + meters
+            state_miles = (
+                self._finalize_state_miles(state_meters, total_distance)
+                if state_meters
+                else {}
+            )
         # Use polylines if available for enhanced analysis
-        if polylines and GIS_AVAILABLE:
+        elif polylines and GIS_AVAILABLE:
             state_miles = self.calculate_state_miles_from_polyline(
                 polylines, total_distance
             )
         elif origin_coords and destination_coords:
-            # Use enhanced sampling analysis
-            state_analysis = self.analyze_route_states_enhanced(
+            # Sample along the stops locally when the boundaries are available,
+            # otherwise use the enhanced reverse-geocoding analysis
+            via_coords = [
+                leg["destination"]["coordinates"]
+                for leg in legs[:-1]
+                if "coordinates" in leg.get("destination", {})
+            ]
+            state_analysis = (
+                self.analyze_route_states_local(
+                    origin_coords, destination_coords, total_distance, via_coords
+                )
+                if config.STATE_ANALYSIS_LOCAL
+                else None
+            ) or self.analyze_route_states_enhanced(
                 None, origin_coords, destination_coords, total_distance
             )
             state_miles = {
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+State analysis worker module
+Process pool for CPU-bound state mileage measurement; workers load the
+parent's prepared state boundaries from a shared artifact file
+"""
+
+import multiprocessing
+import os
+import pickle
+import tempfile
+import weakref
+from typing import Dict, List
+
+import numpy as np
+
+try:
+    import shapely
+except ImportError:
+    shapely = None
+
+from .logging_utils import get_logger
+
+# Workers are forked from a forkserver, a fresh interpreter started for the
+# purpose, so they never inherit locks (logging, requests, GEOS) held by the
+# job runner, Streamlit or HTTP threads of the process that asks for a pool
+FORKSERVER_AVAILABLE = "forkserver" in multiprocessing.get_all_start_methods()
+
+# Analyzer of the pool this worker process belongs to (set by _init_worker)
+_worker_analyzer = None
+
+
+def _init_worker(boundaries_path: str) -> None:
+    """Worker initializer: load the pool's state boundaries into an analyzer"""
+    global _worker_analyzer
+    from .state_analyzer import StateAnalyzer
+
+    with open(boundaries_path, "rb") as f:
+        states_gdf = pickle.load(f)
+    _prepare_boundaries(states_gdf)
+
+    analyzer = StateAnalyzer()
+    analyzer._state_boundaries = states_gdf
+    _worker_analyzer = analyzer
+
+
+def _remove_file(path: str) -> None:
+    """Delete a boundary artifact if it still exists"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _prepare_boundaries(states_gdf) -> None:
+    """Build the spatial index and prepare the polygons for repeated queries"""
+    states_gdf.sindex.query(shapely.points(0.0, 0.0))
+    shapely.prepare(np.asarray(states_gdf.geometry.values))
+
+
+def _measure_chunk(task) -> List[Dict[str, float]]:
+    """Worker entry point: measure one chunk of routes"""
+    segments, owners, route_count, engine = task
+    return _worker_analyzer._measure_segments(
+        segments, owners, route_count, _worker_analyzer._state_boundaries, engine
+    )
+
+
+class StateAnalysisPool:
+    """
+    Process pool that measures route meters per state across CPU cores
+
+    Shapely/GEOS intersection holds the GIL, so threads cannot spread it over
+    cores. The parent's projected boundaries are written once to a temporary
+    artifact that each worker (including any the pool later restarts) loads
+    and prepares in its initializer, so every pool measures against its own
+    analyzer's boundaries. Only projected coordinate arrays go to the workers
+    and only per-state meter dictionaries come back.
+    """
+
+    def __init__(self, analyzer, workers: int):
+        """
+        Start the worker processes
+
+        Args:
+            analyzer: StateAnalyzer whose state boundaries the workers use
+            workers: Number of worker processes
+        """
+        if not FORKSERVER_AVAILABLE:
+            raise RuntimeError("Process-pool state analysis requires a forkserver")
+
+        self.logger = get_logger()
+        self.workers = workers
+
+        states_gdf = analyzer.load_state_boundaries()
+        if states_gdf is None:
+            raise RuntimeError("State boundaries not available for worker pool")
+
+        fd, self._boundaries_path = tempfile.mkstemp(
+            prefix="state_boundaries_", suffix=".pkl"
+        )
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(states_gdf, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+            context = multiprocessing.get_context("forkserver")
+            # Import the GIS stack once in the forkserver, not in every worker
+            context.set_forkserver_preload([f"{__package__}.state_analyzer"])
+            self._pool = context.Pool(
+                workers, initializer=_init_worker, initargs=(self._boundaries_path,)
+            )
+        except Exception:
+            os.remove(self._boundaries_path)
+            raise
+        # Also removed at interpreter exit if the pool is never closed
+        self._remove_artifact = weakref.finalize(
+            self, _remove_file, self._boundaries_path
+        )
+        self.logger.info(f"Started {workers} state analysis worker processes")
+
+    def measure(
+        self,
+        segments: List[np.ndarray],
+        owners: np.ndarray,
+        route_count: int,
+        engine: str,
+    ) -> List[Dict[str, float]]:
+        """
+        Measure route meters per state, split into chunks of whole routes
+
+        Args:
+            segments: Projected (n, 2) coordinate arrays, one per route section
+            owners: Route index of each section
+            route_count: Number of routes
+            engine: "intersection" or "vertex"
+
+        Returns:
+            List of dictionaries mapping state abbreviations to route meters,
+            in route order
+        """
+        # A few chunks per worker keeps them busy when routes differ in size
+        bounds = np.linspace(0, route_count, min(route_count, self.workers * 4) + 1)
+        bounds = np.unique(bounds.astype(int))
+
+        tasks = []
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            selected = np.flatnonzero((owners >= first) & (owners < last))
+            tasks.append(
+                (
+                    [segments[i] for i in selected],
+                    owners[selected] - first,
+                    int(last - first),
+                    engine,
+                )
+            )
+
+        results = []
+        for chunk in self._pool.map(_measure_chunk, tasks):
+            results.extend(chunk)
+        return results
+
+    def close(self) -> None:
+        """Stop the worker processes and remove the boundary artifact"""
+        self._pool.close()
+        self._pool.join()
+        self._remove_artifact()
+        self.logger.info("State analysis worker processes stopped")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Thumbnails module
+Small JPEG previews of uploaded packet scans, cached by image content
+"""
+
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from PIL import Image
+
+from .config import config
+from .logging_utils import get_logger
+
+
+def content_hash(data: bytes) -> str:
+    """Hash of file content, used as the thumbnail cache key"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def make_thumbnail(data: bytes, max_size: Optional[int] = None) -> bytes:
+    """
+    Render a JPEG thumbnail of an image
+
+    JPEG scans are decoded at a reduced scale (draft mode) before resizing,
+    so a multi-megapixel page is never fully decoded.
+
+    Args:
+        data: Encoded image (JPEG or PNG)
+        max_size: Longest thumbnail side in pixels (defaults to config.THUMBNAIL_SIZE)
+
+    Returns:
+        JPEG-encoded thumbnail
+    """
+    max_size = max_size or config.THUMBNAIL_SIZE
+
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("RGB", (max_size, max_size))
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+        thumbnail = img.convert("RGB")
+
+    output = io.BytesIO()
+    thumbnail.save(output, format="JPEG", quality=80)
+    return output.getvalue()
+
+
+class ThumbnailCache:
+    """
+    Bounded, thread-safe cache of thumbnails keyed by content hash and size
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        """
+        Initialize the thumbnail cache
+
+        Args:
+            max_entries: Thumbnails kept, least recently used evicted first
+                         (defaults to config.THUMBNAIL_CACHE_SIZE)
+        """
+        self.logger = get_logger()
+        self.max_entries = max_entries or config.THUMBNAIL_CACHE_SIZE
+        self._thumbnails: "OrderedDict[str, Optional[bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_thumbnail(
+        self, data: bytes, max_size: Optional[int] = None
+    ) -> Optional[bytes]:
+        """
+        Get the thumbnail for an image, rendering it on first use
+
+        Args:
+            data: Encoded image
+            max_size: Longest thumbnail side in pixels (defaults to config.THUMBNAIL_SIZE)
+
+        Returns:
+            JPEG-encoded thumbnail, or None if the image cannot be read
+        """
+        max_size = max_size or config.THUMBNAIL_SIZE
+        key = f"{content_hash(data)}:{max_size}"
+
+        with self._lock:
+            if key in self._thumbnails:
+                self._thumbnails.move_to_end(key)
+                self.hits += 1
+                return self._thumbnails[key]
+            self.misses += 1
+
+        try:
+            thumbnail = make_thumbnail(data, max_size)
+        except Exception as e:
+            self.logger.warning(f"Could not create thumbnail: {e}")
+            thumbnail = None
+
+        with self._lock:
+            self._thumbnails[key] = thumbnail
+            while len(self._thumbnails) > self.max_entries:
+                self._thumbnails.popitem(last=False)
+
+        return thumbnail
+
+    def get_cache_stats(self) -> Dict:
+        """Get statistics about cached thumbnails"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "cached_thumbnails": len(self._thumbnails),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups > 0 else 0,
+            }
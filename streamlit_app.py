@@ -5,65 +5,36 @@ Modern web interface for processing driver packet images using AI-powered OCR
 """
 
 import streamlit as st
-import os
 import io
 import json
+import math
 import csv
 import pandas as pd
 from datetime import datetime
 import time
 import sys
-import tempfile
-import gc
 
 # Add src to Python path for imports
 sys.path.append('src')
 
-from src import DriverPacketProcessor, config
-
-
-def cleanup_temp_file(file_path: str, max_retries: int = 3, delay: float = 0.5) -> bool:
-    """
-    Clean up temporary file with retry logic for Windows file locking issues
-    
-    Args:
-        file_path: Path to file to delete
-        max_retries: Maximum number of retry attempts
-        delay: Delay between retries in seconds
-        
-    Returns:
-        True if file was successfully deleted, False otherwise
-    """
-    if not os.path.exists(file_path):
-        return True
-        
-    for attempt in range(max_retries):
-        try:
-            # Force garbage collection to release any file handles
-            gc.collect()
-            
-            # Try to delete the file
-            os.unlink(file_path)
-            return True
-            
-        except PermissionError:
-            # File is still being used, wait and retry
-            if attempt < max_retries - 1:
-                time.sleep(delay)
-                delay *= 2  # Exponential backoff
-            else:
-                st.warning(f"⚠️ Could not clean up temporary file: {file_path}")
-                return False
-                
-        except FileNotFoundError:
-            # File already deleted
-            return True
-            
-        except Exception as e:
-            st.warning(f"⚠️ Unexpected error cleaning up {file_path}: {e}")
-            return False
-    
-    return False
+from src import config, get_shared_processor
+from src.background_jobs import BackgroundJobRunner
+from src.format4_processor import Format4RouteProcessor
+from src.fuel_csv import (
+    FORMAT2_COLUMNS,
+    FORMAT3_COLUMNS,
+    read_csv_head,
+    read_csv_text,
+    summarize_fuel_csv,
+)
+from src.results_index import (
+    apply_result_edits,
+    field_display_value,
+    paginate,
+    update_result_edits,
+)
+from src.results_store import ResultsStore
+from src.thumbnails import ThumbnailCache
 
 
 import traceback
@@ -71,12 +42,6 @@ from typing import Dict, List, Any
 from PIL import Image
 import zipfile
 
-try:
-    from src.main_processor import DriverPacketProcessor
-except ImportError:
-    st.error("❌ Could not import DriverPacketProcessor. Please check your setup.")
-    st.stop()
-
 # Page configuration
 st.set_page_config(
     page_title="Driver Packet Processing System",
@@ -154,6 +119,29 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Fields from the Gemini extraction prompt that can be edited on the dashboard
+EDITABLE_FIELDS = {
+    'drivers_name': {'label': '👤 Driver Name', 'type': 'text'},
+    'unit': {'label': '🚛 Unit #', 'type': 'text'},
+    'trailer': {'label': '🚚 Trailer #', 'type': 'text'},
+    'date_trip_started': {'label': '📅 Date Trip Started', 'type': 'text'},
+    'date_trip_ended': {'label': '📅 Date Trip Ended', 'type': 'text'},
+    'trip': {'label': '🆔 Trip #', 'type': 'text'},
+    'trip_started_from': {'label': '🏁 Trip Started From', 'type': 'text'},
+    'first_drop': {'label': '📍 1st Drop', 'type': 'text'},
+    'second_drop': {'label': '📍 2nd Drop', 'type': 'text'},
+    'third_drop': {'label': '📍 3rd Drop', 'type': 'text'},
+    'forth_drop': {'label': '📍 4th Drop', 'type': 'text'},
+    'inbound_pu': {'label': '📍 Inbound PU', 'type': 'text'},
+    'drop_off': {'label': '🏁 Drop Off', 'type': 'text'},
+    'total_miles': {'label': '📏 Total Miles', 'type': 'text'}
+}
+TRIP_INFO_FIELDS = ['drivers_name', 'unit', 'trailer', 'date_trip_started', 'date_trip_ended', 'trip', 'total_miles']
+LOCATION_FIELDS = ['trip_started_from', 'first_drop', 'second_drop', 'third_drop', 'forth_drop', 'inbound_pu', 'drop_off']
+
+DASHBOARD_PAGE_SIZES = [10, 25, 50, 100]
+UPLOAD_PREVIEW_PAGE_SIZE = 12
+
 def main():
     """Main Streamlit application"""
     
@@ -219,16 +207,17 @@ def main():
             st.info("💡 **Get HERE API Key for Enhanced Analysis**")
             st.write("Without HERE API, only origin/destination states are calculated.")
         
-        # Initialize processor
+        # Use the processor shared by all sessions with these API keys
         if gemini_key:
             try:
-                if not st.session_state.processor or not st.session_state.api_configured:
-                    st.session_state.processor = DriverPacketProcessor(
-                        gemini_api_key=gemini_key,
-                        here_api_key=here_key if here_key else None
-                    )
-                    st.session_state.api_configured = True
+                processor = get_shared_processor(
+                    gemini_api_key=gemini_key,
+                    here_api_key=here_key if here_key else None
+                )
+                if processor is not st.session_state.processor:
+                    st.session_state.processor = processor
                     st.success("✅ Processor initialized successfully!")
+                st.session_state.api_configured = True
             except Exception as e:
                 st.error(f"❌ Error initializing processor: {str(e)}")
                 st.session_state.api_configured = False
@@ -242,6 +231,9 @@ def main():
         show_setup_instructions()
         return
     
+    # Pick up images finished by the background job since the last run
+    sync_image_job_results()
+    
     # Tabs for different functions
     tab1, tab2, tab3, tab4 = st.tabs([
         "📤 Upload & Process", 
@@ -315,10 +307,7 @@ def upload_and_process_tab(processor, use_here_api):
         # Display uploaded files
         if input_type == "Images (Driver Packets)":
             with st.expander("📁 Uploaded Files", expanded=True):
-                cols = st.columns(min(len(uploaded_files), 4))
-                for i, uploaded_file in enumerate(uploaded_files):
-                    with cols[i % 4]:
-                        st.image(uploaded_file, caption=uploaded_file.name, use_container_width=True)
+                show_upload_previews(uploaded_files)
         else:
             with st.expander("📁 Uploaded CSV Files", expanded=True):
                 st.info("📋 **Supported CSV Formats:**")
@@ -340,69 +329,150 @@ def upload_and_process_tab(processor, use_here_api):
                 process_images(uploaded_files, processor, use_here_api)
             else:
                 process_csv_files(uploaded_files)
+    
+    if input_type == "Images (Driver Packets)":
+        show_image_job_progress()
+
+@st.cache_resource
+def get_thumbnail_cache():
+    """Upload preview thumbnails shared by all sessions of this server process"""
+    return ThumbnailCache()
+
+def show_upload_previews(uploaded_files):
+    """Show thumbnails of the uploaded images, one page at a time"""
+    page = 1
+    page_count = paginate(uploaded_files, 1, UPLOAD_PREVIEW_PAGE_SIZE)[2]
+    if page_count > 1:
+        page = st.number_input("Preview page", min_value=1, max_value=page_count, value=1, step=1, key="upload_preview_page")
+    
+    # Only the current page's thumbnails are rendered (or fetched from the cache)
+    page_files, page, page_count = paginate(uploaded_files, page, UPLOAD_PREVIEW_PAGE_SIZE)
+    if page_count > 1:
+        first_shown = (page - 1) * UPLOAD_PREVIEW_PAGE_SIZE + 1
+        st.caption(f"Showing {first_shown}-{first_shown + len(page_files) - 1} of {len(uploaded_files)} files")
+    
+    thumbnail_cache = get_thumbnail_cache()
+    cols = st.columns(min(len(page_files), 4))
+    for i, uploaded_file in enumerate(page_files):
+        with cols[i % 4]:
+            thumbnail = thumbnail_cache.get_thumbnail(uploaded_file.getvalue())
+            if thumbnail:
+                st.image(thumbnail, caption=uploaded_file.name, use_container_width=True)
+            else:
+                st.write(f"🖼️ {uploaded_file.name}")
+
+@st.cache_resource
+def get_job_runner():
+    """Background job runner shared by all sessions of this server process"""
+    return BackgroundJobRunner(config.BACKGROUND_JOB_WORKERS)
 
 def process_images(uploaded_files, processor, use_here_api):
-    """Process uploaded images"""
-    st.header("🔄 Processing Images...")
+    """Queue uploaded images for background processing"""
+    # Read the uploads now: the UploadedFile objects belong to this script run
+    uploads = [(uploaded_file.name, uploaded_file.getvalue()) for uploaded_file in uploaded_files]
+    
+    runner = get_job_runner()
+    previous_job_id = st.session_state.get('image_job_id')
+    if previous_job_id:
+        runner.cancel_job(previous_job_id)
+    
+    st.session_state.image_job_id = runner.submit_images(processor, uploads, use_here_api)
+    st.session_state.image_job_synced = []
+    st.session_state.processing_results = []
+    clear_result_edits()
+    bump_results_version()
+
+def sync_image_job_results():
+    """
+    Merge newly finished results of this session's background job into session state
     
-    # Create progress bar
-    progress_bar = st.progress(0)
-    status_text = st.empty()
+    Results already merged are kept as they are, so edits made on the dashboard
+    while the job runs are not overwritten.
     
-    results = []
+    Returns:
+        Snapshot of the job record, or None if this session has no job
+    """
+    job_id = st.session_state.get('image_job_id')
+    if not job_id:
+        return None
+    
+    job = get_job_runner().get_job(job_id)
+    if job is None:
+        st.session_state.image_job_id = None
+        return None
+    
+    synced = st.session_state.get('image_job_synced', [])
+    finished = [i for i, result in enumerate(job['results']) if result is not None]
+    if len(finished) > len(synced):
+        current = dict(zip(synced, st.session_state.processing_results))
+        st.session_state.processing_results = [current.get(i, job['results'][i]) for i in finished]
+        st.session_state.image_job_synced = finished
+        bump_results_version()
+    
+    return job
+
+def show_image_job_progress():
+    """Show progress of this session's background job"""
+    job = sync_image_job_results()
+    if not job:
+        return
     
-    for i, uploaded_file in enumerate(uploaded_files):
-        # Update progress
-        progress = (i + 1) / len(uploaded_files)
-        progress_bar.progress(progress)
-        status_text.text(f"Processing {uploaded_file.name}... ({i + 1}/{len(uploaded_files)})")
-        
-        temp_files_to_cleanup = []
-        try:
-            # Save uploaded file temporarily
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp_file:
-                tmp_file.write(uploaded_file.getvalue())
-                tmp_file_path = tmp_file.name
-                temp_files_to_cleanup.append(tmp_file_path)
-            
-            # Process image
-            result = processor.process_image_with_distances(tmp_file_path, use_here_api)
-            result['source_image'] = uploaded_file.name  # Update source image name
-            results.append(result)
-            
-        except Exception as e:
-            st.error(f"❌ Error processing {uploaded_file.name}: {str(e)}")
-            results.append({
-                'source_image': uploaded_file.name,
-                'processing_success': False,
-                'error': str(e)
-            })
-        finally:
-            # Clean up temporary files with retry logic
-            for temp_file_path in temp_files_to_cleanup:
-                cleanup_temp_file(temp_file_path)
+    # Only a running job is polled; the final summary is drawn once
+    if job['status'] == 'running':
+        poll_image_job_progress()
+    else:
+        show_image_job_summary(job)
+
+def poll_image_job_progress():
+    """Show progress of the running background job"""
+    job = sync_image_job_results()
+    if not job:
+        return
     
-    # Complete processing
-    progress_bar.progress(1.0)
-    status_text.text("✅ Processing complete!")
+    if job['status'] != 'running':
+        # Rerun the whole page once so it shows the summary (and stops polling)
+        # and the other tabs pick up the final results
+        st.rerun()
     
-    # Store results in session state
-    st.session_state.processing_results = results
+    total = job['total']
+    st.header("🔄 Processing Images...")
+    st.progress(job['completed'] / total if total else 1.0)
+    in_progress = ', '.join(job['in_progress'][:3]) or 'queued images'
+    st.text(f"Processing {in_progress}... ({job['completed']}/{total} done)")
+    st.caption("You can switch tabs while processing continues - finished images already appear on the Results Dashboard.")
+    if st.button("⏹️ Cancel remaining images", key="cancel_image_job"):
+        get_job_runner().cancel_job(job['job_id'])
+        st.rerun()
+    if not hasattr(st, 'fragment'):
+        st.button("🔄 Refresh progress", key="refresh_image_job")
+
+# Poll the running job without rerunning the rest of the page (Streamlit 1.37+)
+if hasattr(st, 'fragment'):
+    poll_image_job_progress = st.fragment(run_every=1.0)(poll_image_job_progress)
+
+def show_image_job_summary(job):
+    """Show the outcome of a finished or cancelled background job"""
+    total = job['total']
     
-    # Show summary
-    successful = sum(1 for r in results if r.get('processing_success'))
-    failed = len(results) - successful
+    if job['status'] == 'cancelled':
+        st.warning(f"⏹️ Processing cancelled after {job['completed']} of {total} images")
+    else:
+        st.progress(1.0)
+        st.text("✅ Processing complete!")
+    
+    successful = job['successful']
+    failed = job['failed']
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("📊 Total Images", len(results))
+        st.metric("📊 Total Images", total)
     with col2:
         st.metric("✅ Successful", successful)
     with col3:
         st.metric("❌ Failed", failed)
     
     if successful > 0:
-        st.success(f"🎉 Successfully processed {successful} out of {len(results)} images!")
+        st.success(f"🎉 Successfully processed {successful} out of {total} images!")
     
     if failed > 0:
         st.error(f"⚠️ {failed} images failed to process. Check the Results Dashboard for details.")
@@ -424,11 +494,8 @@ def process_csv_files(uploaded_files):
         status_text.text(f"Processing {uploaded_file.name}... ({i + 1}/{len(uploaded_files)})")
         
         try:
-            # Read CSV file
-            csv_content = uploaded_file.getvalue().decode('utf-8')
-            
-            # Detect format and process
-            result = detect_and_process_csv(csv_content, uploaded_file.name)
+            # Detect format from the first lines and process (fuel exports are streamed in chunks)
+            result = detect_and_process_csv(uploaded_file, uploaded_file.name)
             results.append(result)
             
             # Show processing summary
@@ -455,8 +522,13 @@ def process_csv_files(uploaded_files):
     progress_bar.progress(1.0)
     status_text.text("✅ Processing complete!")
     
-    # Store results in session state
+    # Store results in session state (replacing any background image job)
+    if st.session_state.get('image_job_id'):
+        get_job_runner().cancel_job(st.session_state.image_job_id)
+        st.session_state.image_job_id = None
     st.session_state.processing_results = results
+    clear_result_edits()
+    bump_results_version()
     
     # Show summary
     successful = sum(1 for r in results if r.get('processing_success'))
@@ -476,15 +548,15 @@ def process_csv_files(uploaded_files):
     if failed > 0:
         st.error(f"⚠️ {failed} files failed to process. Check the Results Dashboard for details.")
 
-def detect_and_process_csv(csv_content, filename):
-    """Detect CSV format and process accordingly"""
+def detect_and_process_csv(csv_source, filename):
+    """Detect CSV format and process accordingly
+    
+    csv_source may be the CSV text or an uploaded file; only the first few
+    lines are read for detection.
+    """
     try:
-        # Parse CSV
-        import io
-        import csv
-        
         # Read first few lines to detect format
-        lines = csv_content.strip().split('\n')
+        lines = read_csv_head(csv_source)
         if not lines:
             raise ValueError("Empty CSV file")
         
@@ -496,26 +568,26 @@ def detect_and_process_csv(csv_content, filename):
         # Format 1: State,Country,Unit,Distance
         if all(col in header_clean for col in ['state', 'country', 'unit', 'distance']):
             st.info(f"🔍 Detected Format 1 (Distance Data): {filename}")
-            return process_format1_csv(csv_content, filename)
+            return process_format1_csv(read_csv_text(csv_source), filename)
         
         # Format 2: Fuel card transactions (Card #, State/ Prov, Qty)
         elif ('card#' in header_clean or 'cardno' in header_clean) and ('state/prov' in header_clean or 'stateprov' in header_clean) and 'qty' in header_clean:
             st.info(f"🔍 Detected Format 2 (Fuel Transactions): {filename}")
-            return process_format2_csv(csv_content, filename)
+            return process_format2_csv(csv_source, filename)
         
         # Format 3: Complex fuel data (Truck Stop State, Number of Tractor Gallons)
         elif 'truckstopstate' in header_clean and 'numberoftractorgallons' in header_clean:
             st.info(f"🔍 Detected Format 3 (Complex Fuel Data): {filename}")
-            return process_format3_csv(csv_content, filename)
+            return process_format3_csv(csv_source, filename)
         
         # Format 4: Load-based route data (Shipper City, Shipper State, Delivery City, Delivery State)
         elif detect_format4_pattern(lines, filename):
             st.info(f"🔍 Detected Format 4 (Load-based Route Data): {filename}")
-            return process_format4_csv(csv_content, filename)
+            return process_format4_csv(read_csv_text(csv_source), filename)
         
         # Additional detection patterns for variations
         elif 'unit' in header_clean and 'distance' in header_clean and len([col for col in ['state', 'miles', 'mi'] if col in header_clean]) > 0:
-            return process_format1_csv(csv_content, filename)
+            return process_format1_csv(read_csv_text(csv_source), filename)
         
         else:
             # Show available columns for debugging
@@ -598,62 +670,24 @@ def process_format1_csv(csv_content, filename):
             'error': f"Format 1 processing failed: {str(e)}"
         }
 
-def process_format2_csv(csv_content, filename):
-    """Process Format 2: Fuel card transactions"""
+def fuel_csv_result(csv_source, filename, columns):
+    """Aggregate a fuel transaction CSV into a processing result"""
+    summary = summarize_fuel_csv(csv_source, columns)
+    return {
+        'source_image': filename,
+        'processing_success': True,
+        'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'unit': summary['unit'],
+        'fuel_purchases': summary['fuel_purchases'],
+        'fuel_purchase_count': summary['fuel_purchase_count'],
+        'fuel_by_state': summary['fuel_by_state'],
+        'total_gallons': summary['total_gallons']
+    }
+
+def process_format2_csv(csv_source, filename):
+    """Process Format 2: Fuel card transactions (streamed in chunks)"""
     try:
-        import io
-        import csv
-        
-        # Parse CSV
-        reader = csv.DictReader(io.StringIO(csv_content))
-        
-        # Extract fuel data
-        fuel_purchases = []
-        unit = None
-        
-        for row in reader:
-            state = row.get('State/ Prov', '').strip().upper()
-            qty_str = row.get('Qty', '').strip()
-            unit_val = row.get('Unit', '').strip()
-            
-            if not unit:
-                unit = unit_val
-            
-            # Parse quantity (gallons)
-            try:
-                gallons = float(qty_str) if qty_str else 0
-                if gallons > 0 and state:
-                    fuel_purchases.append({
-                        'state': state,
-                        'gallons': gallons
-                    })
-            except ValueError:
-                continue
-        
-        # Process fuel data (aggregate by state)
-        fuel_by_state = {}
-        total_gallons = 0
-        
-        for purchase in fuel_purchases:
-            state = purchase['state']
-            gallons = purchase['gallons']
-            
-            if state in fuel_by_state:
-                fuel_by_state[state] += gallons
-            else:
-                fuel_by_state[state] = gallons
-            
-            total_gallons += gallons
-        
-        return {
-            'source_image': filename,
-            'processing_success': True,
-            'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'unit': unit,
-            'fuel_purchases': fuel_purchases,
-            'fuel_by_state': fuel_by_state,
-            'total_gallons': total_gallons
-        }
+        return fuel_csv_result(csv_source, filename, FORMAT2_COLUMNS)
         
     except Exception as e:
         return {
@@ -662,62 +696,10 @@ def process_format2_csv(csv_content, filename):
             'error': f"Format 2 processing failed: {str(e)}"
         }
 
-def process_format3_csv(csv_content, filename):
-    """Process Format 3: Complex fuel data"""
+def process_format3_csv(csv_source, filename):
+    """Process Format 3: Complex fuel data (streamed in chunks)"""
     try:
-        import io
-        import csv
-        
-        # Parse CSV
-        reader = csv.DictReader(io.StringIO(csv_content))
-        
-        # Extract fuel data
-        fuel_purchases = []
-        unit = None
-        
-        for row in reader:
-            state = row.get('Truck Stop State', '').strip().upper()
-            gallons_str = row.get('Number of Tractor Gallons', '').strip()
-            unit_val = row.get('Unit Number', '').strip()
-            
-            if not unit:
-                unit = unit_val
-            
-            # Parse gallons
-            try:
-                gallons = float(gallons_str) if gallons_str else 0
-                if gallons > 0 and state:
-                    fuel_purchases.append({
-                        'state': state,
-                        'gallons': gallons
-                    })
-            except ValueError:
-                continue
-        
-        # Process fuel data (aggregate by state)
-        fuel_by_state = {}
-        total_gallons = 0
-        
-        for purchase in fuel_purchases:
-            state = purchase['state']
-            gallons = purchase['gallons']
-            
-            if state in fuel_by_state:
-                fuel_by_state[state] += gallons
-            else:
-                fuel_by_state[state] = gallons
-            
-            total_gallons += gallons
-        
-        return {
-            'source_image': filename,
-            'processing_success': True,
-            'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'unit': unit,
-            'fuel_purchases': fuel_purchases,
-            'fuel_by_state': fuel_by_state,
-            'total_gallons': total_gallons
-        }
+        return fuel_csv_result(csv_source, filename, FORMAT3_COLUMNS)
         
     except Exception as e:
         return {
@@ -759,332 +741,87 @@ def detect_format4_pattern(lines, filename):
 
 def process_format4_csv(csv_content, filename):
     """Process Format 4: Load-based route data with HERE API distance calculation"""
-    try:
-        import io
-        import csv
-        
-        # Find the header row (can be on row 1, 2, or 3)
-        lines = csv_content.strip().split('\n')
-        header_row_idx = None
-        
-        for row_idx in range(min(3, len(lines))):
-            if not lines[row_idx].strip():
-                continue
-                
-            header = lines[row_idx].lower()
-            header_clean = header.replace(' ', '').replace('_', '')
-            
-            # Check for Format 4 pattern
-            required_cols = ['loadno', 'shippercity', 'shipperstate', 'deliverycity', 'deliverystate']
-            if all(col in header_clean for col in required_cols):
-                header_row_idx = row_idx
-                break
-                
-            # Alternative pattern
-            alt_required = ['load', 'shipper', 'delivery', 'city', 'state']
-            if sum(1 for col in alt_required if col in header_clean) >= 4:
-                header_row_idx = row_idx
-                break
-        
-        if header_row_idx is None:
-            raise ValueError("Could not find Format 4 headers in first 3 rows")
-        
-        # Parse CSV starting from header row
-        csv_data_from_header = '\n'.join(lines[header_row_idx:])
-        reader = csv.DictReader(io.StringIO(csv_data_from_header))
-        
-        # Initialize processor if available in session state
-        processor = st.session_state.get('processor')
-        if not processor:
-            st.error("❌ Processor not initialized. Please configure API keys first.")
-            return {
-                'source_image': filename,
-                'processing_success': False,
-                'error': 'Processor not initialized'
-            }
-        
-        # Process each row as a separate route
-        route_results = []
-        state_mileage_totals = {}
-        total_calculated_miles = 0
-        successful_routes = 0
-        original_csv_data = []  # Store original CSV data for export
-        
-        # Progress tracking
-        rows = list(reader)
-        total_rows = len(rows)
-        
-        if total_rows == 0:
-            raise ValueError("No data rows found after header")
-        
-        st.info(f"🚛 Processing {total_rows} routes from {filename}")
-        
-        # Create progress bar for Format 4 processing
-        progress_container = st.container()
-        with progress_container:
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-        
-        for i, row in enumerate(rows):
-            # Update progress
-            progress = (i + 1) / total_rows
-            progress_bar.progress(progress)
-            status_text.text(f"Calculating route {i + 1}/{total_rows}...")
-            
-            # Store original row data for later export
-            original_row_data = dict(row)  # Make a copy of the original row
-            
-            try:
-                # Extract route information
-                load_no = row.get('Load No', '').strip()
-                shipper_city = row.get('Shipper City', '').strip()
-                shipper_state = row.get('Shipper State', '').strip()
-                delivery_city = row.get('Delivery City', '').strip()
-                delivery_state = row.get('Delivery State', '').strip()
-                
-                if not all([shipper_city, shipper_state, delivery_city, delivery_state]):
-                    missing_fields = []
-                    if not shipper_city: missing_fields.append('Shipper City')
-                    if not shipper_state: missing_fields.append('Shipper State')
-                    if not delivery_city: missing_fields.append('Delivery City')
-                    if not delivery_state: missing_fields.append('Delivery State')
-                    
-                    error_msg = f"Missing required location data: {', '.join(missing_fields)}"
-                    st.warning(f"⚠️ Skipping row {i+1} (Load {load_no}): {error_msg}")
-                    route_results.append({
-                        'load_no': load_no,
-                        'success': False,
-                        'error': error_msg
-                    })
-                    continue
-                
-                # Format locations for geocoding
-                origin_location = f"{shipper_city}, {shipper_state}"
-                destination_location = f"{delivery_city}, {delivery_state}"
-                
-                # Get coordinates using individual geocoding methods
-                use_here_api = st.session_state.get('use_here_api', True)
-                try:
-                    if hasattr(processor, 'geocoding_service'):
-                        origin_coords = processor.geocoding_service.geocode_location(origin_location, use_here_api)
-                        destination_coords = processor.geocoding_service.geocode_location(destination_location, use_here_api)
-                    else:
-                        # Fallback to processor methods if available
-                        origin_coords = getattr(processor, 'geocode_location_here', lambda x: None)(origin_location)
-                        destination_coords = getattr(processor, 'geocode_location_here', lambda x: None)(destination_location)
-                except Exception as geocoding_error:
-                    error_msg = f"Geocoding service error: {str(geocoding_error)}"
-                    st.error(f"❌ Route {i+1} (Load {load_no}): {error_msg}")
-                    route_results.append({
-                        'load_no': load_no,
-                        'origin': origin_location,
-                        'destination': destination_location,
-                        'success': False,
-                        'error': error_msg
-                    })
-                    continue
-                
-                if not origin_coords or not destination_coords:
-                    missing_coords = []
-                    if not origin_coords: missing_coords.append(f"origin ({origin_location})")
-                    if not destination_coords: missing_coords.append(f"destination ({destination_location})")
-                    
-                    error_msg = f"Could not geocode: {', '.join(missing_coords)}"
-                    st.warning(f"⚠️ Skipping route {i+1} (Load {load_no}): {error_msg}")
-                    route_results.append({
-                        'load_no': load_no,
-                        'origin': origin_location,
-                        'destination': destination_location,
-                        'success': False,
-                        'error': error_msg
-                    })
-                    continue
-                
-                # Calculate route distance using route analyzer
-                try:
-                    if hasattr(processor, 'route_analyzer'):
-                        route_result = processor.route_analyzer.calculate_route_distance(origin_coords, destination_coords)
-                    else:
-                        # Fallback to processor method
-                        route_result = getattr(processor, 'calculate_route_distance_here', lambda x, y: None)(origin_coords, destination_coords)
-                except Exception as route_error:
-                    error_msg = f"Route calculation service error: {str(route_error)}"
-                    st.error(f"❌ Route {i+1} (Load {load_no}): {error_msg}")
-                    route_results.append({
-                        'load_no': load_no,
-                        'origin': origin_location,
-                        'destination': destination_location,
-                        'success': False,
-                        'error': error_msg
-                    })
-                    continue
-                
-                if route_result and route_result.get('distance_miles', 0) > 0:
-                    distance_miles = route_result.get('distance_miles', 0)
-                    polyline = route_result.get('polyline')
-                    
-                    # Calculate state mileage using state analyzer if available
-                    state_mileage = []
-                    if hasattr(processor, 'state_analyzer') and polyline:
-                        try:
-                            state_miles_dict = processor.state_analyzer.calculate_state_miles_from_polyline(polyline, distance_miles)
-                            # Convert to expected format
-                            for state, miles in state_miles_dict.items():
-                                state_mileage.append({
-                                    'state': state,
-                                    'miles': int(round(miles)),
-                                    'percentage': round((miles / distance_miles) * 100, 1) if distance_miles > 0 else 0
-                                })
-                        except Exception as e:
-                            st.warning(f"State analysis failed for route {i+1}: {e}")
-                            # Fallback - use origin and destination states
-                            if shipper_state and shipper_state != delivery_state:
-                                state_mileage.append({'state': shipper_state, 'miles': int(distance_miles // 2), 'percentage': 50.0})
-                                state_mileage.append({'state': delivery_state, 'miles': int(distance_miles // 2), 'percentage': 50.0})
-                            else:
-                                state_mileage.append({'state': shipper_state or delivery_state, 'miles': int(distance_miles), 'percentage': 100.0})
-                    
-                    # Accumulate state mileage totals
-                    for state_data in state_mileage:
-                        state = state_data['state']
-                        miles = state_data['miles']
-                        
-                        if state in state_mileage_totals:
-                            state_mileage_totals[state] += miles
-                        else:
-                            state_mileage_totals[state] = miles
-                    
-                    total_calculated_miles += distance_miles
-                    successful_routes += 1
-                    
-                    route_results.append({
-                        'load_no': load_no,
-                        'origin': origin_location,
-                        'destination': destination_location,
-                        'distance_miles': distance_miles,
-                        'state_mileage': state_mileage,
-                        'original_row_data': original_row_data,  # Include original CSV data
-                        'success': True
-                    })
-                    
-                    # Show progress for successful routes
-                    if i % 10 == 0 or i == total_rows - 1:  # Update every 10 routes or at the end
-                        st.success(f"✅ Route {i+1}: {origin_location} → {destination_location} = {distance_miles} miles")
-                
-                else:
-                    st.warning(f"⚠️ Route {i+1}: Distance calculation failed")
-                    route_results.append({
-                        'load_no': load_no,
-                        'origin': origin_location,
-                        'destination': destination_location,
-                        'success': False,
-                        'error': 'Distance calculation failed'
-                    })
-                
-                # Small delay to respect API rate limits
-                time.sleep(0.1)
-                
-            except Exception as e:
-                error_msg = f"Unexpected error processing route: {str(e)}"
-                st.error(f"❌ Error processing route {i+1} (Load {row.get('Load No', 'Unknown')}): {error_msg}")
-                
-                # Add to logger if available
-                if hasattr(processor, 'logger'):
-                    processor.logger.error(f"Format 4 route processing error for row {i+1}: {error_msg}")
-                
-                route_results.append({
-                    'load_no': row.get('Load No', ''),
-                    'success': False,
-                    'error': error_msg
-                })
-        
-        # Complete progress
-        progress_bar.progress(1.0)
-        status_text.text("✅ Route processing complete!")
-        
-        # Convert state totals to expected format
-        state_mileage_list = []
-        for state, miles in state_mileage_totals.items():
-            miles_int = int(round(miles))
-            percentage = round((miles / total_calculated_miles) * 100, 1) if total_calculated_miles > 0 else 0
-            state_mileage_list.append({
-                'state': state,
-                'miles': miles_int,
-                'percentage': percentage
-            })
-        
-        # Sort by miles descending
-        state_mileage_list.sort(key=lambda x: x['miles'], reverse=True)
-        
-        # Show summary
-        st.success(f"🎉 Format 4 Processing Complete!")
-        st.info(f"📊 Processed {successful_routes}/{total_rows} routes successfully")
-        st.info(f"🗺️ Total calculated distance: {total_calculated_miles:,.0f} miles across {len(state_mileage_list)} states")
-        
-        # Show failure summary if there were failures
-        failed_routes = total_rows - successful_routes
-        if failed_routes > 0:
-            st.warning(f"⚠️ {failed_routes} routes failed to process. Check error messages above for details.")
-            
-            # Show error breakdown
-            error_types = {}
-            for result in route_results:
-                if not result.get('success'):
-                    error = result.get('error', 'Unknown error')
-                    error_type = error.split(':')[0] if ':' in error else error
-                    error_types[error_type] = error_types.get(error_type, 0) + 1
-            
-            if error_types:
-                st.write("**Error Breakdown:**")
-                for error_type, count in sorted(error_types.items(), key=lambda x: x[1], reverse=True):
-                    st.write(f"  • {error_type}: {count} routes")
-        
-        # Log summary to processor logger if available
-        if hasattr(processor, 'logger'):
-            processor.logger.info(f"Format 4 processing complete: {successful_routes}/{total_rows} routes successful, {total_calculated_miles:.0f} total miles")
-            if failed_routes > 0:
-                processor.logger.warning(f"Format 4 processing had {failed_routes} failures")
-                for error_type, count in error_types.items():
-                    processor.logger.warning(f"  {error_type}: {count} routes")
-        
-        return {
-            'source_image': filename,
-            'processing_success': True,
-            'processing_timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
-            'format_type': 'Format 4 - Load-based Route Data',
-            'total_routes_processed': total_rows,
-            'successful_routes': successful_routes,
-            'total_miles': str(int(total_calculated_miles)),
-            'distance_calculations': {
-                'calculation_success': True,
-                'total_distance_miles': total_calculated_miles,
-                'state_mileage': state_mileage_list
-            },
-            'route_details': route_results,
-            'header_found_at_row': header_row_idx + 1
-        }
-        
-    except Exception as e:
+    # Initialize processor if available in session state
+    processor = st.session_state.get('processor')
+    if not processor:
+        st.error("❌ Processor not initialized. Please configure API keys first.")
         return {
             'source_image': filename,
             'processing_success': False,
-            'error': f"Format 4 processing failed: {str(e)}"
+            'error': 'Processor not initialized'
         }
+    
+    st.info(f"🚛 Processing routes from {filename}")
+    
+    # Create progress bar for Format 4 processing
+    progress_container = st.container()
+    with progress_container:
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+    
+    def update_progress(fraction, message):
+        progress_bar.progress(fraction)
+        status_text.text(message)
+    
+    # Unique locations and lanes are resolved once, concurrently, and fanned back to rows
+    result = Format4RouteProcessor(processor).process_csv(
+        csv_content,
+        filename,
+        use_here_api=st.session_state.get('use_here_api', True),
+        progress_callback=update_progress
+    )
+    if not result.get('processing_success'):
+        return result
+    
+    status_text.text("✅ Route processing complete!")
+    
+    total_rows = result['total_routes_processed']
+    successful_routes = result['successful_routes']
+    distance_calculations = result['distance_calculations']
+    
+    # Show summary
+    st.success(f"🎉 Format 4 Processing Complete!")
+    st.info(f"📊 Processed {successful_routes}/{total_rows} routes successfully "
+            f"({result['unique_lanes']} unique lanes, {result['unique_locations']} unique locations)")
+    st.info(f"🗺️ Total calculated distance: {distance_calculations['total_distance_miles']:,.0f} miles "
+            f"across {len(distance_calculations['state_mileage'])} states")
+    
+    # Show failure summary if there were failures
+    failed_routes = total_rows - successful_routes
+    if failed_routes > 0:
+        st.warning(f"⚠️ {failed_routes} routes failed to process. See the route details for each load.")
+        
+        # Show error breakdown
+        st.write("**Error Breakdown:**")
+        for error_type, count in sorted(result['error_types'].items(), key=lambda x: x[1], reverse=True):
+            st.write(f"  • {error_type}: {count} routes")
+    
+    return result
 
 def results_dashboard_tab():
     """Results dashboard tab"""
     st.header("📊 Results Dashboard")
     
+    job_id = st.session_state.get('image_job_id')
+    job = get_job_runner().get_job(job_id) if job_id else None
+    if job and job['status'] == 'running':
+        st.info(f"⏳ Background processing: {job['completed']}/{job['total']} images done - showing finished results so far")
+        st.button("🔄 Refresh results", key="refresh_dashboard_job")
+    
     if not st.session_state.processing_results:
         st.info("No results available. Please process some images first.")
         return
     
-    # Get the most current results (including any edited values)
-    results = get_current_results_with_edits()
-    
-    # Summary metrics
-    show_summary_metrics(results)
+    # Summary metrics are shown above the cards but queried after them, so
+    # edits the cards apply on this run are already included
+    summary_container = st.container()
+    show_results_page()
     
+    with summary_container:
+        show_summary_metrics(get_results_store())
+
+def show_results_page():
+    """Show the filter controls and the current page of result cards"""
     # Detailed results
     st.subheader("📋 Detailed Results")
     
@@ -1097,89 +834,73 @@ def results_dashboard_tab():
     with col3:
         show_debug_info = st.checkbox("Show debug info", value=False, help="Show technical details about state data")
     
-    # Display results
-    filtered_results = [r for r in results if r.get('processing_success')] if show_only_successful else results
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        search = st.text_input("🔍 Search", placeholder="File, driver, unit or trip", key="dashboard_search")
+    with col2:
+        only_with_warnings = st.checkbox("Only with warnings", key="dashboard_only_warnings")
+    with col3:
+        only_edited = st.checkbox("Only edited", key="dashboard_only_edited")
+    
+    # Filter and page in the results store; cards are rendered for the current page only
+    store = get_results_store()
+    filters = {
+        'search': search,
+        'successful_only': show_only_successful,
+        'with_warnings_only': only_with_warnings,
+        'edited_only': only_edited
+    }
+    match_count = store.count_packets(**filters)
+    
+    if not match_count:
+        st.info("No results match the current filters.")
+        return
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        page_size = st.selectbox("Results per page", DASHBOARD_PAGE_SIZES, index=1, key="dashboard_page_size")
+    page_count = max(1, math.ceil(match_count / page_size))
+    with col2:
+        page = st.number_input("Page", min_value=1, max_value=page_count, value=1, step=1, key="dashboard_page")
     
-    for result in filtered_results:
-        show_result_card(result, show_validation_warnings, show_debug_info)
+    page = min(max(1, page), page_count)
+    page_rows = store.query_packets(limit=page_size, offset=(page - 1) * page_size, **filters)
+    first_shown = (page - 1) * page_size + 1
+    st.caption(f"Showing {first_shown}-{first_shown + len(page_rows) - 1} of {match_count} results "
+               f"(page {page}/{page_count})")
+    
+    for row in page_rows:
+        show_result_card(st.session_state.processing_results[row['position']], show_validation_warnings, show_debug_info)
 
-def show_summary_metrics(results):
+def show_summary_metrics(store):
     """Show summary metrics"""
-    successful = [r for r in results if r.get('processing_success')]
-    failed = [r for r in results if not r.get('processing_success')]
+    summary = store.get_summary()
+    successful_count = summary['successful']
     
     # Basic metrics
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        st.metric("📊 Total Images", len(results))
+        st.metric("📊 Total Images", summary['total'])
     
     with col2:
-        st.metric("✅ Successful", len(successful))
+        st.metric("✅ Successful", successful_count)
     
     with col3:
-        st.metric("❌ Failed", len(failed))
+        st.metric("❌ Failed", summary['failed'])
     
     with col4:
-        success_rate = (len(successful) / len(results)) * 100 if results else 0
+        success_rate = (successful_count / summary['total']) * 100 if summary['total'] else 0
         st.metric("📈 Success Rate", f"{success_rate:.1f}%")
     
     # Advanced metrics for successful results
-    if successful:
+    if successful_count:
         st.subheader("🚛 Trip Summary")
         
-        # Calculate totals with safe conversion
-        def safe_float_conversion(value):
-            try:
-                if value is None or value == '':
-                    return 0.0
-                # Remove common non-numeric characters
-                clean_value = str(value).replace(',', '').replace('$', '').replace(' ', '').strip()
-                # Handle cases like "2435B" by extracting numeric part
-                import re
-                numeric_part = re.search(r'^[\d.]+', clean_value)
-                if numeric_part:
-                    return float(numeric_part.group())
-                return 0.0
-            except (ValueError, TypeError, AttributeError):
-                return 0.0
-        
-        total_miles = sum(safe_float_conversion(r.get('total_miles')) for r in successful if r.get('total_miles'))
-        total_distance_calculated = sum(safe_float_conversion(r.get('distance_calculations', {}).get('total_distance_miles', 0)) for r in successful)
-        
-        # Count distance calculation success and enhanced analysis usage
-        distance_calc_success_count = 0
-        here_api_count = 0
-        route_analysis_count = 0
-        total_unique_states = set()
-        
-        for result in successful:
-            distance_data = result.get('distance_calculations', {})
-            
-            # Count successful distance calculations
-            if distance_data.get('calculation_success'):
-                distance_calc_success_count += 1
-            
-            # Count HERE API usage and route analysis usage
-            uses_here_api = False
-            uses_route_analysis = False
-            
-            if distance_data.get('legs'):
-                for leg in distance_data['legs']:
-                    if leg.get('api_used') == 'HERE':
-                        uses_here_api = True
-                    if leg.get('route_analysis_used'):
-                        uses_route_analysis = True
-                        
-            if uses_here_api:
-                here_api_count += 1
-            if uses_route_analysis:
-                route_analysis_count += 1
-            
-            # Collect all unique states found (only from successful calculations)
-            if distance_data.get('state_mileage') and distance_data.get('calculation_success'):
-                for state_data in distance_data['state_mileage']:
-                    total_unique_states.add(state_data['state'])
+        total_miles = summary['extracted_miles']
+        distance_calc_success_count = summary['distance_successes']
+        here_api_count = summary['here_api_packets']
+        route_analysis_count = summary['route_analysis_packets']
         
         col1, col2, col3, col4 = st.columns(4)
         
@@ -1187,14 +908,14 @@ def show_summary_metrics(results):
             st.metric("📏 Total Extracted Miles", f"{total_miles:,.0f}")
         
         with col2:
-            st.metric("🗺️ Total Calculated Distance", f"{total_distance_calculated:,.0f}")
+            st.metric("🗺️ Total Calculated Distance", f"{summary['calculated_miles']:,.0f}")
         
         with col3:
-            avg_miles = total_miles / len(successful) if successful else 0
+            avg_miles = total_miles / successful_count
             st.metric("📊 Average Miles per Trip", f"{avg_miles:,.0f}")
         
         with col4:
-            st.metric("🇺🇸 Unique States Found", len(total_unique_states))
+            st.metric("🇺🇸 Unique States Found", summary['unique_states'])
         
         # Show enhanced analysis metrics
         if route_analysis_count > 0:
@@ -1203,184 +924,136 @@ def show_summary_metrics(results):
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                st.metric("🛣️ Enhanced Analysis Used", f"{route_analysis_count}/{len(successful)}")
+                st.metric("🛣️ Enhanced Analysis Used", f"{route_analysis_count}/{successful_count}")
             
             with col2:
-                here_api_rate = (here_api_count / len(successful)) * 100 if successful else 0
+                here_api_rate = (here_api_count / successful_count) * 100
                 st.metric("📡 HERE API Usage", f"{here_api_rate:.1f}%")
                 
             with col3:
-                route_analysis_rate = (route_analysis_count / len(successful)) * 100 if successful else 0
+                route_analysis_rate = (route_analysis_count / successful_count) * 100
                 st.metric("🎯 Full Route Coverage", f"{route_analysis_rate:.1f}%")
             
             st.success("🎉 **Feature1.md Implemented!** The system now detects ALL states along truck routes, including intermediate states like Nevada, Arizona, and New Mexico between California and Texas.")
             
         else:
             # Show distance calculation issues if any
-            if distance_calc_success_count < len(successful):
-                failed_distance_count = len(successful) - distance_calc_success_count
-                st.warning(f"⚠️ **Distance Calculation Issues:** {failed_distance_count} out of {len(successful)} trips failed distance calculation.")
+            if distance_calc_success_count < successful_count:
+                failed_distance_count = successful_count - distance_calc_success_count
+                st.warning(f"⚠️ **Distance Calculation Issues:** {failed_distance_count} out of {successful_count} trips failed distance calculation.")
             
             # Show HERE API usage info
             if here_api_count > 0:
-                here_api_rate = (here_api_count / len(successful)) * 100 if successful else 0
-                st.info(f"✅ HERE Maps API used for {here_api_count} out of {len(successful)} trips ({here_api_rate:.1f}%) for accurate routing.")
+                here_api_rate = (here_api_count / successful_count) * 100
+                st.info(f"✅ HERE Maps API used for {here_api_count} out of {successful_count} trips ({here_api_rate:.1f}%) for accurate routing.")
                 st.warning("⚠️ Route analysis unavailable - install required GIS dependencies (geopandas, shapely, flexpolyline) for full state detection.")
 
 def show_result_card(result, show_validation_warnings, show_debug_info=False):
-    """Show individual result card with editable fields"""
+    """Show individual result card; fields become editable when the card is switched to edit mode"""
     source_image = result['source_image']
+    edits_key = f"edited_{source_image}"
     
-    with st.expander(f"📄 {source_image}", expanded=False):
+    with st.expander(f"{'✏️' if st.session_state.get(edits_key) else '📄'} {source_image}", expanded=False):
         if not result.get('processing_success'):
             st.error(f"❌ Processing failed: {result.get('error', 'Unknown error')}")
             return
         
-        # Initialize session state for this result if not exists
-        if f"edited_{source_image}" not in st.session_state:
-            st.session_state[f"edited_{source_image}"] = result.copy()
-        
-        if f"original_{source_image}" not in st.session_state:
-            st.session_state[f"original_{source_image}"] = result.copy()
-        
-        # Get current edited values
-        edited_result = st.session_state[f"edited_{source_image}"]
-        original_result = st.session_state[f"original_{source_image}"]
-        
-        st.markdown("### ✏️ Editable Gemini Extracted Fields")
-        st.info("💡 Edit any field below and click 'Recalculate Distances' to update HERE API calculations")
-        
-        # Define all fields from Gemini extraction prompt
-        gemini_fields = {
-            'drivers_name': {'label': '👤 Driver Name', 'type': 'text'},
-            'unit': {'label': '🚛 Unit #', 'type': 'text'},
-            'trailer': {'label': '🚚 Trailer #', 'type': 'text'},
-            'date_trip_started': {'label': '📅 Date Trip Started', 'type': 'text'},
-            'date_trip_ended': {'label': '📅 Date Trip Ended', 'type': 'text'},
-            'trip': {'label': '🆔 Trip #', 'type': 'text'},
-            'trip_started_from': {'label': '🏁 Trip Started From', 'type': 'text'},
-            'first_drop': {'label': '📍 1st Drop', 'type': 'text'},
-            'second_drop': {'label': '📍 2nd Drop', 'type': 'text'},
-            'third_drop': {'label': '📍 3rd Drop', 'type': 'text'},
-            'forth_drop': {'label': '📍 4th Drop', 'type': 'text'},
-            'inbound_pu': {'label': '📍 Inbound PU', 'type': 'text'},
-            'drop_off': {'label': '🏁 Drop Off', 'type': 'text'},
-            'total_miles': {'label': '📏 Total Miles', 'type': 'text'}
-        }
-        
-        # Create editable form
-        col1, col2 = st.columns(2)
+        editing = st.toggle("✏️ Edit fields", value=edits_key in st.session_state, key=f"editing_{source_image}")
         has_changes = False
         
-        with col1:
-            st.markdown("**Driver & Trip Information:**")
-            for field in ['drivers_name', 'unit', 'trailer', 'date_trip_started', 'date_trip_ended', 'trip', 'total_miles']:
-                field_info = gemini_fields[field]
-                current_value = str(edited_result.get(field, '')) if edited_result.get(field) else ''
-                original_value = str(original_result.get(field, '')) if original_result.get(field) else ''
-                
-                new_value = st.text_input(
-                    field_info['label'],
-                    value=current_value,
-                    key=f"{source_image}_{field}",
-                    placeholder=f"Enter {field_info['label'].split(' ', 1)[1].lower()}" if ' ' in field_info['label'] else "Enter value"
-                )
-                
-                # Update session state if changed
-                if new_value != current_value:
-                    st.session_state[f"edited_{source_image}"][field] = new_value
-                    has_changes = True
-                
-                # Check if this field was changed from original
-                if new_value != original_value and new_value.strip():
-                    has_changes = True
-        
-        with col2:
-            st.markdown("**Location Information:**")
-            for field in ['trip_started_from', 'first_drop', 'second_drop', 'third_drop', 'forth_drop', 'inbound_pu', 'drop_off']:
-                field_info = gemini_fields[field]
-                current_value = edited_result.get(field, '')
-                original_value = original_result.get(field, '')
-                
-                # Handle drop_off as list or string
-                if isinstance(current_value, list):
-                    current_value = ', '.join(current_value) if current_value else ''
-                else:
-                    current_value = str(current_value) if current_value else ''
-                
-                if isinstance(original_value, list):
-                    original_value = ', '.join(original_value) if original_value else ''
-                else:
-                    original_value = str(original_value) if original_value else ''
-                
-                new_value = st.text_input(
-                    field_info['label'],
-                    value=current_value,
-                    key=f"{source_image}_{field}",
-                    placeholder=f"Enter {field_info['label'].split(' ', 1)[1].lower()}" if ' ' in field_info['label'] else "Enter location"
-                )
-                
-                # Update session state if changed
-                if new_value != current_value:
+        if not editing:
+            current_edited = apply_result_edits(result, st.session_state.get(edits_key))
+            col1, col2 = st.columns(2)
+            with col1:
+                st.markdown("**Driver & Trip Information:**")
+                for field in TRIP_INFO_FIELDS:
+                    st.write(f"{EDITABLE_FIELDS[field]['label']}: {field_display_value(current_edited.get(field)) or '—'}")
+            with col2:
+                st.markdown("**Location Information:**")
+                for field in LOCATION_FIELDS:
+                    st.write(f"{EDITABLE_FIELDS[field]['label']}: {field_display_value(current_edited.get(field)) or '—'}")
+        else:
+            # The edit diff is created only once the card is opened for editing
+            if edits_key not in st.session_state:
+                st.session_state[edits_key] = {}
+            edits = st.session_state[edits_key]
+            current_edited = apply_result_edits(result, edits)
+            
+            st.markdown("### ✏️ Editable Gemini Extracted Fields")
+            st.info("💡 Edit any field below and click 'Recalculate Distances' to update HERE API calculations")
+            
+            # Create editable form
+            col1, col2 = st.columns(2)
+            
+            with col1:
+                st.markdown("**Driver & Trip Information:**")
+                for field in TRIP_INFO_FIELDS:
+                    field_info = EDITABLE_FIELDS[field]
+                    new_value = st.text_input(
+                        field_info['label'],
+                        value=field_display_value(current_edited.get(field)),
+                        key=f"{source_image}_{field}",
+                        placeholder=f"Enter {field_info['label'].split(' ', 1)[1].lower()}" if ' ' in field_info['label'] else "Enter value"
+                    )
+                    if update_result_edits(edits, result, field, new_value):
+                        bump_results_version()
+            
+            with col2:
+                st.markdown("**Location Information:**")
+                for field in LOCATION_FIELDS:
+                    field_info = EDITABLE_FIELDS[field]
+                    new_value = st.text_input(
+                        field_info['label'],
+                        value=field_display_value(current_edited.get(field)),
+                        key=f"{source_image}_{field}",
+                        placeholder=f"Enter {field_info['label'].split(' ', 1)[1].lower()}" if ' ' in field_info['label'] else "Enter location"
+                    )
+                    
                     # Handle drop_off conversion back to array if needed
                     if field == 'drop_off' and ' to ' in new_value.lower():
-                        st.session_state[f"edited_{source_image}"][field] = [loc.strip() for loc in new_value.split(' to ') if loc.strip()]
-                    else:
-                        st.session_state[f"edited_{source_image}"][field] = new_value
-                    has_changes = True
-                
-                # Check if this field was changed from original
-                if new_value != original_value and new_value.strip():
-                    has_changes = True
-        
-        # Check if any field has been modified from the original
-        current_edited = st.session_state[f"edited_{source_image}"]
-        for field in gemini_fields.keys():
-            original_val = str(original_result.get(field, '')) if original_result.get(field) else ''
-            current_val = str(current_edited.get(field, '')) if current_edited.get(field) else ''
+                        new_value = [loc.strip() for loc in new_value.split(' to ') if loc.strip()]
+                    if update_result_edits(edits, result, field, new_value):
+                        bump_results_version()
             
-            # Special handling for drop_off arrays
-            if field == 'drop_off':
-                if isinstance(original_result.get(field), list):
-                    original_val = ', '.join(original_result.get(field, []))
-                if isinstance(current_edited.get(field), list):
-                    current_val = ', '.join(current_edited.get(field, []))
+            current_edited = apply_result_edits(result, edits)
             
-            if current_val != original_val:
-                has_changes = True
-                break
+            # Check if any field has been modified from the original
+            has_changes = any(field in edits for field in EDITABLE_FIELDS)
+            
+            # Recalculate button
+            st.markdown("---")
+            col_btn1, col_btn2 = st.columns([1, 1])
+            
+            with col_btn1:
+                if st.button(
+                    "🔄 Recalculate Distances", 
+                    disabled=not has_changes,
+                    key=f"recalc_{source_image}",
+                    help="Recalculate HERE API distances with updated values" if has_changes else "Make changes to fields above to enable recalculation"
+                ):
+                    recalculate_distances_for_result(source_image)
+            
+            with col_btn2:
+                if st.button(
+                    "↶ Reset to Original", 
+                    key=f"reset_{source_image}",
+                    help="Reset all fields to original Gemini extracted values"
+                ):
+                    # Drop the edit diff and the field widgets so they show the original values again
+                    del st.session_state[edits_key]
+                    bump_results_version()
+                    for field in EDITABLE_FIELDS:
+                        st.session_state.pop(f"{source_image}_{field}", None)
+                    
+                    st.success(f"✅ Reset {source_image} to original values!")
+                    time.sleep(0.5)  # Brief pause to ensure state is updated
+                    st.rerun()
         
-        # Recalculate button
-        st.markdown("---")
-        col_btn1, col_btn2 = st.columns([1, 1])
-        
-        with col_btn1:
-            if st.button(
-                "🔄 Recalculate Distances", 
-                disabled=not has_changes,
-                key=f"recalc_{source_image}",
-                help="Recalculate HERE API distances with updated values" if has_changes else "Make changes to fields above to enable recalculation"
-            ):
-                recalculate_distances_for_result(source_image)
-        
-        with col_btn2:
-            if st.button(
-                "↶ Reset to Original", 
-                key=f"reset_{source_image}",
-                help="Reset all fields to original Gemini extracted values"
-            ):
-                # Reset to original values
-                st.session_state[f"edited_{source_image}"] = original_result.copy()
-                
-                # Also update the main processing results
-                for i, result in enumerate(st.session_state.processing_results):
-                    if result.get('source_image') == source_image:
-                        st.session_state.processing_results[i] = original_result.copy()
-                        break
-                
-                st.success(f"✅ Reset {source_image} to original values!")
-                time.sleep(0.5)  # Brief pause to ensure state is updated
-                st.rerun()
+        # Show the summary of the last recalculation
+        recalc_notice = st.session_state.pop(f"recalc_notice_{source_image}", None)
+        if recalc_notice:
+            level, message = recalc_notice
+            getattr(st, level)(message)
         
         # Show changes indicator
         if has_changes:
@@ -1489,6 +1162,9 @@ def show_result_card(result, show_validation_warnings, show_debug_info=False):
                     with st.expander("🔍 Raw Fuel Purchase Details", expanded=False):
                         for i, purchase in enumerate(current_edited['fuel_purchases'], 1):
                             st.write(f"**Purchase {i}:** {purchase.get('gallons', 0)} gallons in {purchase.get('state', 'Unknown')}")
+                        purchase_count = current_edited.get('fuel_purchase_count', 0)
+                        if purchase_count > len(current_edited['fuel_purchases']):
+                            st.caption(f"Showing the first {len(current_edited['fuel_purchases'])} of {purchase_count} purchases (state totals include all)")
             else:
                 st.info("No fuel purchase data found in this driver packet")
         
@@ -1511,92 +1187,44 @@ def recalculate_distances_for_result(source_image):
         st.error("❌ Processor not initialized")
         return
     
-    # Get edited result from session state
-    edited_result = st.session_state[f"edited_{source_image}"]
+    # Apply the edit diff from session state to the original result
+    edits = st.session_state[f"edited_{source_image}"]
+    edited_result = apply_result_edits(find_original_result(source_image) or {}, edits)
     
     try:
         with st.spinner(f"🔄 Recalculating distances for {source_image}..."):
-            # Step 4: Get coordinates for the edited locations
+            # Only changed stops are geocoded and only legs touching them are rerouted
             use_here_api = st.session_state.get('use_here_api', True)
-            coordinates_data = st.session_state.processor.get_coordinates_for_stops(edited_result, use_here_api)
-            
-            if coordinates_data:
-                # Update coordinates in the edited result
-                edited_result['coordinates'] = coordinates_data
-                
-                # Step 6: Calculate distances using new coordinates
-                distance_data = st.session_state.processor.calculate_trip_distances(coordinates_data)
-                
-                # Step 7: Analyze state mileage distribution (MISSING STEP!)
-                polylines = (
-                    distance_data.get("trip_polylines", [])
-                    if distance_data.get("calculation_success")
-                    else []
-                )
-                enhanced_distance_data = st.session_state.processor.state_analyzer.add_state_mileage_to_trip_data(
-                    distance_data, polylines
-                )
-                
-                # Use the enhanced data with complete state analysis
-                edited_result['distance_calculations'] = enhanced_distance_data
-                
-                # Compare extracted miles with new calculated miles
-                extracted_miles = edited_result.get('total_miles', '')
-                calculated_miles = enhanced_distance_data.get('total_distance_miles', 0)
-                
-                if extracted_miles and calculated_miles > 0:
-                    try:
-                        extracted_miles_num = float(str(extracted_miles).replace(',', ''))
-                        percentage_diff = abs((extracted_miles_num - calculated_miles) / calculated_miles * 100)
-                        
-                        # Update validation warnings
-                        if 'validation_warnings' not in edited_result:
-                            edited_result['validation_warnings'] = []
-                        
-                        # Remove old distance warnings
-                        edited_result['validation_warnings'] = [
-                            w for w in edited_result['validation_warnings'] 
-                            if not w.startswith("Suspicious total miles:")
-                        ]
-                        
-                        # Add new warning if needed
-                        if percentage_diff > 5:
-                            warning = f"Suspicious total miles: extracted ({extracted_miles_num}) differs from calculated ({calculated_miles:.1f}) by {percentage_diff:.1f}%"
-                            edited_result['validation_warnings'].append(warning)
-                    except ValueError:
-                        pass
-                
-                # Update session state
-                st.session_state[f"edited_{source_image}"] = edited_result
-                
-                # Also update the main processing results
-                for i, result in enumerate(st.session_state.processing_results):
-                    if result.get('source_image') == source_image:
-                        st.session_state.processing_results[i] = edited_result.copy()
-                        break
-                
-                st.success(f"✅ Distances recalculated successfully for {source_image}!")
-                
-                # Display summary of new calculations before refresh
-                if enhanced_distance_data.get('calculation_success'):
-                    st.info(f"📊 New calculated distance: **{calculated_miles} miles** with {enhanced_distance_data.get('successful_calculations', 0)} successful route calculations")
-                    
-                    # Show state mileage summary
-                    if enhanced_distance_data.get('state_mileage'):
-                        state_summary = ", ".join([f"{s['state']}: {s['miles']}mi" for s in enhanced_distance_data['state_mileage'][:3]])
-                        if len(enhanced_distance_data['state_mileage']) > 3:
-                            state_summary += f" + {len(enhanced_distance_data['state_mileage']) - 3} more states"
-                        st.info(f"🇺🇸 State breakdown: {state_summary}")
-                else:
-                    st.warning("⚠️ Distance recalculation completed but some routes failed")
-                
-                st.balloons()
-                
-                # Force UI refresh to show updated data
-                time.sleep(0.5)  # Brief pause to ensure state is updated
-                st.rerun()
-            else:
-                st.error("❌ Failed to get coordinates for the edited locations")
+            recalculation = st.session_state.processor.recalculate_distances(edited_result, use_here_api)
+        
+        if not recalculation.get('recalculation_success'):
+            st.error(f"❌ Error recalculating distances: {recalculation.get('error', 'Unknown error')}")
+            return
+        
+        # Store the recalculated fields in the edit diff (the original result is kept for reset)
+        edits.update(recalculation['patch'])
+        st.session_state[f"edited_{source_image}"] = edits
+        bump_results_version()
+        
+        # Summary shown in the card after the rerun
+        distance_data = recalculation['patch']['distance_calculations']
+        calculated_miles = distance_data.get('total_distance_miles', 0)
+        if distance_data.get('calculation_success'):
+            notice = (
+                f"✅ Distances recalculated: **{calculated_miles} miles** "
+                f"({recalculation['rerouted_legs']} legs rerouted, {recalculation['reused_legs']} reused)"
+            )
+            if distance_data.get('state_mileage'):
+                state_summary = ", ".join([f"{s['state']}: {s['miles']}mi" for s in distance_data['state_mileage'][:3]])
+                if len(distance_data['state_mileage']) > 3:
+                    state_summary += f" + {len(distance_data['state_mileage']) - 3} more states"
+                notice += f" — {state_summary}"
+            st.session_state[f"recalc_notice_{source_image}"] = ('success', notice)
+        else:
+            st.session_state[f"recalc_notice_{source_image}"] = ('warning', "⚠️ Distance recalculation completed but some routes failed")
+        
+        # Refresh the page to show the updated data
+        st.rerun()
                 
     except Exception as e:
         st.error(f"❌ Error recalculating distances: {str(e)}")
@@ -1684,18 +1312,38 @@ def get_current_results_with_edits():
     for result in st.session_state.processing_results:
         source_image = result.get('source_image', '')
         
-        # Check if there's an edited version in session state
+        # Edits are stored as a diff against the original result
         edited_key = f"edited_{source_image}"
         if edited_key in st.session_state:
-            # Use the edited version
-            edited_result = st.session_state[edited_key].copy()
-            current_results.append(edited_result)
+            current_results.append(apply_result_edits(result, st.session_state[edited_key]))
         else:
             # Use the original result
             current_results.append(result.copy())
     
     return current_results
 
+def get_result_edits():
+    """Get the edit diffs of this session, keyed by source image"""
+    return {
+        key[len('edited_'):]: st.session_state[key]
+        for key in list(st.session_state.keys())
+        if isinstance(key, str) and key.startswith('edited_')
+    }
+
+def clear_result_edits():
+    """Drop all edit diffs (called when a new batch replaces the results)"""
+    for key in list(st.session_state.keys()):
+        if isinstance(key, str) and key.startswith(('edited_', 'editing_')):
+            del st.session_state[key]
+    st.session_state.pop('dashboard_page', None)
+
+def find_original_result(source_image):
+    """Get the unedited processing result for a source image"""
+    for result in st.session_state.processing_results:
+        if result.get('source_image') == source_image:
+            return result
+    return None
+
 def debug_result_state_data(result, source_image):
     """Debug function to show what state data is available"""
     st.write(f"**Debug info for {source_image}:**")
@@ -1720,6 +1368,104 @@ def debug_result_state_data(result, source_image):
     else:
         st.write("- Root level state_mileage: None")
 
+def get_results_version():
+    """Version of this session's result set (bumped whenever results are processed or edited)"""
+    return st.session_state.get('results_version', 0)
+
+def bump_results_version():
+    """Mark the result set as changed so cached exports are rebuilt"""
+    st.session_state.results_version = get_results_version() + 1
+
+def get_cached_export(export_format, include_failed, build):
+    """
+    Get an export, building it only once per format and result set version
+    
+    Args:
+        export_format: Export format name
+        include_failed: Whether failed results are included
+        build: Function returning the export (called on a cache miss)
+    
+    Returns:
+        Whatever build() returned for the current result set
+    """
+    version = get_results_version()
+    cache = st.session_state.get('export_cache')
+    if not cache or cache['version'] != version:
+        # Exports of older versions can no longer be requested
+        cache = {'version': version, 'exports': {}}
+        st.session_state.export_cache = cache
+    
+    key = (export_format, include_failed)
+    if key not in cache['exports']:
+        cache['exports'][key] = build()
+    return cache['exports'][key]
+
+def get_results_store():
+    """Results store of the current results (with edits), rebuilt once per result set version"""
+    version = get_results_version()
+    cached = st.session_state.get('results_store')
+    if not cached or cached['version'] != version:
+        if cached:
+            cached['store'].close()
+        store = ResultsStore()
+        edited_sources = [source for source, diff in get_result_edits().items() if diff]
+        store.load_results(get_current_results_with_edits(), edited_sources)
+        cached = {'version': version, 'store': store}
+        st.session_state.results_store = cached
+    return cached['store']
+
+def results_have_format4():
+    """Whether any current result is Format 4, checked once per result set version"""
+    version = get_results_version()
+    memo = st.session_state.get('format4_memo')
+    if not memo or memo['version'] != version:
+        memo = {'version': version, 'value': bool(get_results_store().query_packets(format_prefix='Format 4'))}
+        st.session_state.format4_memo = memo
+    return memo['value']
+
+def filter_export_results(include_failed):
+    """Get the current results (with edits) to export"""
+    results = get_current_results_with_edits()
+    return results if include_failed else [r for r in results if r.get('processing_success')]
+
+def build_json_export(include_failed):
+    """Build the JSON export and its preview"""
+    filtered_results = filter_export_results(include_failed)
+    return {
+        'count': len(filtered_results),
+        'data': json.dumps(filtered_results, indent=2, ensure_ascii=False),
+        'preview': filtered_results[:2]
+    }
+
+def build_format4_export(export_format, include_failed):
+    """Build a Format 4 export (Excel or CSV) and its preview DataFrame"""
+    filtered_results = filter_export_results(include_failed)
+    headers, rows, message = build_format4_export_rows(filtered_results)
+    df = format4_export_dataframe(headers, rows, message)
+    
+    if export_format == "Excel (Format 4)":
+        data = write_excel_sheets({'Format 4 Route Details': df})
+    else:
+        data = f"{message}\n" if message else rows_to_csv(rows, headers)
+    return {'count': len(filtered_results), 'data': data, 'preview': df}
+
+def build_standard_export(export_format, include_failed):
+    """Build a standard export (Excel, distance CSV or fuel CSV) and its preview DataFrames"""
+    store = get_results_store()
+    exported_count = len(store.query_packets(successful_only=not include_failed))
+    distance_rows = build_distance_export_rows(store, include_failed)
+    fuel_rows = build_fuel_export_rows(store, include_failed)
+    distance_df = pd.DataFrame(distance_rows, columns=DISTANCE_EXPORT_FIELDS)
+    fuel_df = pd.DataFrame(fuel_rows, columns=FUEL_EXPORT_FIELDS)
+    
+    if export_format == "Excel":
+        data = write_excel_sheets(standard_excel_sheets(distance_df, fuel_df))
+    elif export_format == "CSV (Distance)":
+        data = rows_to_csv(distance_rows, DISTANCE_EXPORT_FIELDS)
+    else:
+        data = rows_to_csv(fuel_rows, FUEL_EXPORT_FIELDS)
+    return {'count': exported_count, 'data': data, 'distance_preview': distance_df, 'fuel_preview': fuel_df}
+
 def export_data_tab():
     """Export data tab"""
     st.header("💾 Export Data")
@@ -1728,14 +1474,8 @@ def export_data_tab():
         st.info("No results available. Please process some images first.")
         return
     
-    # Get the most current results (including any edited values)
-    results = get_current_results_with_edits()
-    
     # Check if we have Format 4 data
-    format4_results = [r for r in results if r.get('format_type', '').startswith('Format 4')]
-    has_format4 = len(format4_results) > 0
-    
-    if has_format4:
+    if results_have_format4():
         st.info("🚛 **Format 4 (Load-based Route Data) Detected**")
         st.write("Format 4 uses a different export structure where each route is expanded into multiple rows - one per state.")
         
@@ -1756,45 +1496,45 @@ def export_data_tab():
                 help="Include routes that failed to process"
             )
         
-        # Filter results
-        filtered_results = results if include_failed else [r for r in results if r.get('processing_success')]
+        # Exports are rebuilt only when the results change
+        if export_format == "JSON":
+            export = get_cached_export(export_format, include_failed, lambda: build_json_export(include_failed))
+        else:
+            export = get_cached_export(export_format, include_failed, lambda: build_format4_export(export_format, include_failed))
         
-        if not filtered_results:
+        if not export['count']:
             st.warning("No results to export with current filters.")
             return
         
-        # Generate export data for Format 4
+        # Download the Format 4 export
         if export_format == "Excel (Format 4)":
-            export_data = generate_format4_excel_export(filtered_results)
             filename = f"format4_route_details_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             
             st.download_button(
                 label="📥 Download Format 4 Excel",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
         
         elif export_format == "CSV (Format 4)":
-            export_data = generate_format4_csv_export(filtered_results)
             filename = f"format4_route_details_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
             st.download_button(
                 label="📥 Download Format 4 CSV",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="text/csv",
                 use_container_width=True
             )
         
         elif export_format == "JSON":
-            export_data = json.dumps(filtered_results, indent=2, ensure_ascii=False)
             filename = f"format4_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
             st.download_button(
                 label="📥 Download JSON",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="application/json",
                 use_container_width=True
@@ -1804,19 +1544,18 @@ def export_data_tab():
         st.subheader("👀 Format 4 Data Preview")
         
         if export_format in ["Excel (Format 4)", "CSV (Format 4)"]:
-            csv_data = generate_format4_csv_export(filtered_results)
-            if not csv_data.startswith("No Format 4 data") and not csv_data.startswith("Error"):
-                df = pd.read_csv(io.StringIO(csv_data))
+            df = export['preview']
+            if 'Error' not in df.columns:
                 st.write("**Format 4 Route Details Preview:**")
                 st.write(f"Each route is expanded into {len(df)} rows (one per state per route)")
                 st.dataframe(df.head(20), use_container_width=True)  # Show first 20 rows
                 if len(df) > 20:
                     st.info(f"Showing first 20 rows out of {len(df)} total rows")
             else:
-                st.error(csv_data)
+                st.error(df['Error'].iloc[0])
         
         elif export_format == "JSON":
-            st.json(filtered_results[:1])  # Show first result as preview
+            st.json(export['preview'][:1])  # Show first result as preview
     
     else:
         # Regular export for other formats
@@ -1839,57 +1578,56 @@ def export_data_tab():
                 help="Include images that failed to process"
             )
         
-        # Filter results
-        filtered_results = results if include_failed else [r for r in results if r.get('processing_success')]
+        # Exports are rebuilt only when the results change
+        if export_format == "JSON":
+            export = get_cached_export(export_format, include_failed, lambda: build_json_export(include_failed))
+        else:
+            export = get_cached_export(export_format, include_failed, lambda: build_standard_export(export_format, include_failed))
         
-        if not filtered_results:
+        if not export['count']:
             st.warning("No results to export with current filters.")
             return
         
-        # Generate export data
+        # Download the export
         if export_format == "Excel":
-            export_data = generate_excel_export(filtered_results)
             filename = f"driver_packet_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
             
             st.download_button(
                 label="📥 Download Excel (Both Sheets)",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
                 use_container_width=True
             )
         
         elif export_format == "CSV (Distance)":
-            export_data = generate_csv_export(filtered_results)
             filename = f"driver_packet_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
             st.download_button(
                 label="📥 Download Distance Data CSV",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="text/csv",
                 use_container_width=True
             )
         
         elif export_format == "CSV (Fuel)":
-            export_data = generate_fuel_csv_export(filtered_results)
             filename = f"gallon_trip_env_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
             
             st.download_button(
                 label="📥 Download Fuel Data CSV",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="text/csv",
                 use_container_width=True
             )
         
         elif export_format == "JSON":
-            export_data = json.dumps(filtered_results, indent=2, ensure_ascii=False)
             filename = f"driver_packet_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
             
             st.download_button(
                 label="📥 Download JSON",
-                data=export_data,
+                data=export['data'],
                 file_name=filename,
                 mime="application/json",
                 use_container_width=True
@@ -1900,220 +1638,126 @@ def export_data_tab():
         
         if export_format == "Excel":
             # For Excel, show previews of both sheets
-            distance_csv_data = generate_csv_export(filtered_results)
-            df_distance = pd.read_csv(io.StringIO(distance_csv_data))
             st.write("**Driver Packet Results Sheet Preview:**")
-            st.dataframe(df_distance, use_container_width=True)
+            st.dataframe(export['distance_preview'], use_container_width=True)
             
-            fuel_csv_data = generate_fuel_csv_export(filtered_results)
-            df_fuel = pd.read_csv(io.StringIO(fuel_csv_data))
-            if not df_fuel.empty:
+            if not export['fuel_preview'].empty:
                 st.write("**Gallon Trip Env Sheet Preview:**")
-                st.dataframe(df_fuel, use_container_width=True)
+                st.dataframe(export['fuel_preview'], use_container_width=True)
             else:
                 st.write("**Gallon Trip Env Sheet:** No fuel data available in processed results")
         
         elif export_format == "CSV (Distance)":
-            df = pd.read_csv(io.StringIO(export_data))
-            st.dataframe(df, use_container_width=True)
+            st.dataframe(export['distance_preview'], use_container_width=True)
         
         elif export_format == "CSV (Fuel)":
-            df = pd.read_csv(io.StringIO(export_data))
-            st.dataframe(df, use_container_width=True)
+            st.dataframe(export['fuel_preview'], use_container_width=True)
         
         elif export_format == "JSON":
-            st.json(filtered_results[:2])  # Show first 2 results as preview
-
-def generate_csv_export(results):
-    """Generate CSV export.
+            st.json(export['preview'][:2])  # Show first 2 results as preview
 
-    Columns: State, Envelop (Page No.), Truck, Trailer, State2, Total Miles
-    """
-    output = io.StringIO()
-
-    # Header as per expected_output.csv
-    fields = ['State', 'Envelop (Page No.)', 'Truck', 'Trailer', 'State2', 'Total Miles']
-    writer = csv.DictWriter(output, fieldnames=fields)
-    writer.writeheader()
+# State abbreviation to full name mapping
+STATE_FULL_NAMES = {
+    'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California', 'CO': 'Colorado',
+    'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho',
+    'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
+    'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
+    'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire',
+    'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota',
+    'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island',
+    'SC': 'South Carolina', 'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
+    'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
+}
 
-    # State abbreviation to full name mapping
-    state_full_names = {
-        'AL': 'Alabama', 'AK': 'Alaska', 'AZ': 'Arizona', 'AR': 'Arkansas', 'CA': 'California', 'CO': 'Colorado',
-        'CT': 'Connecticut', 'DE': 'Delaware', 'FL': 'Florida', 'GA': 'Georgia', 'HI': 'Hawaii', 'ID': 'Idaho',
-        'IL': 'Illinois', 'IN': 'Indiana', 'IA': 'Iowa', 'KS': 'Kansas', 'KY': 'Kentucky', 'LA': 'Louisiana',
-        'ME': 'Maine', 'MD': 'Maryland', 'MA': 'Massachusetts', 'MI': 'Michigan', 'MN': 'Minnesota',
-        'MS': 'Mississippi', 'MO': 'Missouri', 'MT': 'Montana', 'NE': 'Nebraska', 'NV': 'Nevada', 'NH': 'New Hampshire',
-        'NJ': 'New Jersey', 'NM': 'New Mexico', 'NY': 'New York', 'NC': 'North Carolina', 'ND': 'North Dakota',
-        'OH': 'Ohio', 'OK': 'Oklahoma', 'OR': 'Oregon', 'PA': 'Pennsylvania', 'RI': 'Rhode Island',
-        'SC': 'South Carolina', 'SD': 'South Dakota', 'TN': 'Tennessee', 'TX': 'Texas', 'UT': 'Utah', 'VT': 'Vermont',
-        'VA': 'Virginia', 'WA': 'Washington', 'WV': 'West Virginia', 'WI': 'Wisconsin', 'WY': 'Wyoming'
-    }
+DISTANCE_EXPORT_FIELDS = ['State', 'Envelop (Page No.)', 'Truck', 'Trailer', 'State2', 'Total Miles']
+FUEL_EXPORT_FIELDS = ['State', 'Gallons', 'Unit', 'Trip (Page No.)']
 
+def build_distance_export_rows(store, include_failed=True):
+    """Build distance export rows: one per state per packet, then a grand total row
+    
+    Args:
+        store: ResultsStore holding the results to export
+        include_failed: Whether failed packets count towards the fallback page numbers
+    """
+    rows = []
     grand_total = 0
-
-    for idx, result in enumerate(results, start=1):
-        if not result.get('processing_success'):
-            continue
-
-        # Pull truck/unit and trailer from extracted data
-        truck = result.get('unit', '')
-        trailer = result.get('trailer', '')
-        
-        # Extract page number from image filename if available
-        source_image = result.get('source_image', '')
-        page_number = idx  # Default to sequential numbering
-        
-        # Try to extract page number from filename (e.g., "Page_8", "Page 8", or any number)
-        import re
-        page_match = re.search(r'[Pp]age[_\s]*(\d+)', source_image)
-        if not page_match:
-            # Try to find any number in the filename as fallback
-            page_match = re.search(r'(\d+)', source_image)
+    
+    for item in store.state_mileage_rows(include_failed):
+        # Page number from the file name, or the packet's position in the export
+        page_number = item['page_number'] if item['page_number'] is not None else item['export_index']
+        truck = item['unit'] if item['unit'] is not None else ''
+        trailer = item['trailer'] if item['trailer'] is not None else ''
         
-        if page_match:
-            try:
-                page_number = int(page_match.group(1))
-            except ValueError:
-                pass  # Use default sequential numbering
-
-        # Determine state mileage list
-        state_mileage_data = None
-        dc = result.get('distance_calculations', {})
-        if isinstance(dc, dict) and dc.get('state_mileage'):
-            state_mileage_data = dc['state_mileage']
-        elif result.get('state_mileage'):
-            state_mileage_data = result['state_mileage']
-        else:
-            state_mileage_data = []
-
         # If no state mileage data, create a placeholder row to ensure the result appears
-        if not state_mileage_data:
-            # Add a row with basic info but no state data
-            writer.writerow({
+        if item['state'] is None:
+            rows.append({
                 'State': 'NO_STATE_DATA',
                 'Envelop (Page No.)': page_number,
                 'Truck': truck,
                 'Trailer': trailer,
-                'State2': '',
+                'State2': None,
                 'Total Miles': 0
             })
             continue
-
-        # Write one row per state
-        for state_item in state_mileage_data:
-            abbr = state_item.get('state', '')
-            miles = state_item.get('miles', 0) or 0
-            try:
-                miles_int = int(round(float(miles)))
-            except Exception:
-                miles_int = 0
-
-            full_name = state_full_names.get(abbr, abbr)
-
-            writer.writerow({
-                'State': full_name,
-                'Envelop (Page No.)': page_number,
-                'Truck': truck,
-                'Trailer': trailer,
-                'State2': abbr,
-                'Total Miles': miles_int
-            })
-
-            grand_total += miles_int
-
-    # Final total row with only Total Miles populated
-    writer.writerow({'State': '', 'Envelop (Page No.)': '', 'Truck': '', 'Trailer': '', 'State2': '', 'Total Miles': grand_total})
-
-    return output.getvalue()
-
-def generate_fuel_csv_export(results):
-    """Generate Gallon Trip Env CSV export.
-    
-    Columns: State, Gallons, Unit, Trip (Page No.)
-    """
-    output = io.StringIO()
-    
-    # Header as per plan requirements
-    fields = ['State', 'Gallons', 'Unit', 'Trip (Page No.)']
-    writer = csv.DictWriter(output, fieldnames=fields)
-    writer.writeheader()
-    
-    for idx, result in enumerate(results, start=1):
-        if not result.get('processing_success'):
-            continue
-        
-        # Get unit and trip info
-        unit = result.get('unit', '')
-        
-        # Extract page number from image filename if available
-        source_image = result.get('source_image', '')
-        page_number = idx  # Default to sequential numbering
         
-        # Try to extract page number from filename (e.g., "Page_8", "Page 8", or any number)
-        import re
-        page_match = re.search(r'[Pp]age[_\s]*(\d+)', source_image)
-        if not page_match:
-            # Try to find any number in the filename as fallback
-            page_match = re.search(r'(\d+)', source_image)
+        # One row per state
+        abbr = item['state']
+        miles_int = int(round(item['miles'] or 0))
+        rows.append({
+            'State': STATE_FULL_NAMES.get(abbr, abbr),
+            'Envelop (Page No.)': page_number,
+            'Truck': truck,
+            'Trailer': trailer,
+            'State2': abbr,
+            'Total Miles': miles_int
+        })
         
-        if page_match:
-            try:
-                page_number = int(page_match.group(1))
-            except ValueError:
-                pass  # Use default sequential numbering
-        
-        # Get fuel data
-        fuel_by_state = result.get('fuel_by_state', {})
-        
-        # Write one row per state with fuel purchases
-        for state_abbr, gallons in fuel_by_state.items():
-            writer.writerow({
-                'State': state_abbr,
-                'Gallons': round(gallons, 1),  # Round to 1 decimal place
-                'Unit': unit,
-                'Trip (Page No.)': page_number
-            })
+        grand_total += miles_int
     
-    return output.getvalue()
+    # Final total row with only Total Miles populated
+    rows.append({'State': None, 'Envelop (Page No.)': None, 'Truck': None, 'Trailer': None, 'State2': None, 'Total Miles': grand_total})
+    
+    return rows
 
-def generate_format4_csv_export(results):
-    """Generate Format 4 specific CSV export with expanded route data.
+def build_fuel_export_rows(store, include_failed=True):
+    """Build Gallon Trip Env rows: one per state with fuel purchases per packet
     
-    For Format 4, each route gets expanded into multiple rows - one per state.
-    Columns: Original CSV columns + State + Miles (for that state)
+    Args:
+        store: ResultsStore holding the results to export
+        include_failed: Whether failed packets count towards the fallback page numbers
     """
-    output = io.StringIO()
+    return [
+        {
+            'State': item['state'],
+            'Gallons': round(item['gallons'], 1),  # Round to 1 decimal place
+            'Unit': item['unit'] if item['unit'] is not None else '',
+            'Trip (Page No.)': item['page_number'] if item['page_number'] is not None else item['export_index']
+        }
+        for item in store.fuel_rows(include_failed)
+    ]
+
+def build_format4_export_rows(results):
+    """Build Format 4 export rows: original CSV columns + State + Miles, one row per state per route
     
+    Returns:
+        Tuple of (headers, rows, message); message explains why there is nothing
+        to export and is None otherwise
+    """
     # Find Format 4 results
     format4_results = [r for r in results if r.get('format_type', '').startswith('Format 4')]
     
     if not format4_results:
-        # No Format 4 data, return empty CSV
-        output.write("No Format 4 data available\n")
-        return output.getvalue()
+        return None, [], "No Format 4 data available"
     
     # Get the first Format 4 result to determine structure
-    format4_result = format4_results[0]
-    route_details = format4_result.get('route_details', [])
+    route_details = format4_results[0].get('route_details', [])
     
     if not route_details:
-        output.write("No route details available\n")
-        return output.getvalue()
-    
-    # Determine CSV headers by looking at successful route data
-    # We need to reconstruct the original CSV structure plus State and Miles columns
-    sample_route = None
-    for route in route_details:
-        if route.get('success') and route.get('load_no'):
-            sample_route = route
-            break
-    
-    if not sample_route:
-        output.write("No successful routes found\n")
-        return output.getvalue()
-    
-    # Read the original CSV to get all column names and data
-    # We'll need to match load numbers to get the original row data
+        return None, [], "No route details available"
+    
+    if not any(route.get('success') and route.get('load_no') for route in route_details):
+        return None, [], "No successful routes found"
+    
     try:
         # Get the original CSV headers from the first successful route
         sample_route = None
@@ -2123,8 +1767,7 @@ def generate_format4_csv_export(results):
                 break
         
         if not sample_route:
-            output.write("No successful routes with original data found\n")
-            return output.getvalue()
+            return None, [], "No successful routes with original data found"
         
         # Get original CSV headers and add State and Miles columns
         original_headers = list(sample_route['original_row_data'].keys())
@@ -2132,69 +1775,95 @@ def generate_format4_csv_export(results):
         # Create new headers: original columns + State + Miles (replacing the empty Miles column if it exists)
         if 'Miles' in original_headers:
             # Replace the existing Miles column position
-            new_headers = []
+            headers = []
             for header in original_headers:
                 if header == 'Miles':
-                    new_headers.extend(['State', 'Miles'])
+                    headers.extend(['State', 'Miles'])
                 else:
-                    new_headers.append(header)
+                    headers.append(header)
         else:
             # Add State and Miles at the end
-            new_headers = original_headers + ['State', 'Miles']
+            headers = original_headers + ['State', 'Miles']
         
-        writer = csv.DictWriter(output, fieldnames=new_headers)
-        writer.writeheader()
-        
-        # Process each successful route
+        rows = []
         for route in route_details:
             if not route.get('success') or not route.get('original_row_data'):
                 continue
-                
-            original_data = route['original_row_data']
-            state_mileage = route.get('state_mileage', [])
             
-            # Create one row per state for this route
-            for state_data in state_mileage:
-                state_code = state_data.get('state', '')
-                miles = state_data.get('miles', 0)
-                
-                # Create new row with original data + state info
-                new_row = original_data.copy()
-                new_row['State'] = state_code
-                new_row['Miles'] = miles
-                
-                writer.writerow(new_row)
+            # Create one row per state for this route with original data + state info
+            for state_data in route.get('state_mileage', []):
+                new_row = route['original_row_data'].copy()
+                new_row['State'] = state_data.get('state', '')
+                new_row['Miles'] = state_data.get('miles', 0)
+                rows.append(new_row)
         
-        return output.getvalue()
+        return headers, rows, None
         
     except Exception as e:
-        output.write(f"Error generating Format 4 CSV: {str(e)}\n")
-        return output.getvalue()
+        return None, [], f"Error generating Format 4 CSV: {str(e)}"
 
-def generate_format4_excel_export(results):
-    """Generate Format 4 specific Excel export"""
-    output = io.BytesIO()
-    
-    # Generate CSV data first
-    csv_data = generate_format4_csv_export(results)
+def rows_to_csv(rows, fields):
+    """Write export rows as CSV text"""
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fields)
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue()
+
+def generate_csv_export(results):
+    """Generate CSV export.
+
+    Columns: State, Envelop (Page No.), Truck, Trailer, State2, Total Miles
+    """
+    return rows_to_csv(build_distance_export_rows(ResultsStore.from_results(results)), DISTANCE_EXPORT_FIELDS)
+
+def generate_fuel_csv_export(results):
+    """Generate Gallon Trip Env CSV export.
     
-    # Convert to DataFrame
-    if csv_data.startswith("No Format 4 data") or csv_data.startswith("Error"):
-        # Handle error cases
-        df = pd.DataFrame({'Error': [csv_data.strip()]})
-    else:
-        df = pd.read_csv(io.StringIO(csv_data))
+    Columns: State, Gallons, Unit, Trip (Page No.)
+    """
+    return rows_to_csv(build_fuel_export_rows(ResultsStore.from_results(results)), FUEL_EXPORT_FIELDS)
+
+def generate_format4_csv_export(results):
+    """Generate Format 4 specific CSV export with expanded route data.
     
-    # Write to Excel
+    For Format 4, each route gets expanded into multiple rows - one per state.
+    Columns: Original CSV columns + State + Miles (for that state)
+    """
+    headers, rows, message = build_format4_export_rows(results)
+    if message:
+        return f"{message}\n"
+    return rows_to_csv(rows, headers)
+
+def format4_export_dataframe(headers, rows, message):
+    """Format 4 route details DataFrame (an Error column when there is nothing to export)"""
+    if message:
+        return pd.DataFrame({'Error': [message]})
+    return pd.DataFrame(rows, columns=headers)
+
+def write_excel_sheets(sheets):
+    """Write DataFrames to an xlsx workbook, one sheet per entry"""
+    output = io.BytesIO()
     with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Format 4 Route Details', index=False)
-    
+        for sheet_name, df in sheets.items():
+            df.to_excel(writer, sheet_name=sheet_name, index=False)
     return output.getvalue()
 
+def standard_excel_sheets(distance_df, fuel_df):
+    """Sheets of the standard Excel export (the fuel sheet only when there is fuel data)"""
+    sheets = {'Driver Packet Results': distance_df}
+    if not fuel_df.empty:
+        sheets['Gallon Trip Env'] = fuel_df
+    return sheets
+
+def generate_format4_excel_export(results):
+    """Generate Format 4 specific Excel export"""
+    headers, rows, message = build_format4_export_rows(results)
+    df = format4_export_dataframe(headers, rows, message)
+    return write_excel_sheets({'Format 4 Route Details': df})
+
 def generate_excel_export(results):
     """Generate Excel export data with multiple sheets"""
-    output = io.BytesIO()
-    
     # Check if we have Format 4 data
     format4_results = [r for r in results if r.get('format_type', '').startswith('Format 4')]
     
@@ -2202,20 +1871,11 @@ def generate_excel_export(results):
         # Use Format 4 specific export
         return generate_format4_excel_export(results)
     
-    # Generate both CSV data for regular formats
-    distance_csv_data = generate_csv_export(results)
-    fuel_csv_data = generate_fuel_csv_export(results)
-    
-    # Create dataframes
-    distance_df = pd.read_csv(io.StringIO(distance_csv_data))
-    fuel_df = pd.read_csv(io.StringIO(fuel_csv_data))
-    
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        distance_df.to_excel(writer, sheet_name='Driver Packet Results', index=False)
-        if not fuel_df.empty:
-            fuel_df.to_excel(writer, sheet_name='Gallon Trip Env', index=False)
-    
-    return output.getvalue()
+    # Build both sheets from the flattened result records
+    store = ResultsStore.from_results(results)
+    distance_df = pd.DataFrame(build_distance_export_rows(store), columns=DISTANCE_EXPORT_FIELDS)
+    fuel_df = pd.DataFrame(build_fuel_export_rows(store), columns=FUEL_EXPORT_FIELDS)
+    return write_excel_sheets(standard_excel_sheets(distance_df, fuel_df))
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
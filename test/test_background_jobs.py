@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the background job runner
+Tests concurrent image processing, partial results and cancellation with a fake processor
+"""
+
+import os
+import sys
+import threading
+import time
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.background_jobs import BackgroundJobRunner, process_image_bytes
+
+
+class FakeProcessor:
+    """Processor stand-in that records the files it sees and can block per image"""
+
+    def __init__(self, blocked=(), failing=()):
+        self.blocked = set(blocked)
+        self.failing = set(failing)
+        self.release = threading.Event()
+        self.seen = []
+
+    def process_image_with_distances(self, image, use_here_api=True, source_name=None):
+        content = image.decode()
+        self.seen.append((source_name, content))
+
+        if content in self.blocked:
+            self.release.wait(timeout=5)
+        if content in self.failing:
+            raise RuntimeError(f"cannot read {content}")
+        return {"processing_success": True, "content": content, "source_image": source_name}
+
+
+def wait_for(runner, job_id, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = runner.get_job(job_id)
+        if condition(job):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"Job did not reach expected state: {runner.get_job(job_id)}")
+
+
+@pytest.fixture
+def runner():
+    runner = BackgroundJobRunner(max_workers=2)
+    yield runner
+    runner.shutdown()
+
+
+@pytest.mark.unit
+class TestBackgroundJobRunner:
+    """Test job records published by the background runner"""
+
+    def test_results_in_upload_order(self, runner):
+        processor = FakeProcessor()
+        uploads = [(f"page{i}.jpg", f"image {i}".encode()) for i in range(6)]
+
+        job_id = runner.submit_images(processor, uploads)
+        job = wait_for(runner, job_id, lambda j: j["status"] == "completed")
+
+        assert [r["source_image"] for r in job["results"]] == [name for name, _ in uploads]
+        assert [r["content"] for r in job["results"]] == [f"image {i}" for i in range(6)]
+        assert job["completed"] == job["successful"] == 6
+        assert job["in_progress"] == []
+        assert job["finished_at"] is not None
+
+    def test_partial_results_while_work_continues(self, runner):
+        processor = FakeProcessor(blocked={"slow"})
+        uploads = [("slow.jpg", b"slow"), ("a.jpg", b"a"), ("b.jpg", b"b")]
+
+        job_id = runner.submit_images(processor, uploads)
+        job = wait_for(runner, job_id, lambda j: j["completed"] == 2)
+
+        assert job["status"] == "running"
+        assert job["results"][0] is None
+        assert job["in_progress"] == ["slow.jpg"]
+        assert [r["source_image"] for r in job["results"][1:]] == ["a.jpg", "b.jpg"]
+
+        processor.release.set()
+        job = wait_for(runner, job_id, lambda j: j["status"] == "completed")
+        assert job["results"][0]["source_image"] == "slow.jpg"
+
+    def test_failures_become_failed_results(self, runner):
+        processor = FakeProcessor(failing={"bad"})
+
+        job_id = runner.submit_images(processor, [("good.jpg", b"good"), ("bad.jpg", b"bad")])
+        job = wait_for(runner, job_id, lambda j: j["status"] == "completed")
+
+        assert job["successful"] == 1 and job["failed"] == 1
+        assert job["results"][1] == {"source_image": "bad.jpg", "processing_success": False, "error": "cannot read bad"}
+
+    def test_cancel_skips_queued_images(self):
+        runner = BackgroundJobRunner(max_workers=1)
+        processor = FakeProcessor(blocked={"first"})
+        uploads = [("first.jpg", b"first")] + [(f"q{i}.jpg", b"queued") for i in range(5)]
+
+        job_id = runner.submit_images(processor, uploads)
+        wait_for(runner, job_id, lambda j: j["in_progress"] == ["first.jpg"])
+
+        assert runner.cancel_job(job_id)
+        processor.release.set()
+        runner.shutdown(wait=True)
+
+        job = runner.get_job(job_id)
+        assert job["status"] == "cancelled"
+        assert job["completed"] <= 1
+        assert [content for _, content in processor.seen] == ["first"]
+        assert not runner.cancel_job(job_id)
+
+    def test_snapshots_are_isolated(self, runner):
+        job_id = runner.submit_images(FakeProcessor(), [("a.jpg", b"a")])
+        job = wait_for(runner, job_id, lambda j: j["status"] == "completed")
+
+        job["results"].clear()
+
+        assert len(runner.get_job(job_id)["results"]) == 1
+        assert runner.get_job("unknown") is None
+
+    def test_empty_job_completes(self, runner):
+        job_id = runner.submit_images(FakeProcessor(), [])
+
+        assert runner.get_job(job_id)["status"] == "completed"
+
+    def test_finished_jobs_are_pruned(self):
+        runner = BackgroundJobRunner(max_workers=1, max_jobs=2)
+        job_ids = [runner.submit_images(FakeProcessor(), []) for _ in range(4)]
+
+        assert runner.get_job(job_ids[0]) is None
+        assert runner.get_job(job_ids[-1]) is not None
+        runner.shutdown()
+
+
+@pytest.mark.unit
+class TestProcessImageBytes:
+    """Test processing of an in-memory upload"""
+
+    def test_bytes_passed_with_source_name(self):
+        processor = FakeProcessor()
+
+        result = process_image_bytes(processor, "scan.jpeg", b"content")
+
+        assert processor.seen == [("scan.jpeg", "content")]
+        assert result["source_image"] == "scan.jpeg"
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Tests for the pipeline benchmark harness
+Runs a tiny workload against the local stand-in services
+"""
+
+import os
+import sys
+import pytest
+from PIL import Image
+
+# Add project root and benchmarks folder to path for imports
+PROJECT_ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'benchmarks'))
+
+from benchmark_pipeline import compare_reports, run_benchmark
+
+
+@pytest.mark.integration
+class TestPipelineBenchmark:
+    """Test benchmark report generation"""
+
+    def test_report_contents(self, tmp_path):
+        for i in range(2):
+            Image.new("RGB", (120, 160), (40 * i, 80, 120)).save(tmp_path / f"page_{i}.jpg")
+
+        report = run_benchmark(str(tmp_path), scale=2)
+
+        assert report["images"] == 4
+        assert report["successful"] == 4
+        assert report["images_per_minute"] > 0
+        assert report["external_calls"]["gemini"]["calls"] == 4
+        assert report["stage_latency"]["extraction"]["count"] == 4
+        assert {"p50_ms", "p95_ms", "p99_ms"} <= set(report["stage_latency"]["total"])
+
+        lines = compare_reports(report, report)
+        assert lines[0].endswith("(+0.0%)")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Gemini data extractor
+Tests targeted field re-extraction without calling the real Gemini API
+"""
+
+import json
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock
+from PIL import Image
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.data_extractor import GeminiDataExtractor
+from src.data_validator import DataValidator
+from src.logging_utils import get_logger
+
+
+def make_extractor(response_text):
+    """Build an extractor with a mocked Gemini model (skips model probing)"""
+    extractor = GeminiDataExtractor.__new__(GeminiDataExtractor)
+    extractor.logger = get_logger()
+    extractor.model = MagicMock()
+    extractor.model.generate_content.return_value = MagicMock(text=response_text)
+    extractor.extraction_prompt = extractor._build_extraction_prompt()
+    return extractor
+
+
+@pytest.fixture
+def packet_image(tmp_path):
+    """Create a small blank packet image"""
+    image_path = tmp_path / "packet_Page_01.jpg"
+    Image.new("RGB", (400, 600), "white").save(image_path)
+    return str(image_path)
+
+
+@pytest.mark.unit
+class TestSelectiveReextraction:
+    """Test re-extraction of individual fields"""
+
+    def setup_method(self):
+        self.existing = {
+            'source_image': 'packet_Page_01.jpg',
+            'extraction_success': True,
+            'drivers_name': 'JOHN DOE',
+            'trailer': '7X1',
+            'total_miles': '23513',
+        }
+
+    def test_merges_only_requested_fields(self, packet_image):
+        extractor = make_extractor(json.dumps({
+            'trailer': '211',
+            'total_miles': '2351',
+            'drivers_name': 'SOMEONE ELSE',
+        }))
+
+        result = extractor.reextract_fields(
+            packet_image, ['trailer', 'total_miles'], self.existing
+        )
+
+        assert result['extraction_success'] is True
+        assert result['trailer'] == '211'
+        assert result['total_miles'] == '2351'
+        assert result['drivers_name'] == 'JOHN DOE'
+        assert result['reextraction_updated_fields'] == ['trailer', 'total_miles']
+        # Original record is not mutated
+        assert self.existing['trailer'] == '7X1'
+
+    def test_prompt_is_compact(self, packet_image):
+        extractor = make_extractor('```json\n{"trailer": "211"}\n```')
+
+        extractor.reextract_fields(packet_image, ['trailer'], self.existing)
+
+        prompt = extractor.model.generate_content.call_args[0][0][0]
+        assert '"trailer"' in prompt
+        assert '"total_miles"' not in prompt
+        assert len(prompt) < len(extractor.extraction_prompt) / 5
+
+    def test_empty_answer_keeps_previous_value(self, packet_image):
+        extractor = make_extractor('{"total_miles": ""}')
+
+        result = extractor.reextract_fields(packet_image, ['total_miles'], self.existing)
+
+        assert result['total_miles'] == '23513'
+        assert result['reextraction_updated_fields'] == []
+
+    def test_crop_box_sends_region(self, packet_image):
+        extractor = make_extractor('{"total_miles": "2351"}')
+
+        extractor.reextract_fields(
+            packet_image, ['total_miles'], self.existing, crop_box=(0, 0.75, 1, 1)
+        )
+
+        sent_image = extractor.model.generate_content.call_args[0][0][1]
+        assert sent_image.size == (400, 150)
+
+    def test_unknown_field_rejected(self, packet_image):
+        extractor = make_extractor('{}')
+
+        result = extractor.reextract_fields(packet_image, ['not_a_field'], self.existing)
+
+        assert result['extraction_success'] is False
+        extractor.model.generate_content.assert_not_called()
+
+    def test_invalid_json_reports_error(self, packet_image):
+        extractor = make_extractor('not json')
+
+        result = extractor.reextract_fields(packet_image, ['trailer'], self.existing)
+
+        assert result['extraction_success'] is False
+        assert 'JSON parsing error' in result['error']
+        assert result['trailer'] == '7X1'
+        # The call still used tokens, so it must reach the usage accounting
+        assert 'reextraction_usage' in result
+
+
+@pytest.mark.unit
+class TestInMemoryExtraction:
+    """Test extraction from images that are not on disk"""
+
+    def test_extract_from_pil_image(self):
+        extractor = make_extractor('{"drivers_name": "JOHN DOE"}')
+        page = Image.new("RGB", (100, 100), "white")
+
+        result = extractor.extract_data_from_image(page, "envelope_Page_03")
+
+        assert result['extraction_success'] is True
+        assert result['source_image'] == "envelope_Page_03"
+        assert result['drivers_name'] == "JOHN DOE"
+        assert extractor.model.generate_content.call_args[0][0][1] is page
+
+    def test_extract_data_from_path_uses_same_core(self, packet_image):
+        extractor = make_extractor('{"drivers_name": "JOHN DOE"}')
+
+        result = extractor.extract_data(packet_image)
+
+        assert result['extraction_success'] is True
+        assert result['source_image'] == "packet_Page_01.jpg"
+
+    def test_extract_data_from_bytes(self, packet_image):
+        extractor = make_extractor('{"drivers_name": "JOHN DOE"}')
+        with open(packet_image, "rb") as f:
+            data = f.read()
+
+        result = extractor.extract_data(data, source_name="upload.jpg")
+
+        assert result['extraction_success'] is True
+        assert result['source_image'] == "upload.jpg"
+        assert extractor.model.generate_content.call_args[0][0][1].size == (400, 600)
+
+    def test_extract_data_from_file_like_uses_its_name(self, packet_image):
+        extractor = make_extractor('{"drivers_name": "JOHN DOE"}')
+
+        with open(packet_image, "rb") as f:
+            result = extractor.extract_data(f)
+
+        assert result['extraction_success'] is True
+        assert result['source_image'] == "packet_Page_01.jpg"
+
+    def test_extract_data_from_pil_image(self):
+        extractor = make_extractor('{"drivers_name": "JOHN DOE"}')
+        page = Image.new("RGB", (100, 100), "white")
+
+        result = extractor.extract_data(page, source_name="scan_03")
+
+        assert result['source_image'] == "scan_03"
+        assert extractor.model.generate_content.call_args[0][0][1] is page
+
+    def test_undecodable_bytes_fail_cleanly(self):
+        extractor = make_extractor('{}')
+
+        result = extractor.extract_data(b"not an image")
+
+        assert result['extraction_success'] is False
+        assert result['error'].startswith("Error loading image")
+        assert result['source_image'] == "uploaded_image"
+        extractor.model.generate_content.assert_not_called()
+
+
+@pytest.mark.unit
+class TestUsageAccounting:
+    """Test token and latency capture from Gemini responses"""
+
+    def test_usage_recorded_in_result(self):
+        extractor = make_extractor('{"drivers_name": "JOHN DOE"}')
+        extractor.model.model_name = "models/gemini-2.5-flash"
+        extractor.model.generate_content.return_value.usage_metadata = MagicMock(
+            prompt_token_count=3000, candidates_token_count=400, total_token_count=3400
+        )
+
+        result = extractor.extract_data_from_image(Image.new("RGB", (10, 10)), "page")
+
+        usage = result['extraction_usage']
+        assert usage['model'] == "gemini-2.5-flash"
+        assert usage['prompt_tokens'] == 3000
+        assert usage['output_tokens'] == 400
+        assert usage['total_tokens'] == 3400
+        assert usage['latency_seconds'] >= 0
+        assert usage['estimated_cost_usd'] == pytest.approx(
+            (3000 * 0.30 + 400 * 2.50) / 1_000_000
+        )
+
+    def test_usage_kept_when_json_fails(self):
+        extractor = make_extractor('not json')
+
+        result = extractor.extract_data_from_image(Image.new("RGB", (10, 10)), "page")
+
+        assert result['extraction_success'] is False
+        assert result['extraction_usage']['total_tokens'] == 0
+
+
+@pytest.mark.unit
+class TestReextractionFieldMapping:
+    """Test mapping validation warnings to fields"""
+
+    def test_warnings_map_to_fields(self):
+        validator = DataValidator()
+        warnings = [
+            "Suspicious total miles (too high): 23513 - verify against image",
+            "Invalid trailer number: '7X1' (expected 200-299)",
+            "Unusual date format in date_trip_ended: '13/4'",
+            "Possible field duplication: first_drop and inbound_pu have same value",
+            "Duplicate location found: 'Dallas, TX' appears in multiple fields",
+        ]
+
+        fields = validator.get_fields_for_reextraction(warnings)
+
+        assert fields == ['total_miles', 'trailer', 'date_trip_ended', 'first_drop']
+
+    def test_trailer_warning_raised(self):
+        validator = DataValidator()
+
+        warnings = validator.validate_extracted_data({'trailer': '7X1'})
+
+        assert any('trailer number' in w for w in warnings)
+        assert validator.validate_extracted_data({'trailer': '211'}) == []
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the distance utilities
+Tests vectorized great-circle distances against the scalar haversine formula
+"""
+
+import math
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.distance_utils import great_circle_distances, great_circle_matrix
+from src.route_analyzer import RouteAnalyzer
+
+STOPS = [(35.0844, -106.6504), (32.7767, -96.7970), (35.4676, -97.5164), (34.0522, -118.2437)]
+
+
+def scalar_haversine(coords1, coords2, radius=3956.0):
+    """Reference one-pair haversine (the formula the fallbacks used before)"""
+    lat1, lon1, lat2, lon2 = map(math.radians, [*coords1, *coords2])
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * radius * math.asin(math.sqrt(a))
+
+
+@pytest.mark.unit
+class TestGreatCircleDistances:
+    """Test pairwise and matrix great-circle distances"""
+
+    def test_pairs_match_scalar_formula(self):
+        origins, destinations = STOPS[:-1], STOPS[1:]
+
+        distances = great_circle_distances(origins, destinations)
+
+        expected = [scalar_haversine(a, b) for a, b in zip(origins, destinations)]
+        assert distances == pytest.approx(expected, rel=1e-12)
+
+    def test_single_destination_is_broadcast(self):
+        distances = great_circle_distances(STOPS, STOPS[0])
+
+        assert distances[0] == 0.0
+        assert distances[1:] == pytest.approx([scalar_haversine(STOPS[0], s) for s in STOPS[1:]])
+
+    def test_matrix_is_symmetric_with_zero_diagonal(self):
+        matrix = great_circle_matrix(STOPS)
+
+        assert matrix.shape == (4, 4)
+        assert np.allclose(matrix, matrix.T)
+        assert np.all(np.diag(matrix) == 0)
+        assert matrix[0, 3] == pytest.approx(scalar_haversine(STOPS[0], STOPS[3]))
+
+    def test_rectangular_matrix_and_radius(self):
+        matrix = great_circle_matrix(STOPS[:2], STOPS, radius=6371008.8)
+
+        assert matrix.shape == (2, 4)
+        assert matrix[1, 2] == pytest.approx(scalar_haversine(STOPS[1], STOPS[2], 6371008.8))
+
+    def test_antipodal_points(self):
+        assert great_circle_distances((0, 0), (0, 180))[0] == pytest.approx(math.pi * 3956.0)
+
+    def test_rejects_malformed_coordinates(self):
+        with pytest.raises(ValueError):
+            great_circle_distances([(1.0, 2.0, 3.0)], [(1.0, 2.0, 3.0)])
+
+
+@pytest.mark.unit
+class TestRouteAnalyzerGreatCircle:
+    """Test the RouteAnalyzer great-circle fallbacks built on the vectorized API"""
+
+    def test_single_pair_unchanged(self):
+        analyzer = RouteAnalyzer(here_api_key="key")
+
+        assert analyzer.estimate_great_circle_distance(STOPS[0], STOPS[1]) == round(scalar_haversine(STOPS[0], STOPS[1]), 1)
+        assert analyzer.estimate_great_circle_distance(None, STOPS[1]) == 0.0
+
+    def test_batch_matches_single_pairs_and_skips_missing(self):
+        analyzer = RouteAnalyzer(here_api_key="key")
+        origins = [STOPS[0], None, STOPS[2]]
+        destinations = [STOPS[1], STOPS[2], STOPS[3]]
+
+        distances = analyzer.estimate_great_circle_distances(origins, destinations)
+
+        assert distances == [
+            analyzer.estimate_great_circle_distance(STOPS[0], STOPS[1]),
+            0.0,
+            analyzer.estimate_great_circle_distance(STOPS[2], STOPS[3]),
+        ]
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the batch file processor
+Tests perceptual-hash duplicate page detection
+"""
+
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock
+from PIL import Image, ImageDraw
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.file_processor import FileProcessor
+from src.image_dedup import PerceptualHashIndex, compute_dhash, hamming_distance
+from src.pdf_processor import PDF_AVAILABLE, iter_pdf_pages, page_source_name
+
+
+def make_page(seed):
+    """Create a synthetic packet page with a seed-dependent layout"""
+    img = Image.new("RGB", (300, 400), "white")
+    draw = ImageDraw.Draw(img)
+    for i in range(6):
+        y = 20 + ((seed * 37 + i * 61) % 360)
+        draw.rectangle([10 + i * 40, y, 40 + i * 40, y + 30], fill="black")
+    return img
+
+
+@pytest.fixture
+def packet_folder(tmp_path):
+    """Folder with two distinct pages and a recompressed rescan of the first"""
+    make_page(1).save(tmp_path / "a_page.png")
+    make_page(1).save(tmp_path / "b_page (1).jpg", quality=60)
+    make_page(2).save(tmp_path / "c_page.png")
+    return str(tmp_path)
+
+
+def make_processor():
+    main_processor = MagicMock()
+    main_processor.process_image_with_distances.side_effect = lambda path, use_here: {
+        "source_image": os.path.basename(path),
+        "processing_success": True,
+        "drivers_name": "JOHN DOE",
+    }
+    main_processor.process_single_image.side_effect = lambda image, use_here, name: {
+        "source_image": name,
+        "processing_success": True,
+        "page_size": image.size,
+    }
+    return FileProcessor(main_processor), main_processor
+
+
+@pytest.mark.unit
+class TestPerceptualHash:
+    """Test hashing primitives"""
+
+    def test_recompressed_copy_is_close(self, tmp_path):
+        path = tmp_path / "page.jpg"
+        make_page(1).save(path, quality=50)
+
+        assert hamming_distance(compute_dhash(make_page(1)), compute_dhash(str(path))) <= 4
+
+    def test_different_pages_are_far(self):
+        assert hamming_distance(compute_dhash(make_page(1)), compute_dhash(make_page(2))) > 10
+
+    def test_index_returns_first_match(self):
+        index = PerceptualHashIndex(max_distance=2)
+
+        assert index.check_and_add(make_page(1), "first.jpg") is None
+        assert index.check_and_add(make_page(1), "second.jpg") == {
+            "duplicate_of": "first.jpg",
+            "hash_distance": 0,
+        }
+        assert len(index) == 1
+
+
+@pytest.mark.unit
+class TestDuplicateDetection:
+    """Test duplicate detection in process_folder"""
+
+    def test_duplicate_reuses_extraction(self, packet_folder):
+        processor, main_processor = make_processor()
+
+        results = processor.process_folder(packet_folder, detect_duplicates=True)
+
+        assert main_processor.process_image_with_distances.call_count == 2
+        duplicates = [r for r in results if r.get("is_duplicate")]
+        assert len(duplicates) == 1
+        assert duplicates[0]["duplicate_of"] == "a_page.png"
+        assert duplicates[0]["source_image"] == "b_page (1).jpg"
+        assert duplicates[0]["drivers_name"] == "JOHN DOE"
+        assert processor.get_processing_summary(results)["duplicate_pages"] == 1
+
+    def test_detection_can_be_disabled(self, packet_folder):
+        processor, main_processor = make_processor()
+
+        results = processor.process_folder(packet_folder, detect_duplicates=False)
+
+        assert main_processor.process_image_with_distances.call_count == 3
+        assert not any(r.get("is_duplicate") for r in results)
+
+
+@pytest.mark.unit
+class TestProcessingSummary:
+    """Test summary counts and error categories"""
+
+    def test_common_errors(self):
+        results = [
+            {"source_image": "a.jpg", "processing_success": True},
+            {"source_image": "b.jpg", "processing_success": False, "error": "JSON parsing error: x"},
+            {"source_image": "c.jpg", "processing_success": False},
+            {"source_image": "d.jpg", "processing_success": False, "error": ""},
+        ]
+
+        summary = FileProcessor().get_processing_summary(results)
+
+        assert summary["failed_processing"] == 3
+        assert summary["common_errors"] == {"Other Error": 2, "JSON Parsing Error": 1}
+
+
+def usage(tokens, latency=1.0):
+    return {
+        "model": "gemini-2.5-flash",
+        "prompt_tokens": tokens - 100,
+        "output_tokens": 100,
+        "total_tokens": tokens,
+        "latency_seconds": latency,
+        "estimated_cost_usd": tokens / 1_000_000,
+    }
+
+
+@pytest.mark.unit
+class TestTokenUsageReporting:
+    """Test token and cost aggregation"""
+
+    def setup_method(self):
+        self.results = [
+            {"source_image": "a.jpg", "processing_success": True, "extraction_usage": usage(3000)},
+            {"source_image": "b.jpg", "processing_success": False, "extraction_usage": usage(5000, 4.0)},
+            {"source_image": "c.jpg", "processing_success": True, "extraction_usage": usage(3000),
+             "is_duplicate": True, "duplicate_of": "a.jpg"},
+            {"source_image": "d.jpg", "processing_success": False, "error": "File not found"},
+        ]
+
+    def test_summary_aggregates_usage(self):
+        token_usage = FileProcessor().get_processing_summary(self.results)["token_usage"]
+
+        assert token_usage["pages_with_usage"] == 2
+        assert token_usage["total_tokens"] == 8000
+        assert token_usage["output_tokens"] == 200
+        assert token_usage["average_tokens_per_page"] == 4000
+        assert token_usage["average_latency_seconds"] == 2.5
+        assert token_usage["estimated_cost_usd"] == pytest.approx(0.008)
+
+    def test_expensive_pages_ranked(self):
+        pages = FileProcessor().get_expensive_pages(self.results, top_n=5)
+
+        assert [p["source_image"] for p in pages] == ["b.jpg", "a.jpg"]
+
+    def test_usage_report_written(self, tmp_path):
+        assert FileProcessor().create_usage_report(self.results, str(tmp_path))
+
+        report_files = list(tmp_path.glob("token_usage_*.json"))
+        assert len(report_files) == 1
+
+
+@pytest.fixture
+def envelope_pdf(tmp_path):
+    """Three-page PDF whose third page repeats the first"""
+    pages = [make_page(1), make_page(2), make_page(1)]
+    pdf_path = tmp_path / "envelope.pdf"
+    pages[0].save(pdf_path, save_all=True, append_images=pages[1:], resolution=72)
+    return str(pdf_path)
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not PDF_AVAILABLE, reason="pymupdf not installed")
+class TestPdfIngestion:
+    """Test lazy PDF rasterization and page processing"""
+
+    def test_pages_are_rendered_lazily(self, envelope_pdf):
+        pages = iter_pdf_pages(envelope_pdf, dpi=72)
+
+        page_number, image = next(pages)
+
+        assert page_number == 1
+        assert image.mode == "RGB"
+        assert image.size == (300, 400)
+        assert [n for n, _ in pages] == [2, 3]
+
+    def test_page_source_name(self):
+        assert page_source_name("/scans/envelope.pdf", 7) == "envelope_Page_07"
+
+    def test_process_pdf_preserves_page_numbers(self, envelope_pdf):
+        processor, main_processor = make_processor()
+
+        results = processor.process_pdf(envelope_pdf, detect_duplicates=True)
+
+        assert [r["source_image"] for r in results] == [
+            "envelope_Page_01",
+            "envelope_Page_02",
+            "envelope_Page_03",
+        ]
+        assert [r["page_number"] for r in results] == [1, 2, 3]
+        assert all(r["source_pdf"] == "envelope.pdf" for r in results)
+        assert main_processor.process_single_image.call_count == 2
+        assert results[2]["duplicate_of"] == "envelope_Page_01"
+
+    def test_process_folder_includes_pdfs(self, packet_folder, envelope_pdf):
+        processor, main_processor = make_processor()
+        os.replace(envelope_pdf, os.path.join(packet_folder, "envelope.pdf"))
+
+        results = processor.process_folder(packet_folder, detect_duplicates=False)
+
+        assert len(results) == 6
+        assert main_processor.process_single_image.call_count == 3
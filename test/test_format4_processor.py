@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the Format 4 load sheet processor
+Tests lane deduplication, fan-out to rows and failure handling with fake services
+"""
+
+import os
+import sys
+import threading
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.format4_processor import Format4RouteProcessor, find_format4_header
+
+
+COORDS = {
+    "Dallas, TX": (32.78, -96.80),
+    "Austin, TX": (30.27, -97.74),
+    "Tulsa, OK": (36.15, -95.99),
+}
+
+
+class FakeServices:
+    """Geocoding, route and state analyzer stand-in that counts calls"""
+
+    def __init__(self, barrier=None, state_error=None):
+        self.geocoding_service = self
+        self.route_analyzer = self
+        self.state_analyzer = self
+        self.barrier = barrier
+        self.state_error = state_error
+        self.lock = threading.Lock()
+        self.geocoded = []
+        self.routed = []
+        self.state_batches = []
+
+    def geocode_location(self, location, use_here_api=True):
+        with self.lock:
+            self.geocoded.append(location)
+        if location == "Broken, TX":
+            raise RuntimeError("service unavailable")
+        return COORDS.get(location)
+
+    def calculate_route_distance(self, origin_coords, destination_coords):
+        with self.lock:
+            self.routed.append((origin_coords, destination_coords))
+        if self.barrier:
+            self.barrier.wait(timeout=5)
+        miles = round(abs(origin_coords[0] - destination_coords[0]) * 69, 1)
+        return {"distance_miles": miles, "polyline": [f"poly{miles}"], "api_used": "HERE"}
+
+    def calculate_state_miles_batch(self, polylines, total_distances_miles):
+        self.state_batches.append(list(polylines))
+        if self.state_error:
+            raise RuntimeError(self.state_error)
+        return [{"TX": miles * 0.75, "OK": miles * 0.25} for miles in total_distances_miles]
+
+
+def load_row(load_no, shipper, delivery):
+    shipper_city, shipper_state = shipper.split(", ")
+    delivery_city, delivery_state = delivery.split(", ")
+    return {
+        "Load No": load_no,
+        "Shipper City": shipper_city,
+        "Shipper State": shipper_state,
+        "Delivery City": delivery_city,
+        "Delivery State": delivery_state,
+    }
+
+
+@pytest.mark.unit
+class TestFormat4RouteProcessor:
+    """Test lane-deduplicated routing of load rows"""
+
+    def test_repeated_lanes_resolved_once(self):
+        services = FakeServices()
+        rows = [load_row(str(i), "Dallas, TX", "Tulsa, OK") for i in range(50)]
+        rows += [load_row("R", "Tulsa, OK", "Dallas, TX"), load_row("A", "Dallas, TX", "Austin, TX")]
+
+        summary = Format4RouteProcessor(services, max_workers=4).process_rows(rows)
+
+        assert sorted(services.geocoded) == sorted(COORDS)
+        assert len(services.routed) == 3
+        assert len(services.state_batches) == 1 and len(services.state_batches[0]) == 3
+        assert summary["unique_lanes"] == 3 and summary["unique_locations"] == 3
+        assert summary["successful_routes"] == 52
+        assert [d["load_no"] for d in summary["route_details"]] == [r["Load No"] for r in rows]
+
+    def test_rows_get_their_lane_results(self):
+        services = FakeServices()
+        rows = [load_row("1", "Dallas, TX", "Tulsa, OK"), load_row("2", "Dallas, TX", "Tulsa, OK")]
+
+        summary = Format4RouteProcessor(services).process_rows(rows)
+
+        first, second = summary["route_details"]
+        assert first["origin"] == "Dallas, TX" and first["destination"] == "Tulsa, OK"
+        assert first["distance_miles"] == second["distance_miles"] == 232.5
+        assert first["state_mileage"] == [
+            {"state": "TX", "miles": 174, "percentage": 75.0},
+            {"state": "OK", "miles": 58, "percentage": 25.0},
+        ]
+        assert first["state_mileage"] is not second["state_mileage"]
+        assert first["original_row_data"] == rows[0]
+        assert summary["total_miles"] == 465.0
+        assert summary["state_mileage"][0] == {"state": "TX", "miles": 348, "percentage": 74.8}
+
+    def test_row_failures_reported_per_row(self):
+        services = FakeServices()
+        rows = [
+            load_row("1", "Dallas, TX", "Nowhere, TX"),
+            {"Load No": "2", "Shipper City": "Dallas", "Shipper State": "TX"},
+            load_row("3", "Broken, TX", "Dallas, TX"),
+            load_row("4", "Dallas, TX", "Austin, TX"),
+        ]
+
+        summary = Format4RouteProcessor(services).process_rows(rows)
+
+        details = summary["route_details"]
+        assert details[0]["error"] == "Could not geocode: destination (Nowhere, TX)"
+        assert details[1] == {
+            "load_no": "2",
+            "success": False,
+            "error": "Missing required location data: Delivery City, Delivery State",
+        }
+        assert details[2]["error"] == "Geocoding service error: service unavailable"
+        assert details[3]["success"] is True
+        assert summary["successful_routes"] == 1
+        assert summary["error_types"] == {
+            "Could not geocode": 1,
+            "Missing required location data": 1,
+            "Geocoding service error": 1,
+        }
+
+    def test_state_analysis_failure_falls_back_to_endpoint_states(self):
+        services = FakeServices(state_error="no boundaries")
+        rows = [load_row("1", "Dallas, TX", "Tulsa, OK"), load_row("2", "Dallas, TX", "Austin, TX")]
+
+        summary = Format4RouteProcessor(services).process_rows(rows)
+
+        assert [s["state"] for s in summary["route_details"][0]["state_mileage"]] == ["TX", "OK"]
+        assert summary["route_details"][1]["state_mileage"] == [
+            {"state": "TX", "miles": 173, "percentage": 100.0}
+        ]
+
+    def test_lanes_routed_concurrently(self):
+        # Both lanes must be in flight at once for the barrier to release
+        services = FakeServices(barrier=threading.Barrier(2))
+        rows = [load_row("1", "Dallas, TX", "Tulsa, OK"), load_row("2", "Dallas, TX", "Austin, TX")]
+
+        summary = Format4RouteProcessor(services, max_workers=2).process_rows(rows)
+
+        assert summary["successful_routes"] == 2
+
+    def test_progress_reported(self):
+        progress = []
+
+        Format4RouteProcessor(FakeServices()).process_rows(
+            [load_row("1", "Dallas, TX", "Tulsa, OK")],
+            progress_callback=lambda fraction, message: progress.append(fraction),
+        )
+
+        assert progress[0] == 0.0 and progress[-1] == 1.0
+        assert progress == sorted(progress)
+
+
+@pytest.mark.unit
+class TestFormat4Csv:
+    """Test header detection and CSV-level results"""
+
+    CSV = (
+        "Weekly loads,,,,\n"
+        "Load No,Shipper City,Shipper State,Delivery City,Delivery State\n"
+        "L1,Dallas,TX,Tulsa,OK\n"
+        "L2,Dallas,TX,Tulsa,OK\n"
+    )
+
+    def test_header_found_below_title_row(self):
+        assert find_format4_header(self.CSV.split("\n")) == 1
+        assert find_format4_header(["a,b,c", "", "x,y"]) is None
+
+    def test_process_csv_result(self):
+        result = Format4RouteProcessor(FakeServices()).process_csv(self.CSV, "loads.csv")
+
+        assert result["processing_success"] is True
+        assert result["format_type"] == "Format 4 - Load-based Route Data"
+        assert result["header_found_at_row"] == 2
+        assert result["total_routes_processed"] == 2
+        assert result["total_miles"] == "465"
+        assert result["unique_lanes"] == 1
+
+    def test_missing_header_fails_cleanly(self):
+        result = Format4RouteProcessor(FakeServices()).process_csv("a,b\n1,2\n", "bad.csv")
+
+        assert result["processing_success"] is False
+        assert result["error"].startswith("Format 4 processing failed: Could not find Format 4 headers")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the fuel CSV module
+Tests chunked per-state gallon aggregation and head-only format detection reads
+"""
+
+import io
+import os
+import sys
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.fuel_csv import (
+    FORMAT2_COLUMNS,
+    FORMAT3_COLUMNS,
+    read_csv_head,
+    read_csv_text,
+    summarize_fuel_csv,
+)
+
+FORMAT2_CSV = (
+    "Card #,Tran Date,Unit,State/ Prov,Qty\n"
+    "1234,2024-01-02,,tx,50.5\n"
+    "1234,2024-01-03,215,OK, 20 \n"
+    "1234,2024-01-04,216,TX,29.5\n"
+    "1234,2024-01-05,215,NM,not a number\n"
+    "1234,2024-01-06,215,,10\n"
+    "1234,2024-01-07,215,AZ,0\n"
+)
+
+
+@pytest.mark.unit
+class TestSummarizeFuelCsv:
+    """Test chunked aggregation of fuel transactions"""
+
+    def test_aggregates_by_state(self):
+        summary = summarize_fuel_csv(FORMAT2_CSV, FORMAT2_COLUMNS)
+
+        assert summary['fuel_by_state'] == {'TX': 80.0, 'OK': 20.0}
+        assert list(summary['fuel_by_state']) == ['TX', 'OK']
+        assert summary['total_gallons'] == 100.0
+        assert summary['unit'] == '215'
+        assert summary['rows_read'] == 6
+        assert summary['fuel_purchase_count'] == 3
+        assert summary['fuel_purchases'][0] == {'state': 'TX', 'gallons': 50.5}
+
+    def test_chunking_gives_same_totals(self):
+        whole = summarize_fuel_csv(FORMAT2_CSV, FORMAT2_COLUMNS)
+        chunked = summarize_fuel_csv(FORMAT2_CSV, FORMAT2_COLUMNS, chunk_rows=2)
+
+        assert chunked == whole
+
+    def test_purchases_kept_are_capped(self):
+        rows = "".join(f"1,2024-01-01,215,TX,{i + 1}\n" for i in range(100))
+        source = io.BytesIO(("Card #,Tran Date,Unit,State/ Prov,Qty\n" + rows).encode())
+
+        summary = summarize_fuel_csv(source, FORMAT2_COLUMNS, chunk_rows=7, max_purchases=10)
+
+        assert len(summary['fuel_purchases']) == 10
+        assert summary['fuel_purchase_count'] == 100
+        assert summary['fuel_by_state'] == {'TX': 5050.0}
+
+    def test_format3_columns_and_bom(self):
+        content = (
+            "﻿Unit Number,Truck Stop State,Number of Tractor Gallons,Ignored\n"
+            "301,ca,100.25,x\n"
+            "301,NV,50,y\n"
+        ).encode("utf-8")
+
+        summary = summarize_fuel_csv(content, FORMAT3_COLUMNS)
+
+        assert summary['unit'] == '301'
+        assert summary['fuel_by_state'] == {'CA': 100.25, 'NV': 50.0}
+
+    def test_missing_columns_give_empty_summary(self):
+        summary = summarize_fuel_csv("Card #,Qty\n1,20\n", FORMAT2_COLUMNS)
+
+        assert summary['fuel_by_state'] == {}
+        assert summary['total_gallons'] == 0
+        assert summary['unit'] == ''
+
+
+@pytest.mark.unit
+class TestCsvHead:
+    """Test reading only the start of an upload"""
+
+    def test_head_reads_first_lines_and_rewinds(self):
+        upload = io.BytesIO(b"\xef\xbb\xbfCard #,Qty\r\n1,2\r\n3,4\r\n5,6\r\n")
+
+        lines = read_csv_head(upload, max_lines=2)
+
+        assert lines == ["Card #,Qty", "1,2"]
+        assert upload.tell() == 0
+        assert read_csv_text(upload).endswith("5,6\r\n")
+
+    def test_head_of_text(self):
+        assert read_csv_head("a,b\n1,2\n", max_lines=5) == ["a,b", "1,2"]
+        assert read_csv_head("") == []
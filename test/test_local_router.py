@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the local router
+Tests A* routing over a synthetic road grid and the RouteAnalyzer fallback order
+"""
+
+import heapq
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.distance_utils import great_circle_distances
+from src.local_router import LocalRouter, save_road_graph
+from src.polyline_utils import decode_polyline_array
+from src.route_analyzer import RouteAnalyzer
+
+
+def make_grid_graph(path, rows=20, cols=30, seed=7, removed=()):
+    """Road grid from (30, -106) with 0.1 degree spacing and detour factors 1.0-1.5"""
+    rng = np.random.default_rng(seed)
+    lat, lng = np.meshgrid(30 + 0.1 * np.arange(rows), -106 + 0.1 * np.arange(cols), indexing="ij")
+    node = np.arange(rows * cols).reshape(rows, cols)
+
+    edge_from = np.concatenate((node[:, :-1].ravel(), node[:-1, :].ravel()))
+    edge_to = np.concatenate((node[:, 1:].ravel(), node[1:, :].ravel()))
+    keep = ~np.isin(edge_from, removed) & ~np.isin(edge_to, removed)
+    edge_from, edge_to = edge_from[keep], edge_to[keep]
+
+    # Road lengths are at least the straight-line distance, as on a real network
+    nodes = np.column_stack((lat.ravel(), lng.ravel()))
+    straight = great_circle_distances(nodes[edge_from], nodes[edge_to], radius=6371008.8)
+    meters = straight * rng.uniform(1.0, 1.5, len(straight))
+
+    save_road_graph(path, lat.ravel(), lng.ravel(), edge_from, edge_to, meters)
+    return edge_from, edge_to, meters
+
+
+def dijkstra(node_count, edge_from, edge_to, meters, source, target):
+    """Reference shortest path without a heuristic"""
+    adjacency = [[] for _ in range(node_count)]
+    for a, b, w in zip(edge_from.tolist(), edge_to.tolist(), meters.tolist()):
+        adjacency[a].append((b, w))
+        adjacency[b].append((a, w))
+
+    best = {source: 0.0}
+    queue = [(0.0, source)]
+    while queue:
+        cost, node = heapq.heappop(queue)
+        if node == target:
+            return cost
+        if cost > best[node]:
+            continue
+        for neighbor, w in adjacency[node]:
+            if cost + w < best.get(neighbor, float("inf")):
+                best[neighbor] = cost + w
+                heapq.heappush(queue, (cost + w, neighbor))
+    return None
+
+
+@pytest.fixture
+def grid(tmp_path):
+    path = tmp_path / "road_graph.npz"
+    edges = make_grid_graph(path)
+    return path, edges
+
+
+@pytest.mark.unit
+class TestLocalRouter:
+    """Test shortest paths and route output of the local router"""
+
+    def test_graph_roundtrip(self, grid):
+        path, (edge_from, _, _) = grid
+        router = LocalRouter(str(path))
+
+        assert router.node_count == 600
+        assert len(router._indices) == 2 * len(edge_from)
+        assert router._indptr[-1] == len(router._indices)
+
+    def test_astar_matches_dijkstra(self, grid):
+        path, (edge_from, edge_to, meters) = grid
+        router = LocalRouter(str(path))
+        rng = np.random.default_rng(3)
+
+        for source, target in rng.integers(0, router.node_count, size=(25, 2)).tolist():
+            expected = dijkstra(router.node_count, edge_from, edge_to, meters, source, target)
+            cost, nodes = router.shortest_path(source, target)
+
+            assert cost == pytest.approx(expected, rel=1e-5)
+            assert nodes[0] == source and nodes[-1] == target
+
+    def test_route_matches_calculate_route_distance_shape(self, grid):
+        path, _ = grid
+        router = LocalRouter(str(path))
+
+        result = router.route((30.02, -105.98), (31.5, -103.5))
+
+        assert set(result) == {"distance_miles", "polyline", "api_used", "state_miles"}
+        assert result["api_used"] == "local_router"
+        assert len(result["polyline"]) == 1
+
+        coords = decode_polyline_array(result["polyline"][0])
+        assert coords[0] == pytest.approx([30.02, -105.98], abs=1e-5)
+        assert coords[-1] == pytest.approx([31.5, -103.5], abs=1e-5)
+
+        # Longer than the straight line, but within the grid's detour factors
+        straight_miles = great_circle_distances((30.02, -105.98), (31.5, -103.5))[0]
+        assert straight_miles < result["distance_miles"] < 2.2 * straight_miles
+
+    def test_repeated_routes_use_cache(self, grid):
+        path, _ = grid
+        router = LocalRouter(str(path), cache_size=1)
+
+        first = router.route((30.0, -106.0), (31.0, -105.0))
+        router._astar = None  # any recomputation would fail
+        second = router.route((30.001, -106.001), (31.001, -105.001))
+
+        assert second["distance_miles"] == pytest.approx(first["distance_miles"], abs=0.2)
+        assert len(router.route_cache) == 1
+
+    def test_unreachable_destination(self, tmp_path):
+        # Remove a full grid column so the east side is disconnected
+        path = tmp_path / "split_graph.npz"
+        make_grid_graph(path, rows=5, cols=5, removed=list(range(2, 25, 5)))
+        router = LocalRouter(str(path))
+
+        assert router.route((30.0, -106.0), (30.0, -105.6)) is None
+
+    def test_rejects_unknown_format_version(self, tmp_path):
+        path = tmp_path / "bad_graph.npz"
+        np.savez(path, format_version=np.int32(99))
+
+        with pytest.raises(ValueError):
+            LocalRouter(str(path))
+
+
+@pytest.mark.unit
+class TestRouteAnalyzerLocalBackend:
+    """Test how RouteAnalyzer chooses between HERE, the local graph and great circle"""
+
+    def test_uses_local_router_without_here_key(self, grid, mocker):
+        path, _ = grid
+        mocker.patch("src.route_analyzer.config.HERE_API_KEY", "")
+        analyzer = RouteAnalyzer(local_router=LocalRouter(str(path)))
+
+        result = analyzer.calculate_route_distance((30.0, -106.0), (31.0, -104.0))
+
+        assert result["api_used"] == "local_router"
+        assert result["polyline"]
+
+    def test_loads_graph_from_config(self, grid, mocker):
+        path, _ = grid
+        mocker.patch("src.route_analyzer.config.HERE_API_KEY", "")
+        mocker.patch("src.route_analyzer.config.LOCAL_ROAD_GRAPH_PATH", str(path))
+
+        analyzer = RouteAnalyzer()
+
+        assert analyzer.local_router is not None
+        assert analyzer.calculate_route_distance((30.0, -106.0), (31.0, -104.0))["api_used"] == "local_router"
+
+    def test_here_backend_ignores_graph(self, grid, mocker):
+        path, _ = grid
+        mocker.patch("src.route_analyzer.config.HERE_API_KEY", "")
+        mocker.patch("src.route_analyzer.config.ROUTING_BACKEND", "here")
+        mocker.patch("src.route_analyzer.config.LOCAL_ROAD_GRAPH_PATH", str(path))
+
+        analyzer = RouteAnalyzer()
+
+        assert analyzer.local_router is None
+        assert analyzer.calculate_route_distance((30.0, -106.0), (31.0, -104.0))["api_used"] == "great_circle_approximation"
+
+    def test_local_backend_skips_here(self, grid, mocker):
+        path, _ = grid
+        http = mocker.Mock()
+        mocker.patch("src.route_analyzer.config.ROUTING_BACKEND", "local")
+        analyzer = RouteAnalyzer(here_api_key="key", http_client=http, local_router=LocalRouter(str(path)))
+
+        result = analyzer.calculate_route_distance((30.0, -106.0), (31.0, -104.0))
+
+        assert result["api_used"] == "local_router"
+        http.get.assert_not_called()
+
+    def test_here_failure_falls_back_to_local_router(self, grid, mocker):
+        path, _ = grid
+        http = mocker.Mock()
+        http.get.side_effect = RuntimeError("HERE unavailable")
+        analyzer = RouteAnalyzer(here_api_key="key", http_client=http, local_router=LocalRouter(str(path)))
+
+        result = analyzer.calculate_route_distance((30.0, -106.0), (31.0, -104.0))
+
+        assert result["api_used"] == "local_router"
+        http.get.assert_called_once()
+
+    def test_unreachable_local_route_falls_back_to_great_circle(self, tmp_path, mocker):
+        path = tmp_path / "split_graph.npz"
+        make_grid_graph(path, rows=5, cols=5, removed=list(range(2, 25, 5)))
+        mocker.patch("src.route_analyzer.config.HERE_API_KEY", "")
+        analyzer = RouteAnalyzer(local_router=LocalRouter(str(path)))
+
+        result = analyzer.calculate_route_distance((30.0, -106.0), (30.0, -105.6))
+
+        assert result["api_used"] == "great_circle_approximation"
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared processor registry
+Tests per-fingerprint processor sharing and the thread-safe caches it relies on
+"""
+
+import os
+import sys
+import threading
+import time
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src import processor_registry
+from src.geocoding_service import GeocodingService
+from src.state_analyzer import StateAnalyzer, GIS_AVAILABLE, _SHARED_BOUNDARIES
+
+
+class FakeProcessor:
+    """DriverPacketProcessor stand-in that counts constructions"""
+
+    created = 0
+
+    def __init__(self, gemini_api_key=None, here_api_key=None, reference_csv_path=None):
+        time.sleep(0.05)  # widen the window for concurrent creation
+        if gemini_api_key == "broken":
+            raise RuntimeError("model probing failed")
+        type(self).created += 1
+        self.keys = (gemini_api_key, here_api_key)
+        self.state_analyzer = self
+        self.boundaries_loaded = False
+
+    def load_state_boundaries(self):
+        self.boundaries_loaded = True
+
+    def get_cache_stats(self):
+        return {"keys": self.keys}
+
+
+@pytest.fixture
+def registry(mocker):
+    FakeProcessor.created = 0
+    mocker.patch.object(processor_registry, "DriverPacketProcessor", FakeProcessor)
+    processor_registry.clear_shared_processors()
+    yield processor_registry
+    processor_registry.clear_shared_processors()
+
+
+@pytest.mark.unit
+class TestProcessorRegistry:
+    """Test sharing of processors across sessions"""
+
+    def test_same_keys_share_one_processor(self, registry):
+        first = registry.get_shared_processor("gemini", "here")
+        second = registry.get_shared_processor("gemini", "here")
+
+        assert first is second
+        assert FakeProcessor.created == 1
+        assert first.boundaries_loaded
+
+    def test_different_keys_get_separate_processors(self, registry):
+        with_here = registry.get_shared_processor("gemini", "here")
+        without_here = registry.get_shared_processor("gemini", None)
+
+        assert with_here is not without_here
+        assert without_here.keys == ("gemini", None)
+        assert len(registry.get_registry_stats()) == 2
+
+    def test_concurrent_sessions_create_once(self, registry):
+        processors = []
+
+        def session():
+            processors.append(registry.get_shared_processor("gemini", "here"))
+
+        threads = [threading.Thread(target=session) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert FakeProcessor.created == 1
+        assert all(p is processors[0] for p in processors)
+
+    def test_failed_initialization_is_not_registered(self, registry):
+        with pytest.raises(RuntimeError):
+            registry.get_shared_processor("broken")
+
+        assert registry.get_registry_stats() == {}
+
+    def test_fingerprint_does_not_contain_keys(self):
+        fingerprint = processor_registry.api_key_fingerprint("secret-gemini-key", "secret-here-key")
+
+        assert "secret" not in fingerprint
+        assert fingerprint != processor_registry.api_key_fingerprint("secret-gemini-key", None)
+
+
+@pytest.mark.unit
+class TestSharedCaches:
+    """Test caches that are shared once processors serve several sessions"""
+
+    def test_geocoding_cache_is_bounded_lru(self, mocker):
+        mocker.patch("src.geocoding_service.config.GEOCODING_CACHE_SIZE", 2)
+        service = GeocodingService(here_api_key="key", http_client=mocker.Mock())
+
+        service._cache_location("Dallas, TX", (32.8, -96.8))
+        service._cache_location("Austin, TX", (30.3, -97.7))
+        assert service.geocode_location("Dallas, TX") == (32.8, -96.8)
+        service._cache_location("Tulsa, OK", None)
+
+        assert list(service.geocoding_cache) == ["Dallas, TX", "Tulsa, OK"]
+        assert service.get_cache_stats()["failed_geocodes"] == 1
+
+    def test_request_errors_are_not_cached(self, mocker):
+        mocker.patch("src.geocoding_service.config.NOMINATIM_RATE_LIMIT", 0)
+        http = mocker.Mock()
+        http.get.side_effect = TimeoutError("timed out")
+        service = GeocodingService(here_api_key="key", http_client=http)
+
+        assert service.geocode_location("Dallas, TX") is None
+        assert "Dallas, TX" not in service.geocoding_cache
+
+        http.get.side_effect = None
+        http.get.return_value.json.return_value = []
+        assert service.geocode_location("Nowhere, ZZ", use_here_api=False) is None
+        assert service.geocoding_cache["Nowhere, ZZ"] is None
+
+    @pytest.mark.skipif(not GIS_AVAILABLE, reason="GIS dependencies not installed")
+    def test_state_boundaries_loaded_once_per_process(self, tmp_path, mocker):
+        import geopandas as gpd
+        from shapely.geometry import box
+
+        shapefile = tmp_path / "states.shp"
+        gpd.GeoDataFrame(
+            {"STUSPS": ["NM", "TX"]},
+            geometry=[box(-106, 30, -102, 40), box(-102, 30, -98, 40)],
+            crs="EPSG:4326",
+        ).to_file(shapefile)
+        mocker.patch("src.state_analyzer.config.STATE_SHAPEFILE_PATH", str(shapefile))
+        read_file = mocker.spy(gpd, "read_file")
+
+        try:
+            first = StateAnalyzer().load_state_boundaries()
+            second = StateAnalyzer().load_state_boundaries()
+
+            assert first is second
+            assert list(first["STUSPS"]) == ["NM", "TX"]
+            assert read_file.call_count == 1
+        finally:
+            _SHARED_BOUNDARIES.pop(str(shapefile.resolve()), None)
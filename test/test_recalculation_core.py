@@ -4,6 +4,7 @@ Core unit tests for recalculation functionality
 Tests the essential logic without Streamlit dependencies
 """
 
+import json
 import pytest
 import unittest.mock as mock
 from unittest.mock import MagicMock, patch
@@ -14,6 +15,8 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
 
 from src.main_processor import DriverPacketProcessor
+from src.geocoding_service import GeocodingService
+from src.route_analyzer import RouteAnalyzer
 
 
 class TestRecalculationCore:
@@ -358,5 +361,121 @@ class TestRecalculationDataFlow:
         assert 'differs from calculated (1450.2)' in updated_warnings[0]
 
 
+class TestIncrementalRecalculation:
+    """Test that recalculation only geocodes and routes what an edit changed"""
+
+    COORDS = {
+        'San Francisco, CA': (37.7749, -122.4194),
+        'Las Vegas, NV': (36.1699, -115.1398),
+        'Phoenix, AZ': (33.4484, -112.0740),
+        'Houston, TX': (29.7604, -95.3698),
+    }
+
+    def geocode(self, location, use_here_api=True):
+        return self.COORDS.get(location)
+
+    def route(self, origin, destination):
+        return {'distance_miles': round(abs(origin[1] - destination[1]) * 50, 1),
+                'api_used': 'HERE', 'polyline': f'{origin}-{destination}'}
+
+    @patch('src.main_processor.GeminiDataExtractor')
+    @patch('src.main_processor.GeocodingService')
+    @patch('src.main_processor.RouteAnalyzer')
+    @patch('src.main_processor.StateAnalyzer')
+    @patch('src.main_processor.DataValidator')
+    @patch('src.main_processor.ReferenceValidator')
+    @patch('src.main_processor.FileProcessor')
+    def setup_method(self, method, *mocks):
+        """Processor with real geocoding/routing logic and stubbed service calls"""
+        self.processor = DriverPacketProcessor(
+            gemini_api_key="mock_gemini_key", here_api_key="mock_here_key"
+        )
+        self.processor.geocoding_service = GeocodingService(here_api_key="key")
+        self.processor.route_analyzer = RouteAnalyzer(here_api_key="key")
+        self.processor.state_analyzer = MagicMock()
+        self.processor.state_analyzer.add_state_mileage_to_trip_data.side_effect = (
+            lambda distance_data, polylines=None: dict(distance_data, state_mileage=[])
+        )
+
+        with patch.object(GeocodingService, 'geocode_location', side_effect=self.geocode), \
+                patch.object(RouteAnalyzer, 'calculate_route_distance', side_effect=self.route):
+            original = {
+                'trip_started_from': 'San Francisco, CA',
+                'first_drop': 'Las Vegas, NV',
+                'drop_off': ['Houston, TX'],
+                'total_miles': '1360',
+                'validation_warnings': ['Missing trailer number'],
+            }
+            recalculation = self.processor.recalculate_distances(original)
+        self.original = dict(original, **recalculation['patch'])
+
+    def test_unchanged_result_reuses_everything(self):
+        with patch.object(GeocodingService, 'geocode_location', side_effect=self.geocode) as geocode, \
+                patch.object(RouteAnalyzer, 'calculate_route_distance', side_effect=self.route) as route:
+            recalculation = self.processor.recalculate_distances(self.original)
+
+        assert recalculation['recalculation_success']
+        assert recalculation['changed_stops'] == []
+        assert recalculation['reused_legs'] == 2 and recalculation['rerouted_legs'] == 0
+        geocode.assert_not_called()
+        route.assert_not_called()
+        assert recalculation['patch']['distance_calculations']['total_distance_miles'] == \
+            self.original['distance_calculations']['total_distance_miles']
+
+    def test_polylines_stored_once(self):
+        distance_data = self.original['distance_calculations']
+
+        assert 'trip_polylines' not in distance_data
+        dumped = json.dumps(distance_data)
+        for leg in distance_data['legs']:
+            assert dumped.count(json.dumps(leg['polyline'])) == 1
+
+    def test_one_changed_stop_reroutes_its_legs(self):
+        edited = dict(self.original, first_drop='Phoenix, AZ')
+
+        with patch.object(GeocodingService, 'geocode_location', side_effect=self.geocode) as geocode, \
+                patch.object(RouteAnalyzer, 'calculate_route_distance', side_effect=self.route) as route:
+            recalculation = self.processor.recalculate_distances(edited)
+
+        assert recalculation['changed_stops'] == ['first_drop']
+        geocode.assert_called_once_with('Phoenix, AZ', True)
+        assert route.call_count == 2
+        legs = recalculation['patch']['distance_calculations']['legs']
+        assert [leg['destination']['location'] for leg in legs] == ['Phoenix, AZ', 'Houston, TX']
+        assert recalculation['patch']['coordinates']['trip_started_from'] == \
+            self.original['coordinates']['trip_started_from']
+
+    def test_added_stop_reuses_untouched_legs(self):
+        edited = dict(self.original, inbound_pu='Phoenix, AZ')
+
+        with patch.object(GeocodingService, 'geocode_location', side_effect=self.geocode), \
+                patch.object(RouteAnalyzer, 'calculate_route_distance', side_effect=self.route) as route:
+            recalculation = self.processor.recalculate_distances(edited)
+
+        # SF -> LV is unchanged; LV -> PHX and PHX -> HOU are new
+        assert recalculation['reused_legs'] == 1 and recalculation['rerouted_legs'] == 2
+        assert route.call_count == 2
+
+    def test_miles_warning_replaced(self):
+        edited = dict(
+            self.original,
+            total_miles='500',
+            validation_warnings=['Missing trailer number', 'Suspicious total miles: old'],
+        )
+
+        recalculation = self.processor.recalculate_distances(edited)
+
+        warnings = recalculation['patch']['validation_warnings']
+        assert warnings[0] == 'Missing trailer number'
+        assert len(warnings) == 2 and warnings[1].startswith('Suspicious total miles: extracted (500.0)')
+
+    def test_errors_are_reported(self):
+        self.processor.state_analyzer.add_state_mileage_to_trip_data.side_effect = RuntimeError('boom')
+
+        recalculation = self.processor.recalculate_distances(self.original)
+
+        assert recalculation == {'recalculation_success': False, 'error': 'boom'}
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
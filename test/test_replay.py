@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Unit tests for service record/replay
+Tests that Gemini and HERE responses can be recorded once and replayed offline
+"""
+
+import json
+import os
+import sys
+import pytest
+import requests
+from unittest.mock import MagicMock, patch
+from PIL import Image
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.config import config
+from src.data_extractor import GeminiDataExtractor
+from src.main_processor import DriverPacketProcessor
+from src.replay import ReplayStore, ReplayHttpClient, ReplayGeminiModel
+
+try:
+    import flexpolyline
+except ImportError:
+    flexpolyline = None
+
+
+CITIES = {
+    "Dallas, TX": (32.7767, -96.7970),
+    "Oklahoma City, OK": (35.4676, -97.5164),
+}
+
+
+def fake_response(data, status_code=200):
+    response = MagicMock(status_code=status_code)
+    response.json.return_value = data
+    return response
+
+
+def fake_here_get(url, params=None, **kwargs):
+    """Stand-in for the live HERE services used while recording"""
+    params = params or {}
+    if "revgeocode" in url:
+        return fake_response({"items": [{"address": {"state": "Texas", "stateCode": "TX"}}]})
+    if "geocode" in url:
+        lat, lng = CITIES[params["q"]]
+        return fake_response({"items": [{"position": {"lat": lat, "lng": lng}}]})
+    if "router" in url:
+        polyline = flexpolyline.encode(list(CITIES.values())) if flexpolyline else None
+        return fake_response({
+            "routes": [{"sections": [{"summary": {"length": 335000}, "polyline": polyline}]}]
+        })
+    raise AssertionError(f"Unexpected request: {url}")
+
+
+@pytest.mark.unit
+class TestReplayStore:
+    """Test fixture storage"""
+
+    def test_key_ignores_api_key(self):
+        key_a = ReplayStore.request_key("here_geocode", {"q": "Dallas, TX", "apikey": "a"})
+        key_b = ReplayStore.request_key("here_geocode", {"q": "Dallas, TX", "apikey": "b"})
+
+        assert key_a == key_b
+
+    def test_api_key_not_written(self, tmp_path):
+        store = ReplayStore(str(tmp_path))
+
+        path = store.save("here_geocode", {"q": "Dallas, TX", "apikey": "secret"}, {"json": {}})
+
+        assert "secret" not in path.read_text()
+        assert store.load("here_geocode", {"q": "Dallas, TX"}) == {"json": {}}
+
+
+@pytest.mark.unit
+class TestReplayHttpClient:
+    """Test HTTP record/replay"""
+
+    def test_record_then_replay(self, tmp_path):
+        store = ReplayStore(str(tmp_path))
+        url = "https://geocode.search.hereapi.com/v1/geocode"
+        params = {"q": "Dallas, TX", "apikey": "live-key", "limit": 1}
+
+        with patch("src.replay.requests.get", side_effect=fake_here_get):
+            ReplayHttpClient("record", store).get(url, params=params, timeout=5)
+
+        client = ReplayHttpClient("replay", store, latency_seconds=0, error_rate=0)
+        response = client.get(url, params={**params, "apikey": "other"})
+
+        response.raise_for_status()
+        assert response.json()["items"][0]["position"]["lat"] == 32.7767
+        assert client.get_call_stats()["here_geocode"]["replayed"] == 1
+
+    def test_missing_fixture_behaves_like_offline(self, tmp_path):
+        client = ReplayHttpClient("replay", ReplayStore(str(tmp_path)), error_rate=0)
+
+        with pytest.raises(requests.exceptions.ConnectionError):
+            client.get("https://router.hereapi.com/v8/routes", params={"origin": "1,2"})
+
+        assert client.get_call_stats()["here_routes"]["missing"] == 1
+
+    def test_injected_errors(self, tmp_path):
+        client = ReplayHttpClient("replay", ReplayStore(str(tmp_path)), error_rate=1.0)
+
+        with pytest.raises(requests.exceptions.Timeout):
+            client.get("https://geocode.search.hereapi.com/v1/geocode", params={"q": "x"})
+
+        assert client.get_call_stats()["here_geocode"]["injected_errors"] == 1
+
+    def test_counts_exact_across_threads(self, tmp_path):
+        from concurrent.futures import ThreadPoolExecutor
+
+        client = ReplayHttpClient("replay", ReplayStore(str(tmp_path)), latency_seconds=0, error_rate=0)
+
+        def call(_):
+            with pytest.raises(requests.exceptions.ConnectionError):
+                client.get("https://geocode.search.hereapi.com/v1/geocode", params={"q": "x"})
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(call, range(400)))
+
+        stats = client.get_call_stats()["here_geocode"]
+        assert stats["calls"] == 400 and stats["missing"] == 400
+
+
+@pytest.mark.unit
+class TestReplayGeminiModel:
+    """Test Gemini record/replay"""
+
+    def test_record_then_replay(self, tmp_path):
+        store = ReplayStore(str(tmp_path))
+        live_model = MagicMock(model_name="models/gemini-2.5-flash")
+        live_model.generate_content.return_value = MagicMock(
+            text='{"drivers_name": "JOHN DOE"}',
+            usage_metadata=MagicMock(
+                prompt_token_count=10, candidates_token_count=5, total_token_count=15
+            ),
+        )
+        page = Image.new("RGB", (20, 20), "white")
+
+        ReplayGeminiModel("record", store, model=live_model).generate_content(["prompt", page])
+        replayed = ReplayGeminiModel("replay", store, error_rate=0).generate_content(
+            ["prompt", page.copy()]
+        )
+
+        assert json.loads(replayed.text) == {"drivers_name": "JOHN DOE"}
+        assert replayed.usage_metadata.total_token_count == 15
+
+    def test_different_page_is_not_replayed(self, tmp_path):
+        store = ReplayStore(str(tmp_path))
+        store.save("gemini", ReplayGeminiModel._request_for(["prompt", Image.new("RGB", (5, 5))]), {"text": "{}"})
+
+        with pytest.raises(ConnectionError):
+            ReplayGeminiModel("replay", store, error_rate=0).generate_content(
+                ["prompt", Image.new("RGB", (5, 5), "white")]
+            )
+
+
+@pytest.mark.integration
+class TestOfflinePipeline:
+    """Run the full processor against recorded responses"""
+
+    def test_processor_runs_from_fixtures(self, tmp_path):
+        image_path = str(tmp_path / "packet.jpg")
+        Image.new("RGB", (60, 80), "white").save(image_path)
+
+        live_model = MagicMock(model_name="models/gemini-2.5-flash")
+        live_model.generate_content.return_value = MagicMock(
+            text=json.dumps({
+                "drivers_name": "JOHN DOE",
+                "trip_started_from": "Dallas, TX",
+                "drop_off": "Oklahoma City, OK",
+                "total_miles": "208",
+            }),
+            usage_metadata=None,
+        )
+
+        with patch.object(config, "SERVICE_REPLAY_DIR", str(tmp_path / "fixtures")), \
+             patch.object(config, "SERVICE_REPLAY_ERROR_RATE", 0.0):
+            with patch.object(GeminiDataExtractor, "_initialize_model_with_fallback", return_value=live_model), \
+                 patch("src.replay.requests.get", side_effect=fake_here_get):
+                recorder = DriverPacketProcessor(
+                    gemini_api_key="live", here_api_key="live",
+                    setup_logging_config=False, replay_mode="record",
+                )
+                recorded = recorder.process_single_image(image_path)
+
+            with patch("src.replay.requests.get", side_effect=AssertionError("network used")):
+                replayer = DriverPacketProcessor(setup_logging_config=False, replay_mode="replay")
+                replayed = replayer.process_single_image(image_path)
+
+        assert replayed["processing_success"] is True
+        assert replayed["drivers_name"] == recorded["drivers_name"]
+        assert (
+            replayed["distance_calculations"]["total_distance_miles"]
+            == recorded["distance_calculations"]["total_distance_miles"]
+        )
+
+        stats = replayer.get_service_call_stats()
+        assert stats["gemini"]["replayed"] == 1
+        assert stats["here_geocode"]["replayed"] == 2
+        assert all(counts["missing"] == 0 for counts in stats.values())
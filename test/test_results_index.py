@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the results index
+Tests pagination and edit diffs used by the dashboard
+"""
+
+import os
+import sys
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.results_index import (
+    apply_result_edits,
+    field_display_value,
+    paginate,
+    update_result_edits,
+)
+
+
+@pytest.mark.unit
+class TestPaginate:
+    """Test page slicing"""
+
+    def test_pages(self):
+        items = list(range(23))
+
+        assert paginate(items, 1, 10) == (list(range(10)), 1, 3)
+        assert paginate(items, 3, 10) == ([20, 21, 22], 3, 3)
+
+    def test_page_clamped(self):
+        assert paginate(list(range(5)), 9, 10) == ([0, 1, 2, 3, 4], 1, 1)
+        assert paginate([], 0, 10) == ([], 1, 1)
+
+
+@pytest.mark.unit
+class TestResultEdits:
+    """Test edit diffs against the original result"""
+
+    def setup_method(self):
+        self.original = {'unit': '123', 'drop_off': ['Dallas, TX', 'Austin, TX'], 'trailer': None}
+
+    def test_only_changed_fields_kept(self):
+        edits = {}
+
+        assert update_result_edits(edits, self.original, 'unit', '456')
+        assert not update_result_edits(edits, self.original, 'drop_off', 'Dallas, TX, Austin, TX')
+        assert not update_result_edits(edits, self.original, 'trailer', '')
+
+        assert edits == {'unit': '456'}
+
+    def test_reverting_removes_field(self):
+        edits = {'unit': '456'}
+
+        assert update_result_edits(edits, self.original, 'unit', '123')
+        assert edits == {}
+
+    def test_unchanged_edit_reports_no_change(self):
+        edits = {'unit': '456'}
+
+        assert not update_result_edits(edits, self.original, 'unit', '456')
+
+    def test_apply_does_not_modify_original(self):
+        edited = apply_result_edits(self.original, {'unit': '456'})
+
+        assert edited['unit'] == '456' and edited['drop_off'] == self.original['drop_off']
+        assert self.original['unit'] == '123'
+        assert apply_result_edits(self.original) == self.original
+
+    def test_display_value(self):
+        assert field_display_value(['A', 'B']) == 'A, B'
+        assert field_display_value(None) == ''
+        assert field_display_value(2351) == '2351'
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the results store
+Tests flattening results into SQLite tables and the summary/export queries
+"""
+
+import os
+import sys
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.results_store import (
+    ResultsStore,
+    page_number_from_name,
+    parse_miles,
+    parse_trip_date,
+)
+
+
+def make_results():
+    return [
+        {
+            'source_image': 'envelope_Page_8.jpg',
+            'processing_success': True,
+            'drivers_name': 'John Doe',
+            'unit': '215',
+            'trailer': 'T7',
+            'trip': '1001',
+            'date_trip_started': '01/15/24',
+            'total_miles': '1,400B',
+            'validation_warnings': ['check miles'],
+            'coordinates': {'geocoding_summary': {'successful_geocoding': 3}},
+            'reference_validation': {'reference_found': True},
+            'distance_calculations': {
+                'calculation_success': True,
+                'total_distance_miles': 1450.2,
+                'legs': [
+                    {'leg_number': 1, 'origin': {'location': 'Dallas, TX', 'state': 'TX'},
+                     'destination': {'location': 'Tulsa, OK', 'state': 'OK'},
+                     'distance_miles': 250.0, 'api_used': 'HERE'},
+                ],
+                'state_mileage': [
+                    {'state': 'TX', 'miles': 900.4, 'percentage': 62.1},
+                    {'state': 'OK', 'miles': 549.8, 'percentage': 37.9},
+                ],
+            },
+            'fuel_by_state': {'TX': 120.04, 'OK': 30.0},
+        },
+        {'source_image': 'bad.jpg', 'processing_success': False, 'error': 'Gemini API timeout'},
+        {
+            'source_image': 'scan.jpg',
+            'processing_success': True,
+            'drivers_name': 'JANE ROE',
+            'unit': '300',
+            'date_trip_started': '02/01/2024',
+            'total_miles': '600',
+            'is_duplicate': True,
+            'distance_calculations': {'calculation_success': False, 'total_distance_miles': 0},
+        },
+    ]
+
+
+@pytest.mark.unit
+class TestParsing:
+    """Test field parsing used when flattening"""
+
+    def test_parse_miles(self):
+        assert parse_miles('2,435B') == 2435.0
+        assert parse_miles(12) == 12.0
+        assert parse_miles('') is None
+        assert parse_miles('n/a') is None
+
+    def test_parse_trip_date(self):
+        assert parse_trip_date('01/15/24') == '2024-01-15'
+        assert parse_trip_date('01/15/2024') == '2024-01-15'
+        assert parse_trip_date('sometime') is None
+
+    def test_page_number_from_name(self):
+        assert page_number_from_name('packet_Page_08.jpg') == 8
+        assert page_number_from_name('scan12_v2.jpg') == 12
+        assert page_number_from_name('scan.jpg') is None
+
+
+@pytest.mark.unit
+class TestResultsStore:
+    """Test summary, filter and export queries"""
+
+    def setup_method(self):
+        self.store = ResultsStore.from_results(make_results())
+
+    def teardown_method(self):
+        self.store.close()
+
+    def test_summary(self):
+        summary = self.store.get_summary()
+
+        assert summary['total'] == 3
+        assert summary['successful'] == 2 and summary['failed'] == 1
+        assert summary['extracted_miles'] == 2000.0
+        assert summary['calculated_miles'] == 1450.2
+        assert summary['distance_successes'] == 1
+        assert summary['geocoding_successes'] == 1
+        assert summary['reference_validations'] == 1
+        assert summary['validation_warnings'] == 1
+        assert summary['duplicates'] == 1
+        assert summary['here_api_packets'] == 1
+        assert summary['route_analysis_packets'] == 0
+        assert summary['unique_states'] == 2
+
+    def test_empty_store_summary(self):
+        summary = ResultsStore.from_results([]).get_summary()
+
+        assert summary['total'] == 0 and summary['extracted_miles'] == 0
+
+    def test_query_packets_by_indexed_fields(self):
+        assert [p['position'] for p in self.store.query_packets(drivers_name='john doe')] == [0]
+        assert [p['position'] for p in self.store.query_packets(unit='300')] == [2]
+        assert self.store.query_packets(trailer='T7', trip='1001')[0]['source_image'] == 'envelope_Page_8.jpg'
+        assert [p['position'] for p in self.store.query_packets(date_from='2024-01-20')] == [2]
+        assert [p['position'] for p in self.store.query_packets(date_to='2024-01-31')] == [0]
+        assert len(self.store.query_packets(successful_only=True)) == 2
+
+    def test_state_mileage_rows_number_exported_packets(self):
+        with_failed = self.store.state_mileage_rows(include_failed=True)
+        successful_only = self.store.state_mileage_rows(include_failed=False)
+
+        assert [(r['state'], r['miles']) for r in with_failed] == [('TX', 900.4), ('OK', 549.8), (None, None)]
+        assert with_failed[0]['page_number'] == 8
+        assert with_failed[-1]['export_index'] == 3
+        assert successful_only[-1]['export_index'] == 2
+
+    def test_fuel_rows(self):
+        rows = self.store.fuel_rows()
+
+        assert [(r['state'], r['gallons'], r['unit']) for r in rows] == [('TX', 120.04, '215'), ('OK', 30.0, '215')]
+
+    def test_state_mileage_totals(self):
+        totals = self.store.state_mileage_totals(unit='215')
+
+        assert [t['state'] for t in totals] == ['TX', 'OK']
+        assert totals[0]['packets'] == 1
+        assert self.store.state_mileage_totals(unit='999') == []
+
+    def test_error_counts(self):
+        assert self.store.error_counts() == {'Gemini API timeout': 1}
+
+    def test_reload_replaces_results(self):
+        self.store.load_results(make_results()[:1])
+
+        assert self.store.get_summary()['total'] == 1
+        assert len(self.store.fuel_rows()) == 2
+
+    def test_file_backed_store(self, tmp_path):
+        db_path = str(tmp_path / 'results.sqlite')
+        ResultsStore(db_path).load_results(make_results())
+
+        reopened = ResultsStore(db_path)
+        assert reopened.get_summary()['total'] == 3
+        reopened.close()
+
+
+def make_batch(count):
+    return [
+        {
+            'source_image': f'packet_{i:03d}.jpg',
+            'processing_success': i % 4 != 3,
+            'drivers_name': 'JOHN DOE' if i % 2 else 'JANE ROE',
+            'unit': str(100 + i),
+            'trip': str(i),
+            'validation_warnings': ['check miles'] if i % 5 == 0 else [],
+            'error': None if i % 4 != 3 else 'Blurry image',
+        }
+        for i in range(count)
+    ]
+
+
+@pytest.mark.unit
+class TestDashboardQueries:
+    """Test search, status filters and paging used by the dashboard"""
+
+    def setup_method(self):
+        self.store = ResultsStore.from_results(make_batch(20), edited_sources=['packet_005.jpg'])
+
+    def teardown_method(self):
+        self.store.close()
+
+    def positions(self, **filters):
+        return [p['position'] for p in self.store.query_packets(**filters)]
+
+    def test_filters_combine(self):
+        assert self.store.count_packets(successful_only=True) == 15
+        assert self.positions(with_warnings_only=True) == [0, 5, 10, 15]
+        assert self.positions(edited_only=True) == [5]
+        assert self.positions(search=' packet_01') == list(range(10, 20))
+        assert self.positions(search='jane', successful_only=True, with_warnings_only=True) == [0, 10]
+
+    def test_failed_results_searchable_by_error(self):
+        assert self.positions(search='BLURRY') == [3, 7, 11, 15, 19]
+        assert self.positions(search='blurry', successful_only=True) == []
+
+    def test_search_wildcards_are_literal(self):
+        assert self.store.count_packets(search='%') == 0
+        assert self.store.count_packets(search='packet_') == 20
+        assert self.store.count_packets(search='k_t') == 0
+
+    def test_limit_and_offset(self):
+        assert self.positions(limit=5, offset=0, successful_only=True) == [0, 1, 2, 4, 5]
+        assert self.positions(limit=5, offset=10, successful_only=True) == [13, 14, 16, 17, 18]
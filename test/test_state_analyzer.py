@@ -0,0 +1,479 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the state analyzer
+Tests polyline decoding and state mileage allocation against synthetic state boundaries
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.state_analyzer import StateAnalyzer, GIS_AVAILABLE
+from src.state_workers import FORKSERVER_AVAILABLE
+from src.polyline_utils import decode_polyline_array, project_coordinates
+
+pytestmark = pytest.mark.skipif(not GIS_AVAILABLE, reason="GIS dependencies not installed")
+
+if GIS_AVAILABLE:
+    import flexpolyline
+    import geopandas as gpd
+    from shapely.geometry import LineString, box
+
+
+def make_state_boundaries():
+    """Three side-by-side rectangular 'states' between longitudes -106 and -94"""
+    states = gpd.GeoDataFrame(
+        {"STUSPS": ["NM", "TX", "OK"]},
+        geometry=[box(-106, 30, -102, 40), box(-102, 30, -98, 40), box(-98, 30, -94, 40)],
+        crs="EPSG:4326",
+    )
+    return states.to_crs(epsg=5070)
+
+
+def make_route(start, end, points=200):
+    lats = np.linspace(start[0], end[0], points)
+    lngs = np.linspace(start[1], end[1], points)
+    return flexpolyline.encode(list(zip(lats, lngs)))
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = StateAnalyzer()
+    analyzer._state_boundaries = make_state_boundaries()
+    return analyzer
+
+
+@pytest.mark.unit
+class TestPolylineDecoding:
+    """Test the vectorized flexible polyline decoder"""
+
+    @pytest.mark.parametrize("precision", [5, 6, 7])
+    def test_matches_reference_decoder(self, precision):
+        rng = np.random.default_rng(precision)
+        points = list(zip(rng.uniform(25, 49, 500), rng.uniform(-124, -67, 500)))
+        encoded = flexpolyline.encode(points, precision=precision)
+
+        expected = np.array(flexpolyline.decode(encoded))
+
+        np.testing.assert_allclose(decode_polyline_array(encoded), expected)
+
+    def test_third_dimension_dropped(self):
+        points = [(35.0, -100.0, 120.0), (35.1, -100.2, 130.0)]
+        encoded = flexpolyline.encode(points, third_dim=flexpolyline.ALTITUDE)
+
+        decoded = decode_polyline_array(encoded)
+
+        assert decoded.shape == (2, 2)
+        np.testing.assert_allclose(decoded, [(35.0, -100.0), (35.1, -100.2)])
+
+    def test_invalid_input_rejected(self):
+        with pytest.raises(ValueError):
+            decode_polyline_array("BF!")
+
+    def test_projection_uses_lng_lat_order(self):
+        x, y = project_coordinates(np.array([[40.0, -96.0]]))
+
+        # -96 is the central meridian of EPSG:5070, so x is ~0 and y is northing
+        assert abs(x[0]) < 1
+        assert 1500000 < y[0] < 2500000
+
+
+@pytest.mark.unit
+class TestStateMilesFromPolyline:
+    """Test state mileage allocation"""
+
+    def test_miles_split_across_states(self, analyzer):
+        route = make_route((35.0, -105.0), (35.0, -95.0))
+
+        state_miles = analyzer.calculate_state_miles_from_polyline(route, 600)
+
+        assert set(state_miles) == {"NM", "TX", "OK"}
+        assert sum(state_miles.values()) == pytest.approx(600, abs=0.5)
+        assert state_miles["TX"] == pytest.approx(240, rel=0.05)
+        assert state_miles["NM"] == pytest.approx(180, rel=0.05)
+
+    def test_multiple_sections(self, analyzer):
+        sections = [make_route((35.0, -105.0), (35.0, -100.0)), make_route((35.0, -100.0), (35.0, -96.0))]
+
+        state_miles = analyzer.calculate_state_miles_from_polyline(sections, 500)
+
+        assert set(state_miles) == {"NM", "TX", "OK"}
+        assert sum(state_miles.values()) == pytest.approx(500, abs=0.5)
+
+    def test_no_boundaries_returns_empty(self):
+        analyzer = StateAnalyzer()
+        analyzer.load_state_boundaries = lambda: None
+
+        assert analyzer.calculate_state_miles_from_polyline(make_route((35, -105), (35, -95)), 600) == {}
+
+
+@pytest.mark.unit
+class TestVertexEngine:
+    """Test the vertex-classification mileage engine against polygon intersection"""
+
+    @pytest.mark.parametrize("start,end", [
+        ((35.0, -105.0), (35.0, -95.0)),
+        ((31.0, -105.5), (39.0, -94.5)),
+        ((38.0, -101.0), (32.0, -99.0)),
+    ])
+    def test_matches_intersection_engine(self, analyzer, start, end):
+        route = make_route(start, end, points=57)
+
+        reference = analyzer.calculate_state_miles_from_polyline(route, 600, engine="intersection")
+        vertex = analyzer.calculate_state_miles_from_polyline(route, 600, engine="vertex")
+
+        assert set(vertex) == set(reference)
+        for state in reference:
+            assert vertex[state] == pytest.approx(reference[state], abs=0.2)
+
+    def test_route_leaving_all_states(self, analyzer):
+        # Starts west of the NM box, outside every state
+        route = make_route((35.0, -108.0), (35.0, -100.0))
+
+        reference = analyzer.calculate_state_miles_from_polyline(route, 400, engine="intersection")
+        vertex = analyzer.calculate_state_miles_from_polyline(route, 400, engine="vertex")
+
+        assert set(vertex) == {"NM", "TX"}
+        for state in reference:
+            assert vertex[state] == pytest.approx(reference[state], abs=0.2)
+
+    def test_engine_selected_from_config(self, analyzer, mocker):
+        mocker.patch("src.state_analyzer.config.STATE_MILEAGE_ENGINE", "vertex")
+        spy = mocker.spy(analyzer, "_state_meters_by_vertices")
+
+        analyzer.calculate_state_miles_from_polyline(make_route((35, -105), (35, -95)), 600)
+
+        spy.assert_called_once()
+
+
+@pytest.mark.unit
+class TestRouteSimplification:
+    """Test Douglas-Peucker simplification before state mileage"""
+
+    def make_wiggly_route(self, points=2000):
+        lngs = np.linspace(-105.0, -95.0, points)
+        lats = 35.0 + 0.0005 * np.sin(np.arange(points))
+        return flexpolyline.encode(list(zip(lats, lngs)))
+
+    def test_simplify_segment_reduces_vertices(self, analyzer):
+        xy = np.column_stack((np.linspace(0, 10000, 1001), np.zeros(1001)))
+        xy[1::2, 1] = 0.5
+
+        simplified = analyzer._simplify_segment(xy, 1.0)
+
+        assert len(simplified) == 2
+        np.testing.assert_allclose(simplified, xy[[0, -1]])
+
+    @pytest.mark.parametrize("tolerance", [10, 100, 500])
+    def test_simplified_miles_close_to_unsimplified(self, analyzer, tolerance):
+        route = self.make_wiggly_route()
+
+        reference = analyzer.calculate_state_miles_from_polyline(route, 600, simplify_tolerance=0)
+        simplified = analyzer.calculate_state_miles_from_polyline(route, 600, simplify_tolerance=tolerance)
+
+        assert set(simplified) == set(reference)
+        assert sum(simplified.values()) == pytest.approx(600, abs=0.5)
+        for state in reference:
+            assert simplified[state] == pytest.approx(reference[state], abs=1.0)
+
+    def test_tolerance_from_config(self, analyzer, mocker):
+        mocker.patch("src.state_analyzer.config.ROUTE_SIMPLIFY_TOLERANCE_METERS", 50.0)
+        spy = mocker.spy(analyzer, "_simplify_segment")
+
+        analyzer.calculate_state_miles_from_polyline(make_route((35, -105), (35, -95)), 600)
+
+        spy.assert_called_once()
+        assert spy.call_args.args[1] == 50.0
+
+    def test_disabled_by_default(self, analyzer, mocker):
+        mocker.patch("src.state_analyzer.config.ROUTE_SIMPLIFY_TOLERANCE_METERS", 0.0)
+        spy = mocker.spy(analyzer, "_simplify_segment")
+
+        analyzer.calculate_state_miles_from_polyline(make_route((35, -105), (35, -95)), 600)
+
+        spy.assert_not_called()
+
+
+@pytest.mark.unit
+class TestStateMilesBatch:
+    """Test batch state mileage across many routes"""
+
+    def test_matches_single_route_results_in_order(self, analyzer):
+        polylines = [
+            make_route((35.0, -105.0), (35.0, -95.0)),
+            make_route((32.0, -101.0), (38.0, -99.5)),
+            [make_route((35.0, -105.0), (35.0, -100.0)), make_route((35.0, -100.0), (35.0, -96.0))],
+        ]
+        totals = [600, 420, 500]
+
+        batch = analyzer.calculate_state_miles_batch(polylines, totals)
+
+        expected = [analyzer.calculate_state_miles_from_polyline(p, t) for p, t in zip(polylines, totals)]
+        assert batch == expected
+
+    def test_vertex_engine_batch(self, analyzer):
+        polylines = [make_route((35.0, -105.0), (35.0, -95.0)), make_route((36.0, -97.0), (36.0, -95.0))]
+
+        batch = analyzer.calculate_state_miles_batch(polylines, [600, 110], engine="vertex")
+
+        assert set(batch[0]) == {"NM", "TX", "OK"}
+        assert batch[1] == {"OK": 110.0}
+
+    def test_unusable_routes_return_empty(self, analyzer):
+        polylines = ["", make_route((35.0, -105.0), (35.0, -95.0)), "BF!"]
+
+        batch = analyzer.calculate_state_miles_batch(polylines, [100, 600, 100])
+
+        assert batch[0] == {}
+        assert batch[2] == {}
+        assert set(batch[1]) == {"NM", "TX", "OK"}
+
+    def test_length_mismatch_rejected(self, analyzer):
+        with pytest.raises(ValueError):
+            analyzer.calculate_state_miles_batch(["a", "b"], [1.0])
+
+
+def make_trip(stops):
+    """Trip distance data with one routed leg between consecutive stops"""
+    legs = []
+    for number, (origin, destination) in enumerate(zip(stops, stops[1:]), start=1):
+        legs.append({
+            "leg_number": number,
+            "origin": {"coordinates": origin},
+            "destination": {"coordinates": destination},
+            "distance_miles": 100.0,
+            "polyline": [make_route(origin, destination)],
+        })
+    return {
+        "legs": legs,
+        "total_distance_miles": 100.0 * len(legs),
+        "calculation_success": True,
+        "trip_polylines": [pl for leg in legs for pl in leg["polyline"]],
+    }
+
+
+@pytest.mark.unit
+class TestLegStateMileageCache:
+    """Test per-leg state mileage memoization"""
+
+    STOPS = [(35.0, -105.0), (35.0, -101.0), (35.5, -97.0), (35.0, -95.0)]
+
+    def test_trip_composed_from_legs_matches_whole_trip(self, analyzer):
+        trip = make_trip(self.STOPS)
+
+        result = analyzer.add_state_mileage_to_trip_data(trip, trip["trip_polylines"])
+
+        expected = analyzer.calculate_state_miles_from_polyline(trip["trip_polylines"], 300.0)
+        assert {s["state"]: s["miles"] for s in result["state_mileage"]} == expected
+
+    def test_one_stop_edit_recomputes_two_legs(self, analyzer, mocker):
+        analyzer.add_state_mileage_to_trip_data(make_trip(self.STOPS), [])
+        spy = mocker.spy(analyzer, "_state_meters_batch")
+
+        edited_stops = list(self.STOPS)
+        edited_stops[2] = (36.0, -97.5)
+        result = analyzer.add_state_mileage_to_trip_data(make_trip(edited_stops), [])
+
+        spy.assert_called_once()
+        assert len(spy.call_args.args[0]) == 2
+        assert analyzer.get_cache_stats()["hits"] == 1
+        assert sum(s["miles"] for s in result["state_mileage"]) == pytest.approx(300, abs=0.5)
+
+    def test_unchanged_trip_served_from_cache(self, analyzer, mocker):
+        analyzer.add_state_mileage_to_trip_data(make_trip(self.STOPS), [])
+        spy = mocker.spy(analyzer, "_state_meters_batch")
+
+        analyzer.add_state_mileage_to_trip_data(make_trip(self.STOPS), [])
+
+        spy.assert_not_called()
+
+    def test_cached_entries_not_mutated_by_callers(self, analyzer):
+        polyline = make_route((35.0, -105.0), (35.0, -95.0))
+
+        first = analyzer.calculate_leg_state_meters([polyline])[0]
+        first["TX"] = 0.0
+
+        assert analyzer.calculate_leg_state_meters([polyline])[0]["TX"] > 0
+
+    def test_cache_size_limit(self, analyzer, mocker):
+        mocker.patch("src.state_analyzer.config.STATE_MILEAGE_CACHE_SIZE", 2)
+
+        analyzer.calculate_leg_state_meters(
+            [make_route(a, b) for a, b in zip(self.STOPS, self.STOPS[1:])]
+        )
+
+        assert analyzer.get_cache_stats()["cached_legs"] == 2
+
+    def test_legs_without_polylines_use_trip_polylines(self, analyzer):
+        trip = make_trip(self.STOPS)
+        for leg in trip["legs"]:
+            del leg["polyline"]
+
+        result = analyzer.add_state_mileage_to_trip_data(trip, trip["trip_polylines"])
+
+        assert {s["state"] for s in result["state_mileage"]} == {"NM", "TX", "OK"}
+        assert analyzer.get_cache_stats()["cached_legs"] == 0
+
+
+def exact_state_miles(analyzer, stops, total_miles):
+    """Reference split: exact clipping of the projected stop-to-stop lines"""
+    states = analyzer._state_boundaries
+    x, y = project_coordinates(np.array(stops, dtype=float), states.crs.srs)
+    line = LineString(np.column_stack((x, y)))
+    meters = {row.STUSPS: line.intersection(row.geometry).length for row in states.itertuples()}
+    total_meters = sum(meters.values())
+    return {state: value / total_meters * total_miles for state, value in meters.items() if value > 0}
+
+
+@pytest.mark.unit
+class TestLocalStateAnalysis:
+    """Test polyline-free state analysis from the local boundaries"""
+
+    @pytest.mark.parametrize("stops", [
+        [(35.0, -105.0), (35.0, -95.0)],
+        [(31.0, -105.5), (39.5, -94.5)],
+        [(35.0, -105.0), (38.0, -99.0), (33.0, -97.0)],
+    ])
+    def test_matches_exact_split(self, analyzer, stops):
+        analysis = analyzer.analyze_route_states_local(stops[0], stops[-1], 700, via_coords=stops[1:-1])
+
+        expected = exact_state_miles(analyzer, stops, 700)
+        assert analysis["analysis_method"] == "local_boundary_sampling"
+        assert {s["state"] for s in analysis["states"]} == set(expected)
+        for state in analysis["states"]:
+            assert state["miles"] == pytest.approx(expected[state["state"]], abs=0.15)
+
+    def test_no_network_calls(self, analyzer, mocker):
+        analyzer.geocoding_service = mocker.MagicMock()
+
+        analyzer.analyze_route_states_local((35.0, -105.0), (35.0, -95.0), 600)
+
+        assert analyzer.geocoding_service.method_calls == []
+
+    def test_more_accurate_than_reverse_geocode_sampling(self, analyzer, mocker):
+        # Even with a perfect reverse geocoder the ratio steps misplace borders
+        mocker.patch("src.state_analyzer.config.HERE_RATE_LIMIT", 0)
+        states = analyzer._state_boundaries
+
+        def perfect_geocoder(coords):
+            x, y = project_coordinates(np.array([coords]), states.crs.srs)
+            label = analyzer._classify_points(np.column_stack((x, y)), states)[0]
+            return states["STUSPS"].iloc[label] if label >= 0 else None
+
+        mocker.patch.object(analyzer, "_reverse_geocode_to_state", side_effect=perfect_geocoder)
+        origin, destination = (34.0, -105.3), (36.0, -94.4)
+        expected = exact_state_miles(analyzer, [origin, destination], 650)
+
+        def max_error(analysis):
+            miles = {s["state"]: s["miles"] for s in analysis["states"]}
+            return max(abs(miles.get(state, 0) - value) for state, value in expected.items())
+
+        local = analyzer.analyze_route_states_local(origin, destination, 650)
+        sampled = analyzer.analyze_route_states_enhanced(None, origin, destination, 650)
+
+        assert max_error(local) < 0.2
+        assert max_error(sampled) > 10 * max_error(local)
+
+    def test_trip_without_polylines_follows_stops(self, analyzer, mocker):
+        trip = make_trip([(35.0, -105.0), (35.0, -95.5), (35.0, -105.0)])
+        for leg in trip["legs"]:
+            del leg["polyline"]
+        enhanced = mocker.spy(analyzer, "analyze_route_states_enhanced")
+
+        result = analyzer.add_state_mileage_to_trip_data(trip, [])
+
+        enhanced.assert_not_called()
+        assert {s["state"] for s in result["state_mileage"]} == {"NM", "TX", "OK"}
+        assert sum(s["miles"] for s in result["state_mileage"]) == pytest.approx(200, abs=0.5)
+
+    def test_unavailable_without_boundaries(self):
+        analyzer = StateAnalyzer()
+        analyzer.load_state_boundaries = lambda: None
+
+        assert analyzer.analyze_route_states_local((35.0, -105.0), (35.0, -95.0), 600) is None
+
+
+@pytest.mark.unit
+@pytest.mark.skipif(not FORKSERVER_AVAILABLE, reason="forkserver not available")
+class TestStateAnalysisWorkers:
+    """Test the process-pool backend for batch state mileage"""
+
+    @pytest.mark.parametrize("engine", ["intersection", "vertex"])
+    def test_pool_matches_in_process_results(self, analyzer, mocker, engine):
+        polylines = [
+            make_route((35.0, -105.0), (35.0, -95.0)),
+            "",
+            make_route((32.0, -101.0), (38.0, -99.5)),
+            [make_route((35.0, -105.0), (35.0, -100.0)), make_route((35.0, -100.0), (35.0, -96.0))],
+            make_route((36.0, -97.0), (36.0, -95.0)),
+        ]
+        totals = [600, 0, 420, 500, 110]
+        expected = analyzer.calculate_state_miles_batch(polylines, totals, engine=engine)
+
+        mocker.patch("src.state_analyzer.config.STATE_ANALYSIS_WORKERS", 2)
+        try:
+            pooled = analyzer.calculate_state_miles_batch(polylines, totals, engine=engine)
+            assert analyzer._worker_pool is not None
+        finally:
+            analyzer.close_worker_pool()
+
+        assert pooled == expected
+
+    def test_single_worker_runs_in_process(self, analyzer, mocker):
+        mocker.patch("src.state_analyzer.config.STATE_ANALYSIS_WORKERS", 1)
+
+        analyzer.calculate_state_miles_batch([make_route((35, -105), (35, -95))] * 2, [600, 600])
+
+        assert analyzer._worker_pool is None
+
+    def test_concurrent_batches_share_one_pool(self, analyzer, mocker):
+        from concurrent.futures import ThreadPoolExecutor
+        from src import state_analyzer
+
+        polylines = [make_route((35.0, -105.0), (35.0, -95.0)), make_route((32.0, -101.0), (38.0, -99.5))]
+        totals = [600, 420]
+        expected = analyzer.calculate_state_miles_batch(polylines, totals)
+
+        pools = []
+        start_pool = state_analyzer.StateAnalysisPool
+
+        def track_pool(*args):
+            pools.append(start_pool(*args))
+            return pools[-1]
+
+        mocker.patch("src.state_analyzer.config.STATE_ANALYSIS_WORKERS", 2)
+        mocker.patch("src.state_analyzer.StateAnalysisPool", side_effect=track_pool)
+        try:
+            with ThreadPoolExecutor(max_workers=6) as executor:
+                results = list(executor.map(
+                    lambda _: analyzer.calculate_state_miles_batch(polylines, totals), range(12)
+                ))
+        finally:
+            analyzer.close_worker_pool()
+
+        assert len(pools) == 1
+        assert all(result == expected for result in results)
+
+    def test_each_pool_uses_its_own_boundaries(self, analyzer, mocker):
+        merged = StateAnalyzer()
+        merged._state_boundaries = gpd.GeoDataFrame(
+            {"STUSPS": ["TX"]}, geometry=[box(-106, 30, -94, 40)], crs="EPSG:4326"
+        ).to_crs(epsg=5070)
+        polylines = [make_route((35.0, -105.0), (35.0, -95.0))] * 2
+        expected = [a.calculate_state_miles_batch(polylines, [600, 600]) for a in (analyzer, merged)]
+
+        mocker.patch("src.state_analyzer.config.STATE_ANALYSIS_WORKERS", 2)
+        try:
+            pooled = [a.calculate_state_miles_batch(polylines, [600, 600]) for a in (analyzer, merged)]
+            pooled_again = analyzer.calculate_state_miles_batch(polylines, [600, 600])
+        finally:
+            analyzer.close_worker_pool()
+            merged.close_worker_pool()
+
+        assert pooled == expected
+        assert pooled_again == expected[0]
+        assert set(expected[1][0]) == {"TX"}
@@ -4,6 +4,7 @@ Test suite for Streamlit recalculation functionality
 Tests the complex multi-step process of editing values and recalculating distances
 """
 
+import io
 import pytest
 import unittest.mock as mock
 from unittest.mock import MagicMock, patch
@@ -210,15 +211,33 @@ class TestRecalculationIntegration:
             'legs': self.mock_distance_data['legs']
         }
 
+    def make_session_state(self, edited_result):
+        """Session state holding the processor and the edit diff for test_packet.jpg"""
+        mock_session_state = MagicMock()
+        mock_session_state.processor = self.mock_processor
+        mock_session_state.use_here_api = True
+        mock_session_state.processing_results = [{'source_image': 'test_packet.jpg', 'unit': '123'}]
+        
+        # Mock the edited result access
+        mock_session_state.__getitem__ = lambda self, key: edited_result if key == 'edited_test_packet.jpg' else None
+        return mock_session_state
+
     @patch('streamlit_app.st')
     def test_recalculation_success_flow(self, mock_st):
         """Test successful recalculation flow"""
         # Setup mocks
-        self.mock_processor.get_coordinates_for_stops.return_value = self.mock_coordinates_data
-        self.mock_processor.calculate_trip_distances.return_value = self.mock_distance_data
-        self.mock_state_analyzer.add_state_mileage_to_trip_data.return_value = self.mock_enhanced_distance_data
+        self.mock_processor.recalculate_distances.return_value = {
+            'recalculation_success': True,
+            'patch': {
+                'coordinates': self.mock_coordinates_data,
+                'distance_calculations': self.mock_enhanced_distance_data,
+                'validation_warnings': [],
+            },
+            'changed_stops': ['first_drop'],
+            'reused_legs': 0,
+            'rerouted_legs': 2,
+        }
         
-        # Mock session state
         edited_result = {
             'source_image': 'test_packet.jpg',
             'trip_started_from': 'San Francisco, CA',
@@ -226,97 +245,87 @@ class TestRecalculationIntegration:
             'drop_off': 'Houston, TX',
             'total_miles': '1400'
         }
-        
-        mock_session_state = MagicMock()
-        mock_session_state.processor = self.mock_processor
-        mock_session_state.use_here_api = True
-        mock_session_state.processing_results = [{'source_image': 'test_packet.jpg', 'unit': '123'}]
-        
-        # Mock the edited result access  
-        mock_session_state.__getitem__ = lambda self, key: edited_result if key == 'edited_test_packet.jpg' else None
+        mock_session_state = self.make_session_state(edited_result)
         
         with patch('streamlit_app.st.session_state', mock_session_state):
             with patch('streamlit_app.st.spinner'):
-                with patch('time.sleep'):  # Skip the sleep
-                    # Call the recalculation function
-                    streamlit_app.recalculate_distances_for_result('test_packet.jpg')
-        
-        # Verify the process was called correctly
-        self.mock_processor.get_coordinates_for_stops.assert_called_once()
-        self.mock_processor.calculate_trip_distances.assert_called_once_with(self.mock_coordinates_data)
-        self.mock_state_analyzer.add_state_mileage_to_trip_data.assert_called_once()
-        
-        # Verify success messages were shown
-        mock_st.success.assert_called()
-        mock_st.info.assert_called()
-        mock_st.balloons.assert_called_once()
+                # Call the recalculation function
+                streamlit_app.recalculate_distances_for_result('test_packet.jpg')
+        
+        # Verify the processor was asked for a patch for the edited result
+        self.mock_processor.recalculate_distances.assert_called_once()
+        called_result = self.mock_processor.recalculate_distances.call_args[0][0]
+        assert called_result['first_drop'] == 'Las Vegas, NV'
+        assert called_result['unit'] == '123'
+        
+        # Verify the patch was stored in the edit diff and the page refreshed
+        assert edited_result['distance_calculations'] == self.mock_enhanced_distance_data
+        assert edited_result['coordinates'] == self.mock_coordinates_data
         mock_st.rerun.assert_called_once()
 
     @patch('streamlit_app.st')
-    def test_recalculation_geocoding_failure(self, mock_st):
-        """Test recalculation when geocoding fails"""
+    def test_recalculation_failure(self, mock_st):
+        """Test recalculation when the processor reports an error"""
         # Setup mocks for failure
-        self.mock_processor.get_coordinates_for_stops.return_value = None
+        self.mock_processor.recalculate_distances.return_value = {
+            'recalculation_success': False,
+            'error': 'Geocoding service unavailable',
+        }
         
-        # Mock session state
         edited_result = {
             'source_image': 'test_packet.jpg',
             'trip_started_from': 'Invalid Location XYZ'
         }
-        
-        mock_session_state = MagicMock()
-        mock_session_state.processor = self.mock_processor
-        mock_session_state.use_here_api = True
-        
-        # Mock the edited result access  
-        mock_session_state.__getitem__ = lambda self, key: edited_result if key == 'edited_test_packet.jpg' else None
+        mock_session_state = self.make_session_state(edited_result)
         
         with patch('streamlit_app.st.session_state', mock_session_state):
             with patch('streamlit_app.st.spinner'):
                 # Call the recalculation function
                 streamlit_app.recalculate_distances_for_result('test_packet.jpg')
         
-        # Verify error was shown
-        mock_st.error.assert_called_with("❌ Failed to get coordinates for the edited locations")
+        # Verify error was shown and nothing was stored
+        mock_st.error.assert_called_with("❌ Error recalculating distances: Geocoding service unavailable")
+        assert 'distance_calculations' not in edited_result
+        mock_st.rerun.assert_not_called()
 
     @patch('streamlit_app.st')
     def test_recalculation_distance_calculation_failure(self, mock_st):
         """Test recalculation when distance calculation fails"""
-        # Setup mocks
-        self.mock_processor.get_coordinates_for_stops.return_value = self.mock_coordinates_data
-        
         # Mock failed distance calculation
         failed_distance_data = {
             'calculation_success': False,
             'total_distance_miles': 0,
             'error': 'HERE API routing failed'
         }
-        self.mock_processor.calculate_trip_distances.return_value = failed_distance_data
-        self.mock_state_analyzer.add_state_mileage_to_trip_data.return_value = failed_distance_data
+        self.mock_processor.recalculate_distances.return_value = {
+            'recalculation_success': True,
+            'patch': {
+                'coordinates': self.mock_coordinates_data,
+                'distance_calculations': failed_distance_data,
+                'validation_warnings': [],
+            },
+            'changed_stops': ['drop_off'],
+            'reused_legs': 0,
+            'rerouted_legs': 1,
+        }
         
-        # Mock session state
         edited_result = {
             'source_image': 'test_packet.jpg',
             'trip_started_from': 'San Francisco, CA',
             'drop_off': 'Houston, TX'
         }
-        
-        mock_session_state = MagicMock()
-        mock_session_state.processor = self.mock_processor
-        mock_session_state.use_here_api = True
-        mock_session_state.processing_results = [{'source_image': 'test_packet.jpg'}]
-        
-        # Mock the edited result access  
-        mock_session_state.__getitem__ = lambda self, key: edited_result if key == 'edited_test_packet.jpg' else None
+        mock_session_state = self.make_session_state(edited_result)
         
         with patch('streamlit_app.st.session_state', mock_session_state):
             with patch('streamlit_app.st.spinner'):
-                with patch('time.sleep'):
-                    # Call the recalculation function
-                    streamlit_app.recalculate_distances_for_result('test_packet.jpg')
+                # Call the recalculation function
+                streamlit_app.recalculate_distances_for_result('test_packet.jpg')
         
-        # Verify warning was shown for failed calculation
-        mock_st.warning.assert_called_with("⚠️ Distance recalculation completed but some routes failed")
+        # Verify a warning was queued for the card
+        mock_session_state.__setitem__.assert_any_call(
+            'recalc_notice_test_packet.jpg',
+            ('warning', "⚠️ Distance recalculation completed but some routes failed")
+        )
 
 
 class TestExportDataWithRecalculation:
@@ -366,6 +375,191 @@ class TestExportDataWithRecalculation:
         assert 'test1.jpg' in csv_output or '1' in csv_output  # Page number
 
 
+class AttrDict(dict):
+    """Dictionary with attribute access, like st.session_state"""
+
+    def __getattr__(self, key):
+        return self[key]
+
+    def __setattr__(self, key, value):
+        self[key] = value
+
+
+class TestExportCaching:
+    """Test export memoization keyed on the result set version"""
+
+    def test_export_built_once_per_version(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            return {'data': b'xlsx'}
+
+        with patch('streamlit_app.st.session_state', AttrDict()):
+            first = streamlit_app.get_cached_export('Excel', False, build)
+            again = streamlit_app.get_cached_export('Excel', False, build)
+            streamlit_app.get_cached_export('Excel', True, build)
+            assert first is again
+            assert len(builds) == 2
+
+            streamlit_app.bump_results_version()
+            streamlit_app.get_cached_export('Excel', False, build)
+
+            assert len(builds) == 3
+            assert len(streamlit_app.st.session_state.export_cache['exports']) == 1
+
+    def test_each_format_cached_without_changing_version(self):
+        results = [
+            {
+                'source_image': f'p_Page_{i}.jpg',
+                'processing_success': True,
+                'unit': str(100 + i),
+                'trailer': '211',
+                'fuel_by_state': {'TX': 20.0},
+                'distance_calculations': {'state_mileage': [{'state': 'TX', 'miles': 100, 'percentage': 100.0}]},
+            }
+            for i in range(5)
+        ]
+
+        with patch('streamlit_app.st.session_state', AttrDict()), \
+             patch('streamlit_app.get_current_results_with_edits', return_value=results):
+            for export_format in ["Excel", "CSV (Distance)", "CSV (Fuel)"]:
+                export = streamlit_app.get_cached_export(
+                    export_format, False, lambda: streamlit_app.build_standard_export(export_format, False)
+                )
+                assert export['count'] == 5
+            streamlit_app.get_cached_export('JSON', False, lambda: streamlit_app.build_json_export(False))
+
+            cache = streamlit_app.st.session_state.export_cache
+            assert sorted(cache['exports']) == [
+                ('CSV (Distance)', False), ('CSV (Fuel)', False), ('Excel', False), ('JSON', False)
+            ]
+            assert cache['version'] == 0
+            assert cache['exports'][('CSV (Fuel)', False)]['data'].count('TX') == 5
+            streamlit_app.st.session_state.results_store['store'].close()
+
+    def test_format4_check_memoized_per_version(self):
+        store = MagicMock()
+        store.query_packets.return_value = [{'position': 0}]
+
+        with patch('streamlit_app.st.session_state', AttrDict()), \
+             patch('streamlit_app.get_results_store', return_value=store):
+            assert streamlit_app.results_have_format4() is True
+            assert streamlit_app.results_have_format4() is True
+            assert store.query_packets.call_count == 1
+            assert 'export_cache' not in streamlit_app.st.session_state
+
+            store.query_packets.return_value = []
+            streamlit_app.bump_results_version()
+            assert streamlit_app.results_have_format4() is False
+            store.query_packets.assert_called_with(format_prefix='Format 4')
+
+    def test_excel_built_from_records(self):
+        import pandas as pd
+        results = [
+            {
+                'source_image': 'packet_Page_08.jpg',
+                'processing_success': True,
+                'unit': '123',
+                'trailer': '7X1',
+                'fuel_by_state': {'TX': 50.04},
+                'distance_calculations': {'state_mileage': [{'state': 'TX', 'miles': 500}]},
+            }
+        ]
+
+        with patch('streamlit_app.pd.read_csv') as read_csv:
+            excel_bytes = streamlit_app.generate_excel_export(results)
+        read_csv.assert_not_called()
+
+        sheets = pd.read_excel(io.BytesIO(excel_bytes), sheet_name=None)
+        distance = sheets['Driver Packet Results']
+        assert list(distance.columns) == streamlit_app.DISTANCE_EXPORT_FIELDS
+        assert distance['State'].iloc[0] == 'Texas'
+        assert distance['Trailer'].iloc[0] == '7X1'
+        assert distance['Total Miles'].tolist() == [500, 500]
+        assert sheets['Gallon Trip Env']['Gallons'].iloc[0] == 50.0
+
+    def test_csv_and_rows_agree(self):
+        results = [{'source_image': 'p3.jpg', 'processing_success': True, 'unit': '9', 'distance_calculations': {}}]
+
+        csv_output = streamlit_app.generate_csv_export(results)
+
+        assert csv_output.splitlines() == [
+            'State,Envelop (Page No.),Truck,Trailer,State2,Total Miles',
+            'NO_STATE_DATA,3,9,,,0',
+            ',,,,,0',
+        ]
+
+
+class UploadStub:
+    """Uploaded file stand-in that records reads"""
+
+    def __init__(self, name, data):
+        self.name = name
+        self.data = data
+        self.reads = 0
+
+    def getvalue(self):
+        self.reads += 1
+        return self.data
+
+
+class TestUploadPreviews:
+    """Test paged upload preview thumbnails"""
+
+    @patch('streamlit_app.st')
+    def test_only_current_page_rendered(self, mock_st):
+        from PIL import Image
+        from src.thumbnails import ThumbnailCache
+
+        uploads = []
+        for i in range(30):
+            output = io.BytesIO()
+            Image.new('RGB', (400, 500), (i * 8, 80, 80)).save(output, format='JPEG')
+            uploads.append(UploadStub(f'page_{i}.jpg', output.getvalue()))
+        cache = ThumbnailCache(max_entries=50)
+        mock_st.number_input.return_value = 3
+        mock_st.columns.return_value = [MagicMock() for _ in range(4)]
+
+        with patch('streamlit_app.get_thumbnail_cache', return_value=cache):
+            streamlit_app.show_upload_previews(uploads)
+
+        mock_st.caption.assert_called_once_with("Showing 25-30 of 30 files")
+        assert [u.reads for u in uploads[24:]] == [1] * 6
+        assert sum(u.reads for u in uploads[:24]) == 0
+        assert mock_st.image.call_count == 6
+        assert cache.get_cache_stats()['misses'] == 6
+
+
+class TestImageJobProgress:
+    """Test that only a running background job is polled"""
+
+    def make_job(self, status):
+        return {'job_id': 'job-1', 'status': status, 'total': 3, 'completed': 3,
+                'successful': 2, 'failed': 1, 'in_progress': []}
+
+    @pytest.mark.parametrize('status', ['completed', 'cancelled'])
+    def test_finished_job_shows_summary_without_polling(self, status):
+        job = self.make_job(status)
+
+        with patch('streamlit_app.sync_image_job_results', return_value=job), \
+             patch('streamlit_app.poll_image_job_progress') as poll, \
+             patch('streamlit_app.show_image_job_summary') as summary:
+            streamlit_app.show_image_job_progress()
+
+        poll.assert_not_called()
+        summary.assert_called_once_with(job)
+
+    def test_running_job_is_polled(self):
+        with patch('streamlit_app.sync_image_job_results', return_value=self.make_job('running')), \
+             patch('streamlit_app.poll_image_job_progress') as poll, \
+             patch('streamlit_app.show_image_job_summary') as summary:
+            streamlit_app.show_image_job_progress()
+
+        poll.assert_called_once_with()
+        summary.assert_not_called()
+
+
 @pytest.mark.integration
 class TestRecalculationEndToEnd:
     """End-to-end tests for recalculation functionality"""
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the thumbnails module
+Tests thumbnail rendering and the content-keyed bounded cache
+"""
+
+import io
+import os
+import sys
+import pytest
+from PIL import Image
+
+# Add project root to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.thumbnails import ThumbnailCache, content_hash, make_thumbnail
+
+
+def encode_image(size, color, fmt="JPEG"):
+    output = io.BytesIO()
+    Image.new("RGB", size, color).save(output, format=fmt)
+    return output.getvalue()
+
+
+@pytest.mark.unit
+class TestMakeThumbnail:
+    """Test thumbnail rendering"""
+
+    def test_large_scan_reduced(self):
+        data = encode_image((2400, 3200), "white")
+
+        thumbnail = make_thumbnail(data, max_size=200)
+
+        with Image.open(io.BytesIO(thumbnail)) as img:
+            assert img.format == "JPEG"
+            assert max(img.size) == 200
+            assert img.size == (150, 200)
+        assert len(thumbnail) < len(data)
+
+    def test_png_with_alpha(self):
+        output = io.BytesIO()
+        Image.new("RGBA", (400, 100), (255, 0, 0, 128)).save(output, format="PNG")
+
+        with Image.open(io.BytesIO(make_thumbnail(output.getvalue(), max_size=100))) as img:
+            assert img.size == (100, 25)
+            assert img.mode == "RGB"
+
+
+@pytest.mark.unit
+class TestThumbnailCache:
+    """Test the content-keyed thumbnail cache"""
+
+    def test_same_content_rendered_once(self):
+        cache = ThumbnailCache(max_entries=10)
+        data = encode_image((800, 600), "blue")
+
+        first = cache.get_thumbnail(data, max_size=64)
+        second = cache.get_thumbnail(bytes(data), max_size=64)
+
+        assert first == second
+        stats = cache.get_cache_stats()
+        assert stats["hits"] == 1 and stats["misses"] == 1
+
+    def test_size_is_part_of_key(self):
+        cache = ThumbnailCache(max_entries=10)
+        data = encode_image((800, 600), "blue")
+
+        cache.get_thumbnail(data, max_size=64)
+        cache.get_thumbnail(data, max_size=128)
+
+        assert cache.get_cache_stats()["cached_thumbnails"] == 2
+
+    def test_least_recently_used_evicted(self):
+        cache = ThumbnailCache(max_entries=2)
+        images = [encode_image((50, 50), color) for color in ("red", "green", "blue")]
+
+        cache.get_thumbnail(images[0], max_size=32)
+        cache.get_thumbnail(images[1], max_size=32)
+        cache.get_thumbnail(images[0], max_size=32)
+        cache.get_thumbnail(images[2], max_size=32)
+
+        assert cache.get_cache_stats()["cached_thumbnails"] == 2
+        cache.get_thumbnail(images[0], max_size=32)
+        assert cache.get_cache_stats()["hits"] == 2
+
+    def test_unreadable_image_returns_none(self):
+        cache = ThumbnailCache(max_entries=2)
+
+        assert cache.get_thumbnail(b"not an image", max_size=32) is None
+
+    def test_content_hash(self):
+        assert content_hash(b"a") == content_hash(b"a")
+        assert content_hash(b"a") != content_hash(b"b")